@@ -0,0 +1,729 @@
+"""
+Command Line Module
+-------------------
+
+`python -m ch347` runs everyday CH347 tasks without a script of their own.
+
+Subcommands:
+
+- `list`: the CH347 devices that can be opened.
+- `info`: versions, serial number, USB details and transfer plan of a device.
+- `i2c scan`: the I2C addresses that acknowledge, and the known parts among them.
+- `i2c dump`: registers of an I2C device as a hex dump, or to a file.
+- `eeprom read/write`: a 24Cxx EEPROM to or from a file.
+- `spi flash read/write/verify`: a SPI NOR flash to, from or against a file.
+  Writes erase and program only the 4 KiB sectors that differ from the
+  file, and skip the erase when the new data only clears bits. Addresses
+  are 3 bytes, so ranges must lie in the first 16 MiB.
+- `bench`: the `ch347.bench` benchmark suite.
+
+Transfers go between the device and the file chunk by chunk, with a
+progress line on the terminal and the MB/s reached at the end. `--device`
+selects the device index and `--json` prints results as JSON for scripts.
+Everything beyond argument parsing is imported when a subcommand needs it,
+so the tool starts quickly.
+
+Usage Example:
+--------------
+
+python -m ch347 list
+python -m ch347 --device 1 --json info
+python -m ch347 i2c scan --speed 400
+python -m ch347 i2c dump 0x68 --start 0x3B --length 14
+python -m ch347 eeprom read 24c256 eeprom.bin
+python -m ch347 spi flash write firmware.bin --clock auto --verify
+python -m ch347 bench --quick
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+EEPROM_TYPES = (
+    "24c01",
+    "24c02",
+    "24c04",
+    "24c08",
+    "24c16",
+    "24c32",
+    "24c64",
+    "24c128",
+    "24c256",
+    "24c512",
+    "24c1024",
+    "24c2048",
+    "24c4096",
+)
+
+I2C_SPEEDS = {20: 0, 100: 1, 400: 2, 750: 3}
+
+
+def _number(text) -> int:
+    return int(text, 0)
+
+
+class Progress:
+    """
+    Progress line of a transfer, and its throughput.
+
+    Attributes:
+        total (int): Bytes to transfer.
+        done (int): Bytes transferred.
+    """
+
+    INTERVAL = 0.1
+
+    def __init__(self, label, total, enabled=True, stream=None):
+        """
+        Start timing a transfer.
+
+        Args:
+            label (str): What is being transferred.
+            total (int): Bytes to transfer.
+            enabled (bool): Draw the progress line (default is True).
+            stream: Where the line goes (default is sys.stderr).
+        """
+        self.label = label
+        self.total = total
+        self.done = 0
+        self.enabled = enabled
+        self.stream = stream if stream is not None else sys.stderr
+        self.start = time.perf_counter()
+        self._drawn = 0.0
+
+    def update(self, count):
+        """
+        Add transferred bytes.
+        """
+        self.done += count
+        now = time.perf_counter()
+        if self.enabled and (now - self._drawn >= self.INTERVAL):
+            self._drawn = now
+            percent = 100 * self.done / self.total if self.total else 100
+            self.stream.write(
+                f"\r{self.label}: {self.done}/{self.total} bytes "
+                f"{percent:5.1f}% {self.rate(now):7.3f} MB/s"
+            )
+            self.stream.flush()
+
+    def rate(self, now=None) -> float:
+        elapsed = (now or time.perf_counter()) - self.start
+        return self.done / elapsed / 1e6 if elapsed > 0 else 0.0
+
+    def finish(self) -> dict:
+        """
+        Stop timing.
+
+        Returns:
+            dict: "bytes", "seconds" and "mb_per_s" of the transfer.
+        """
+        seconds = time.perf_counter() - self.start
+        if self.enabled:
+            self.stream.write("\r\x1b[K")
+            self.stream.flush()
+        return {
+            "bytes": self.done,
+            "seconds": seconds,
+            "mb_per_s": self.done / seconds / 1e6 if seconds > 0 else 0.0,
+        }
+
+
+def _summary(label, transfer) -> str:
+    return (
+        f"{label}: {transfer['bytes']} bytes in {transfer['seconds']:.3f} s, "
+        f"{transfer['mb_per_s']:.3f} MB/s"
+    )
+
+
+def _library(args):
+    # The library of an injected driver, otherwise the --dll path
+    return args.driver.ch347dll if args.driver is not None else args.dll
+
+
+def _open(args):
+    if args.driver is not None:
+        driver = args.driver
+    else:
+        from .ch347 import CH347
+
+        driver = CH347(device_index=args.device, dll_path=args.dll)
+    if driver.open_device() is None:
+        raise RuntimeError(f"Cannot open CH347 device {driver.device_index}")
+    args.opened = driver
+    return driver
+
+
+def _info_dict(info) -> dict:
+    result = {}
+    for name, _ in info._fields_:
+        if name == "DevHandle":
+            continue
+        value = getattr(info, name)
+        if isinstance(value, bytes):
+            value = value.decode("utf-8", "replace")
+        result[name] = value
+    return result
+
+
+def cmd_list(args):
+    from .ch347 import CH347
+
+    library = _library(args)
+    devices = []
+    for index in range(CH347.MAX_DEVICE_NUMBER):
+        driver = CH347(device_index=index, dll_path=library)
+        if driver.open_device() is None:
+            break
+        try:
+            info = driver.get_device_info()
+            devices.append(
+                {
+                    "index": index,
+                    "serial_number": driver.get_serial_number(),
+                    "chip_type": driver.get_chip_type(),
+                    "info": _info_dict(info) if info is not None else None,
+                }
+            )
+        finally:
+            driver.close_device()
+    lines = [
+        f"{device['index']}: serial {device['serial_number']}, "
+        f"chip type {device['chip_type']}, "
+        + (
+            f"{device['info']['ProductString']} mode {device['info']['ChipMode']}"
+            if device["info"]
+            else "no device information"
+        )
+        for device in devices
+    ]
+    lines.append(f"{len(devices)} device(s)")
+    return {"devices": devices}, lines
+
+
+def cmd_info(args):
+    driver = _open(args)
+    result = {
+        "device": driver.device_index,
+        "serial_number": driver.get_serial_number(),
+        "chip_type": driver.get_chip_type(),
+    }
+    version = driver.get_version()
+    if version is not None:
+        for name, value in zip(
+            ("driver_version", "dll_version", "device_version", "chip_type"), version
+        ):
+            result[name] = value
+    info = driver.get_device_info()
+    result["info"] = _info_dict(info) if info is not None else None
+    result["transfer_plan"] = driver.get_transfer_plan().to_dict()
+
+    lines = [f"{name}: {value}" for name, value in result.items() if name != "info"]
+    if result["info"]:
+        lines += [f"  {name}: {value}" for name, value in result["info"].items()]
+    return result, lines
+
+
+def _i2c(args):
+    driver = _open(args)
+    if not driver.i2c_set(I2C_SPEEDS[args.speed]):
+        raise RuntimeError("CH347I2C_Set failed")
+    return driver
+
+
+def cmd_i2c_scan(args):
+    from i2c_devices.discovery import identify, scan
+
+    driver = _i2c(args)
+    addresses = scan(driver)
+    if args.identify:
+        devices = identify(driver, addresses, instantiate=False)
+    else:
+        devices = [(address, None, None, None) for address in addresses]
+    result = {
+        "devices": [
+            {
+                "address": address,
+                "name": name,
+                "identity": identity.hex() if identity is not None else None,
+            }
+            for address, name, identity, _ in devices
+        ]
+    }
+    lines = [
+        f"0x{device['address']:02X}  {device['name'] or ''}".rstrip()
+        for device in result["devices"]
+    ]
+    lines.append(f"{len(addresses)} device(s)")
+    return result, lines
+
+
+def _hexdump(data, start) -> list:
+    lines = []
+    for offset in range(0, len(data), 16):
+        row = data[offset : offset + 16]
+        text = "".join(chr(byte) if 32 <= byte < 127 else "." for byte in row)
+        lines.append(f"{start + offset:04X}: {row.hex(' '):<47}  {text}")
+    return lines
+
+
+def cmd_i2c_dump(args):
+    driver = _i2c(args)
+    data = driver.stream_i2c([args.address << 1, args.start], args.length)
+    if data is None:
+        raise RuntimeError(f"I2C read from 0x{args.address:02X} failed")
+    data = bytes(data)
+    result = {"address": args.address, "start": args.start, "data": data.hex()}
+    if args.output:
+        with open(args.output, "wb") as file:
+            file.write(data)
+        return result, [f"{len(data)} bytes written to {args.output}"]
+    return result, _hexdump(data, args.start)
+
+
+def _eeprom(args):
+    eeprom_id = EEPROM_TYPES.index(args.type)
+    size = 128 << eeprom_id
+    if not 0 <= args.address < size:
+        raise ValueError(f"Address 0x{args.address:X} is outside the {args.type}")
+    return eeprom_id, size
+
+
+def cmd_eeprom_read(args):
+    eeprom_id, size = _eeprom(args)
+    length = args.length if args.length is not None else size - args.address
+    length = min(length, size - args.address)
+    driver = _open(args)
+    progress = Progress("eeprom read", length, args.progress)
+    with open(args.file, "wb") as file:
+        for offset in range(0, length, args.chunk):
+            count = min(args.chunk, length - offset)
+            data = driver.read_eeprom(eeprom_id, args.address + offset, count)
+            if data is None:
+                raise RuntimeError(f"EEPROM read at 0x{args.address + offset:X} failed")
+            file.write(data)
+            progress.update(count)
+    transfer = progress.finish()
+    return transfer, [_summary("eeprom read", transfer)]
+
+
+def cmd_eeprom_write(args):
+    eeprom_id, size = _eeprom(args)
+    length = os.path.getsize(args.file)
+    if args.address + length > size:
+        raise ValueError(f"{args.file} does not fit in the {args.type}")
+    driver = _open(args)
+    progress = Progress("eeprom write", length, args.progress)
+    mismatches = 0
+    with open(args.file, "rb") as file:
+        offset = 0
+        while True:
+            data = file.read(args.chunk)
+            if not data:
+                break
+            address = args.address + offset
+            if not driver.write_eeprom(eeprom_id, address, data):
+                raise RuntimeError(f"EEPROM write at 0x{address:X} failed")
+            if (
+                args.verify
+                and driver.read_eeprom(eeprom_id, address, len(data)) != data
+            ):
+                mismatches += 1
+            offset += len(data)
+            progress.update(len(data))
+    transfer = progress.finish()
+    lines = [_summary("eeprom write", transfer)]
+    if args.verify:
+        transfer["verified"] = not mismatches
+        lines.append("verify: " + ("ok" if not mismatches else "MISMATCH"))
+    return transfer, lines
+
+
+class _SPIFlash:
+    # SPI NOR flash with 3-byte addresses, 4 KiB sectors and 256 byte pages
+
+    SECTOR = 4096
+    PAGE = 256
+    # Larger parts wrap around at 16 MiB with 3-byte addresses
+    ADDRESS_LIMIT = 1 << 24
+
+    def __init__(self, driver, chip_select):
+        self.driver = driver
+        self.chip_select = chip_select
+
+    def jedec_id(self) -> bytes:
+        data = self.driver.spi_read(self.chip_select, [0x9F], 3)
+        if data is None:
+            raise RuntimeError("Reading the flash JEDEC ID failed")
+        return bytes(data)
+
+    @staticmethod
+    def _command(opcode, address) -> list:
+        return [opcode, (address >> 16) & 0xFF, (address >> 8) & 0xFF, address & 0xFF]
+
+    def read(self, address, length) -> bytes:
+        data = self.driver.spi_read(
+            self.chip_select, self._command(0x03, address), length
+        )
+        if data is None:
+            raise RuntimeError(f"Flash read at 0x{address:X} failed")
+        return bytes(data)
+
+    def _wait(self, timeout=5.0):
+        # Poll the status register until the write in progress bit clears
+        deadline = time.perf_counter() + timeout
+        while True:
+            status = self.driver.spi_read(self.chip_select, [0x05], 1)
+            if status is None:
+                raise RuntimeError("Reading the flash status failed")
+            if not status[0] & 0x01:
+                return
+            if time.perf_counter() > deadline:
+                raise RuntimeError("Flash stays busy")
+
+    def _write_enable(self):
+        if not self.driver.spi_write(self.chip_select, [0x06]):
+            raise RuntimeError("Flash write enable failed")
+
+    def erase_sector(self, address):
+        self._write_enable()
+        if not self.driver.spi_write(self.chip_select, self._command(0x20, address)):
+            raise RuntimeError(f"Flash sector erase at 0x{address:X} failed")
+        self._wait()
+
+    def program(self, address, data) -> int:
+        # Page program the pages that are not blank, return how many
+        programmed = 0
+        for offset in range(0, len(data), self.PAGE):
+            page = data[offset : offset + self.PAGE]
+            if page.count(0xFF) == len(page):
+                continue
+            self._write_enable()
+            if not self.driver.spi_write(
+                self.chip_select, self._command(0x02, address + offset) + list(page)
+            ):
+                raise RuntimeError(
+                    f"Flash page program at 0x{address + offset:X} failed"
+                )
+            self._wait()
+            programmed += 1
+        return programmed
+
+
+def _flash(args):
+    from .ch347 import SPIConfig
+
+    driver = _open(args)
+    chip_select = 0x80 | args.cs
+    config = SPIConfig(
+        Mode=args.mode,
+        Clock=7 if args.clock == "auto" else int(args.clock),
+        ByteOrder=1,
+        SPIOutDefaultData=0xFF,
+        ChipSelect=chip_select,
+        IsAutoDeactiveCS=1,
+    )
+    if not driver.spi_init(config):
+        raise RuntimeError("CH347SPI_Init failed")
+    if args.clock == "auto":
+        from .tuning import SPIClockTuner
+
+        SPIClockTuner(driver, config).tune()
+    flash = _SPIFlash(driver, chip_select)
+    jedec_id = flash.jedec_id()
+    if jedec_id in (b"\x00\x00\x00", b"\xff\xff\xff"):
+        raise RuntimeError("No SPI flash answers the JEDEC ID command")
+    # The capacity code of most SPI NOR parts is log2 of the size in bytes
+    size = 1 << jedec_id[2] if 0x10 <= jedec_id[2] <= 0x1F else None
+    return flash, jedec_id, size
+
+
+def _flash_length(args, size, available):
+    if args.length is not None:
+        length = args.length
+    elif available is not None:
+        length = available
+    elif size is not None:
+        length = size - args.address
+    else:
+        raise ValueError("Unknown flash size, give --length")
+    if size is not None and args.address + length > size:
+        raise ValueError("The range does not fit in the flash")
+    if args.address + length > _SPIFlash.ADDRESS_LIMIT:
+        raise ValueError(
+            "Only the first 16 MiB can be reached with 3-byte addresses, "
+            "give a range below 0x1000000"
+        )
+    return length
+
+
+def cmd_flash_read(args):
+    flash, jedec_id, size = _flash(args)
+    length = _flash_length(args, size, None)
+    progress = Progress("flash read", length, args.progress)
+    with open(args.file, "wb") as file:
+        for offset in range(0, length, args.chunk):
+            count = min(args.chunk, length - offset)
+            file.write(flash.read(args.address + offset, count))
+            progress.update(count)
+    transfer = progress.finish()
+    transfer["jedec_id"] = jedec_id.hex()
+    return transfer, [_summary("flash read", transfer)]
+
+
+def _flash_verify(args, flash, length):
+    progress = Progress("flash verify", length, args.progress)
+    mismatch = None
+    with open(args.file, "rb") as file:
+        for offset in range(0, length, args.chunk):
+            expected = file.read(min(args.chunk, length - offset))
+            data = flash.read(args.address + offset, len(expected))
+            if data != expected:
+                first = next(
+                    i for i, (a, b) in enumerate(zip(data, expected)) if a != b
+                )
+                mismatch = args.address + offset + first
+                break
+            progress.update(len(expected))
+    transfer = progress.finish()
+    transfer["verified"] = mismatch is None
+    transfer["mismatch"] = mismatch
+    if mismatch is None:
+        return transfer, [_summary("flash verify", transfer), "verify: ok"]
+    return transfer, [f"verify: MISMATCH at 0x{mismatch:X}"]
+
+
+def cmd_flash_verify(args):
+    flash, jedec_id, size = _flash(args)
+    length = _flash_length(args, size, os.path.getsize(args.file))
+    transfer, lines = _flash_verify(args, flash, length)
+    transfer["jedec_id"] = jedec_id.hex()
+    return transfer, lines
+
+
+def cmd_flash_write(args):
+    flash, jedec_id, size = _flash(args)
+    length = _flash_length(args, size, os.path.getsize(args.file))
+    if args.address % _SPIFlash.SECTOR:
+        raise ValueError("Flash writes start at a 4 KiB sector boundary")
+    progress = Progress("flash write", length, args.progress)
+    erased = skipped = pages = 0
+    with open(args.file, "rb") as file:
+        for offset in range(0, length, _SPIFlash.SECTOR):
+            data = file.read(min(_SPIFlash.SECTOR, length - offset))
+            address = args.address + offset
+            current = flash.read(address, len(data))
+            if current == data:
+                skipped += 1
+            elif all(old & new == new for old, new in zip(current, data)):
+                # Programming only clears bits: no erase needed
+                pages += flash.program(address, data)
+            else:
+                # Keep the rest of a partially written last sector
+                if len(data) < _SPIFlash.SECTOR:
+                    data += flash.read(
+                        address + len(data), _SPIFlash.SECTOR - len(data)
+                    )
+                flash.erase_sector(address)
+                erased += 1
+                pages += flash.program(address, data)
+            progress.update(min(_SPIFlash.SECTOR, length - offset))
+    transfer = progress.finish()
+    transfer.update(
+        jedec_id=jedec_id.hex(),
+        sectors_erased=erased,
+        sectors_skipped=skipped,
+        pages_programmed=pages,
+    )
+    lines = [
+        _summary("flash write", transfer),
+        f"{erased} sector(s) erased, {skipped} unchanged, {pages} page(s) programmed",
+    ]
+    if args.verify:
+        verified, verify_lines = _flash_verify(args, flash, length)
+        transfer["verified"] = verified["verified"]
+        lines += verify_lines[-1:]
+    return transfer, lines
+
+
+def cmd_bench(args):
+    from .bench import main as bench_main
+
+    return bench_main(args.arguments)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m ch347", description="CH347 USB bridge tool."
+    )
+    parser.add_argument(
+        "--device", type=int, default=0, help="device index (default: 0)"
+    )
+    parser.add_argument("--dll", help="path of the CH347 library")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("list", help="list the devices").set_defaults(run=cmd_list)
+    commands.add_parser("info", help="show device details").set_defaults(run=cmd_info)
+
+    i2c = commands.add_parser("i2c", help="I2C bus").add_subparsers(
+        dest="action", required=True
+    )
+    for name, run, help_text in (
+        ("scan", cmd_i2c_scan, "find the devices on the bus"),
+        ("dump", cmd_i2c_dump, "read the registers of a device"),
+    ):
+        command = i2c.add_parser(name, help=help_text)
+        command.add_argument(
+            "--speed",
+            type=int,
+            choices=sorted(I2C_SPEEDS),
+            default=100,
+            help="SCL frequency in kHz (default: 100)",
+        )
+        command.set_defaults(run=run)
+        if name == "scan":
+            command.add_argument(
+                "--no-identify",
+                dest="identify",
+                action="store_false",
+                help="only list the addresses that acknowledge",
+            )
+        else:
+            command.add_argument("address", type=_number, help="7-bit address")
+            command.add_argument(
+                "--start", type=_number, default=0, help="first register (default: 0)"
+            )
+            command.add_argument(
+                "--length",
+                type=_number,
+                default=256,
+                help="number of bytes (default: 256)",
+            )
+            command.add_argument("--output", help="write the bytes to this file")
+
+    eeprom = commands.add_parser("eeprom", help="24Cxx EEPROM").add_subparsers(
+        dest="action", required=True
+    )
+    for name, run in (("read", cmd_eeprom_read), ("write", cmd_eeprom_write)):
+        command = eeprom.add_parser(name, help=f"{name} an EEPROM")
+        command.add_argument("type", type=str.lower, choices=EEPROM_TYPES)
+        command.add_argument("file")
+        command.add_argument(
+            "--address", type=_number, default=0, help="first byte (default: 0)"
+        )
+        command.add_argument(
+            "--chunk",
+            type=_number,
+            default=4096,
+            help="bytes per library call (default: 4096)",
+        )
+        if name == "read":
+            command.add_argument(
+                "--length", type=_number, help="bytes to read (default: to the end)"
+            )
+        else:
+            command.add_argument(
+                "--verify", action="store_true", help="read back every chunk"
+            )
+        command.set_defaults(run=run)
+
+    spi = commands.add_parser("spi", help="SPI bus").add_subparsers(
+        dest="device_type", required=True
+    )
+    flash = spi.add_parser("flash", help="SPI NOR flash").add_subparsers(
+        dest="action", required=True
+    )
+    for name, run in (
+        ("read", cmd_flash_read),
+        ("write", cmd_flash_write),
+        ("verify", cmd_flash_verify),
+    ):
+        command = flash.add_parser(name, help=f"{name} a SPI flash")
+        command.add_argument("file")
+        command.add_argument(
+            "--cs", type=int, choices=(0, 1), default=0, help="chip select (default: 0)"
+        )
+        command.add_argument(
+            "--mode",
+            type=int,
+            choices=range(4),
+            default=0,
+            help="SPI mode (default: 0)",
+        )
+        command.add_argument(
+            "--clock",
+            choices=[str(clock) for clock in range(8)] + ["auto"],
+            default="1",
+            help="SPIConfig.Clock, 60 MHz >> clock, or auto to tune (default: 1)",
+        )
+        command.add_argument(
+            "--address", type=_number, default=0, help="first byte (default: 0)"
+        )
+        command.add_argument(
+            "--length",
+            type=_number,
+            help="bytes (default: the file, or the rest of the flash)",
+        )
+        command.add_argument(
+            "--chunk",
+            type=_number,
+            default=65536,
+            help="bytes per read (default: 65536)",
+        )
+        if name == "write":
+            command.add_argument(
+                "--verify", action="store_true", help="read back after writing"
+            )
+        command.set_defaults(run=run)
+
+    # The remaining arguments are options of python -m ch347.bench
+    commands.add_parser(
+        "bench", help="run the benchmark suite", add_help=False
+    ).set_defaults(run=cmd_bench)
+    return parser
+
+
+def main(argv=None, driver=None) -> int:
+    """
+    Run the command line tool.
+
+    Args:
+        argv (list, optional): Arguments, by default those of the process.
+        driver (CH347, optional): Driver to use instead of opening --device.
+
+    Returns:
+        int: Exit status.
+    """
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if args.run is cmd_bench:
+        args.arguments = extra
+    elif extra:
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    args.driver = driver
+    args.opened = None
+    args.progress = not args.json and sys.stderr.isatty()
+    if args.run is cmd_bench:
+        return args.run(args)
+    try:
+        result, lines = args.run(args)
+    except (RuntimeError, ValueError, OSError) as error:
+        if args.json:
+            print(json.dumps({"error": str(error)}))
+        else:
+            print(f"error: {error}", file=sys.stderr)
+        return 1
+    finally:
+        if args.opened is not None:
+            args.opened.close_device()
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print("\n".join(lines))
+    return 0 if result.get("verified", True) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
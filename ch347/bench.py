@@ -0,0 +1,420 @@
+"""
+Benchmark Module
+----------------
+
+The `ch347.bench` module measures what the host side of the library costs,
+so performance regressions are caught before a release.
+
+Three groups of benchmarks are run:
+
+- Binding overhead: nanoseconds per call of `stream_i2c`, `spi_read`,
+  `spi_write` and `stream_spi4` against `StubCH347`, a library whose entry
+  points return at once, plus the peak memory a single call allocates.
+- Driver sample rates: `MPU6050.get_all_data` and an INA226 bus voltage,
+  current and power reading against the simulator.
+- Throughput: EEPROM and SPI flash MB/s against the simulator.
+
+Rates measured against the simulator are reported twice: "host" figures
+are wall clock time of the Python code with a free bus, "modeled" figures
+divide by the time the simulator's `LatencyModel` charges, which is what
+a USB 2.0 CH347 would need for the same calls. Modeled figures are
+deterministic; host figures depend on the machine.
+
+Results are a JSON document of named metrics. `compare` lists the metrics
+that got worse than a stored baseline by more than a tolerance.
+
+Usage Example:
+--------------
+
+python -m ch347.bench --output bench.json
+python -m ch347.bench --baseline bench.json --tolerance 0.2
+"""
+
+import argparse
+import ctypes
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from .ch347 import CH347, SPIConfig
+from .simulator import (
+    LatencyModel,
+    SimulatedCH347,
+    SimulatedFunction,
+    VirtualEEPROM,
+    VirtualINA226,
+    VirtualMPU6050,
+    VirtualSPIFlash,
+)
+
+
+def _succeed(*args):
+    return True
+
+
+class StubCH347:
+    """
+    CH347 library whose entry points do nothing and report success.
+
+    Pass an instance as `dll_path` to `CH347` to time the bindings alone.
+    """
+
+    def __getattr__(self, name):
+        if not name.startswith("CH347"):
+            raise AttributeError(name)
+        function = SimulatedFunction(_succeed)
+        setattr(self, name, function)
+        return function
+
+
+def _metric(value, unit, higher_is_better) -> dict:
+    return {"value": value, "unit": unit, "higher_is_better": higher_is_better}
+
+
+def time_per_call(function, iterations, repeat=5) -> float:
+    """
+    Time a function the way timeit does: best of several runs, garbage collection off.
+
+    Args:
+        function (callable): Function without arguments.
+        iterations (int): Calls per run.
+        repeat (int): Number of runs (default is 5).
+
+    Returns:
+        float: Nanoseconds per call of the fastest run.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter_ns()
+            for _ in range(iterations):
+                function()
+            elapsed = time.perf_counter_ns() - start
+            best = elapsed if best is None else min(best, elapsed)
+    finally:
+        if enabled:
+            gc.enable()
+    return best / iterations
+
+
+def peak_allocation(function, calls=16) -> int:
+    """
+    Memory a single call allocates at its peak, per tracemalloc.
+
+    Args:
+        function (callable): Function without arguments.
+        calls (int): Number of calls measured; the smallest peak is kept (default is 16).
+
+    Returns:
+        int: Bytes allocated on top of the memory in use before the call.
+    """
+    # Warm up caches such as lazily set argtypes first
+    function()
+    started = tracemalloc.is_tracing()
+    if not started:
+        tracemalloc.start()
+    try:
+        best = None
+        for _ in range(calls):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            function()
+            peak = tracemalloc.get_traced_memory()[1] - before
+            best = peak if best is None else min(best, peak)
+    finally:
+        if not started:
+            tracemalloc.stop()
+    return best
+
+
+def bench_bindings(iterations=20000) -> dict:
+    """
+    Per-call overhead and allocations of the data path bindings against StubCH347.
+    """
+    driver = CH347(dll_path=StubCH347())
+    driver.open_device()
+    payload = list(range(256))
+    io_buffer = ctypes.create_string_buffer(256)
+    stub = driver.ch347dll.CH347StreamI2C
+    operations = {
+        "stub_call": lambda: stub(0, 2, None, 14, None),
+        "stream_i2c": lambda: driver.stream_i2c([0xD0, 0x3B], 14),
+        "spi_read": lambda: driver.spi_read(0x80, [0x03, 0, 0, 0], 256),
+        "spi_write": lambda: driver.spi_write(0x80, payload),
+        "stream_spi4": lambda: driver.stream_spi4(0x80, 256, io_buffer),
+    }
+    results = {}
+    for name, operation in operations.items():
+        results[f"bindings.{name}.ns_per_call"] = _metric(
+            time_per_call(operation, iterations), "ns", False
+        )
+        results[f"bindings.{name}.alloc_bytes_per_call"] = _metric(
+            peak_allocation(operation), "bytes", False
+        )
+    return results
+
+
+def _simulated(*devices):
+    # A free bus for host timing and the default model for the modeled time
+    host = SimulatedCH347(latency=LatencyModel(call_overhead=0))
+    modeled = SimulatedCH347()
+    for sim in (host, modeled):
+        for attach, target, device in devices:
+            getattr(sim, attach)(target, device())
+    return CH347(dll_path=host), CH347(dll_path=modeled), modeled
+
+
+def _rate(prefix, function, count, modeled_function, modeled, unit, scale=1):
+    host_seconds = time_per_call(function, count, repeat=3) / 1e9
+    before = modeled.elapsed
+    modeled_function()
+    modeled_seconds = modeled.elapsed - before
+    return {
+        f"{prefix}.host_{unit}": _metric(scale / host_seconds, unit, True),
+        f"{prefix}.modeled_{unit}": _metric(scale / modeled_seconds, unit, True),
+    }
+
+
+def bench_drivers(samples=500) -> dict:
+    """
+    Sample rates of the INA226 and MPU6050 drivers against the simulator.
+
+    The drivers live outside the ch347 package; they are skipped when they
+    cannot be imported.
+    """
+    try:
+        from i2c_devices.ina226 import INA226
+        from i2c_devices.mpu6050 import MPU6050
+    except ImportError:
+        return {}
+
+    results = {}
+    host, modeled_driver, modeled = _simulated(("attach_i2c", 0x68, VirtualMPU6050))
+    mpu, modeled_mpu = MPU6050(driver=host), MPU6050(driver=modeled_driver)
+    results.update(
+        _rate(
+            "drivers.mpu6050.get_all_data",
+            mpu.get_all_data,
+            samples,
+            modeled_mpu.get_all_data,
+            modeled,
+            "hz",
+        )
+    )
+
+    host, modeled_driver, modeled = _simulated(("attach_i2c", 0x40, VirtualINA226))
+    ina, modeled_ina = INA226(driver=host), INA226(driver=modeled_driver)
+
+    def reading(sensor):
+        return sensor.get_bus_voltage(), sensor.get_current(), sensor.get_power()
+
+    results.update(
+        _rate(
+            "drivers.ina226.reading",
+            lambda: reading(ina),
+            samples,
+            lambda: reading(modeled_ina),
+            modeled,
+            "hz",
+        )
+    )
+    return results
+
+
+def bench_eeprom(size=32768) -> dict:
+    """
+    Read and write MB/s of a 24C256 through CH347ReadEEPROM/CH347WriteEEPROM.
+
+    The modeled write rate covers the bus only, not the page write cycle time.
+    """
+    eeprom_id = 8  # ID_24C256
+    host, modeled_driver, modeled = _simulated(
+        ("attach_i2c", 0x50, lambda: VirtualEEPROM(size=32768))
+    )
+    data = bytes(range(256)) * (size // 256)
+    megabytes = size / 1e6
+    results = {}
+    results.update(
+        _rate(
+            "eeprom.write",
+            lambda: host.write_eeprom(eeprom_id, 0, data),
+            1,
+            lambda: modeled_driver.write_eeprom(eeprom_id, 0, data),
+            modeled,
+            "mb_per_s",
+            megabytes,
+        )
+    )
+    results.update(
+        _rate(
+            "eeprom.read",
+            lambda: host.read_eeprom(eeprom_id, 0, size),
+            1,
+            lambda: modeled_driver.read_eeprom(eeprom_id, 0, size),
+            modeled,
+            "mb_per_s",
+            megabytes,
+        )
+    )
+    return results
+
+
+def bench_flash(size=1 << 20, chunk=4096) -> dict:
+    """
+    Read and page program MB/s of a SPI NOR flash through spi_read/spi_write.
+    """
+    host, modeled_driver, modeled = _simulated(("attach_spi", 0, VirtualSPIFlash))
+    for driver in (host, modeled_driver):
+        driver.spi_init(SPIConfig(Mode=0, Clock=1, ByteOrder=1, ChipSelect=0x80))
+    page = list(range(256))
+
+    def read(driver):
+        for address in range(0, size, chunk):
+            driver.spi_read(
+                0x80, [0x03, address >> 16, (address >> 8) & 0xFF, 0], chunk
+            )
+
+    def program(driver):
+        for address in range(0, size // 16, 256):
+            driver.spi_write(0x80, [0x06])
+            driver.spi_write(
+                0x80, [0x02, address >> 16, (address >> 8) & 0xFF, 0] + page
+            )
+
+    results = {}
+    results.update(
+        _rate(
+            "flash.read",
+            lambda: read(host),
+            1,
+            lambda: read(modeled_driver),
+            modeled,
+            "mb_per_s",
+            size / 1e6,
+        )
+    )
+    results.update(
+        _rate(
+            "flash.program",
+            lambda: program(host),
+            1,
+            lambda: program(modeled_driver),
+            modeled,
+            "mb_per_s",
+            size / 16 / 1e6,
+        )
+    )
+    return results
+
+
+def run_benchmarks(quick=False) -> dict:
+    """
+    Run the benchmark suite.
+
+    Args:
+        quick (bool): Use fewer iterations and smaller transfers, e.g. in tests (default is False).
+
+    Returns:
+        dict: {"meta": {...}, "results": {name: {"value", "unit", "higher_is_better"}}}
+    """
+    results = {}
+    results.update(bench_bindings(1000 if quick else 20000))
+    results.update(bench_drivers(20 if quick else 500))
+    results.update(bench_eeprom(4096 if quick else 32768))
+    results.update(bench_flash(1 << 16 if quick else 1 << 20))
+    return {
+        "meta": {
+            "created": time.time(),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "quick": quick,
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, tolerance=0.1) -> list:
+    """
+    Find the metrics that got worse than a baseline.
+
+    Metrics missing from either document are ignored.
+
+    Args:
+        current (dict): Output of run_benchmarks().
+        baseline (dict): Earlier output of run_benchmarks().
+        tolerance (float): Allowed relative change, 0.1 for 10% (default is 0.1).
+
+    Returns:
+        list: One dict per regression with "name", "baseline", "value", "unit"
+              and "change", the relative change in the bad direction.
+    """
+    regressions = []
+    reference = baseline.get("results", {})
+    for name, metric in sorted(current.get("results", {}).items()):
+        if name not in reference:
+            continue
+        old = reference[name]["value"]
+        new = metric["value"]
+        if metric["higher_is_better"]:
+            change = (old - new) / old if old else 0.0
+        else:
+            change = (new - old) / old if old else float(new > 0)
+        if change > tolerance:
+            regressions.append(
+                {
+                    "name": name,
+                    "baseline": old,
+                    "value": new,
+                    "unit": metric["unit"],
+                    "change": change,
+                }
+            )
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m ch347.bench", description="Run the CH347 benchmark suite."
+    )
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against this results file")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="allowed relative regression (default: 0.1)",
+    )
+    parser.add_argument("--quick", action="store_true", help="short runs")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(quick=args.quick)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    for name, metric in results["results"].items():
+        print(f"{name:<48} {metric['value']:>14.6g} {metric['unit']}")
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(
+            f"REGRESSION {regression['name']}: {regression['baseline']:.6g} -> "
+            f"{regression['value']:.6g} {regression['unit']} "
+            f"({regression['change']:.0%} worse)",
+            file=sys.stderr,
+        )
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
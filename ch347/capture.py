@@ -0,0 +1,273 @@
+"""
+Capture Module
+--------------
+
+The `ch347.capture` module paces sensor sampling with the sensor's own
+interrupt line instead of a host timer.
+
+A `TriggeredCapture` arms a CH347 GPIO interrupt on the sensor's INT/ALERT pin
+and answers every edge with a burst of I2C reads that was planned up front, so
+nothing is built or looked up between the edge and the bus transfer. Each
+sample carries the edge timestamp and the interrupt-to-read latency. Edges that
+pile up while a read is in progress are counted as dropped, since the sensor
+only holds the latest conversion.
+
+Usage Example:
+--------------
+
+from ch347 import CH347
+from ch347.capture import TriggeredCapture
+from ch347.gpio import GPIO
+
+capture = TriggeredCapture.mpu6050(GPIO(CH347()), pin=4)
+for sample in capture.run(count=1000):
+    print(sample.timestamp_ns, sample.latency_ns, sample.data.hex())
+print(capture.stats())
+capture.close()
+"""
+
+import threading
+import time
+from array import array
+from collections import namedtuple
+
+from .gpio import GPIO
+
+Sample = namedtuple("Sample", ["timestamp_ns", "latency_ns", "data"])
+
+
+class TriggeredCapture:
+    """
+    Interrupt-paced I2C burst reads.
+
+    Attributes:
+        samples (int): Number of samples read.
+        dropped (int): Number of edges without a read of their own.
+        failures (int): Number of burst reads that failed.
+        latencies (array): Interrupt-to-read latency of every sample in nanoseconds.
+    """
+
+    # MPU-6050 registers used to route data-ready to the INT pin
+    MPU6050_INT_PIN_CFG = 0x37
+    MPU6050_INT_ENABLE = 0x38
+    MPU6050_INT_STATUS = 0x3A
+
+    # INA226 registers used to route conversion-ready to the ALERT pin
+    INA226_BUS_VOLTAGE_REG = 0x02
+    INA226_MASK_ENABLE_REG = 0x06
+
+    def __init__(self, gpio, address, reads, pin, mode=GPIO.FALLING):
+        """
+        Initialize the capture engine.
+
+        Args:
+            gpio (GPIO): The GPIO interface of the CH347 the sensor is connected to.
+            address (int): 7-bit I2C address of the sensor.
+            reads (list): (register, length) pairs read on every edge, in order.
+            pin (int): GPIO number wired to the sensor's INT/ALERT output.
+            mode (int): Edge that signals new data (default is GPIO.FALLING).
+        """
+        self.gpio = gpio
+        self.driver = gpio.driver
+        self.pin = pin
+        self.mode = mode
+        # Plan the transfers once, the edge handler only replays them
+        self._bursts = tuple(
+            (bytes([address << 1, register]), length) for register, length in reads
+        )
+        self.record_size = sum(length for _, length in reads)
+        self.samples = 0
+        self.dropped = 0
+        self.failures = 0
+        self.latencies = array("q")
+        self._thread = None
+        self._running = False
+
+    @classmethod
+    def mpu6050(cls, gpio, pin, address=0x68):
+        """
+        Capture accelerometer, temperature and gyroscope data on MPU-6050 data-ready.
+
+        The INT pin is configured as active low push-pull latched until INT_STATUS
+        is read. Each sample is INT_STATUS followed by the 14 bytes from
+        ACCEL_XOUT_H to GYRO_ZOUT_L, read in one transfer which also clears the
+        interrupt.
+
+        Args:
+            gpio (GPIO): The GPIO interface.
+            pin (int): GPIO number wired to INT.
+            address (int): I2C address of the MPU-6050 (default is 0x68).
+
+        Returns:
+            TriggeredCapture: The configured capture engine.
+        """
+        driver = gpio.driver
+        # INT_LEVEL | LATCH_INT_EN
+        driver.stream_i2c([address << 1, cls.MPU6050_INT_PIN_CFG, 0xA0], 0)
+        # DATA_RDY_EN
+        driver.stream_i2c([address << 1, cls.MPU6050_INT_ENABLE, 0x01], 0)
+        return cls(gpio, address, [(cls.MPU6050_INT_STATUS, 15)], pin, GPIO.FALLING)
+
+    @classmethod
+    def ina226(cls, gpio, pin, address=0x40):
+        """
+        Capture bus voltage, power and current on INA226 conversion-ready.
+
+        The INA226 does not auto-increment its register pointer, so each register
+        is a transfer of its own. Mask/Enable is read last to release ALERT.
+
+        Args:
+            gpio (GPIO): The GPIO interface.
+            pin (int): GPIO number wired to ALERT.
+            address (int): I2C address of the INA226 (default is 0x40).
+
+        Returns:
+            TriggeredCapture: The configured capture engine.
+        """
+        # CNVR
+        gpio.driver.stream_i2c(
+            [address << 1, cls.INA226_MASK_ENABLE_REG, 0x04, 0x00], 0
+        )
+        reads = [
+            (cls.INA226_BUS_VOLTAGE_REG, 2),
+            (cls.INA226_BUS_VOLTAGE_REG + 1, 2),
+            (cls.INA226_BUS_VOLTAGE_REG + 2, 2),
+            (cls.INA226_MASK_ENABLE_REG, 2),
+        ]
+        return cls(gpio, address, reads, pin, GPIO.FALLING)
+
+    def _burst(self):
+        data = b""
+        for request, length in self._bursts:
+            result = self.driver.stream_i2c(request, length)
+            if result is None:
+                return None
+            data += result
+        return data
+
+    def read_sample(self, timeout=None):
+        """
+        Wait for the next edge and read the sensor.
+
+        Args:
+            timeout (float, optional): Maximum time to wait for an edge in seconds.
+
+        Returns:
+            Sample: (timestamp_ns, latency_ns, data), or None on timeout or read failure.
+        """
+        event = self.gpio.wait_for_edge(self.pin, timeout)
+        if event is None:
+            return None
+        # Only the newest conversion can still be read, older edges are lost
+        ring = self.gpio.rings[self.pin]
+        while len(ring):
+            event = ring.pop()
+            self.dropped += 1
+        data = self._burst()
+        latency = time.perf_counter_ns() - event.timestamp_ns
+        if data is None:
+            self.failures += 1
+            return None
+        self.samples += 1
+        self.latencies.append(latency)
+        return Sample(event.timestamp_ns, latency, data)
+
+    def arm(self) -> bool:
+        """
+        Enable the interrupt on the sensor pin.
+
+        Returns:
+            bool: True if successful, False otherwise.
+        """
+        return self.gpio.arm(self.pin, self.mode)
+
+    def run(self, count=None, timeout=1.0):
+        """
+        Arm the interrupt and yield samples until enough are read or the sensor stops.
+
+        Args:
+            count (int, optional): Number of samples to read, None reads until timeout.
+            timeout (float): Stop after this many seconds without an edge (default is 1.0).
+
+        Yields:
+            Sample: (timestamp_ns, latency_ns, data) for every successful read.
+        """
+        if not self.arm():
+            raise RuntimeError("CH347SetIntRoutine failed")
+        read = 0
+        while count is None or read < count:
+            failures = self.failures
+            sample = self.read_sample(timeout)
+            if sample is None:
+                if self.failures == failures:
+                    return
+                continue
+            read += 1
+            yield sample
+
+    def start(self, callback, timeout=1.0):
+        """
+        Capture in a background thread, calling callback(sample) for every sample.
+
+        Args:
+            callback (callable): Receives each Sample on the capture thread.
+            timeout (float): Edge wait granularity used to notice stop() (default is 1.0).
+        """
+        if self._thread is not None:
+            raise RuntimeError("capture already running")
+        # Armed once; a timeout only gives the worker a chance to see stop()
+        if not self.arm():
+            raise RuntimeError("CH347SetIntRoutine failed")
+        self._running = True
+
+        def worker():
+            while self._running:
+                sample = self.read_sample(timeout)
+                if sample is not None:
+                    callback(sample)
+
+        self._thread = threading.Thread(target=worker, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the background capture thread and disable the interrupt.
+        """
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.gpio.disarm()
+
+    def stats(self) -> dict:
+        """
+        Summarize the capture.
+
+        Returns:
+            dict: samples, dropped, failures, ring_overflows and latency
+                  min/mean/p50/p99/max in microseconds.
+        """
+        latencies = sorted(self.latencies)
+        result = {
+            "samples": self.samples,
+            "dropped": self.dropped + self.gpio.dropped,
+            "failures": self.failures,
+            "ring_overflows": self.gpio.dropped,
+        }
+        if latencies:
+            n = len(latencies)
+            result.update(
+                latency_min_us=latencies[0] / 1000,
+                latency_mean_us=sum(latencies) / n / 1000,
+                latency_p50_us=latencies[n // 2] / 1000,
+                latency_p99_us=latencies[min(n - 1, n * 99 // 100)] / 1000,
+                latency_max_us=latencies[-1] / 1000,
+            )
+        return result
+
+    def close(self):
+        """
+        Stop capturing and close the GPIO interface.
+        """
+        self.stop()
+        self.gpio.close()
@@ -0,0 +1,343 @@
+"""
+Capture File Module
+-------------------
+
+The `ch347.capture_file` module stores timestamped sensor samples in a
+compact columnar file and reads them back by time range.
+
+`CaptureWriter` collects samples into fixed-size chunks of preallocated
+NumPy columns, one per field, so its memory use does not grow with the
+length of a capture. Every full chunk is written to disk column by column:
+integer columns are delta-encoded, which turns slowly changing sensor
+readings and evenly spaced timestamps into runs of small numbers, and each
+column is compressed with zlib. A chunk index is appended when the file is
+closed.
+
+`CaptureReader` memory-maps a file and reads only its index when opened,
+so even multi-hour captures open at once. `read(start_ns, end_ns)` finds
+the chunks that overlap the range in the index and decompresses only
+those, and only the requested columns.
+
+File format:
+------------
+
+All integers are little endian.
+
+- Header: b"CH347COL", u16 version, u16 column count, u32 rows per chunk,
+  then per column a u8 length and the UTF-8 name, and a u8 length and the
+  NumPy dtype string. The first column is "timestamp_ns", int64.
+- Chunks: the zlib-compressed columns of every chunk, one after the other.
+- Index: per chunk a u64 file offset, i64 first and last timestamp, u32
+  number of rows and one u32 compressed size per column.
+- Footer: u64 index offset, u32 number of chunks and b"CH347IDX".
+
+Usage Example:
+--------------
+
+from ch347.capture_file import CaptureReader, CaptureWriter
+
+with CaptureWriter("ina226.ch347col", {"bus_mv": "f4", "current_ua": "i4"}) as writer:
+    writer.append(time.time_ns(), sensor.get_bus_voltage(), sensor.get_current())
+
+with CaptureReader("ina226.ch347col") as reader:
+    data = reader.read(start_ns, start_ns + 60 * 10**9, columns=["current_ua"])
+    print(data["timestamp_ns"], data["current_ua"])
+"""
+
+import mmap
+import os
+import struct
+import zlib
+
+import numpy as np
+
+MAGIC = b"CH347COL"
+FOOTER_MAGIC = b"CH347IDX"
+VERSION = 1
+
+TIMESTAMP = "timestamp_ns"
+
+_HEADER = struct.Struct("<8sHHI")
+_ENTRY = struct.Struct("<QqqI")
+_FOOTER = struct.Struct("<QI8s")
+
+
+def _encode(column) -> bytes:
+    # Integer columns are stored as wrapping differences of their unsigned view
+    if column.dtype.kind in "iu":
+        unsigned = column.view(column.dtype.str.replace("i", "u"))
+        deltas = np.empty_like(unsigned)
+        if len(unsigned):
+            deltas[0] = unsigned[0]
+            np.subtract(unsigned[1:], unsigned[:-1], out=deltas[1:])
+        return deltas.tobytes()
+    return column.tobytes()
+
+
+def _decode(data, dtype) -> np.ndarray:
+    if dtype.kind in "iu":
+        unsigned = np.dtype(dtype.str.replace("i", "u"))
+        deltas = np.frombuffer(data, dtype=unsigned)
+        return np.cumsum(deltas, dtype=unsigned).view(dtype)
+    return np.frombuffer(data, dtype=dtype)
+
+
+class CaptureWriter:
+    """
+    Writes samples to a columnar capture file.
+
+    Attributes:
+        columns (dict): Column name to little endian NumPy dtype, timestamp first.
+        chunk_rows (int): Rows per chunk.
+        rows (int): Number of samples written.
+    """
+
+    def __init__(self, path, columns, chunk_rows=4096, level=6):
+        """
+        Create a capture file.
+
+        Args:
+            path (str): The file to create.
+            columns (dict): Column name to NumPy dtype of the sample fields, in order.
+            chunk_rows (int): Rows per chunk (default is 4096).
+            level (int): zlib compression level (default is 6).
+        """
+        self.columns = {TIMESTAMP: np.dtype("<i8")}
+        for name, dtype in dict(columns).items():
+            if name == TIMESTAMP:
+                raise ValueError(f"{TIMESTAMP} is added by the writer")
+            self.columns[name] = np.dtype(dtype).newbyteorder("<")
+        self.chunk_rows = chunk_rows
+        self.level = level
+        self.rows = 0
+        self._buffers = [np.empty(chunk_rows, dtype) for dtype in self.columns.values()]
+        self._filled = 0
+        self._index = []
+        self.file = open(path, "wb")
+        header = bytearray(_HEADER.pack(MAGIC, VERSION, len(self.columns), chunk_rows))
+        for name, dtype in self.columns.items():
+            for text in (name.encode(), dtype.str.encode()):
+                header.append(len(text))
+                header += text
+        self.file.write(header)
+
+    def append(self, timestamp_ns, *values):
+        """
+        Add one sample.
+
+        Args:
+            timestamp_ns (int): Time of the sample; timestamps must not decrease.
+            *values: One value per column, in column order.
+        """
+        if len(values) != len(self.columns) - 1:
+            raise ValueError(
+                f"Expected {len(self.columns) - 1} values, got {len(values)}"
+            )
+        filled = self._filled
+        buffers = self._buffers
+        buffers[0][filled] = timestamp_ns
+        for buffer, value in zip(buffers[1:], values):
+            buffer[filled] = value
+        self._filled = filled + 1
+        self.rows += 1
+        if self._filled == self.chunk_rows:
+            self._flush()
+
+    def write_block(self, timestamps_ns, **columns):
+        """
+        Add a block of samples.
+
+        Args:
+            timestamps_ns (array): Times of the samples; timestamps must not decrease.
+            **columns: One array per column, of the same length.
+        """
+        names = list(self.columns)[1:]
+        if set(columns) != set(names):
+            raise ValueError(f"Expected the columns {names}, got {list(columns)}")
+        blocks = [np.asarray(timestamps_ns)]
+        for name in names:
+            blocks.append(np.asarray(columns[name]))
+        count = len(blocks[0])
+        # Checked before any buffer is changed, so a bad block adds nothing
+        if any(len(block) != count for block in blocks):
+            raise ValueError("All columns must have as many values as timestamps")
+        done = 0
+        while done < count:
+            take = min(count - done, self.chunk_rows - self._filled)
+            for buffer, block in zip(self._buffers, blocks):
+                buffer[self._filled : self._filled + take] = block[done : done + take]
+            self._filled += take
+            done += take
+            if self._filled == self.chunk_rows:
+                self._flush()
+        self.rows += count
+
+    def _flush(self):
+        rows = self._filled
+        if not rows:
+            return
+        offset = self.file.tell()
+        sizes = []
+        for buffer in self._buffers:
+            data = zlib.compress(_encode(buffer[:rows]), self.level)
+            self.file.write(data)
+            sizes.append(len(data))
+        timestamps = self._buffers[0]
+        self._index.append(
+            (offset, int(timestamps[0]), int(timestamps[rows - 1]), rows, sizes)
+        )
+        self._filled = 0
+
+    def close(self):
+        """
+        Write the remaining samples and the chunk index, and close the file.
+        """
+        if self.file.closed:
+            return
+        self._flush()
+        index_offset = self.file.tell()
+        for offset, first, last, rows, sizes in self._index:
+            self.file.write(_ENTRY.pack(offset, first, last, rows))
+            self.file.write(struct.pack(f"<{len(sizes)}I", *sizes))
+        self.file.write(_FOOTER.pack(index_offset, len(self._index), FOOTER_MAGIC))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class CaptureReader:
+    """
+    Memory-mapped reader of a capture file.
+
+    Attributes:
+        columns (dict): Column name to NumPy dtype, timestamp first.
+        chunk_rows (int): Rows per chunk the file was written with.
+        index (numpy.ndarray): Per chunk offset, first_ns, last_ns, rows and sizes.
+        rows (int): Number of samples in the file.
+    """
+
+    def __init__(self, path):
+        """
+        Open a capture file.
+
+        Args:
+            path (str): The file written by CaptureWriter.
+        """
+        self.path = path
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        if size < _HEADER.size + _FOOTER.size:
+            self.file.close()
+            raise ValueError("Not a CH347 capture: file too short")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, self.chunk_rows = _HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError("Not a CH347 capture: bad magic")
+        if version != VERSION:
+            self.close()
+            raise ValueError(f"Unsupported CH347 capture version: {version}")
+        self.columns = {}
+        position = _HEADER.size
+        for _ in range(count):
+            texts = []
+            for _ in range(2):
+                length = self.map[position]
+                texts.append(bytes(self.map[position + 1 : position + 1 + length]))
+                position += 1 + length
+            self.columns[texts[0].decode()] = np.dtype(texts[1].decode())
+
+        index_offset, chunks, magic = _FOOTER.unpack_from(self.map, size - _FOOTER.size)
+        if magic != FOOTER_MAGIC:
+            self.close()
+            raise ValueError("CH347 capture has no index, it was not closed")
+        self.index = np.frombuffer(
+            self.map,
+            dtype=np.dtype(
+                [
+                    ("offset", "<u8"),
+                    ("first_ns", "<i8"),
+                    ("last_ns", "<i8"),
+                    ("rows", "<u4"),
+                    ("sizes", "<u4", (count,)),
+                ]
+            ),
+            count=chunks,
+            offset=index_offset,
+        ).copy()
+        self.rows = int(self.index["rows"].sum())
+
+    @property
+    def time_range(self) -> tuple:
+        """
+        First and last timestamp of the capture, None if it is empty.
+        """
+        if not len(self.index):
+            return None
+        return int(self.index["first_ns"][0]), int(self.index["last_ns"][-1])
+
+    def _column(self, chunk, column):
+        entry = self.index[chunk]
+        sizes = entry["sizes"]
+        start = int(entry["offset"]) + int(sizes[:column].sum())
+        data = zlib.decompress(self.map[start : start + int(sizes[column])])
+        return _decode(data, list(self.columns.values())[column])
+
+    def read(self, start_ns=None, end_ns=None, columns=None) -> dict:
+        """
+        Read the samples of a time range.
+
+        Args:
+            start_ns (int, optional): First timestamp to include, None for the start.
+            end_ns (int, optional): Timestamp to stop before, None for the end.
+            columns (list, optional): Columns to read, None for all.
+
+        Returns:
+            dict: Column name to array, always including "timestamp_ns".
+        """
+        names = list(self.columns)
+        wanted = [TIMESTAMP] + [
+            name for name in (columns or names[1:]) if name != TIMESTAMP
+        ]
+        positions = [names.index(name) for name in wanted]
+        # Chunks are in time order: skip those ending before or starting after the range
+        first = 0
+        last = len(self.index)
+        if start_ns is not None:
+            first = int(np.searchsorted(self.index["last_ns"], start_ns, "left"))
+        if end_ns is not None:
+            last = int(np.searchsorted(self.index["first_ns"], end_ns, "left"))
+        parts = {name: [] for name in wanted}
+        for chunk in range(first, max(first, last)):
+            timestamps = self._column(chunk, 0)
+            low = 0 if start_ns is None else np.searchsorted(timestamps, start_ns)
+            high = (
+                len(timestamps)
+                if end_ns is None
+                else np.searchsorted(timestamps, end_ns)
+            )
+            if low >= high:
+                continue
+            parts[TIMESTAMP].append(timestamps[low:high])
+            for name, position in zip(wanted[1:], positions[1:]):
+                parts[name].append(self._column(chunk, position)[low:high])
+        return {
+            name: (
+                np.concatenate(arrays) if arrays else np.empty(0, self.columns[name])
+            )
+            for name, arrays in parts.items()
+        }
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -1,4 +1,6 @@
 import ctypes
+import os
+import weakref
 from typing import List
 
 
@@ -78,15 +80,129 @@ class SPIConfig(ctypes.Structure):
     ]
 
 
+class TransferPlan:
+    """
+    Chunk sizes of large transfers, derived from the USB endpoint size and speed.
+
+    A CH347 command travels as a 3 byte header and its payload in bulk packets
+    of the endpoint size, into a 4096 byte command buffer. The SPI write step
+    is the largest multiple of the packet size that fits the buffer with the
+    header, so every block but the last fills whole packets.
+
+    An I2C stream command that fits a single bulk packet together with its
+    start, address and stop commands completes in one USB transaction, so
+    stream_i2c_chunked splits long reads into commands of that size.
+
+    Attributes:
+        PACKET_SIZES (dict): Bulk packet size by UsbSpeedType (0=FS, 1=HS, 2=SS).
+        COMMAND_BUFFER (int): Size of the CH347 command buffer in bytes.
+        COMMAND_HEADER (int): Size of a command header in bytes.
+        I2C_OVERHEAD (int): Packet bytes an I2C stream command needs besides the data.
+        usb_speed (int): UsbSpeedType the plan was made for.
+        packet_size (int): Bulk packet size in bytes.
+        spi_write_step (int): Bytes per SPI write block, the write_step of spi_write.
+        i2c_read_chunk (int): Bytes read per I2C stream command.
+    """
+
+    PACKET_SIZES = {0: 64, 1: 512, 2: 1024}
+    COMMAND_BUFFER = 4096
+    COMMAND_HEADER = 3
+    I2C_OVERHEAD = 4
+
+    def __init__(self, usb_speed=1, packet_size=None):
+        """
+        Make a plan.
+
+        Args:
+            usb_speed (int): 0=full speed, 1=high speed (default), 2=super speed.
+            packet_size (int, optional): Bulk OUT endpoint size, by default the
+                                         standard size for the speed.
+        """
+        self.usb_speed = usb_speed
+        self.packet_size = packet_size or self.PACKET_SIZES.get(usb_speed, 512)
+        packets = (self.COMMAND_BUFFER - self.COMMAND_HEADER) // self.packet_size
+        self.spi_write_step = max(1, packets) * self.packet_size
+        self.i2c_read_chunk = self.packet_size - self.I2C_OVERHEAD
+
+    @classmethod
+    def from_device_info(cls, info):
+        """
+        Make the plan of a device from its DeviceInfo.
+        """
+        return cls(info.UsbSpeedType, info.BulkOutEndpMaxSize)
+
+    @staticmethod
+    def split(length, chunk) -> list:
+        """
+        Split a transfer into chunks.
+
+        Returns:
+            list: (offset, size) of every chunk.
+        """
+        return [
+            (offset, min(chunk, length - offset)) for offset in range(0, length, chunk)
+        ]
+
+    def to_dict(self) -> dict:
+        return {
+            "usb_speed": self.usb_speed,
+            "packet_size": self.packet_size,
+            "spi_write_step": self.spi_write_step,
+            "i2c_read_chunk": self.i2c_read_chunk,
+        }
+
+    def __repr__(self):
+        return f"TransferPlan({self.to_dict()})"
+
+
+def _state(args) -> tuple:
+    # Comparable form of configuration arguments, structures by field values
+    return tuple(
+        (
+            tuple(getattr(argument, name) for name, _ in argument._fields_)
+            if isinstance(argument, ctypes.Structure)
+            else argument
+        )
+        for argument in args
+    )
+
+
 class CH347:
     # MAX devices number
     MAX_DEVICE_NUMBER = 8
 
+    # Configuration methods kept in the shadow, in the order they are reapplied
+    SHADOWED = (
+        "set_timeout",
+        "spi_set_frequency",
+        "spi_set_data_bits",
+        "spi_init",
+        "spi_set_chip_select",
+        "i2c_set",
+        "i2c_set_stretch",
+        "i2c_set_driver_mode",
+        "jtag_init",
+    )
+
+    # Shadowed methods that also act on the bus, so they are restored after
+    # a reopen but never skipped
+    ALWAYS_APPLIED = ("spi_set_chip_select", "jtag_init")
+
     # Define the callback function type
     NOTIFY_ROUTINE = ctypes.CFUNCTYPE(None, ctypes.c_ulong)
 
+    # Define the GPIO interrupt service routine type, it receives 8 status bytes
+    INT_ROUTINE = ctypes.CFUNCTYPE(None, ctypes.POINTER(ctypes.c_ubyte))
+
     INVALID_HANDLE_VALUE = ctypes.c_void_p(-1).value
 
+    # Libraries loaded from a path, shared so that every driver of one
+    # library finds the same configuration shadows
+    _libraries = {}
+
+    # Configuration shadows by library, then by device index
+    _shadows = weakref.WeakKeyDictionary()
+
     def __init__(self, device_index=0, dll_path=None):
         """
         Initialize the CH347 interface.
@@ -94,20 +210,46 @@ class CH347:
         Args:
             device_index (int): The index of the device to open (default: 0).
             dll_path (str, optional): Path to the CH347 DLL file. If None, the system will
-                                    search for the DLL in system directories.
+                                    search for the DLL in system directories. An already
+                                    loaded library object, such as a
+                                    ch347.simulator.SimulatedCH347, is used as is.
         """
         if dll_path is None:
             # Let Windows find the DLL in system directories
-            self.ch347dll = ctypes.WinDLL("CH347DLLA64")
-        else:
+            self.ch347dll = self._load_library("CH347DLLA64")
+        elif isinstance(dll_path, (str, bytes, os.PathLike)):
             # Use the specified path
-            self.ch347dll = ctypes.WinDLL(dll_path)
+            self.ch347dll = self._load_library(dll_path)
+        else:
+            # Use the given library object
+            self.ch347dll = dll_path
 
         self.device_index = device_index
 
         # 创建回调函数对象并绑定到实例属性
         self.callback_func = self.NOTIFY_ROUTINE(self.event_callback)
 
+        # The DLL keeps calling the interrupt routine, so the ctypes object
+        # must live as long as the routine is installed
+        self.int_routine_func = None
+
+        # Chunk sizes of large transfers, read from the device on first use
+        self.transfer_plan = None
+
+        # Byte order of 16-bit SPI words in transfer buffers, ">" or "<",
+        # known from spi_init or read from the device on first use
+        self.spi_word_order = None
+
+        # Arguments of the configuration calls in force on the device, by
+        # method name; calls that would not change them are skipped. Every
+        # driver of the device shares it, as each one changes the device.
+        self.config_shadow = self._shadows.setdefault(self.ch347dll, {}).setdefault(
+            device_index, {}
+        )
+        self.shadowed = set(self.SHADOWED).difference(self.ALWAYS_APPLIED)
+        self._spi_config_seeded = False
+        self._reopen = False
+
         # Set the function argument types and return type for CH347OpenDevice
         self.ch347dll.CH347OpenDevice.argtypes = [ctypes.c_ulong]
         self.ch347dll.CH347OpenDevice.restype = ctypes.c_void_p
@@ -278,15 +420,62 @@ class CH347:
             # Device insertion event
             print("Device inserted")
 
+    @classmethod
+    def _load_library(cls, dll_path):
+        library = cls._libraries.get(dll_path)
+        if library is None:
+            library = cls._libraries[dll_path] = ctypes.WinDLL(dll_path)
+        return library
+
+    def _configured(self, name, args) -> bool:
+        # Whether the device already has this configuration
+        return name in self.shadowed and _state(
+            self.config_shadow.get(name, ())
+        ) == _state(args)
+
+    def _record(self, name, args, result):
+        if result:
+            self.config_shadow[name] = tuple(
+                (
+                    type(argument).from_buffer_copy(argument)
+                    if isinstance(argument, ctypes.Structure)
+                    else argument
+                )
+                for argument in args
+            )
+        else:
+            # A failed call leaves the device state unknown
+            self.config_shadow.pop(name, None)
+
+    def restore_configuration(self) -> bool:
+        """
+        Apply the configuration in the shadow to the device again.
+
+        Returns:
+            bool: True if every call succeeded, False otherwise.
+        """
+        shadow = dict(self.config_shadow)
+        self.config_shadow.clear()
+        result = True
+        for name in self.SHADOWED:
+            if name in shadow:
+                result = bool(getattr(self, name)(*shadow[name])) and result
+        return result
+
     def open_device(self):
         """
         Open USB device.
 
+        After a close_device() the configuration applied before is restored.
+
         Returns:
             int: Handle to the opened device if successful, None otherwise.
         """
         handle = self.ch347dll.CH347OpenDevice(self.device_index)
         if handle != self.INVALID_HANDLE_VALUE:
+            if self._reopen:
+                self._reopen = False
+                self.restore_configuration()
             return handle
         else:
             return None
@@ -299,6 +488,9 @@ class CH347:
             bool: True if successful, False otherwise.
         """
         result = self.ch347dll.CH347CloseDevice(self.device_index)
+        # The device may come back on another port at another speed
+        self.transfer_plan = None
+        self._reopen = bool(self.config_shadow)
         return result
 
     def get_device_info(self):
@@ -320,6 +512,23 @@ class CH347:
         else:
             return None
 
+    def get_transfer_plan(self) -> TransferPlan:
+        """
+        Get the chunk sizes used for large transfers on this device.
+
+        The endpoint size and USB speed are read from the device once; until
+        that succeeds the high speed defaults are returned.
+
+        Returns:
+            TransferPlan: The plan.
+        """
+        if self.transfer_plan is None:
+            info = self.get_device_info()
+            if info is None or not info.BulkOutEndpMaxSize:
+                return TransferPlan()
+            self.transfer_plan = TransferPlan.from_device_info(info)
+        return self.transfer_plan
+
     def get_version(self):
         """
         Obtain driver version, library version, device version, and chip type.
@@ -409,24 +618,42 @@ class CH347:
         Returns:
             bool: True if successful, False otherwise.
         """
+        args = (write_timeout, read_timeout)
+        if self._configured("set_timeout", args):
+            return True
         result = self.ch347dll.CH347SetTimeout(
             self.device_index, write_timeout, read_timeout
         )
+        self._record("set_timeout", args, result)
         return result
 
     def spi_init(self, spi_config: SPIConfig) -> bool:
         """
         Initialize the SPI Controller.
 
+        The controller is only initialized when the configuration differs
+        from the one in force, which is read from the device the first time.
+
         Args:
             spi_config (SPIConfig): The configuration for the SPI controller.
 
         Returns:
             bool: True if initialization is successful, False otherwise.
         """
-        result = self.ch347dll.CH347SPI_Init(
-            self.device_index, ctypes.byref(spi_config)
-        )
+        if not self._spi_config_seeded and "spi_init" in self.shadowed:
+            self._spi_config_seeded = True
+            if "spi_init" not in self.config_shadow:
+                config = self.spi_get_config()
+                self._record("spi_init", (config,), config is not None)
+        if self._configured("spi_init", (spi_config,)):
+            result = True
+        else:
+            result = self.ch347dll.CH347SPI_Init(
+                self.device_index, ctypes.byref(spi_config)
+            )
+            self._record("spi_init", (spi_config,), result)
+        if result:
+            self.spi_word_order = ">" if spi_config.ByteOrder else "<"
         return result
 
     def spi_get_config(self):
@@ -488,18 +715,19 @@ class CH347:
         Returns:
             bool: True if successful, False otherwise.
         """
-        result = self.ch347dll.CH347SPI_SetChipSelect(
-            self.device_index,
+        args = (
             enable_select,
             chip_select,
             is_auto_deactive_cs,
             active_delay,
             delay_deactive,
         )
+        result = self.ch347dll.CH347SPI_SetChipSelect(self.device_index, *args)
+        self._record("spi_set_chip_select", args, result)
         return result
 
     def spi_write(
-        self, chip_select: int, write_data: List[int], write_step: int = 512
+        self, chip_select: int, write_data: List[int], write_step: int = None
     ) -> bool:
         """
         SPI write data.
@@ -508,11 +736,14 @@ class CH347:
             chip_select (int): Chip selection control. When bit 7 is 0, chip selection control is ignored.
                                 When bit 7 is 1, chip selection operation is performed.
             write_data (List[int]): List of integers to write.
-            write_step (int, optional): The length of a single block to be read. Default is 512.
+            write_step (int, optional): The length of a single block to be written.
+                                        Default is the spi_write_step of the transfer plan.
 
         Returns:
             bool: True if successful, False otherwise.
         """
+        if write_step is None:
+            write_step = self.get_transfer_plan().spi_write_step
         write_length = len(write_data)
         write_buffer = ctypes.create_string_buffer(bytes(write_data))
         result = self.ch347dll.CH347SPI_Write(
@@ -616,7 +847,10 @@ class CH347:
         Returns:
             bool: True if successful, False otherwise.
         """
+        if self._configured("i2c_set", (interface_speed,)):
+            return True
         result = self.ch347dll.CH347I2C_Set(self.device_index, interface_speed)
+        self._record("i2c_set", (interface_speed,), result)
         return result
 
     def i2c_set_delay_ms(self, delay_ms):
@@ -660,11 +894,42 @@ class CH347:
         else:
             return None
 
+    def stream_i2c_chunked(self, write_data, read_length, chunk=None):
+        """
+        Process an I2C data stream, reading in commands that fit one USB packet.
+
+        The first command writes write_data and reads a chunk, each following
+        one is a current address read (STOP, START, address with the read bit)
+        of the next chunk. Only use it for devices that keep incrementing the
+        address across a STOP, such as 24Cxx EEPROMs; stream_i2c reads in a
+        single transfer.
+
+        Args:
+            write_data (bytes): Data to write, starting with the I2C device address.
+            read_length (int): Number of bytes of data to read.
+            chunk (int, optional): Bytes per command, by default the
+                                   i2c_read_chunk of the transfer plan.
+
+        Returns:
+            bytes: Data read from the I2C stream, None if a command failed.
+        """
+        if chunk is None:
+            chunk = self.get_transfer_plan().i2c_read_chunk
+        read_address = [write_data[0] | 0x01]
+        data = bytearray()
+        for offset, size in TransferPlan.split(read_length, chunk):
+            part = self.stream_i2c(write_data if offset == 0 else read_address, size)
+            if part is None:
+                return None
+            data += part
+        return bytes(data)
+
     def spi_set_frequency(self, spi_speed_hz: int) -> bool:
         """
         Set the SPI clock frequency.
 
-        After calling this interface, you need to call spi_init again for reinitialization.
+        The controller has to be initialized again after a new frequency. A configuration
+        applied before with spi_init is applied again here, otherwise call spi_init.
 
         Args:
             spi_speed_hz (int): Set the SPI clock frequency in Hz.
@@ -673,14 +938,21 @@ class CH347:
             bool: True if successful, False otherwise.
         """
         # Set the function argument types and return type if not already set
-        if not hasattr(self.ch347dll.CH347SPI_SetFrequency, "argtypes"):
+        if self.ch347dll.CH347SPI_SetFrequency.argtypes is None:
             self.ch347dll.CH347SPI_SetFrequency.argtypes = [
                 ctypes.c_ulong,
                 ctypes.c_ulong,
             ]
             self.ch347dll.CH347SPI_SetFrequency.restype = ctypes.c_bool
 
+        if self._configured("spi_set_frequency", (spi_speed_hz,)):
+            return True
         result = self.ch347dll.CH347SPI_SetFrequency(self.device_index, spi_speed_hz)
+        self._record("spi_set_frequency", (spi_speed_hz,), result)
+        # The controller has to be initialized again, so replay the settings in force
+        spi_config = self.config_shadow.pop("spi_init", None)
+        if result and spi_config is not None:
+            result = self.spi_init(*spi_config)
         return result
 
     def spi_set_data_bits(self, data_bits: int) -> bool:
@@ -694,16 +966,128 @@ class CH347:
             bool: True if successful, False otherwise.
         """
         # Set the function argument types and return type if not already set
-        if not hasattr(self.ch347dll.CH347SPI_SetDataBits, "argtypes"):
+        if self.ch347dll.CH347SPI_SetDataBits.argtypes is None:
             self.ch347dll.CH347SPI_SetDataBits.argtypes = [
                 ctypes.c_ulong,
                 ctypes.c_ubyte,
             ]
             self.ch347dll.CH347SPI_SetDataBits.restype = ctypes.c_bool
 
+        if self._configured("spi_set_data_bits", (data_bits,)):
+            return True
         result = self.ch347dll.CH347SPI_SetDataBits(self.device_index, data_bits)
+        self._record("spi_set_data_bits", (data_bits,), result)
         return result
 
+    def _spi_word_dtype(self):
+        import numpy as np
+
+        if self.spi_word_order is None:
+            config = self.spi_get_config()
+            if config is None:
+                return np.dtype(">u2")
+            self.spi_word_order = ">" if config.ByteOrder else "<"
+        # MSB first clocks the high byte of a word out first
+        return np.dtype(self.spi_word_order + "u2")
+
+    def _spi_word_buffer(self, words, copy):
+        # Words in wire byte order, in memory ctypes can point to
+        import numpy as np
+
+        dtype = self._spi_word_dtype()
+        words = np.asarray(words)
+        if words.dtype.kind not in "ui" or words.dtype.itemsize == 1:
+            # Bytes would be widened one per word instead of paired
+            raise TypeError(f"Expected 16-bit words, got {words.dtype}")
+        if words.dtype.itemsize != 2 and words.size:
+            if words.min() < 0 or words.max() > 0xFFFF:
+                raise ValueError("Words must be in the range 0-0xFFFF")
+        if (
+            copy
+            or words.dtype != dtype
+            or not words.flags.c_contiguous
+            or not words.flags.writeable
+        ):
+            # A single vectorised conversion, byteswapping if needed
+            words = np.array(words, dtype=dtype, order="C")
+        return words, (ctypes.c_char * words.nbytes).from_buffer(words)
+
+    def spi_write_words(self, chip_select: int, words, write_step: int = None) -> bool:
+        """
+        SPI write 16-bit words, for 16-bit data mode (see spi_set_data_bits).
+
+        The words are sent in the byte order set by SPIConfig.ByteOrder. A uint16
+        array already in that order, such as a big-endian array for MSB first,
+        is sent without a copy; otherwise it is converted in one vectorised step.
+
+        Args:
+            chip_select (int): Chip selection control, see spi_write.
+            words: uint16 numpy array, array("H") or memoryview of words.
+            write_step (int, optional): The length in bytes of a single block, see spi_write.
+
+        Returns:
+            bool: True if successful, False otherwise.
+        """
+        if write_step is None:
+            write_step = self.get_transfer_plan().spi_write_step
+        words, buffer = self._spi_word_buffer(words, copy=False)
+        length = words.nbytes
+        return self.ch347dll.CH347SPI_Write(
+            self.device_index, chip_select, length, write_step, buffer
+        )
+
+    def spi_read_words(self, chip_select: int, write_data: List[int], count: int):
+        """
+        SPI write bytes, then read 16-bit words.
+
+        Args:
+            chip_select (int): Chip selection control, see spi_read.
+            write_data (List[int]): Bytes to write first, e.g. a command.
+            count (int): Number of words to read.
+
+        Returns:
+            numpy.ndarray: count words in native byte order, None if the read failed.
+        """
+        import numpy as np
+
+        dtype = self._spi_word_dtype()
+        write_length = len(write_data)
+        buffer = np.empty(max(write_length, 2 * count), dtype=np.uint8)
+        buffer[:write_length] = bytearray(write_data)
+        result = self.ch347dll.CH347SPI_Read(
+            self.device_index,
+            chip_select,
+            write_length,
+            ctypes.byref(ctypes.c_ulong(2 * count)),
+            (ctypes.c_char * buffer.nbytes).from_buffer(buffer),
+        )
+        if not result:
+            return None
+        return buffer[: 2 * count].view(dtype).astype(np.uint16, copy=False)
+
+    def spi_write_read_words(self, chip_select: int, words):
+        """
+        SPI full duplex transfer of 16-bit words.
+
+        Args:
+            chip_select (int): Chip selection control, see spi_write_read.
+            words: uint16 numpy array, array("H") or memoryview of words to send.
+
+        Returns:
+            numpy.ndarray: The words received, in native byte order, None if the
+                           transfer failed.
+        """
+        import numpy as np
+
+        # The transfer overwrites its buffer, so the caller's words are copied
+        words, buffer = self._spi_word_buffer(words, copy=True)
+        result = self.ch347dll.CH347SPI_WriteRead(
+            self.device_index, chip_select, words.nbytes, buffer
+        )
+        if not result:
+            return None
+        return words.astype(np.uint16, copy=False)
+
     def get_serial_number(self) -> str:
         """
         Get the USB serial number of the device.
@@ -712,7 +1096,7 @@ class CH347:
             str: The device serial number if successful, None otherwise.
         """
         # Set the function argument types and return type if not already set
-        if not hasattr(self.ch347dll.CH347GetSerialNumber, "argtypes"):
+        if self.ch347dll.CH347GetSerialNumber.argtypes is None:
             self.ch347dll.CH347GetSerialNumber.argtypes = [
                 ctypes.c_ulong,
                 ctypes.c_char_p,
@@ -741,7 +1125,7 @@ class CH347:
                 2=CHIP_TYPE_CH347F, 3=CHIP_TYPE_CH339W
         """
         # Set the function argument types and return type if not already set
-        if not hasattr(self.ch347dll.CH347GetChipType, "argtypes"):
+        if self.ch347dll.CH347GetChipType.argtypes is None:
             self.ch347dll.CH347GetChipType.argtypes = [ctypes.c_ulong]
             self.ch347dll.CH347GetChipType.restype = ctypes.c_ubyte
 
@@ -759,14 +1143,17 @@ class CH347:
             bool: True if successful, False otherwise.
         """
         # Set the function argument types and return type if not already set
-        if not hasattr(self.ch347dll.CH347I2C_SetStretch, "argtypes"):
+        if self.ch347dll.CH347I2C_SetStretch.argtypes is None:
             self.ch347dll.CH347I2C_SetStretch.argtypes = [
                 ctypes.c_ulong,
                 ctypes.c_bool,
             ]
             self.ch347dll.CH347I2C_SetStretch.restype = ctypes.c_bool
 
+        if self._configured("i2c_set_stretch", (enable,)):
+            return True
         result = self.ch347dll.CH347I2C_SetStretch(self.device_index, enable)
+        self._record("i2c_set_stretch", (enable,), result)
         return result
 
     def i2c_set_driver_mode(self, mode: int) -> bool:
@@ -780,14 +1167,17 @@ class CH347:
             bool: True if successful, False otherwise.
         """
         # Set the function argument types and return type if not already set
-        if not hasattr(self.ch347dll.CH347I2C_SetDriverMode, "argtypes"):
+        if self.ch347dll.CH347I2C_SetDriverMode.argtypes is None:
             self.ch347dll.CH347I2C_SetDriverMode.argtypes = [
                 ctypes.c_ulong,
                 ctypes.c_ubyte,
             ]
             self.ch347dll.CH347I2C_SetDriverMode.restype = ctypes.c_bool
 
+        if self._configured("i2c_set_driver_mode", (mode,)):
+            return True
         result = self.ch347dll.CH347I2C_SetDriverMode(self.device_index, mode)
+        self._record("i2c_set_driver_mode", (mode,), result)
         return result
 
     def stream_i2c_ret_ack(self, write_data, read_length) -> tuple:
@@ -805,7 +1195,7 @@ class CH347:
                 - int: The number of ACK values returned by read/write
         """
         # Set the function argument types and return type if not already set
-        if not hasattr(self.ch347dll.CH347StreamI2C_RetACK, "argtypes"):
+        if self.ch347dll.CH347StreamI2C_RetACK.argtypes is None:
             self.ch347dll.CH347StreamI2C_RetACK.argtypes = [
                 ctypes.c_ulong,
                 ctypes.c_ulong,
@@ -854,7 +1244,7 @@ class CH347:
             bytes: The data read from the EEPROM if successful, None otherwise.
         """
         # Set the function argument types and return type if not already set
-        if not hasattr(self.ch347dll.CH347ReadEEPROM, "argtypes"):
+        if self.ch347dll.CH347ReadEEPROM.argtypes is None:
             self.ch347dll.CH347ReadEEPROM.argtypes = [
                 ctypes.c_ulong,
                 ctypes.c_int,  # EEPROM_TYPE enum
@@ -893,7 +1283,7 @@ class CH347:
             bool: True if successful, False otherwise.
         """
         # Set the function argument types and return type if not already set
-        if not hasattr(self.ch347dll.CH347WriteEEPROM, "argtypes"):
+        if self.ch347dll.CH347WriteEEPROM.argtypes is None:
             self.ch347dll.CH347WriteEEPROM.argtypes = [
                 ctypes.c_ulong,
                 ctypes.c_int,  # EEPROM_TYPE enum
@@ -917,3 +1307,610 @@ class CH347:
         )
 
         return result
+
+    def jtag_init(self, clock_rate: int) -> bool:
+        """
+        Initialize the JTAG interface and set the communication speed.
+
+        Args:
+            clock_rate (int): Communication speed, 0-5. A larger value indicates a faster speed.
+
+        Returns:
+            bool: True if successful, False otherwise.
+        """
+        # Set the function argument types and return type if not already set
+        if self.ch347dll.CH347Jtag_INIT.argtypes is None:
+            self.ch347dll.CH347Jtag_INIT.argtypes = [ctypes.c_ulong, ctypes.c_ubyte]
+            self.ch347dll.CH347Jtag_INIT.restype = ctypes.c_bool
+
+        result = self.ch347dll.CH347Jtag_INIT(self.device_index, clock_rate)
+        self._record("jtag_init", (clock_rate,), result)
+        return result
+
+    def jtag_get_config(self) -> int:
+        """
+        Get the JTAG speed configuration.
+
+        Returns:
+            int: The clock rate (0-5) if successful, None otherwise.
+        """
+        # Set the function argument types and return type if not already set
+        if self.ch347dll.CH347Jtag_GetCfg.argtypes is None:
+            self.ch347dll.CH347Jtag_GetCfg.argtypes = [
+                ctypes.c_ulong,
+                ctypes.POINTER(ctypes.c_ubyte),
+            ]
+            self.ch347dll.CH347Jtag_GetCfg.restype = ctypes.c_bool
+
+        clock_rate = ctypes.c_ubyte()
+        result = self.ch347dll.CH347Jtag_GetCfg(
+            self.device_index, ctypes.byref(clock_rate)
+        )
+
+        if result:
+            return clock_rate.value
+        else:
+            return None
+
+    def jtag_tms_change(self, tms_value: bytes, step: int, skip: int = 0) -> bool:
+        """
+        Switch the TAP state by clocking out a sequence of TMS values.
+
+        Args:
+            tms_value (bytes): TMS bits packed LSB first, in switching order.
+            step (int): Number of TMS bits to clock out.
+            skip (int, optional): Number of leading bits of tms_value to skip. Default is 0.
+
+        Returns:
+            bool: True if successful, False otherwise.
+        """
+        # Set the function argument types and return type if not already set
+        if self.ch347dll.CH347Jtag_TmsChange.argtypes is None:
+            self.ch347dll.CH347Jtag_TmsChange.argtypes = [
+                ctypes.c_ulong,
+                ctypes.c_void_p,
+                ctypes.c_ulong,
+                ctypes.c_ulong,
+            ]
+            self.ch347dll.CH347Jtag_TmsChange.restype = ctypes.c_bool
+
+        tms_buffer = ctypes.create_string_buffer(bytes(tms_value))
+        result = self.ch347dll.CH347Jtag_TmsChange(
+            self.device_index, tms_buffer, step, skip
+        )
+        return result
+
+    def jtag_io_scan(self, data_bits: bytes, bit_length: int, is_read: bool) -> bytes:
+        """
+        Shift data in the Shift-DR/IR state and move to Exit1-DR/IR afterwards.
+
+        Args:
+            data_bits (bytes): Bits to shift out on TDI, packed LSB first.
+            bit_length (int): Number of bits to shift.
+            is_read (bool): Whether to capture TDO.
+
+        Returns:
+            bytes: The TDO bits packed LSB first (empty when is_read is False) if successful, None otherwise.
+        """
+        # Set the function argument types and return type if not already set
+        if self.ch347dll.CH347Jtag_IoScan.argtypes is None:
+            self.ch347dll.CH347Jtag_IoScan.argtypes = [
+                ctypes.c_ulong,
+                ctypes.c_void_p,
+                ctypes.c_ulong,
+                ctypes.c_bool,
+            ]
+            self.ch347dll.CH347Jtag_IoScan.restype = ctypes.c_bool
+
+        byte_length = (bit_length + 7) // 8
+        io_buffer = ctypes.create_string_buffer(
+            bytes(data_bits)[:byte_length], byte_length
+        )
+        result = self.ch347dll.CH347Jtag_IoScan(
+            self.device_index, io_buffer, bit_length, is_read
+        )
+
+        if result:
+            return io_buffer.raw[:byte_length] if is_read else b""
+        else:
+            return None
+
+    def jtag_io_scan_t(
+        self, data_bits: bytes, bit_length: int, is_read: bool, is_last_packet: bool
+    ) -> bytes:
+        """
+        Shift data in the Shift-DR/IR state, optionally staying in it.
+
+        If is_last_packet is True the TAP moves to Exit1-DR/IR on the final bit,
+        otherwise it stays in Shift-DR/IR so that the scan can be continued.
+
+        Args:
+            data_bits (bytes): Bits to shift out on TDI, packed LSB first.
+            bit_length (int): Number of bits to shift.
+            is_read (bool): Whether to capture TDO.
+            is_last_packet (bool): Whether this is the last packet of the scan.
+
+        Returns:
+            bytes: The TDO bits packed LSB first (empty when is_read is False) if successful, None otherwise.
+        """
+        # Set the function argument types and return type if not already set
+        if self.ch347dll.CH347Jtag_IoScanT.argtypes is None:
+            self.ch347dll.CH347Jtag_IoScanT.argtypes = [
+                ctypes.c_ulong,
+                ctypes.c_void_p,
+                ctypes.c_ulong,
+                ctypes.c_bool,
+                ctypes.c_bool,
+            ]
+            self.ch347dll.CH347Jtag_IoScanT.restype = ctypes.c_bool
+
+        byte_length = (bit_length + 7) // 8
+        io_buffer = ctypes.create_string_buffer(
+            bytes(data_bits)[:byte_length], byte_length
+        )
+        result = self.ch347dll.CH347Jtag_IoScanT(
+            self.device_index, io_buffer, bit_length, is_read, is_last_packet
+        )
+
+        if result:
+            return io_buffer.raw[:byte_length] if is_read else b""
+        else:
+            return None
+
+    def jtag_reset(self) -> int:
+        """
+        Reset the TAP to Test-Logic-Reset by holding TMS high for more than six clocks.
+
+        Returns:
+            int: The value returned by the library, non-zero if successful.
+        """
+        # Set the function argument types and return type if not already set
+        if self.ch347dll.CH347Jtag_Reset.argtypes is None:
+            self.ch347dll.CH347Jtag_Reset.argtypes = [ctypes.c_ulong]
+            self.ch347dll.CH347Jtag_Reset.restype = ctypes.c_ulong
+
+        result = self.ch347dll.CH347Jtag_Reset(self.device_index)
+        return result
+
+    def jtag_reset_trst(self, level: bool) -> bool:
+        """
+        Drive the TRST pin to reset the target hardware.
+
+        Args:
+            level (bool): False=set low, True=set high.
+
+        Returns:
+            bool: True if successful, False otherwise.
+        """
+        # Set the function argument types and return type if not already set
+        if self.ch347dll.CH347Jtag_ResetTrst.argtypes is None:
+            self.ch347dll.CH347Jtag_ResetTrst.argtypes = [ctypes.c_ulong, ctypes.c_bool]
+            self.ch347dll.CH347Jtag_ResetTrst.restype = ctypes.c_bool
+
+        result = self.ch347dll.CH347Jtag_ResetTrst(self.device_index, level)
+        return result
+
+    def jtag_write_read(
+        self, is_dr: bool, write_data: bytes, write_bit_length: int
+    ) -> bytes:
+        """
+        Bit band mode JTAG IR/DR read and write, suited to short control scans.
+
+        The state machine goes Run-Test -> Shift-IR/DR -> Exit IR/DR -> Run-Test.
+
+        Args:
+            is_dr (bool): True for a DR scan, False for an IR scan.
+            write_data (bytes): Bits to shift out on TDI, packed LSB first.
+            write_bit_length (int): Number of bits to shift.
+
+        Returns:
+            bytes: The TDO bits packed LSB first if successful, None otherwise.
+        """
+        # Set the function argument types and return type if not already set
+        if self.ch347dll.CH347Jtag_WriteRead.argtypes is None:
+            self.ch347dll.CH347Jtag_WriteRead.argtypes = [
+                ctypes.c_ulong,
+                ctypes.c_bool,
+                ctypes.c_ulong,
+                ctypes.c_void_p,
+                ctypes.POINTER(ctypes.c_ulong),
+                ctypes.c_void_p,
+            ]
+            self.ch347dll.CH347Jtag_WriteRead.restype = ctypes.c_bool
+
+        return self._jtag_write_read(
+            self.ch347dll.CH347Jtag_WriteRead, is_dr, write_data, write_bit_length
+        )
+
+    def jtag_write_read_fast(
+        self, is_dr: bool, write_data: bytes, write_bit_length: int
+    ) -> bytes:
+        """
+        Batch JTAG IR/DR read and write, suited to bulk transfers such as firmware download.
+
+        The hardware buffer holds 4096 bytes, so a single call must not shift more than
+        4096 * 8 bits. The state machine goes Run-Test -> Shift-IR/DR -> Exit IR/DR -> Run-Test.
+
+        Args:
+            is_dr (bool): True for a DR scan, False for an IR scan.
+            write_data (bytes): Bits to shift out on TDI, packed LSB first.
+            write_bit_length (int): Number of bits to shift.
+
+        Returns:
+            bytes: The TDO bits packed LSB first if successful, None otherwise.
+        """
+        # Set the function argument types and return type if not already set
+        if self.ch347dll.CH347Jtag_WriteRead_Fast.argtypes is None:
+            self.ch347dll.CH347Jtag_WriteRead_Fast.argtypes = [
+                ctypes.c_ulong,
+                ctypes.c_bool,
+                ctypes.c_ulong,
+                ctypes.c_void_p,
+                ctypes.POINTER(ctypes.c_ulong),
+                ctypes.c_void_p,
+            ]
+            self.ch347dll.CH347Jtag_WriteRead_Fast.restype = ctypes.c_bool
+
+        return self._jtag_write_read(
+            self.ch347dll.CH347Jtag_WriteRead_Fast, is_dr, write_data, write_bit_length
+        )
+
+    def _jtag_write_read(self, function, is_dr, write_data, write_bit_length):
+        byte_length = (write_bit_length + 7) // 8
+
+        # Create ctypes buffers for write and read data
+        write_buffer = ctypes.create_string_buffer(
+            bytes(write_data)[:byte_length], byte_length
+        )
+        read_buffer = ctypes.create_string_buffer(byte_length)
+        read_bit_length = ctypes.c_ulong(write_bit_length)
+
+        result = function(
+            self.device_index,
+            is_dr,
+            write_bit_length,
+            write_buffer,
+            ctypes.byref(read_bit_length),
+            read_buffer,
+        )
+
+        if result:
+            return read_buffer.raw[:byte_length]
+        else:
+            return None
+
+    def gpio_get(self) -> tuple:
+        """
+        Get the GPIO direction and pin level.
+
+        Returns:
+            tuple: (direction, level) if successful, None otherwise. Bits 0-7 correspond to
+            GPIO0-7; direction 0=input, 1=output; level 0=low, 1=high.
+        """
+        # Set the function argument types and return type if not already set
+        if self.ch347dll.CH347GPIO_Get.argtypes is None:
+            self.ch347dll.CH347GPIO_Get.argtypes = [
+                ctypes.c_ulong,
+                ctypes.POINTER(ctypes.c_ubyte),
+                ctypes.POINTER(ctypes.c_ubyte),
+            ]
+            self.ch347dll.CH347GPIO_Get.restype = ctypes.c_bool
+
+        direction = ctypes.c_ubyte()
+        level = ctypes.c_ubyte()
+        result = self.ch347dll.CH347GPIO_Get(
+            self.device_index, ctypes.byref(direction), ctypes.byref(level)
+        )
+
+        if result:
+            return direction.value, level.value
+        else:
+            return None
+
+    def gpio_set(self, enable: int, set_dir_out: int, set_data_out: int) -> bool:
+        """
+        Set the GPIO direction and pin level.
+
+        Args:
+            enable (int): Data validity flag, bits 0-7 select which of GPIO0-7 are changed.
+            set_dir_out (int): I/O direction, 0=input, 1=output. Bits 0-7 correspond to GPIO0-7.
+            set_data_out (int): Output level of the output pins, 0=low, 1=high.
+
+        Returns:
+            bool: True if successful, False otherwise.
+        """
+        # Set the function argument types and return type if not already set
+        if self.ch347dll.CH347GPIO_Set.argtypes is None:
+            self.ch347dll.CH347GPIO_Set.argtypes = [
+                ctypes.c_ulong,
+                ctypes.c_ubyte,
+                ctypes.c_ubyte,
+                ctypes.c_ubyte,
+            ]
+            self.ch347dll.CH347GPIO_Set.restype = ctypes.c_bool
+
+        result = self.ch347dll.CH347GPIO_Set(
+            self.device_index, enable, set_dir_out, set_data_out
+        )
+        return result
+
+    def set_int_routine(
+        self, int0_pin: int, int0_mode: int, int1_pin: int, int1_mode: int, routine
+    ) -> bool:
+        """
+        Set the GPIO interrupt service routine.
+
+        Args:
+            int0_pin (int): INT0 GPIO pin number 0-7, a value greater than 7 disables INT0.
+            int0_mode (int): INT0 trigger, 0=falling edge, 1=rising edge, 2=both edges.
+            int1_pin (int): INT1 GPIO pin number 0-7, a value greater than 7 disables INT1.
+            int1_mode (int): INT1 trigger, 0=falling edge, 1=rising edge, 2=both edges.
+            routine (callable): Called with a pointer to the 8 GPIO status bytes on each
+                interrupt, None cancels the interrupt service. Each status byte holds:
+                bit 7 direction, bit 6 level, bit 5 interrupt enabled, bits 4-3 trigger mode.
+
+        Returns:
+            bool: True if successful, False otherwise.
+        """
+        # Set the function argument types and return type if not already set
+        if self.ch347dll.CH347SetIntRoutine.argtypes is None:
+            self.ch347dll.CH347SetIntRoutine.argtypes = [
+                ctypes.c_ulong,
+                ctypes.c_ubyte,
+                ctypes.c_ubyte,
+                ctypes.c_ubyte,
+                ctypes.c_ubyte,
+                self.INT_ROUTINE,
+            ]
+            self.ch347dll.CH347SetIntRoutine.restype = ctypes.c_bool
+
+        int_routine_func = self.INT_ROUTINE(routine) if routine is not None else None
+        result = self.ch347dll.CH347SetIntRoutine(
+            self.device_index,
+            int0_pin,
+            int0_mode,
+            int1_pin,
+            int1_mode,
+            int_routine_func,
+        )
+        if result:
+            self.int_routine_func = int_routine_func
+        return result
+
+    def read_inter(self) -> bytes:
+        """
+        Read interrupt data.
+
+        Returns:
+            bytes: The 8 GPIO status bytes if successful, None otherwise.
+        """
+        # Set the function argument types and return type if not already set
+        if self.ch347dll.CH347ReadInter.argtypes is None:
+            self.ch347dll.CH347ReadInter.argtypes = [
+                ctypes.c_ulong,
+                ctypes.POINTER(ctypes.c_ubyte),
+            ]
+            self.ch347dll.CH347ReadInter.restype = ctypes.c_bool
+
+        status = (ctypes.c_ubyte * 8)()
+        result = self.ch347dll.CH347ReadInter(self.device_index, status)
+
+        if result:
+            return bytes(status)
+        else:
+            return None
+
+    def abort_inter(self) -> bool:
+        """
+        Abandon the interrupt data read operation.
+
+        Returns:
+            bool: True if successful, False otherwise.
+        """
+        # Set the function argument types and return type if not already set
+        if self.ch347dll.CH347AbortInter.argtypes is None:
+            self.ch347dll.CH347AbortInter.argtypes = [ctypes.c_ulong]
+            self.ch347dll.CH347AbortInter.restype = ctypes.c_bool
+
+        result = self.ch347dll.CH347AbortInter(self.device_index)
+        return result
+
+    def uart_open(self):
+        """
+        Open the UART interface.
+
+        Returns:
+            int: Handle to the opened UART if successful, None otherwise.
+        """
+        # Set the function argument types and return type if not already set
+        if self.ch347dll.CH347Uart_Open.argtypes is None:
+            self.ch347dll.CH347Uart_Open.argtypes = [ctypes.c_ulong]
+            self.ch347dll.CH347Uart_Open.restype = ctypes.c_void_p
+
+        handle = self.ch347dll.CH347Uart_Open(self.device_index)
+        if handle is not None and handle != self.INVALID_HANDLE_VALUE:
+            return handle
+        else:
+            return None
+
+    def uart_close(self) -> bool:
+        """
+        Close the UART interface.
+
+        Returns:
+            bool: True if successful, False otherwise.
+        """
+        # Set the function argument types and return type if not already set
+        if self.ch347dll.CH347Uart_Close.argtypes is None:
+            self.ch347dll.CH347Uart_Close.argtypes = [ctypes.c_ulong]
+            self.ch347dll.CH347Uart_Close.restype = ctypes.c_bool
+
+        result = self.ch347dll.CH347Uart_Close(self.device_index)
+        return result
+
+    def uart_init(
+        self,
+        baud_rate: int,
+        byte_size: int = 8,
+        parity: int = 0,
+        stop_bits: int = 0,
+        byte_timeout: int = 0,
+    ) -> bool:
+        """
+        Set the UART configuration.
+
+        Args:
+            baud_rate (int): Baud rate.
+            byte_size (int): Data bits, 5, 6, 7, 8 or 16 (default is 8).
+            parity (int): 0=None, 1=Odd, 2=Even, 3=Mark, 4=Space (default is 0).
+            stop_bits (int): 0=1 stop bit, 1=1.5 stop bits, 2=2 stop bits (default is 0).
+            byte_timeout (int): Byte timeout in units of 100 us (default is 0).
+
+        Returns:
+            bool: True if successful, False otherwise.
+        """
+        # Set the function argument types and return type if not already set
+        if self.ch347dll.CH347Uart_Init.argtypes is None:
+            self.ch347dll.CH347Uart_Init.argtypes = [
+                ctypes.c_ulong,
+                ctypes.c_ulong,
+                ctypes.c_ubyte,
+                ctypes.c_ubyte,
+                ctypes.c_ubyte,
+                ctypes.c_ubyte,
+            ]
+            self.ch347dll.CH347Uart_Init.restype = ctypes.c_bool
+
+        result = self.ch347dll.CH347Uart_Init(
+            self.device_index, baud_rate, byte_size, parity, stop_bits, byte_timeout
+        )
+        return result
+
+    def uart_set_timeout(self, write_timeout: int, read_timeout: int) -> bool:
+        """
+        Set the timeout of UART USB data reads and writes.
+
+        Args:
+            write_timeout (int): Write timeout in milliseconds, 0xFFFFFFFF means no timeout.
+            read_timeout (int): Read timeout in milliseconds, 0xFFFFFFFF means no timeout.
+
+        Returns:
+            bool: True if successful, False otherwise.
+        """
+        # Set the function argument types and return type if not already set
+        if self.ch347dll.CH347Uart_SetTimeout.argtypes is None:
+            self.ch347dll.CH347Uart_SetTimeout.argtypes = [
+                ctypes.c_ulong,
+                ctypes.c_ulong,
+                ctypes.c_ulong,
+            ]
+            self.ch347dll.CH347Uart_SetTimeout.restype = ctypes.c_bool
+
+        result = self.ch347dll.CH347Uart_SetTimeout(
+            self.device_index, write_timeout, read_timeout
+        )
+        return result
+
+    def uart_read(self, length: int) -> bytes:
+        """
+        Read a block of data from the UART.
+
+        Args:
+            length (int): Maximum number of bytes to read.
+
+        Returns:
+            bytes: The data read, possibly shorter than length, or None on failure.
+        """
+        read_buffer = ctypes.create_string_buffer(length)
+        count = self.uart_read_into(read_buffer, length)
+        if count is None:
+            return None
+        return read_buffer.raw[:count]
+
+    def uart_read_into(self, buffer, length: int) -> int:
+        """
+        Read a block of data from the UART directly into a writable buffer.
+
+        Args:
+            buffer: Writable object supporting the buffer protocol, such as a bytearray,
+                memoryview slice or ctypes array, at least length bytes long.
+            length (int): Maximum number of bytes to read.
+
+        Returns:
+            int: Number of bytes read, or None on failure.
+        """
+        # Set the function argument types and return type if not already set
+        if self.ch347dll.CH347Uart_Read.argtypes is None:
+            self.ch347dll.CH347Uart_Read.argtypes = [
+                ctypes.c_ulong,
+                ctypes.c_void_p,
+                ctypes.POINTER(ctypes.c_ulong),
+            ]
+            self.ch347dll.CH347Uart_Read.restype = ctypes.c_bool
+
+        if not isinstance(buffer, ctypes.Array):
+            buffer = (ctypes.c_char * length).from_buffer(buffer)
+        io_length = ctypes.c_ulong(length)
+        result = self.ch347dll.CH347Uart_Read(
+            self.device_index, buffer, ctypes.byref(io_length)
+        )
+
+        if result:
+            return io_length.value
+        else:
+            return None
+
+    def uart_write(self, data: bytes) -> int:
+        """
+        Write a block of data to the UART.
+
+        Args:
+            data (bytes): Data to write.
+
+        Returns:
+            int: Number of bytes written, or None on failure.
+        """
+        # Set the function argument types and return type if not already set
+        if self.ch347dll.CH347Uart_Write.argtypes is None:
+            self.ch347dll.CH347Uart_Write.argtypes = [
+                ctypes.c_ulong,
+                ctypes.c_void_p,
+                ctypes.POINTER(ctypes.c_ulong),
+            ]
+            self.ch347dll.CH347Uart_Write.restype = ctypes.c_bool
+
+        write_buffer = ctypes.create_string_buffer(bytes(data), len(data))
+        io_length = ctypes.c_ulong(len(data))
+        result = self.ch347dll.CH347Uart_Write(
+            self.device_index, write_buffer, ctypes.byref(io_length)
+        )
+
+        if result:
+            return io_length.value
+        else:
+            return None
+
+    def uart_query_buf_upload(self) -> int:
+        """
+        Query how many received bytes are waiting in the UART read buffer.
+
+        Returns:
+            int: Number of bytes waiting, or None on failure.
+        """
+        # Set the function argument types and return type if not already set
+        if self.ch347dll.CH347Uart_QueryBufUpload.argtypes is None:
+            self.ch347dll.CH347Uart_QueryBufUpload.argtypes = [
+                ctypes.c_ulong,
+                ctypes.POINTER(ctypes.c_longlong),
+            ]
+            self.ch347dll.CH347Uart_QueryBufUpload.restype = ctypes.c_bool
+
+        remain_bytes = ctypes.c_longlong()
+        result = self.ch347dll.CH347Uart_QueryBufUpload(
+            self.device_index, ctypes.byref(remain_bytes)
+        )
+
+        if result:
+            return remain_bytes.value
+        else:
+            return None
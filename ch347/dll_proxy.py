@@ -0,0 +1,113 @@
+"""
+DLL Proxy Module
+----------------
+
+The `ch347.dll_proxy` module holds the base classes of the objects that stand
+in for the DLL object of a `CH347` driver, such as the instrumentation,
+recording and adaptive timeout proxies.
+
+A `DLLProxy` wraps the DLL object and creates one wrapper per function on
+first use. Function attributes such as argtypes and restype are read from
+and written to the wrapped DLL function, so the CH347 bindings work
+unchanged. Proxies can be stacked; each one wraps the DLL object of the one
+attached before it.
+
+Usage Example:
+--------------
+
+from ch347.dll_proxy import DLLProxy, ProxyFunction, argument_value
+
+
+class CountingFunction(ProxyFunction):
+    def __call__(self, *args):
+        self.owner.counts[argument_value(args[0])] += 1
+        return self.function(*args)
+
+
+class CountingDLL(DLLProxy):
+    def __init__(self, dll):
+        super().__init__(dll)
+        self.counts = collections.Counter()
+
+    def wrap(self, name, function):
+        return CountingFunction(name, function, self)
+
+
+driver.ch347dll = CountingDLL(driver.ch347dll)
+"""
+
+
+def argument_value(argument) -> int:
+    """
+    Integer value of a DLL call argument.
+
+    Args:
+        argument: An int, a ctypes scalar or a ctypes.byref() to one.
+
+    Returns:
+        int: The value, 0 for arguments without one such as buffers.
+    """
+    if isinstance(argument, int):
+        return argument
+    argument = getattr(argument, "_obj", argument)
+    return getattr(argument, "value", 0) or 0
+
+
+class DLLProxy:
+    """
+    Stand-in for the CH347 DLL object that wraps its functions.
+
+    Subclasses override `wrap` to return a `ProxyFunction` for the functions
+    they handle.
+
+    Attributes:
+        dll: The wrapped DLL object.
+    """
+
+    def __init__(self, dll):
+        self.dll = dll
+        self._functions = {}
+
+    def __getattr__(self, name):
+        function = self._functions.get(name)
+        if function is None:
+            function = self._functions[name] = self.wrap(name, getattr(self.dll, name))
+        return function
+
+    def wrap(self, name, function):
+        """
+        Wrapper of a DLL function, created once per function.
+
+        Args:
+            name (str): DLL function name.
+            function: The function of the wrapped DLL object.
+
+        Returns:
+            The function to call in its place, by default the function itself.
+        """
+        return function
+
+
+class ProxyFunction:
+    """
+    Wrapper of a single DLL function that forwards its attributes.
+
+    Attributes:
+        name (str): DLL function name.
+        function: The wrapped function.
+        owner (DLLProxy): The proxy that created the wrapper.
+    """
+
+    def __init__(self, name, function, owner):
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "function", function)
+        object.__setattr__(self, "owner", owner)
+
+    def __getattr__(self, name):
+        return getattr(self.function, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.function, name, value)
+
+    def __call__(self, *args):
+        return self.function(*args)
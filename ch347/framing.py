@@ -0,0 +1,377 @@
+"""
+Framing Module
+--------------
+
+The `ch347.framing` module splits a byte stream, such as the CH347 UART, into
+COBS, SLIP or length-prefixed frames in batches.
+
+Each decoder owns a fixed receive buffer. Received data is appended to it,
+frame delimiters in the new data are located with one NumPy comparison, and
+every complete frame is decoded in place. Frames are returned as memoryviews
+into the receive buffer, so no frame is copied. A view stays valid until the
+next call that adds data to the decoder. When the data passed to feed() does
+not fit into the buffer at once, the frames of its earlier parts are returned
+as bytes copies instead.
+
+Trailing checksums are verified for the whole batch at once: sum8 and xor8
+with prefix sums over the buffer, crc32 with `zlib.crc32` per frame. Frames
+that fail the check or cannot be decoded are dropped and counted.
+
+Usage Example:
+--------------
+
+from ch347 import CH347
+from ch347.framing import COBSDecoder
+from ch347.uart import UARTPort
+
+port = UARTPort(CH347(), baudrate=6000000, timeout=1.0)
+decoder = COBSDecoder(checksum="crc32")
+while True:
+    for frame in decoder.read_from(port):
+        handle(frame)
+"""
+
+import abc
+import struct
+import zlib
+
+import numpy as np
+
+
+def cobs_encode(data) -> bytes:
+    """
+    Encode data with Consistent Overhead Byte Stuffing, without the delimiter.
+
+    Args:
+        data (bytes): Payload.
+
+    Returns:
+        bytes: Encoded frame, free of zero bytes.
+    """
+    out = bytearray()
+    data = bytes(data)
+    start = 0
+    while True:
+        index = data.find(b"\x00", start, start + 254)
+        if index < 0:
+            block = data[start : start + 254]
+            if len(block) == 254 and start + 254 < len(data):
+                out.append(0xFF)
+                out += block
+                start += 254
+                continue
+            out.append(len(block) + 1)
+            out += block
+            return bytes(out)
+        out.append(index - start + 1)
+        out += data[start:index]
+        start = index + 1
+
+
+def slip_encode(data) -> bytes:
+    """
+    Encode data with SLIP escaping, without the END delimiters.
+
+    Args:
+        data (bytes): Payload.
+
+    Returns:
+        bytes: Escaped frame, free of END bytes.
+    """
+    return bytes(data).replace(b"\xdb", b"\xdb\xdd").replace(b"\xc0", b"\xdb\xdc")
+
+
+class FrameDecoder(abc.ABC):
+    """
+    Base class of the batch frame decoders.
+
+    Subclasses implement `_split`, which locates raw frames in the buffered
+    data, and `_decode`, which decodes one raw frame in place.
+
+    Attributes:
+        CHECKSUMS (dict): Supported checksum names and their sizes in bytes.
+        frames (int): Number of frames returned.
+        errors (int): Number of frames dropped for a bad checksum or encoding,
+            or for being shorter than the checksum.
+        overflows (int): Number of times a frame did not fit into the buffer.
+    """
+
+    CHECKSUMS = {None: 0, "sum8": 1, "xor8": 1, "crc32": 4}
+
+    def __init__(self, checksum=None, capacity=1 << 20):
+        """
+        Initialize the decoder.
+
+        Args:
+            checksum (str, optional): Trailing checksum of every frame, one of
+                "sum8", "xor8" or "crc32" (little endian), None for no checksum.
+            capacity (int): Size of the receive buffer in bytes (default is 1 MiB).
+        """
+        if checksum not in self.CHECKSUMS:
+            raise ValueError(f"Unsupported checksum: {checksum}")
+        self.checksum = checksum
+        self.checksum_size = self.CHECKSUMS[checksum]
+        self.capacity = capacity
+        # The buffer is never resized, so views handed out stay exportable
+        self.buffer = bytearray(capacity)
+        self.array = np.frombuffer(self.buffer, dtype=np.uint8)
+        self.view = memoryview(self.buffer)
+        self.start = 0
+        self.end = 0
+        self.frames = 0
+        self.errors = 0
+        self.overflows = 0
+
+    def writable(self) -> memoryview:
+        """
+        Free space at the end of the buffer, to be filled in place before commit().
+
+        Data left over from the previous batch is moved to the front first,
+        which invalidates the frames returned before.
+        """
+        if self.start:
+            pending = self.end - self.start
+            self.buffer[:pending] = bytes(self.view[self.start : self.end])
+            self.start, self.end = 0, pending
+        if self.end == self.capacity:
+            # A single frame larger than the buffer, skip it and resync
+            self.overflows += 1
+            self._discard()
+        return self.view[self.end :]
+
+    def commit(self, count) -> list:
+        """
+        Decode the frames completed by count bytes written into writable().
+
+        Returns:
+            list: The decoded frames as memoryviews into the receive buffer.
+        """
+        scan_from = self.end
+        self.end += count
+        spans, self.start = self._split(scan_from)
+        decoded = []
+        for start, end in spans:
+            span = self._decode(start, end)
+            if span is None or span[1] - span[0] < self.checksum_size:
+                self.errors += 1
+            else:
+                decoded.append(span)
+        if self.checksum_size and decoded:
+            decoded = self._verify(decoded)
+        self.frames += len(decoded)
+        return [self.view[start:end] for start, end in decoded]
+
+    def feed(self, data) -> list:
+        """
+        Append received data and decode the frames it completes.
+
+        Args:
+            data (bytes): Received data.
+
+        Returns:
+            list: The decoded frames as memoryviews into the receive buffer,
+                or as bytes if the data took more than one buffer fill.
+        """
+        data = memoryview(data).cast("B")
+        frames = []
+        while len(data):
+            # The next fill moves or overwrites the data of the earlier ones
+            frames = [bytes(frame) for frame in frames]
+            target = self.writable()
+            count = min(len(target), len(data))
+            target[:count] = data[:count]
+            data = data[count:]
+            frames += self.commit(count)
+        return frames
+
+    def read_from(self, port) -> list:
+        """
+        Read from a UARTPort straight into the receive buffer and decode.
+
+        Waits for at least one byte, up to the port timeout.
+
+        Args:
+            port (UARTPort): The port to read from.
+
+        Returns:
+            list: The decoded frames as memoryviews into the receive buffer.
+        """
+        target = self.writable()
+        size = max(1, min(len(target), port.in_waiting))
+        return self.commit(port.readinto(target[:size]))
+
+    def _discard(self):
+        self.start = self.end = 0
+
+    def _verify(self, spans) -> list:
+        size = self.checksum_size
+        starts = np.fromiter((s for s, _ in spans), dtype=np.int64, count=len(spans))
+        ends = np.fromiter((e for _, e in spans), dtype=np.int64, count=len(spans))
+        payload_ends = ends - size
+        if self.checksum == "crc32":
+            buffer = self.buffer
+            view = self.view
+            good = np.fromiter(
+                (
+                    zlib.crc32(view[s:p]).to_bytes(4, "little") == buffer[p:e]
+                    for s, p, e in zip(
+                        starts.tolist(), payload_ends.tolist(), ends.tolist()
+                    )
+                ),
+                dtype=bool,
+                count=len(spans),
+            )
+        else:
+            # Prefix reductions over the covered region give every frame's
+            # checksum with a couple of gathers
+            low = int(starts[0])
+            data = self.array[low : int(ends[-1])]
+            if self.checksum == "sum8":
+                prefix = np.zeros(len(data) + 1, dtype=np.uint64)
+                np.cumsum(data, dtype=np.uint64, out=prefix[1:])
+                values = (prefix[payload_ends - low] - prefix[starts - low]) & 0xFF
+            else:
+                prefix = np.zeros(len(data) + 1, dtype=np.uint8)
+                np.bitwise_xor.accumulate(data, out=prefix[1:])
+                values = prefix[payload_ends - low] ^ prefix[starts - low]
+            good = values == data[payload_ends - low]
+        self.errors += int(len(spans) - np.count_nonzero(good))
+        return [
+            (start, end)
+            for (start, _), end, ok in zip(spans, payload_ends.tolist(), good.tolist())
+            if ok
+        ]
+
+    @abc.abstractmethod
+    def _split(self, scan_from):
+        """
+        Locate the complete raw frames from scan_from on.
+
+        Returns:
+            tuple: ([(start, end), ...] spans, offset of the first unfinished frame).
+        """
+
+    @abc.abstractmethod
+    def _decode(self, start, end):
+        """
+        Decode one raw frame in place.
+
+        Returns:
+            tuple: (start, end) of the decoded frame, or None if it is malformed.
+        """
+
+
+class DelimitedDecoder(FrameDecoder):
+    """
+    Base class of decoders for frames terminated by a delimiter byte.
+
+    Attributes:
+        DELIMITER (int): The frame delimiter.
+    """
+
+    DELIMITER = 0
+
+    def _split(self, scan_from):
+        region = self.array[scan_from : self.end]
+        delimiters = (np.flatnonzero(region == self.DELIMITER) + scan_from).tolist()
+        spans = []
+        start = self.start
+        for delimiter in delimiters:
+            if delimiter > start:
+                spans.append((start, delimiter))
+            start = delimiter + 1
+        return spans, start
+
+
+class COBSDecoder(DelimitedDecoder):
+    """
+    Decoder of zero-delimited COBS frames.
+    """
+
+    DELIMITER = 0
+
+    def _decode(self, start, end):
+        buffer = self.buffer
+        # Walk the code bytes; every one after the first stands for a zero
+        codes = []
+        position = start
+        while position < end:
+            codes.append(position)
+            position += buffer[position]
+        if position != end:
+            return None
+        if any(buffer[code] == 0xFF for code in codes[:-1]):
+            # A full block is not followed by a zero, so compact the frame
+            out = bytearray()
+            for index, code in enumerate(codes):
+                block_end = code + buffer[code]
+                out += self.view[code + 1 : block_end]
+                if buffer[code] != 0xFF and index + 1 < len(codes):
+                    out.append(0)
+            buffer[start : start + len(out)] = out
+            return start, start + len(out)
+        # Otherwise the decoded frame is the encoded one shifted by one byte
+        if len(codes) > 1:
+            self.array[codes[1:]] = 0
+        return start + 1, end
+
+
+class SLIPDecoder(DelimitedDecoder):
+    """
+    Decoder of SLIP frames (RFC 1055).
+    """
+
+    DELIMITER = 0xC0
+    ESC = 0xDB
+
+    def _decode(self, start, end):
+        buffer = self.buffer
+        if buffer.find(self.ESC, start, end) < 0:
+            return start, end
+        raw = bytes(self.view[start:end])
+        escapes = raw.count(b"\xdb")
+        if escapes != raw.count(b"\xdb\xdc") + raw.count(b"\xdb\xdd"):
+            return None
+        data = raw.replace(b"\xdb\xdc", b"\xc0").replace(b"\xdb\xdd", b"\xdb")
+        buffer[start : start + len(data)] = data
+        return start, start + len(data)
+
+
+class LengthPrefixedDecoder(FrameDecoder):
+    """
+    Decoder of frames preceded by a binary length field.
+    """
+
+    def __init__(self, header="<H", checksum=None, capacity=1 << 20):
+        """
+        Initialize the decoder.
+
+        Args:
+            header (str): struct format of the length field (default is "<H").
+                The length counts the bytes after the field, checksum included.
+            checksum (str, optional): Trailing checksum, see FrameDecoder.
+            capacity (int): Size of the receive buffer in bytes (default is 1 MiB).
+        """
+        super().__init__(checksum, capacity)
+        self.header = struct.Struct(header)
+
+    def _split(self, scan_from):
+        unpack_from = self.header.unpack_from
+        header_size = self.header.size
+        spans = []
+        position = self.start
+        while self.end - position >= header_size:
+            (length,) = unpack_from(self.buffer, position)
+            if header_size + length > self.capacity:
+                # The length field is corrupt, nothing after it can be trusted
+                self.errors += 1
+                return spans, self.end
+            frame_end = position + header_size + length
+            if frame_end > self.end:
+                break
+            spans.append((position + header_size, frame_end))
+            position = frame_end
+        return spans, position
+
+    def _decode(self, start, end):
+        return start, end
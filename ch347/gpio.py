@@ -0,0 +1,380 @@
+"""
+GPIO Module
+-----------
+
+The `ch347.gpio` module drives GPIO0-7 of the CH347 and turns pin interrupts
+into a stream of timestamped edge events.
+
+The interrupt routine installed with `CH347SetIntRoutine` only stamps the edge
+with `time.perf_counter_ns()` and stores it in the preallocated single-producer,
+single-consumer ring buffer of its pin; it never takes a lock. Consumers iterate
+over the events of all pins, wait for the next edge on one pin without touching
+the events of the others, or read them as an asyncio stream.
+Waiting on a data-ready or alert pin this way replaces polling a status
+register over I2C, so the USB bus only carries the reads that have data.
+
+Usage Example:
+--------------
+
+from ch347 import CH347
+from ch347.gpio import GPIO
+
+gpio = GPIO(CH347())
+gpio.arm(4, GPIO.FALLING)
+for event in gpio.events(timeout=1.0):
+    print(event.pin, event.level, event.timestamp_ns)
+gpio.close()
+"""
+
+import asyncio
+import threading
+import time
+from array import array
+from collections import namedtuple
+
+EdgeEvent = namedtuple("EdgeEvent", ["pin", "level", "timestamp_ns"])
+
+
+class EventRing:
+    """
+    Fixed-size ring buffer of edge events for one producer and one consumer.
+
+    The producer only writes the head index and the consumer only writes the
+    tail index, so no lock is needed. When the ring is full new events are
+    dropped and counted.
+
+    Attributes:
+        capacity (int): Number of events the ring holds, a power of two.
+        dropped (int): Number of events lost because the ring was full.
+    """
+
+    def __init__(self, capacity=4096):
+        if capacity & (capacity - 1):
+            raise ValueError("capacity must be a power of two")
+        self.capacity = capacity
+        self._mask = capacity - 1
+        self._pins = bytearray(capacity)
+        self._levels = bytearray(capacity)
+        self._timestamps = array("q", bytes(8 * capacity))
+        self._head = 0
+        self._tail = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return self._head - self._tail
+
+    def push(self, pin, level, timestamp_ns) -> bool:
+        head = self._head
+        if head - self._tail >= self.capacity:
+            self.dropped += 1
+            return False
+        index = head & self._mask
+        self._pins[index] = pin
+        self._levels[index] = level
+        self._timestamps[index] = timestamp_ns
+        # Publish the slot only after it has been filled
+        self._head = head + 1
+        return True
+
+    def pop(self):
+        tail = self._tail
+        if tail == self._head:
+            return None
+        index = tail & self._mask
+        event = EdgeEvent(
+            self._pins[index], self._levels[index], self._timestamps[index]
+        )
+        self._tail = tail + 1
+        return event
+
+    def peek_timestamp(self):
+        tail = self._tail
+        if tail == self._head:
+            return None
+        return self._timestamps[tail & self._mask]
+
+
+class GPIO:
+    """
+    CH347 GPIO0-7 with interrupt-driven edge events.
+
+    Every pin has a ring of its own, so a consumer of one pin's edges never
+    takes the edges of another pin. Each ring has a single consumer: either
+    the readers of all pins (get_event, events, stream) or one of that pin.
+
+    Attributes:
+        FALLING (int): Falling edge trigger mode.
+        RISING (int): Rising edge trigger mode.
+        BOTH (int): Double edge trigger mode.
+        rings (tuple): EventRing of every pin.
+        interrupts (int): Number of interrupts received since arm().
+        unattributed (int): Number of those interrupts that showed no edge on
+                            an armed pin and produced no event.
+    """
+
+    PIN_COUNT = 8
+
+    FALLING = 0
+    RISING = 1
+    BOTH = 2
+
+    # Pin number that disables an interrupt source
+    DISABLED = 0xFF
+
+    def __init__(self, driver, capacity=4096):
+        """
+        Initialize the GPIO interface.
+
+        Args:
+            driver: An instance of the CH347 driver.
+            capacity (int): Number of edge events buffered per pin, a power of two (default is 4096).
+        """
+        self.driver = driver
+        self.driver.open_device()
+        self.rings = tuple(EventRing(capacity) for _ in range(self.PIN_COUNT))
+        self.interrupts = 0
+        self.unattributed = 0
+        self._armed = ()
+        self._last_levels = {}
+        # Set on an edge of the pin; the last one on an edge of any pin
+        self._ready = tuple(threading.Event() for _ in range(self.PIN_COUNT + 1))
+        self._async_waiters = []
+
+        state = self.driver.gpio_get()
+        if state is None:
+            raise RuntimeError("CH347GPIO_Get failed")
+        self._direction, self._output = state
+
+    @property
+    def dropped(self) -> int:
+        """
+        Number of edge events lost because the consumer fell behind.
+        """
+        return sum(ring.dropped for ring in self.rings)
+
+    def get(self) -> tuple:
+        """
+        Read the direction and level of all pins.
+
+        Returns:
+            tuple: (direction, level) bit masks, bits 0-7 correspond to GPIO0-7.
+        """
+        state = self.driver.gpio_get()
+        if state is None:
+            raise RuntimeError("CH347GPIO_Get failed")
+        return state
+
+    def read(self, pin: int) -> int:
+        """
+        Read the level of a pin.
+
+        Args:
+            pin (int): GPIO number, 0-7.
+
+        Returns:
+            int: 0 for low, 1 for high.
+        """
+        return (self.get()[1] >> pin) & 1
+
+    def set_direction(self, pin: int, output: bool) -> bool:
+        """
+        Configure a pin as input or output.
+
+        Args:
+            pin (int): GPIO number, 0-7.
+            output (bool): True for output, False for input.
+
+        Returns:
+            bool: True if successful, False otherwise.
+        """
+        bit = 1 << pin
+        direction = self._direction | bit if output else self._direction & ~bit
+        result = self.driver.gpio_set(bit, direction, self._output)
+        if result:
+            self._direction = direction
+        return result
+
+    def write(self, pin: int, level: int) -> bool:
+        """
+        Drive a pin as output at the given level.
+
+        Args:
+            pin (int): GPIO number, 0-7.
+            level (int): 0 for low, 1 for high.
+
+        Returns:
+            bool: True if successful, False otherwise.
+        """
+        bit = 1 << pin
+        direction = self._direction | bit
+        output = self._output | bit if level else self._output & ~bit
+        result = self.driver.gpio_set(bit, direction, output)
+        if result:
+            self._direction = direction
+            self._output = output
+        return result
+
+    def arm(self, pin: int, mode=FALLING, pin2=None, mode2=FALLING) -> bool:
+        """
+        Enable interrupts on up to two pins and start collecting edge events.
+
+        Args:
+            pin (int): GPIO number for INT0, 0-7.
+            mode (int): Trigger mode for INT0, FALLING, RISING or BOTH (default is FALLING).
+            pin2 (int, optional): GPIO number for INT1.
+            mode2 (int): Trigger mode for INT1 (default is FALLING).
+
+        Returns:
+            bool: True if successful, False otherwise.
+        """
+        armed = ((pin, mode),) if pin2 is None else ((pin, mode), (pin2, mode2))
+        levels = self.get()[1]
+        self._last_levels = {p: (levels >> p) & 1 for p, _ in armed}
+        self._armed = armed
+        self.interrupts = 0
+        self.unattributed = 0
+        return self.driver.set_int_routine(
+            pin,
+            mode,
+            self.DISABLED if pin2 is None else pin2,
+            mode2,
+            self._on_interrupt,
+        )
+
+    def disarm(self) -> bool:
+        """
+        Disable the pin interrupts. Events already buffered can still be read.
+
+        Returns:
+            bool: True if successful, False otherwise.
+        """
+        self._armed = ()
+        return self.driver.set_int_routine(self.DISABLED, 0, self.DISABLED, 0, None)
+
+    def _on_interrupt(self, status):
+        # Runs on the DLL's thread: stamp, store, wake consumers, nothing else
+        timestamp = time.perf_counter_ns()
+        self.interrupts += 1
+        edges = []
+        waiting = []
+        for pin, mode in self._armed:
+            level = (status[pin] >> 6) & 1
+            changed = level != self._last_levels[pin]
+            self._last_levels[pin] = level
+            if changed and (mode == self.BOTH or level == mode):
+                edges.append((pin, level))
+            elif mode != self.BOTH and level == mode:
+                # Still at the level its edge leads to, the edge back from a
+                # previous trigger raised no interrupt to be seen
+                waiting.append((pin, level))
+        if not edges and len(waiting) == 1:
+            edges = waiting
+        if not edges:
+            # The pulse was over before the status was sampled, or several
+            # pins could have fired: no event can be attributed
+            self.unattributed += 1
+            return
+        for pin, level in edges:
+            self.rings[pin].push(pin, level, timestamp)
+            self._ready[pin].set()
+        self._ready[-1].set()
+        for loop, wake in self._async_waiters:
+            loop.call_soon_threadsafe(wake.set)
+
+    def _pop(self, pin=None):
+        if pin is not None:
+            return self.rings[pin].pop()
+        # The oldest event of all pins
+        oldest = None
+        for ring in self.rings:
+            timestamp = ring.peek_timestamp()
+            if timestamp is not None and (oldest is None or timestamp < oldest[0]):
+                oldest = (timestamp, ring)
+        return None if oldest is None else oldest[1].pop()
+
+    def get_event(self, timeout=None, pin=None):
+        """
+        Take the next edge event, waiting for one if the buffer is empty.
+
+        Args:
+            timeout (float, optional): Maximum time to wait in seconds, None waits forever.
+            pin (int, optional): Only take events of this pin, the others stay buffered.
+
+        Returns:
+            EdgeEvent: (pin, level, timestamp_ns), or None on timeout.
+        """
+        event = self._pop(pin)
+        if event is not None:
+            return event
+        ready = self._ready[-1 if pin is None else pin]
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            # Clear before checking again so a push in between is not missed
+            ready.clear()
+            event = self._pop(pin)
+            if event is not None:
+                return event
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return None
+            ready.wait(remaining)
+
+    def events(self, timeout=None):
+        """
+        Iterate over edge events as they arrive.
+
+        Args:
+            timeout (float, optional): Stop after this many seconds without an event.
+
+        Yields:
+            EdgeEvent: (pin, level, timestamp_ns) in timestamp order.
+        """
+        while True:
+            event = self.get_event(timeout)
+            if event is None:
+                return
+            yield event
+
+    def wait_for_edge(self, pin=None, timeout=None):
+        """
+        Block until an edge occurs, instead of polling a status register.
+
+        Events on other pins stay buffered for their own consumers.
+
+        Args:
+            pin (int, optional): Only return edges on this pin.
+            timeout (float, optional): Maximum time to wait in seconds.
+
+        Returns:
+            EdgeEvent: The edge, or None on timeout.
+        """
+        return self.get_event(timeout, pin)
+
+    async def stream(self):
+        """
+        Asynchronously iterate over edge events as they arrive.
+
+        Yields:
+            EdgeEvent: (pin, level, timestamp_ns) in timestamp order.
+        """
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        self._async_waiters = self._async_waiters + [waiter]
+        try:
+            while True:
+                event = self._pop()
+                if event is None:
+                    waiter[1].clear()
+                    event = self._pop()
+                    if event is None:
+                        await waiter[1].wait()
+                        continue
+                yield event
+        finally:
+            self._async_waiters = [w for w in self._async_waiters if w is not waiter]
+
+    def close(self):
+        """
+        Disable the pin interrupts and close the CH347 device.
+        """
+        self.disarm()
+        self.driver.close_device()
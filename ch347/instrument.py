@@ -0,0 +1,391 @@
+"""
+Instrumentation Module
+----------------------
+
+The `ch347.instrument` module records what every CH347 DLL call costs: call
+counts, bytes moved, failures and a latency histogram per DLL function and
+per device index.
+
+Instrumentation is opt in. `Instrumentation.attach(driver)` puts a recording
+proxy in front of the driver's DLL object and `detach(driver)` takes it away
+again; a driver that was never attached calls the DLL directly and pays
+nothing. Latencies go into HDR-style log-linear histograms, so percentiles
+keep a bounded relative error from nanoseconds to seconds at a fixed memory
+cost.
+
+Snapshots can be exported as a dict, as JSON, or in the Prometheus text
+format for the node exporter textfile collector.
+
+Usage Example:
+--------------
+
+from ch347 import CH347
+from ch347.instrument import Instrumentation
+
+driver = CH347()
+stats = Instrumentation()
+stats.attach(driver)
+driver.open_device()
+driver.stream_i2c([0x80, 0x00], 2)
+print(stats.to_json())
+stats.write_prometheus("/var/lib/node_exporter/ch347.prom")
+"""
+
+import ctypes
+import json
+import os
+import threading
+import time
+
+from .dll_proxy import DLLProxy, ProxyFunction, argument_value
+
+_INVALID_HANDLE_VALUE = ctypes.c_void_p(-1).value
+
+
+class Histogram:
+    """
+    Log-linear histogram of non-negative integers, in the style of HdrHistogram.
+
+    Values below 2**SIGNIFICANT_BITS are counted exactly. Above that every
+    power of two is split into 2**(SIGNIFICANT_BITS - 1) buckets, which bounds
+    the relative error of a reported value to 2**-(SIGNIFICANT_BITS - 1).
+
+    Attributes:
+        count (int): Number of recorded values.
+        total (int): Sum of the recorded values.
+        min (int): Smallest recorded value, None when empty.
+        max (int): Largest recorded value, None when empty.
+    """
+
+    SIGNIFICANT_BITS = 6
+
+    # Enough buckets for values up to 2**64
+    BUCKETS = (64 - SIGNIFICANT_BITS + 2) << (SIGNIFICANT_BITS - 1)
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKETS
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    @classmethod
+    def bucket(cls, value) -> int:
+        shift = value.bit_length() - cls.SIGNIFICANT_BITS
+        if shift <= 0:
+            return value
+        return (shift << (cls.SIGNIFICANT_BITS - 1)) + (value >> shift)
+
+    @classmethod
+    def bucket_range(cls, index) -> tuple:
+        """
+        The lowest and highest value counted in a bucket.
+        """
+        if index < 1 << cls.SIGNIFICANT_BITS:
+            return index, index
+        shift = (index >> (cls.SIGNIFICANT_BITS - 1)) - 1
+        mantissa = index - (shift << (cls.SIGNIFICANT_BITS - 1))
+        return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+    def record(self, value):
+        self.counts[self.bucket(value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        """
+        Add the values of another histogram to this one.
+        """
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, percent) -> int:
+        """
+        The value below which the given percentage of the recorded values fall.
+
+        Args:
+            percent (float): Percentile, 0-100.
+
+        Returns:
+            int: The upper end of the bucket holding the percentile, clamped to
+                 the recorded maximum, or None when empty.
+        """
+        if not self.count:
+            return None
+        rank = max(1, -(-self.count * percent // 100))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.bucket_range(index)[1], self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.total / self.count if self.count else None,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "p999": self.percentile(99.9),
+        }
+
+
+class OperationStats:
+    """
+    Counters of one DLL function on one device.
+
+    Attributes:
+        calls (int): Number of calls.
+        failures (int): Number of calls that reported failure.
+        bytes (int): Number of payload bytes moved.
+        latency (Histogram): Call latency in nanoseconds.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.failures = 0
+        self.bytes = 0
+        self.latency = Histogram()
+
+    def to_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "bytes": self.bytes,
+            "latency_ns": self.latency.to_dict(),
+        }
+
+
+def _stream(write, read):
+    return lambda args: argument_value(args[write]) + argument_value(args[read])
+
+
+def _argument(position):
+    return lambda args: argument_value(args[position])
+
+
+def _bits(*positions):
+    return lambda args: sum((argument_value(args[p]) + 7) // 8 for p in positions)
+
+
+def _bool_failed(result) -> bool:
+    return not result
+
+
+def _handle_failed(result) -> bool:
+    return result is None or result == _INVALID_HANDLE_VALUE
+
+
+def _never_failed(result) -> bool:
+    return False
+
+
+class Instrumentation:
+    """
+    Registry of per-operation and per-device statistics of CH347 DLL calls.
+
+    Attributes:
+        PAYLOAD (dict): DLL function name to a function that returns the number
+                        of payload bytes a call moves, given its arguments.
+        FAILED (dict): DLL function name to a function that tells from the
+                       result whether a call failed, for the functions that
+                       do not return BOOL.
+    """
+
+    PAYLOAD = {
+        "CH347StreamI2C": _stream(1, 3),
+        "CH347StreamI2C_RetACK": _stream(1, 3),
+        "CH347SPI_Write": _argument(2),
+        "CH347SPI_Read": _stream(2, 3),
+        "CH347SPI_WriteRead": _argument(2),
+        "CH347StreamSPI4": _argument(2),
+        "CH347ReadEEPROM": _argument(3),
+        "CH347WriteEEPROM": _argument(3),
+        "CH347ReadData": _argument(2),
+        "CH347WriteData": _argument(2),
+        "CH347Jtag_WriteRead": _bits(2, 4),
+        "CH347Jtag_WriteRead_Fast": _bits(2, 4),
+        "CH347Jtag_IoScan": _bits(2),
+        "CH347Jtag_IoScanT": _bits(2),
+        "CH347Uart_Read": _argument(2),
+        "CH347Uart_Write": _argument(2),
+    }
+
+    FAILED = {
+        "CH347OpenDevice": _handle_failed,
+        "CH347Uart_Open": _handle_failed,
+        # Values rather than BOOL, where 0 is a valid result such as a CH341 chip type
+        "CH347GetChipType": _never_failed,
+        "CH347Jtag_Reset": _never_failed,
+    }
+
+    def __init__(self):
+        self.operations = {}
+        self.lock = threading.Lock()
+        self.started = time.time()
+
+    def attach(self, driver):
+        """
+        Start recording the DLL calls of a CH347 driver.
+
+        Args:
+            driver (CH347): The driver to instrument.
+        """
+        if not isinstance(driver.ch347dll, InstrumentedDLL):
+            driver.ch347dll = InstrumentedDLL(driver.ch347dll, self)
+
+    @staticmethod
+    def detach(driver):
+        """
+        Stop recording the DLL calls of a CH347 driver.
+
+        Args:
+            driver (CH347): The instrumented driver.
+        """
+        if isinstance(driver.ch347dll, InstrumentedDLL):
+            driver.ch347dll = driver.ch347dll.dll
+
+    def record(self, operation, device, elapsed_ns, payload, failed):
+        key = (operation, device)
+        with self.lock:
+            stats = self.operations.get(key)
+            if stats is None:
+                stats = self.operations[key] = OperationStats()
+            stats.calls += 1
+            stats.bytes += payload
+            stats.failures += failed
+            stats.latency.record(elapsed_ns)
+
+    def reset(self):
+        with self.lock:
+            self.operations = {}
+            self.started = time.time()
+
+    def snapshot(self) -> dict:
+        """
+        Take a snapshot of all counters.
+
+        Returns:
+            dict: {"started": epoch seconds, "operations": [{"operation", "device",
+                  "calls", "failures", "bytes", "latency_ns": {...}}, ...]}
+        """
+        with self.lock:
+            operations = [
+                dict(operation=operation, device=device, **stats.to_dict())
+                for (operation, device), stats in sorted(
+                    self.operations.items(),
+                    key=lambda item: (item[0][0], str(item[0][1])),
+                )
+            ]
+        return {"started": self.started, "operations": operations}
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.snapshot(), **kwargs)
+
+    def to_prometheus(self, prefix="ch347") -> str:
+        """
+        Render the counters in the Prometheus text exposition format.
+
+        Latencies are exported as a summary in seconds.
+
+        Returns:
+            str: The metrics text.
+        """
+        snapshot = self.snapshot()["operations"]
+        lines = []
+        for name, key, help_text in (
+            ("calls_total", "calls", "Number of CH347 DLL calls."),
+            ("failures_total", "failures", "Number of failed CH347 DLL calls."),
+            ("bytes_total", "bytes", "Payload bytes moved by CH347 DLL calls."),
+        ):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            for entry in snapshot:
+                labels = f'op="{entry["operation"]}",device="{entry["device"]}"'
+                lines.append(f"{prefix}_{name}{{{labels}}} {entry[key]}")
+
+        name = f"{prefix}_call_duration_seconds"
+        lines.append(f"# HELP {name} Latency of CH347 DLL calls.")
+        lines.append(f"# TYPE {name} summary")
+        with self.lock:
+            histograms = {key: stats.latency for key, stats in self.operations.items()}
+        for entry in snapshot:
+            histogram = histograms[(entry["operation"], entry["device"])]
+            labels = f'op="{entry["operation"]}",device="{entry["device"]}"'
+            for quantile in (0.5, 0.9, 0.99, 0.999):
+                value = histogram.percentile(quantile * 100) / 1e9
+                lines.append(f'{name}{{{labels},quantile="{quantile}"}} {value:.9f}')
+            lines.append(f"{name}_sum{{{labels}}} {histogram.total / 1e9:.9f}")
+            lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path, prefix="ch347"):
+        """
+        Write the metrics to a file, replacing it atomically.
+
+        Args:
+            path (str): Output file, e.g. in the node exporter textfile directory.
+            prefix (str): Metric name prefix (default is "ch347").
+        """
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w") as file:
+            file.write(self.to_prometheus(prefix))
+        os.replace(temporary, path)
+
+
+class InstrumentedDLL(DLLProxy):
+    """
+    Stand-in for the CH347 DLL object that records every function call.
+    """
+
+    def __init__(self, dll, instrumentation):
+        super().__init__(dll)
+        self.instrumentation = instrumentation
+
+    def wrap(self, name, function):
+        return InstrumentedFunction(name, function, self)
+
+
+class InstrumentedFunction(ProxyFunction):
+    """
+    Recording wrapper of a single DLL function.
+    """
+
+    def __init__(self, name, function, owner):
+        super().__init__(name, function, owner)
+        object.__setattr__(
+            self, "payload", Instrumentation.PAYLOAD.get(name, lambda args: 0)
+        )
+        object.__setattr__(
+            self, "failed", Instrumentation.FAILED.get(name, _bool_failed)
+        )
+
+    def __call__(self, *args):
+        start = time.perf_counter_ns()
+        result = self.function(*args)
+        elapsed = time.perf_counter_ns() - start
+        # The payload is read afterwards, length arguments passed by reference
+        # hold the transferred length by then
+        failed = self.failed(result)
+        try:
+            payload = 0 if failed else self.payload(args)
+        except (IndexError, TypeError):
+            payload = 0
+        self.owner.instrumentation.record(
+            self.name, args[0] if args else None, elapsed, payload, failed
+        )
+        return result
@@ -0,0 +1,439 @@
+"""
+JTAG Module
+-----------
+
+The `ch347.jtag` module drives the CH347 JTAG interface (chip mode 3 or CH347F)
+on top of the `jtag_*` bindings of the `CH347` class.
+
+The TAP state is tracked on the host, so TMS sequences are only clocked out when
+the state actually has to change, and consecutive moves are sent in a single
+`CH347Jtag_TmsChange` call. Scans that start and end in Run-Test/Idle go through
+`CH347Jtag_WriteRead_Fast`; scans that are continued across calls (end_state is
+the Shift state) are merged on the host and sent in pieces that fit the 4096-byte
+hardware buffer.
+
+All scan data is passed and returned as bit-packed buffers, LSB first: bit i of
+the scan is bit (i % 8) of byte (i // 8).
+
+Usage Example:
+--------------
+
+from ch347 import CH347
+from ch347.jtag import JTAG
+
+driver = CH347()
+jtag = JTAG(driver)
+print([hex(idcode) for idcode in jtag.scan_chain()])
+"""
+
+from collections import deque
+from typing import List, Tuple
+
+
+class TapState:
+    """
+    IEEE 1149.1 TAP controller states.
+    """
+
+    TEST_LOGIC_RESET = 0
+    RUN_TEST_IDLE = 1
+    SELECT_DR_SCAN = 2
+    CAPTURE_DR = 3
+    SHIFT_DR = 4
+    EXIT1_DR = 5
+    PAUSE_DR = 6
+    EXIT2_DR = 7
+    UPDATE_DR = 8
+    SELECT_IR_SCAN = 9
+    CAPTURE_IR = 10
+    SHIFT_IR = 11
+    EXIT1_IR = 12
+    PAUSE_IR = 13
+    EXIT2_IR = 14
+    UPDATE_IR = 15
+
+    # Next state for TMS=0 and TMS=1, indexed by the current state
+    TRANSITIONS = (
+        (RUN_TEST_IDLE, TEST_LOGIC_RESET),
+        (RUN_TEST_IDLE, SELECT_DR_SCAN),
+        (CAPTURE_DR, SELECT_IR_SCAN),
+        (SHIFT_DR, EXIT1_DR),
+        (SHIFT_DR, EXIT1_DR),
+        (PAUSE_DR, UPDATE_DR),
+        (PAUSE_DR, EXIT2_DR),
+        (SHIFT_DR, UPDATE_DR),
+        (RUN_TEST_IDLE, SELECT_DR_SCAN),
+        (CAPTURE_IR, TEST_LOGIC_RESET),
+        (SHIFT_IR, EXIT1_IR),
+        (SHIFT_IR, EXIT1_IR),
+        (PAUSE_IR, UPDATE_IR),
+        (PAUSE_IR, EXIT2_IR),
+        (SHIFT_IR, UPDATE_IR),
+        (RUN_TEST_IDLE, SELECT_DR_SCAN),
+    )
+
+
+def _shortest_paths() -> List[List[Tuple[int, int]]]:
+    # Breadth-first search from every state, the TMS bits of each path are
+    # packed LSB first so they can be handed to CH347Jtag_TmsChange directly.
+    paths = []
+    for start in range(16):
+        row = [None] * 16
+        row[start] = (0, 0)
+        queue = deque([start])
+        while queue:
+            state = queue.popleft()
+            bits, count = row[state]
+            for tms in (0, 1):
+                nxt = TapState.TRANSITIONS[state][tms]
+                if row[nxt] is None:
+                    row[nxt] = (bits | (tms << count), count + 1)
+                    queue.append(nxt)
+        paths.append(row)
+    return paths
+
+
+# TMS_PATHS[start][end] is (tms_bits, bit_count)
+TMS_PATHS = _shortest_paths()
+
+
+class JTAG:
+    """
+    JTAG master with host-side TAP state tracking.
+
+    Attributes:
+        BUFFER_SIZE (int): Size of the CH347 JTAG hardware buffer in bytes.
+        CLOCK_RATES (tuple): TCK frequency in Hz of each CH347Jtag_INIT clock rate.
+        state (int): The tracked TAP state, None until the TAP has been reset.
+    """
+
+    BUFFER_SIZE = 4096
+
+    CLOCK_RATES = (1875000, 3750000, 7500000, 15000000, 30000000, 60000000)
+
+    STABLE_STATES = (
+        TapState.TEST_LOGIC_RESET,
+        TapState.RUN_TEST_IDLE,
+        TapState.PAUSE_DR,
+        TapState.PAUSE_IR,
+    )
+
+    # States from which CH347Jtag_WriteRead_Fast can start without clocking
+    # the TAP through states the caller did not ask for.
+    _FAST_START_STATES = (
+        TapState.TEST_LOGIC_RESET,
+        TapState.RUN_TEST_IDLE,
+        TapState.UPDATE_DR,
+        TapState.UPDATE_IR,
+    )
+
+    def __init__(self, driver, clock_rate=4):
+        """
+        Initialize the JTAG interface.
+
+        Args:
+            driver: An instance of the CH347 driver.
+            clock_rate (int): Communication speed, 0-5. A larger value is faster (default is 4).
+        """
+        self.driver = driver
+        self.driver.open_device()
+        if not self.driver.jtag_init(clock_rate):
+            raise RuntimeError("CH347Jtag_INIT failed")
+
+        self.state = None
+
+        # TMS bits waiting to be clocked out
+        self._tms_bits = 0
+        self._tms_count = 0
+
+        # Scan data held back until the scan it belongs to is completed:
+        # [is_dr, bits, bit_count, read, tdo_bits, tdo_count, in_shift]
+        self._pending = None
+
+        self.reset()
+
+    def reset(self):
+        """
+        Move the TAP to Test-Logic-Reset, whatever its current state is.
+        """
+        self._complete_pending()
+        self._queue_tms(0x1F, 5)
+        self.state = TapState.TEST_LOGIC_RESET
+
+    def goto_state(self, state: int):
+        """
+        Move the TAP to the given state along the shortest path.
+
+        Nothing is clocked if the TAP is already in that state. The TMS bits are
+        queued and sent together with the next scan or flush.
+
+        Args:
+            state (int): The target TapState.
+        """
+        self._complete_pending()
+        if self.state is None:
+            self.reset()
+        bits, count = TMS_PATHS[self.state][state]
+        self._queue_tms(bits, count)
+        self.state = state
+
+    def run_test(self, cycles: int, state=TapState.RUN_TEST_IDLE):
+        """
+        Clock TCK in a stable state.
+
+        Args:
+            cycles (int): Number of TCK cycles to spend in the state.
+            state (int): Test-Logic-Reset, Run-Test/Idle, Pause-DR or Pause-IR
+                (default is Run-Test/Idle).
+        """
+        if state not in self.STABLE_STATES:
+            raise ValueError(f"TAP state {state} is not a stable state")
+        self.goto_state(state)
+        # TMS stays high in Test-Logic-Reset and low in the other stable states
+        if state == TapState.TEST_LOGIC_RESET:
+            self._queue_tms((1 << cycles) - 1, cycles)
+        else:
+            self._queue_tms(0, cycles)
+
+    def shift_ir(
+        self, data, bit_length=None, read=False, end_state=TapState.RUN_TEST_IDLE
+    ):
+        """
+        Shift data through the instruction register.
+
+        Args:
+            data (bytes): Bits to shift out on TDI, packed LSB first.
+            bit_length (int, optional): Number of bits to shift. Defaults to all bits of data.
+            read (bool): Whether to return the TDO bits.
+            end_state (int): TapState to leave the TAP in (default is Run-Test/Idle).
+                Passing TapState.SHIFT_IR holds the bits back and continues the scan
+                with the next shift_ir call.
+
+        Returns:
+            bytes: The TDO bits packed LSB first when the scan completes and read is True,
+            None otherwise.
+        """
+        return self._shift(False, data, bit_length, read, end_state)
+
+    def shift_dr(
+        self, data, bit_length=None, read=False, end_state=TapState.RUN_TEST_IDLE
+    ):
+        """
+        Shift data through the currently selected data register.
+
+        Args:
+            data (bytes): Bits to shift out on TDI, packed LSB first.
+            bit_length (int, optional): Number of bits to shift. Defaults to all bits of data.
+            read (bool): Whether to return the TDO bits.
+            end_state (int): TapState to leave the TAP in (default is Run-Test/Idle).
+                Passing TapState.SHIFT_DR holds the bits back and continues the scan
+                with the next shift_dr call.
+
+        Returns:
+            bytes: The TDO bits packed LSB first when the scan completes and read is True,
+            None otherwise. A continued scan returns the TDO bits of all its pieces, pieces
+            shifted before read was first requested read back as zeros.
+        """
+        return self._shift(True, data, bit_length, read, end_state)
+
+    def flush(self):
+        """
+        Complete any continued scan and clock out all queued TMS bits.
+
+        A continued scan completed here ends in Exit1-DR/IR.
+
+        Returns:
+            bytes: The TDO bits of the completed scan if it was read, None otherwise.
+        """
+        tdo = self._complete_pending()
+        self._flush_tms()
+        return tdo
+
+    def scan_chain(self, max_devices=32) -> List[int]:
+        """
+        Discover the devices on the scan chain by their IDCODE.
+
+        After Test-Logic-Reset every TAP selects its IDCODE register, or BYPASS if it
+        has none. Ones are shifted through DR and the captured value is walked from
+        the device closest to TDO: a 1 marks a 32-bit IDCODE, a 0 a 1-bit BYPASS.
+
+        Args:
+            max_devices (int): Maximum number of devices to look for (default is 32).
+
+        Returns:
+            List[int]: The IDCODE of each device, closest to TDO first. Devices without
+            an IDCODE register are reported as 0. Empty if TDO is stuck low.
+        """
+        self.reset()
+        bit_length = 32 * (max_devices + 1)
+        tdo = self.shift_dr(b"\xff" * (bit_length // 8), bit_length, read=True)
+        value = int.from_bytes(tdo, "little")
+
+        idcodes = []
+        position = 0
+        while len(idcodes) < max_devices and position < bit_length:
+            if not value >> position:
+                # No fill bit came back, TDO is stuck low after the chain
+                break
+            if (value >> position) & 1:
+                idcode = (value >> position) & 0xFFFFFFFF
+                if idcode == 0xFFFFFFFF:
+                    # Our own fill pattern came back, end of chain
+                    break
+                idcodes.append(idcode)
+                position += 32
+            else:
+                idcodes.append(0)
+                position += 1
+        return idcodes
+
+    def chain_ir_length(self, max_bits=256) -> int:
+        """
+        Measure the total instruction register length of the scan chain.
+
+        Args:
+            max_bits (int): Upper bound for the total IR length (default is 256).
+
+        Returns:
+            int: The total IR length in bits, None if the chain is broken or longer than max_bits.
+        """
+        # Flush the chain with zeros, then count how long the first one takes to come out
+        data = (((1 << max_bits) - 1) << max_bits).to_bytes(
+            (2 * max_bits + 7) // 8, "little"
+        )
+        tdo = self.shift_ir(data, 2 * max_bits, read=True)
+        value = int.from_bytes(tdo, "little") >> max_bits
+        if value == 0:
+            return None
+        return (value & -value).bit_length() - 1
+
+    def _queue_tms(self, bits, count):
+        self._tms_bits |= bits << self._tms_count
+        self._tms_count += count
+
+    def _flush_tms(self):
+        max_bits = self.BUFFER_SIZE * 8
+        while self._tms_count:
+            count = min(self._tms_count, max_bits)
+            bits = self._tms_bits & ((1 << count) - 1)
+            if not self.driver.jtag_tms_change(
+                bits.to_bytes((count + 7) // 8, "little"), count, 0
+            ):
+                self._tms_bits = 0
+                self._tms_count = 0
+                self.state = None
+                raise RuntimeError("CH347Jtag_TmsChange failed")
+            self._tms_bits >>= count
+            self._tms_count -= count
+
+    def _shift(self, is_dr, data, bit_length, read, end_state):
+        data = bytes(data)
+        if bit_length is None:
+            bit_length = len(data) * 8
+        bits = int.from_bytes(data, "little") & ((1 << bit_length) - 1)
+
+        pending = self._pending
+        if pending is not None and pending[0] != is_dr:
+            self._complete_pending()
+            pending = None
+        if pending is None:
+            if self.state is None:
+                self.reset()
+            pending = [is_dr, 0, 0, False, 0, 0, False]
+            self._pending = pending
+
+        # Merge the new piece into the held scan
+        pending[1] |= bits << pending[2]
+        pending[2] += bit_length
+        pending[3] = pending[3] or read
+
+        shift_state = TapState.SHIFT_DR if is_dr else TapState.SHIFT_IR
+        if end_state == shift_state:
+            self._drain(pending)
+            return None
+        return self._complete(end_state)
+
+    def _complete_pending(self):
+        if self._pending is None:
+            return None
+        return self._complete(None)
+
+    def _drain(self, pending):
+        # Send whole buffers of a continued scan while keeping at least one bit
+        # back, the last bit has to be clocked with TMS high.
+        max_bits = self.BUFFER_SIZE * 8
+        if pending[2] <= max_bits:
+            return
+        self._enter_shift(pending)
+        while pending[2] > max_bits:
+            chunk = pending[1] & ((1 << max_bits) - 1)
+            tdo = self.driver.jtag_io_scan_t(
+                chunk.to_bytes(self.BUFFER_SIZE, "little"), max_bits, pending[3], False
+            )
+            self._check_scan(tdo, "CH347Jtag_IoScanT")
+            self._append_tdo(pending, tdo, max_bits)
+            pending[1] >>= max_bits
+            pending[2] -= max_bits
+
+    def _complete(self, end_state):
+        pending = self._pending
+        self._pending = None
+        is_dr, bits, bit_length, read = pending[:4]
+        byte_length = (bit_length + 7) // 8
+
+        if (
+            not pending[6]
+            and end_state == TapState.RUN_TEST_IDLE
+            and bit_length <= self.BUFFER_SIZE * 8
+            and self.state in self._FAST_START_STATES
+        ):
+            # Run-Test -> Shift -> Exit1 -> Update -> Run-Test in one call
+            if self.state != TapState.RUN_TEST_IDLE:
+                self.goto_state(TapState.RUN_TEST_IDLE)
+            self._flush_tms()
+            tdo = self.driver.jtag_write_read_fast(
+                is_dr, bits.to_bytes(byte_length, "little"), bit_length
+            )
+            self._check_scan(tdo, "CH347Jtag_WriteRead_Fast")
+            self.state = TapState.RUN_TEST_IDLE
+            return tdo if read else None
+
+        # A scan longer than the buffer goes out in buffer-sized pieces too
+        self._drain(pending)
+        bits, bit_length = pending[1], pending[2]
+        byte_length = (bit_length + 7) // 8
+        self._enter_shift(pending)
+        tdo = self.driver.jtag_io_scan_t(
+            bits.to_bytes(byte_length, "little"), bit_length, read, True
+        )
+        self._check_scan(tdo, "CH347Jtag_IoScanT")
+        self._append_tdo(pending, tdo, bit_length)
+        self.state = TapState.EXIT1_DR if is_dr else TapState.EXIT1_IR
+        if end_state is not None:
+            self.goto_state(end_state)
+
+        if not read:
+            return None
+        return pending[4].to_bytes((pending[5] + 7) // 8, "little")
+
+    def _enter_shift(self, pending):
+        if not pending[6]:
+            shift_state = TapState.SHIFT_DR if pending[0] else TapState.SHIFT_IR
+            bits, count = TMS_PATHS[self.state][shift_state]
+            self._queue_tms(bits, count)
+            self.state = shift_state
+            pending[6] = True
+        self._flush_tms()
+
+    def _check_scan(self, tdo, name):
+        if tdo is None:
+            self.state = None
+            raise RuntimeError(f"{name} failed")
+
+    @staticmethod
+    def _append_tdo(pending, tdo, bit_length):
+        # Pieces shifted before reading was requested read back as zeros
+        if tdo:
+            value = int.from_bytes(tdo, "little") & ((1 << bit_length) - 1)
+            pending[4] |= value << pending[5]
+        pending[5] += bit_length
@@ -0,0 +1,247 @@
+"""
+Live Module
+-----------
+
+The `ch347.live` module separates sensor acquisition from live display.
+
+An `Acquisition` samples a sensor on its own thread, as fast as the bus
+allows or at a fixed rate, into a `SampleRing`: a fixed-size NumPy buffer,
+so memory stays the same however long it runs. A plot, or anything else
+running at its own pace, asks the ring for the latest samples with
+`window(n)`. The ring keeps every sample twice, at its position and one
+capacity further, so the latest n samples are always one contiguous slice
+and `window` returns views without copying.
+
+Usage Example:
+--------------
+
+import matplotlib.animation as animation
+import matplotlib.pyplot as plt
+
+from ch347.live import Acquisition
+from i2c_devices.mpu6050 import MPU6050
+
+acquisition = Acquisition.mpu6050(MPU6050(), capacity=4096)
+acquisition.start()
+
+fig, ax = plt.subplots()
+lines = ax.plot([], [], [], [], [], [])
+
+def update(frame):
+    times, values = acquisition.ring.window(500)
+    for channel, line in enumerate(lines):
+        line.set_data(times, values[:, channel])
+    return lines
+
+ani = animation.FuncAnimation(fig, update, interval=50, blit=True)
+plt.show()
+acquisition.stop()
+"""
+
+import threading
+import time
+
+import numpy as np
+
+
+class SampleRing:
+    """
+    Fixed-size ring of timestamped multi-channel samples for one producer.
+
+    Attributes:
+        capacity (int): Number of samples kept.
+        channels (int): Values per sample.
+        count (int): Number of samples appended since creation.
+    """
+
+    def __init__(self, capacity, channels, dtype=np.float64):
+        """
+        Initialize the ring.
+
+        Args:
+            capacity (int): Number of samples kept.
+            channels (int): Values per sample.
+            dtype: NumPy dtype of the values (default is float64).
+        """
+        self.capacity = capacity
+        self.channels = channels
+        self._slots = capacity
+        # Every sample is stored twice so any window is contiguous
+        self._times = np.zeros(2 * capacity, dtype=np.int64)
+        self._values = np.zeros((2 * capacity, channels), dtype=dtype)
+        self.count = 0
+
+    def append(self, timestamp_ns, values):
+        """
+        Add a sample, replacing the oldest one when the ring is full.
+
+        Args:
+            timestamp_ns (int): Time of the sample.
+            values: One value per channel.
+        """
+        index = self.count % self._slots
+        mirror = index + self._slots
+        self._times[index] = self._times[mirror] = timestamp_ns
+        self._values[index] = values
+        self._values[mirror] = self._values[index]
+        # Publish the sample after it is stored
+        self.count += 1
+
+    def window(self, n=None) -> tuple:
+        """
+        The latest samples, oldest first, as views into the ring.
+
+        The views stay valid until the producer has appended capacity - n
+        more samples; copy them to keep them longer.
+
+        Args:
+            n (int, optional): Number of samples, by default all that are kept.
+
+        Returns:
+            tuple: (timestamps_ns, values) arrays of up to n samples.
+        """
+        count = self.count
+        n = min(self.capacity if n is None else n, count, self.capacity)
+        end = count % self._slots + self._slots
+        return self._times[end - n : end], self._values[end - n : end]
+
+    def snapshot(self, n=None) -> tuple:
+        """
+        Like window(), but copies.
+        """
+        times, values = self.window(n)
+        return times.copy(), values.copy()
+
+    def clear(self):
+        self.count = 0
+
+
+class Acquisition:
+    """
+    Background sampling of a sensor into a SampleRing.
+
+    Attributes:
+        ring (SampleRing): The samples.
+        failures (int): Number of reads that failed.
+    """
+
+    def __init__(self, read, channels, capacity=4096, rate_hz=None, ring=None):
+        """
+        Initialize the acquisition.
+
+        Args:
+            read (callable): Returns one value per channel; raises RuntimeError
+                             or returns None when a read fails.
+            channels (int): Values per sample.
+            capacity (int): Samples kept in the ring (default is 4096).
+            rate_hz (float, optional): Sampling rate, None samples as fast as possible.
+            ring (SampleRing, optional): Where the samples go, for example a
+                                         SamplePublisher, by default a new SampleRing.
+        """
+        self.read = read
+        self.ring = ring if ring is not None else SampleRing(capacity, channels)
+        self.rate_hz = rate_hz
+        self.failures = 0
+        self._thread = None
+        self._running = False
+
+    @classmethod
+    def ina226(cls, sensor, **kwargs):
+        """
+        Sample bus voltage (mV), current (uA) and power (mW) of an INA226.
+        """
+
+        def read():
+            return sensor.get_bus_voltage(), sensor.get_current(), sensor.get_power()
+
+        return cls(read, 3, **kwargs)
+
+    @classmethod
+    def mpu6050(cls, mpu, **kwargs):
+        """
+        Sample acceleration (g) and rotation (deg/s) X, Y and Z of an MPU-6050.
+        """
+
+        def read():
+            accel, gyro, _ = mpu.get_all_data()
+            scale = 1 / mpu.GRAVITIY_MS2
+            return (
+                accel["x"] * scale,
+                accel["y"] * scale,
+                accel["z"] * scale,
+                gyro["x"],
+                gyro["y"],
+                gyro["z"],
+            )
+
+        return cls(read, 6, **kwargs)
+
+    def _run(self):
+        ring = self.ring
+        read = self.read
+        period = 1 / self.rate_hz if self.rate_hz else 0
+        deadline = time.perf_counter()
+        while self._running:
+            try:
+                values = read()
+            except RuntimeError:
+                values = None
+            if values is None:
+                self.failures += 1
+            else:
+                ring.append(time.perf_counter_ns(), values)
+            if period:
+                deadline += period
+                delay = deadline - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    # Behind schedule: skip the missed slots instead of bursting
+                    deadline = time.perf_counter()
+
+    def start(self):
+        """
+        Start sampling in a background thread.
+        """
+        if self._thread is not None:
+            raise RuntimeError("acquisition already running")
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the sampling thread.
+        """
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def rate(self, n=None) -> float:
+        """
+        Measured sampling rate over the latest samples.
+
+        Args:
+            n (int, optional): Number of samples to measure over, by default all kept.
+
+        Returns:
+            float: Samples per second, 0 with fewer than two samples.
+        """
+        times, _ = self.window(n)
+        if len(times) < 2 or times[-1] == times[0]:
+            return 0.0
+        return (len(times) - 1) * 1e9 / (times[-1] - times[0])
+
+    def window(self, n=None) -> tuple:
+        """
+        The latest samples, see SampleRing.window().
+        """
+        return self.ring.window(n)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,753 @@
+"""
+Record Module
+-------------
+
+The `ch347.record` module records the bus traffic of a CH347 to a binary log
+and serves it back later, so field issues can be reproduced and drivers
+tested without the hardware.
+
+`Recorder.attach(driver)` puts a recording proxy in front of the driver's
+DLL object, like `ch347.instrument` does. Every DLL call is logged with its
+operation, device index, integer arguments (chip select, lengths, EEPROM
+type, ...), the contents of the buffers it reads, the contents of the
+buffers it writes, its result and its start time and duration.
+
+`ReplayCH347` is a library object for `CH347(dll_path=...)` that answers the
+calls from a log in order. It writes the recorded output buffers, returns
+the recorded results, and with `strict=True` raises `ReplayError` when the
+driver does not issue the recorded calls with the recorded data. Calls are
+answered at once, or paced like the recording with `speed`.
+
+Interrupt and device notification callbacks are logged as calls, but they
+are not invoked on replay.
+
+Log format:
+-----------
+
+The file starts with the 16 byte header b"CH347LOG", a little endian u16
+version and 6 reserved bytes. It is followed by records, each a u32 length
+and a body of that length, so a log can be appended to at any time and read
+through mmap. The first body byte is the record type:
+
+- SESSION: u64 wall clock start in ns. Starts a new recording session;
+  operation codes and call times are relative to the session.
+- OPERATION: u16 operation code and the DLL function name in UTF-8.
+- CALL: u16 operation, u32 device index, u64 start in ns, u64 duration in
+  ns, the result, the arguments and the output buffers.
+
+Usage Example:
+--------------
+
+from ch347 import CH347
+from ch347.record import Recorder, ReplayCH347
+from i2c_devices.mpu6050 import MPU6050
+
+driver = CH347()
+with Recorder("mpu6050.ch347log") as recorder:
+    recorder.attach(driver)
+    MPU6050(driver=driver).get_all_data()
+
+replayed = MPU6050(driver=CH347(dll_path=ReplayCH347("mpu6050.ch347log")))
+print(replayed.get_all_data())
+"""
+
+import ctypes
+import mmap
+import os
+import struct
+import threading
+import time
+
+from .dll_proxy import DLLProxy, ProxyFunction, argument_value
+
+MAGIC = b"CH347LOG"
+VERSION = 1
+
+_HEADER = struct.Struct("<8sH6x")
+_LENGTH = struct.Struct("<I")
+_SESSION = struct.Struct("<BQ")
+_OPERATION = struct.Struct("<BH")
+_CALL = struct.Struct("<BHIQQBQB")
+_OUTPUT = struct.Struct("<BI")
+
+RECORD_SESSION = 1
+RECORD_OPERATION = 2
+RECORD_CALL = 3
+
+# Value tags of results and arguments
+_NONE = 0
+_FALSE = 1
+_TRUE = 2
+_INTEGER = 3
+_NEGATIVE = 4
+_BUFFER = 5  # Pointer argument, its contents follow
+_OUT_BUFFER = 6  # Pointer argument the DLL only writes, its size follows
+_OPAQUE = 7  # Callbacks and other arguments that are not recorded
+
+
+def _bytes(position):
+    return lambda args: argument_value(args[position])
+
+
+def _bits(position):
+    return lambda args: (argument_value(args[position]) + 7) // 8
+
+
+# Pointer arguments the DLL writes to, by position, with the length of the
+# data it writes, None for the whole object
+OUTPUTS = {
+    "CH347GetDeviceInfor": {1: None},
+    "CH347GetVersion": {1: None, 2: None, 3: None, 4: None},
+    "CH347GetSerialNumber": {1: None},
+    "CH347ReadData": {1: _bytes(2), 2: None},
+    "CH347SPI_GetCfg": {1: None},
+    "CH347SPI_Read": {3: None, 4: _bytes(3)},
+    "CH347SPI_WriteRead": {3: _bytes(2)},
+    "CH347StreamSPI4": {3: _bytes(2)},
+    "CH347StreamI2C": {4: _bytes(3)},
+    "CH347StreamI2C_RetACK": {4: _bytes(3), 5: None},
+    "CH347ReadEEPROM": {4: _bytes(3)},
+    "CH347GPIO_Get": {1: None, 2: None},
+    "CH347ReadInter": {1: None},
+    "CH347Jtag_GetCfg": {1: None},
+    "CH347Jtag_IoScan": {1: _bits(2)},
+    "CH347Jtag_IoScanT": {1: _bits(2)},
+    "CH347Jtag_WriteRead": {4: None, 5: _bits(4)},
+    "CH347Jtag_WriteRead_Fast": {4: None, 5: _bits(4)},
+    "CH347Uart_Read": {1: _bytes(2), 2: None},
+    "CH347Uart_Write": {2: None},
+}
+
+# Output arguments whose contents the DLL reads as well
+INOUT = {
+    "CH347ReadData": (2,),
+    "CH347SPI_Read": (3, 4),
+    "CH347SPI_WriteRead": (3,),
+    "CH347StreamSPI4": (3,),
+    "CH347Jtag_IoScan": (1,),
+    "CH347Jtag_IoScanT": (1,),
+    "CH347Jtag_WriteRead": (4,),
+    "CH347Jtag_WriteRead_Fast": (4,),
+    "CH347Uart_Read": (2,),
+    "CH347Uart_Write": (2,),
+}
+
+
+# Calls whose first argument after the device index is the chip select
+SPI_TRANSFERS = (
+    "CH347SPI_Write",
+    "CH347SPI_Read",
+    "CH347SPI_WriteRead",
+    "CH347StreamSPI4",
+)
+
+
+class ReplayError(RuntimeError):
+    """
+    Raised when a replayed call does not match the log.
+
+    Attributes:
+        index (int): Position of the offending call in the log.
+    """
+
+    def __init__(self, message, index=None):
+        if index is not None:
+            message = f"{message} (call {index})"
+        super().__init__(message)
+        self.index = index
+
+
+def _pointee(argument):
+    # The ctypes object behind a pointer argument, None for other arguments
+    target = getattr(argument, "_obj", argument)
+    if isinstance(target, (ctypes.Array, ctypes.Structure, ctypes.Union)):
+        return target
+    if target is not argument and isinstance(target, ctypes._SimpleCData):
+        return target
+    return None
+
+
+def _contents(target, length=None) -> bytes:
+    size = ctypes.sizeof(target)
+    if length is not None:
+        size = max(0, min(size, length))
+    return ctypes.string_at(ctypes.addressof(target), size)
+
+
+def _pack_value(value) -> bytes:
+    if value is None:
+        return bytes([_NONE]) + bytes(8)
+    if value is True or value is False:
+        return bytes([_TRUE if value else _FALSE]) + bytes(8)
+    value = int(value)
+    if value < 0:
+        return struct.pack("<BQ", _NEGATIVE, -value)
+    return struct.pack("<BQ", _INTEGER, value & 0xFFFFFFFFFFFFFFFF)
+
+
+def _unpack_value(tag, value):
+    if tag == _NONE:
+        return None
+    if tag in (_FALSE, _TRUE):
+        return tag == _TRUE
+    return -value if tag == _NEGATIVE else value
+
+
+class OutputBuffer:
+    """
+    Placeholder of a pointer argument whose contents were not recorded.
+
+    Attributes:
+        size (int): Size of the pointed-to object in bytes.
+    """
+
+    __slots__ = ("size",)
+
+    def __init__(self, size):
+        self.size = size
+
+    def __eq__(self, other):
+        return isinstance(other, OutputBuffer) and other.size == self.size
+
+    def __repr__(self):
+        return f"OutputBuffer({self.size})"
+
+
+class Opaque:
+    """
+    Placeholder of an argument that is not recorded, such as a callback.
+    """
+
+    __slots__ = ()
+
+    def __eq__(self, other):
+        return isinstance(other, Opaque)
+
+    def __repr__(self):
+        return "Opaque()"
+
+
+class Transaction:
+    """
+    One logged DLL call.
+
+    Attributes:
+        operation (str): DLL function name.
+        device (int): Device index.
+        timestamp_ns (int): Wall clock start of the call in ns since the epoch.
+        start_ns (int): Start of the call in ns since the start of its session.
+        duration_ns (int): Duration of the call in ns.
+        result: Return value; bool, int or None.
+        arguments (list): Arguments after the device index: int, None, bytes
+                          for recorded buffers, OutputBuffer or Opaque.
+        outputs (dict): Argument position to the bytes the DLL wrote there.
+        session (int): Number of the recording session, counting from 0.
+    """
+
+    __slots__ = (
+        "operation",
+        "device",
+        "timestamp_ns",
+        "start_ns",
+        "duration_ns",
+        "result",
+        "arguments",
+        "outputs",
+        "session",
+    )
+
+    def __init__(
+        self,
+        operation,
+        device,
+        timestamp_ns,
+        start_ns,
+        duration_ns,
+        result,
+        arguments,
+        outputs,
+        session,
+    ):
+        self.operation = operation
+        self.device = device
+        self.timestamp_ns = timestamp_ns
+        self.start_ns = start_ns
+        self.duration_ns = duration_ns
+        self.result = result
+        self.arguments = arguments
+        self.outputs = outputs
+        self.session = session
+
+    @property
+    def target(self):
+        """
+        The chip select of SPI calls or the 7-bit address of I2C calls, else None.
+        """
+        if self.operation in SPI_TRANSFERS:
+            return self.arguments[0]
+        if self.operation.startswith("CH347StreamI2C"):
+            write = self.arguments[1] if len(self.arguments) > 1 else None
+            if isinstance(write, bytes) and write and self.arguments[0]:
+                return write[0] >> 1
+        return None
+
+    def __repr__(self):
+        return (
+            f"Transaction({self.operation}, device={self.device}, "
+            f"start_ns={self.start_ns}, result={self.result!r})"
+        )
+
+
+class Recorder:
+    """
+    Writes the DLL calls of attached CH347 drivers to a log file.
+
+    Attributes:
+        path (str): The log file.
+        calls (int): Number of calls recorded.
+    """
+
+    def __init__(self, path, flush=False):
+        """
+        Open a log for appending and start a new session in it.
+
+        Args:
+            path (str): Log file; created when missing.
+            flush (bool): Flush every call to the OS, so the log survives a crash
+                          of the process (default is False).
+        """
+        self.path = path
+        self.flush = flush
+        self.calls = 0
+        self.lock = threading.Lock()
+        self.operations = {}
+        self.file = open(path, "ab")
+        if self.file.tell() == 0:
+            self.file.write(_HEADER.pack(MAGIC, VERSION))
+        else:
+            with open(path, "rb") as existing:
+                _check_header(existing.read(_HEADER.size))
+        self.started = time.perf_counter_ns()
+        self._write(_SESSION.pack(RECORD_SESSION, time.time_ns()))
+
+    def attach(self, driver):
+        """
+        Start recording the DLL calls of a CH347 driver.
+
+        Args:
+            driver (CH347): The driver to record.
+        """
+        if not isinstance(driver.ch347dll, RecordingDLL):
+            driver.ch347dll = RecordingDLL(driver.ch347dll, self)
+
+    @staticmethod
+    def detach(driver):
+        """
+        Stop recording the DLL calls of a CH347 driver.
+
+        Args:
+            driver (CH347): The recorded driver.
+        """
+        if isinstance(driver.ch347dll, RecordingDLL):
+            driver.ch347dll = driver.ch347dll.dll
+
+    def capture_inputs(self, operation, args) -> list:
+        """
+        Encode the arguments of a call before it runs.
+
+        Returns:
+            list: Encoded arguments after the device index.
+        """
+        outputs = OUTPUTS.get(operation)
+        inout = INOUT.get(operation, ())
+        encoded = []
+        for position, argument in enumerate(args[1:], 1):
+            if isinstance(argument, ctypes._CFuncPtr):
+                encoded.append(bytes([_OPAQUE]))
+                continue
+            target = _pointee(argument)
+            if target is not None:
+                if (
+                    outputs is not None
+                    and position in outputs
+                    and position not in inout
+                ):
+                    encoded.append(
+                        struct.pack("<BI", _OUT_BUFFER, ctypes.sizeof(target))
+                    )
+                else:
+                    data = _contents(target)
+                    encoded.append(struct.pack("<BI", _BUFFER, len(data)) + data)
+            elif isinstance(argument, (bytes, bytearray)):
+                encoded.append(
+                    struct.pack("<BI", _BUFFER, len(argument)) + bytes(argument)
+                )
+            elif argument is None or isinstance(argument, int):
+                encoded.append(_pack_value(argument))
+            elif isinstance(argument, ctypes._SimpleCData) and isinstance(
+                argument.value, int
+            ):
+                encoded.append(_pack_value(argument.value))
+            else:
+                encoded.append(bytes([_OPAQUE]))
+        return encoded
+
+    def record(self, operation, args, inputs, result, start_ns, duration_ns):
+        """
+        Append a finished call to the log.
+
+        Args:
+            operation (str): DLL function name.
+            args (tuple): The call arguments, read again for the outputs.
+            inputs (list): Output of capture_inputs() taken before the call.
+            result: Return value of the call.
+            start_ns (int): perf_counter_ns() at the start of the call.
+            duration_ns (int): Duration of the call in ns.
+        """
+        outputs = OUTPUTS.get(operation)
+        written = []
+        for position, argument in enumerate(args[1:], 1):
+            if outputs is not None and position not in outputs:
+                continue
+            target = _pointee(argument)
+            if target is None:
+                continue
+            length = outputs[position] if outputs is not None else None
+            try:
+                data = _contents(target, length(args) if length else None)
+            except (IndexError, TypeError):
+                data = _contents(target)
+            written.append(_OUTPUT.pack(position, len(data)) + data)
+
+        device = argument_value(args[0]) & 0xFFFFFFFF if args else 0xFFFFFFFF
+        result_tag, result_value = struct.unpack("<BQ", _pack_value(result))
+        with self.lock:
+            code = self.operations.get(operation)
+            if code is None:
+                code = self.operations[operation] = len(self.operations)
+                self._write(
+                    _OPERATION.pack(RECORD_OPERATION, code) + operation.encode()
+                )
+            self._write(
+                _CALL.pack(
+                    RECORD_CALL,
+                    code,
+                    device,
+                    max(0, start_ns - self.started),
+                    duration_ns,
+                    result_tag,
+                    result_value,
+                    len(inputs),
+                )
+                + b"".join(inputs)
+                + bytes([len(written)])
+                + b"".join(written)
+            )
+            self.calls += 1
+            if self.flush:
+                self.file.flush()
+
+    def _write(self, body):
+        self.file.write(_LENGTH.pack(len(body)) + body)
+
+    def close(self):
+        with self.lock:
+            if not self.file.closed:
+                self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class RecordingDLL(DLLProxy):
+    """
+    Stand-in for the CH347 DLL object that logs every function call.
+    """
+
+    def __init__(self, dll, recorder):
+        super().__init__(dll)
+        self.recorder = recorder
+
+    def wrap(self, name, function):
+        return RecordingFunction(name, function, self)
+
+
+class RecordingFunction(ProxyFunction):
+    """
+    Logging wrapper of a single DLL function.
+    """
+
+    def __call__(self, *args):
+        recorder = self.owner.recorder
+        # Buffers the DLL reads and writes must be copied before the call
+        inputs = recorder.capture_inputs(self.name, args)
+        start = time.perf_counter_ns()
+        result = self.function(*args)
+        elapsed = time.perf_counter_ns() - start
+        recorder.record(self.name, args, inputs, result, start, elapsed)
+        return result
+
+
+def _check_header(header):
+    if len(header) < _HEADER.size:
+        raise ValueError("Not a CH347 log: file too short")
+    magic, version = _HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ValueError("Not a CH347 log: bad magic")
+    if version != VERSION:
+        raise ValueError(f"Unsupported CH347 log version: {version}")
+
+
+class TransactionLog:
+    """
+    Memory-mapped reader of a log written by Recorder.
+
+    A record cut short at the end of the file, as left by a crashed
+    recorder, ends the log.
+    """
+
+    def __init__(self, path):
+        """
+        Open a log.
+
+        Args:
+            path (str): The log file.
+        """
+        self.path = path
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        _check_header(self.file.read(_HEADER.size))
+        self.map = (
+            mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            if size > _HEADER.size
+            else b""
+        )
+        self._offsets = None
+
+    def _records(self):
+        data = self.map
+        position = _HEADER.size
+        end = len(data)
+        while position + _LENGTH.size <= end:
+            (length,) = _LENGTH.unpack_from(data, position)
+            body = position + _LENGTH.size
+            if body + length > end:
+                break
+            yield position, body, length
+            position = body + length
+
+    def __iter__(self):
+        data = self.map
+        names = {}
+        session = -1
+        epoch = 0
+        for _, body, length in self._records():
+            kind = data[body]
+            if kind == RECORD_SESSION:
+                _, epoch = _SESSION.unpack_from(data, body)
+                session += 1
+                names = {}
+            elif kind == RECORD_OPERATION:
+                _, code = _OPERATION.unpack_from(data, body)
+                names[code] = bytes(
+                    data[body + _OPERATION.size : body + length]
+                ).decode()
+            elif kind == RECORD_CALL:
+                yield self._call(data, body, names, session, epoch)
+
+    def _call(self, data, position, names, session, epoch):
+        (
+            _,
+            code,
+            device,
+            start_ns,
+            duration_ns,
+            result_tag,
+            result_value,
+            count,
+        ) = _CALL.unpack_from(data, position)
+        position += _CALL.size
+        arguments = []
+        for _ in range(count):
+            tag = data[position]
+            if tag == _BUFFER:
+                (size,) = _LENGTH.unpack_from(data, position + 1)
+                position += 5
+                arguments.append(bytes(data[position : position + size]))
+                position += size
+            elif tag == _OUT_BUFFER:
+                (size,) = _LENGTH.unpack_from(data, position + 1)
+                arguments.append(OutputBuffer(size))
+                position += 5
+            elif tag == _OPAQUE:
+                arguments.append(Opaque())
+                position += 1
+            else:
+                (value,) = struct.unpack_from("<Q", data, position + 1)
+                arguments.append(_unpack_value(tag, value))
+                position += 9
+        outputs = {}
+        count = data[position]
+        position += 1
+        for _ in range(count):
+            index, size = _OUTPUT.unpack_from(data, position)
+            position += _OUTPUT.size
+            outputs[index] = bytes(data[position : position + size])
+            position += size
+        return Transaction(
+            names[code],
+            device,
+            epoch + start_ns,
+            start_ns,
+            duration_ns,
+            _unpack_value(result_tag, result_value),
+            arguments,
+            outputs,
+            session,
+        )
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def close(self):
+        if isinstance(self.map, mmap.mmap):
+            self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class _ReplayFunction:
+    # Accepts argtypes and restype like a ctypes function
+
+    argtypes = None
+    restype = None
+
+    def __init__(self, replay, name):
+        self.replay = replay
+        self.__name__ = name
+
+    def __call__(self, *args):
+        return self.replay.call(self.__name__, args)
+
+
+class ReplayCH347:
+    """
+    CH347 library object that answers calls from a recorded log.
+
+    Pass an instance as `dll_path` to `CH347` to use it.
+
+    Attributes:
+        position (int): Number of calls replayed.
+    """
+
+    def __init__(self, log, speed=None, strict=True):
+        """
+        Load a log for replay.
+
+        Args:
+            log (str or TransactionLog): The log, or the path of the log file.
+            speed (float, optional): Pace of the replay relative to the recording,
+                1.0 for recorded speed; None answers at once (default).
+            strict (bool): Raise ReplayError when the arguments of a call, including
+                the data it sends, differ from the log (default is True). Otherwise
+                only the operation has to match.
+        """
+        if isinstance(log, TransactionLog):
+            self.transactions = list(log)
+        else:
+            with TransactionLog(log) as opened:
+                self.transactions = list(opened)
+        self.speed = speed
+        self.strict = strict
+        self.position = 0
+        self.lock = threading.Lock()
+        self._session = None
+        self._anchor = 0
+
+    def __getattr__(self, name):
+        if not name.startswith("CH347"):
+            raise AttributeError(name)
+        function = _ReplayFunction(self, name)
+        setattr(self, name, function)
+        return function
+
+    @property
+    def remaining(self) -> int:
+        return len(self.transactions) - self.position
+
+    def call(self, operation, args):
+        with self.lock:
+            index = self.position
+            if index >= len(self.transactions):
+                raise ReplayError(f"{operation}: the log has no more calls", index)
+            transaction = self.transactions[index]
+            if transaction.operation != operation:
+                raise ReplayError(
+                    f"{operation} called, log has {transaction.operation}", index
+                )
+            if self.strict:
+                self._check(transaction, args, index)
+            self.position += 1
+            self._pace(transaction)
+
+        for position, data in transaction.outputs.items():
+            target = _pointee(args[position]) if position < len(args) else None
+            if target is not None:
+                ctypes.memmove(
+                    ctypes.addressof(target),
+                    data,
+                    min(len(data), ctypes.sizeof(target)),
+                )
+        return transaction.result
+
+    def _check(self, transaction, args, index):
+        if len(args) - 1 != len(transaction.arguments):
+            raise ReplayError(
+                f"{transaction.operation}: {len(args) - 1} arguments, "
+                f"log has {len(transaction.arguments)}",
+                index,
+            )
+        for position, (argument, recorded) in enumerate(
+            zip(args[1:], transaction.arguments), 1
+        ):
+            if isinstance(recorded, Opaque):
+                continue
+            target = _pointee(argument)
+            if isinstance(recorded, OutputBuffer):
+                actual = (
+                    OutputBuffer(ctypes.sizeof(target)) if target is not None else None
+                )
+            elif isinstance(recorded, bytes):
+                actual = _contents(target) if target is not None else argument
+                actual = bytes(actual) if actual is not None else None
+            elif isinstance(argument, ctypes._SimpleCData):
+                actual = argument.value
+            else:
+                actual = argument
+            if actual != recorded:
+                raise ReplayError(
+                    f"{transaction.operation}: argument {position} is {actual!r}, "
+                    f"log has {recorded!r}",
+                    index,
+                )
+
+    def _pace(self, transaction):
+        if not self.speed:
+            return
+        if transaction.session != self._session:
+            self._session = transaction.session
+            self._anchor = time.perf_counter_ns() - transaction.start_ns / self.speed
+        due = (
+            self._anchor + (transaction.start_ns + transaction.duration_ns) / self.speed
+        )
+        delay = (due - time.perf_counter_ns()) / 1e9
+        if delay > 0:
+            time.sleep(delay)
@@ -0,0 +1,339 @@
+"""
+Sample Bus Module
+-----------------
+
+The `ch347.sample_bus` module shares the samples of one acquisition process
+with any number of consumer processes, without pickling or copying them.
+
+A `SamplePublisher` is a `SampleRing` whose storage is a named
+`multiprocessing.shared_memory` block: a small header holding the layout
+and the sample count, followed by the timestamp and value arrays. It has a
+single writer and takes no locks: the header holds two sequence numbers,
+the number of samples published and the number being written. A write
+advances the second before it stores samples and the first after, so a
+reader can tell which samples are complete and which are being replaced.
+A `SampleSubscriber` attaches to the block by name and keeps its own read
+position, so adding consumers adds no work for the publisher. `read()`
+returns the samples published since the previous call as NumPy views into
+the shared block. A consumer that falls more than a ring behind loses the
+overwritten samples; this is counted in `lost` instead of being returned as
+corrupt data.
+
+Usage Example:
+--------------
+
+# Acquisition process
+from ch347.live import Acquisition
+from ch347.sample_bus import SamplePublisher
+
+with SamplePublisher(6, capacity=8192, name="imu") as publisher:
+    with Acquisition.mpu6050(MPU6050(), ring=publisher):
+        run_forever()
+
+# Any other process
+from ch347.sample_bus import SampleSubscriber
+
+with SampleSubscriber("imu") as subscriber:
+    while True:
+        times, values = subscriber.read()
+        log(times, values)
+        if not subscriber.intact():
+            print("samples were overwritten while they were used")
+"""
+
+import struct
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .live import SampleRing
+
+MAGIC = b"CH347BUS"
+VERSION = 1
+
+# magic, version, slots, channels, value dtype; the sequence numbers follow
+_HEADER = struct.Struct("<8sIII16s")
+SEQUENCE_OFFSET = 40
+HEADER_SIZE = 64
+
+
+def _layout(slots, channels, dtype):
+    # Sizes of the mirrored timestamp and value arrays
+    times = 2 * slots * 8
+    values = 2 * slots * channels * dtype.itemsize
+    return times, values
+
+
+def _arrays(buffer, slots, channels, dtype):
+    times_size, values_size = _layout(slots, channels, dtype)
+    # Published and written sample counts
+    sequence = np.ndarray((2,), dtype="<i8", buffer=buffer, offset=SEQUENCE_OFFSET)
+    times = np.ndarray((2 * slots,), dtype=np.int64, buffer=buffer, offset=HEADER_SIZE)
+    values = np.ndarray(
+        (2 * slots, channels),
+        dtype=dtype,
+        buffer=buffer,
+        offset=HEADER_SIZE + times_size,
+    )
+    return sequence, times, values
+
+
+def _attach(name):
+    # Only the creator owns the block: keep the resource tracker of an
+    # attaching process from unlinking it when that process exits
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass
+    # Before Python 3.13 attaching registers the block too. Processes started
+    # by multiprocessing share the creator's tracker, where the registration
+    # is the creator's own; only a tracker of a process's own may forget it.
+    from multiprocessing import resource_tracker
+
+    tracker = getattr(resource_tracker, "_resource_tracker", None)
+    shared = getattr(tracker, "_fd", None) is not None
+    memory = shared_memory.SharedMemory(name=name)
+    if not shared:
+        resource_tracker.unregister(memory._name, "shared_memory")
+    return memory
+
+
+class SamplePublisher(SampleRing):
+    """
+    SampleRing in named shared memory, written by a single producer.
+
+    It can be passed as the ring of an `Acquisition`, or filled directly
+    with `append` and `append_block`.
+
+    Attributes:
+        name (str): Name of the shared memory block subscribers attach to.
+        capacity (int): Number of samples kept.
+        channels (int): Values per sample.
+        count (int): Number of samples published since creation.
+    """
+
+    def __init__(self, channels, capacity=4096, dtype=np.float64, name=None):
+        """
+        Create the shared memory block.
+
+        Args:
+            channels (int): Values per sample.
+            capacity (int): Number of samples kept (default is 4096).
+            dtype: NumPy dtype of the values (default is float64).
+            name (str, optional): Name of the block, by default a unique name.
+        """
+        dtype = np.dtype(dtype)
+        # One spare slot holds the sample being written, so subscribers can
+        # always read capacity samples that are not being changed
+        slots = capacity + 1
+        times_size, values_size = _layout(slots, channels, dtype)
+        self.memory = shared_memory.SharedMemory(
+            name=name, create=True, size=HEADER_SIZE + times_size + values_size
+        )
+        self.name = self.memory.name
+        _HEADER.pack_into(
+            self.memory.buf, 0, MAGIC, VERSION, slots, channels, dtype.str.encode()
+        )
+        self._sequence, times, values = _arrays(self.memory.buf, slots, channels, dtype)
+        self._sequence[:] = 0
+        self.capacity = capacity
+        self.channels = channels
+        self._slots = slots
+        self._times = times
+        self._values = values
+
+    @property
+    def count(self) -> int:
+        return int(self._sequence[0])
+
+    @count.setter
+    def count(self, value):
+        self._sequence[0] = value
+
+    def append(self, timestamp_ns, values):
+        """
+        Add a sample and publish it.
+
+        Args:
+            timestamp_ns (int): Time of the sample.
+            values: One value per channel.
+        """
+        self._sequence[1] = self._sequence[0] + 1
+        super().append(timestamp_ns, values)
+
+    def append_block(self, timestamps_ns, values):
+        """
+        Add several samples and publish them together.
+
+        Args:
+            timestamps_ns (array): Times of the samples.
+            values (array): samples x channels values.
+        """
+        timestamps_ns = np.asarray(timestamps_ns)
+        values = np.asarray(values)
+        slots = self._slots
+        count = self.count
+        self._sequence[1] = count + len(timestamps_ns)
+        # Blocks longer than the ring only leave their tail
+        skip = max(0, len(timestamps_ns) - (slots - 1))
+        done = skip
+        while done < len(timestamps_ns):
+            index = (count + done) % slots
+            take = min(len(timestamps_ns) - done, slots - index)
+            for start in (index, index + slots):
+                self._times[start : start + take] = timestamps_ns[done : done + take]
+                self._values[start : start + take] = values[done : done + take]
+            done += take
+        self.count = count + len(timestamps_ns)
+
+    def close(self):
+        """
+        Detach from the shared memory block and remove it.
+
+        Subscribers that are still attached keep their mapping.
+        """
+        if self.memory is None:
+            return
+        # The arrays export the buffer and have to go before it is closed
+        self._sequence = self._times = self._values = None
+        self.memory.close()
+        self.memory.unlink()
+        self.memory = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class SampleSubscriber:
+    """
+    Reader of a SamplePublisher, possibly in another process.
+
+    Attributes:
+        name (str): Name of the shared memory block.
+        capacity (int): Number of samples the publisher keeps readable.
+        channels (int): Values per sample.
+        position (int): Sequence number of the next sample to read.
+        lost (int): Number of samples overwritten before they were read.
+        overruns (int): Number of reads that found samples lost.
+    """
+
+    def __init__(self, name, from_start=False):
+        """
+        Attach to a publisher.
+
+        Args:
+            name (str): Name of the publisher's shared memory block.
+            from_start (bool): Read the samples already kept by the publisher,
+                               instead of only those published from now on
+                               (default is False).
+        """
+        self.memory = _attach(name)
+        self.name = name
+        magic, version, slots, channels, dtype = _HEADER.unpack_from(self.memory.buf, 0)
+        if magic != MAGIC:
+            self.memory.close()
+            raise ValueError(f"{name} is not a CH347 sample bus")
+        if version != VERSION:
+            self.memory.close()
+            raise ValueError(f"Unsupported CH347 sample bus version: {version}")
+        self._slots = slots
+        self.capacity = slots - 1
+        self.channels = channels
+        self.dtype = np.dtype(dtype.rstrip(b"\0").decode())
+        self._sequence, self._times, self._values = _arrays(
+            self.memory.buf, slots, channels, self.dtype
+        )
+        count = self.count
+        self.position = self._oldest(count) if from_start else count
+        self.lost = 0
+        self.overruns = 0
+        self._start = self.position
+
+    @property
+    def count(self) -> int:
+        """
+        Number of samples published so far.
+        """
+        return int(self._sequence[0])
+
+    def _oldest(self, count) -> int:
+        # First sample that is complete and not being replaced, read after count
+        return max(0, count - self.capacity, int(self._sequence[1]) - self._slots)
+
+    def available(self) -> int:
+        """
+        Number of published samples not read yet, lost ones included.
+        """
+        return self.count - self.position
+
+    def read(self, max_samples=None) -> tuple:
+        """
+        Take the samples published since the previous read.
+
+        The views are into shared memory and stay valid until the publisher
+        has added capacity - n more samples; check with intact() after
+        using them, or copy them.
+
+        Args:
+            max_samples (int, optional): Most samples to take, by default all,
+                                         up to one ring.
+
+        Returns:
+            tuple: (timestamps_ns, values) arrays, empty when nothing is new.
+        """
+        count = self.count
+        position = self.position
+        oldest = self._oldest(count)
+        if position < oldest:
+            # Fell more than a ring behind: skip to the oldest intact sample
+            self.lost += oldest - position
+            self.overruns += 1
+            position = oldest
+        n = count - position
+        if max_samples is not None:
+            n = min(n, max_samples)
+        self._start = position
+        self.position = position + n
+        start = position % self._slots
+        return self._times[start : start + n], self._values[start : start + n]
+
+    def intact(self) -> bool:
+        """
+        Whether the samples of the last read are still unchanged.
+        """
+        return self._start >= int(self._sequence[1]) - self._slots
+
+    def window(self, n=None) -> tuple:
+        """
+        The latest samples, oldest first, without moving the read position.
+
+        Args:
+            n (int, optional): Number of samples, by default all that are kept.
+
+        Returns:
+            tuple: (timestamps_ns, values) arrays of up to n samples.
+        """
+        count = self.count
+        kept = count - self._oldest(count)
+        n = kept if n is None else min(n, kept)
+        end = count % self._slots + self._slots
+        return self._times[end - n : end], self._values[end - n : end]
+
+    def close(self):
+        """
+        Detach from the shared memory block.
+        """
+        if self.memory is None:
+            return
+        self._sequence = self._times = self._values = None
+        self.memory.close()
+        self.memory = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
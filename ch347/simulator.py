@@ -0,0 +1,1091 @@
+"""
+Simulator Module
+----------------
+
+The `ch347.simulator` module provides `SimulatedCH347`, a pure-Python stand-in
+for the CH347 DLL. It implements the entry points `CH347` binds and routes the
+bus traffic to virtual devices, so drivers and throughput features can run
+without hardware or Windows.
+
+Virtual devices:
+
+- `VirtualINA226`: current/power monitor with a conversion-ready ALERT output.
+- `VirtualMPU6050`: accelerometer/gyroscope with a data-ready INT output.
+- `VirtualEEPROM`: 24Cxx I2C EEPROM with page writes, also behind
+  `CH347ReadEEPROM`/`CH347WriteEEPROM`.
+- `VirtualSPIFlash`: SPI NOR flash with JEDEC ID, read, page program and erase.
+- `SPILoopback`: MOSI wired to MISO.
+
+A `LatencyModel` charges every call a fixed USB overhead plus the wire time
+of its payload at the configured I2C or SPI clock. The time is accumulated in
+`SimulatedCH347.elapsed` and optionally slept for real.
+
+Setting `SimulatedCH347.spi_max_hz` flips a bit in every SPI transfer
+clocked faster, like a board whose wiring does not carry the clock. On I2C,
+`SimulatedCH347.i2c_rise_limit` makes open-drain transfers above that SCL
+go unacknowledged, and devices with `stretch_above` set return corrupted
+reads when the host does not honour clock stretching.
+`SimulatedCH347.stall()` makes bus transfers hang until the USB timeout set
+with `CH347SetTimeout` expires and then fail, to exercise timeout handling.
+
+The JTAG entry points are not simulated.
+
+Usage Example:
+--------------
+
+from ch347 import CH347
+from ch347.simulator import LatencyModel, SimulatedCH347, VirtualINA226
+from i2c_devices.ina226 import INA226
+
+sim = SimulatedCH347(latency=LatencyModel(sleep=True))
+sim.attach_i2c(0x40, VirtualINA226(bus_voltage_mv=5000, current_ma=120))
+sensor = INA226(driver=CH347(dll_path=sim))
+print(sensor.get_bus_voltage())
+"""
+
+import ctypes
+import random
+import threading
+import time
+
+from .ch347 import DeviceInfo, SPIConfig
+
+
+def _int(value):
+    # Plain integers, ctypes scalars and ctypes.byref() of scalars
+    if isinstance(value, int):
+        return value
+    return getattr(value, "_obj", value).value
+
+
+def _address(buffer):
+    return ctypes.addressof(getattr(buffer, "_obj", buffer))
+
+
+def _load(buffer, length) -> bytes:
+    if not length:
+        return b""
+    return ctypes.string_at(_address(buffer), length)
+
+
+def _store(buffer, data):
+    if data:
+        ctypes.memmove(_address(buffer), bytes(data), len(data))
+
+
+def _set(reference, value):
+    getattr(reference, "_obj", reference).value = value
+
+
+class LatencyModel:
+    """
+    Cost of a simulated call: a fixed USB round trip plus the wire time of the payload.
+
+    Attributes:
+        call_overhead (float): Seconds charged per DLL call.
+        jitter (float): Maximum extra seconds added at random per call.
+        sleep (bool): Whether to actually sleep for the charged time.
+    """
+
+    def __init__(self, call_overhead=125e-6, jitter=0.0, sleep=False, seed=None):
+        """
+        Initialize the latency model.
+
+        Args:
+            call_overhead (float): Seconds per call (default is one USB 2.0 microframe).
+            jitter (float): Maximum random extra seconds per call (default is 0).
+            sleep (bool): Sleep for the charged time (default is False).
+            seed (int, optional): Seed of the jitter generator.
+        """
+        self.call_overhead = call_overhead
+        self.jitter = jitter
+        self.sleep = sleep
+        self.random = random.Random(seed)
+
+    def cost(self, wire_bits=0, bit_rate=None) -> float:
+        seconds = self.call_overhead
+        if wire_bits and bit_rate:
+            seconds += wire_bits / bit_rate
+        if self.jitter:
+            seconds += self.random.random() * self.jitter
+        return seconds
+
+    def wait(self, seconds):
+        if self.sleep and seconds > 0:
+            time.sleep(seconds)
+
+
+class I2CDevice:
+    """
+    Base class of virtual I2C devices.
+
+    A transfer addressed to the device calls `write` with the bytes after the
+    address byte, then `read` if the host reads. An `irq` callable, set by
+    `SimulatedCH347.wire_interrupt`, drives the device's interrupt output.
+    """
+
+    # Number of consecutive bus addresses the device answers to
+    address_span = 1
+
+    # Fastest SCL in Hz the device acknowledges, None for no limit
+    max_speed = None
+
+    # SCL in Hz above which the device stretches the clock on reads, None for never
+    stretch_above = None
+
+    def __init__(self):
+        self.irq = None
+        self.block = 0
+
+    def write(self, data):
+        pass
+
+    def read(self, length) -> bytes:
+        return bytes([0xFF] * length)
+
+    def interrupt(self, active):
+        if self.irq is not None:
+            self.irq(active)
+
+
+class VirtualINA226(I2CDevice):
+    """
+    Virtual INA226 with 16-bit big-endian registers.
+
+    The measurement registers are derived from the bus voltage and current set
+    on the model, using the calibration register like the real part.
+    """
+
+    CONFIG_REG = 0x00
+    SHUNT_VOLTAGE_REG = 0x01
+    BUS_VOLTAGE_REG = 0x02
+    POWER_REG = 0x03
+    CURRENT_REG = 0x04
+    CALIBRATION_REG = 0x05
+    MASK_ENABLE_REG = 0x06
+    ALERT_LIMIT_REG = 0x07
+    MANUFACTURER_ID_REG = 0xFE
+    DIE_ID_REG = 0xFF
+
+    CNVR = 0x0400
+    CVRF = 0x0008
+
+    def __init__(self, bus_voltage_mv=5000.0, current_ma=0.0, r_shunt=20):
+        """
+        Initialize the model.
+
+        Args:
+            bus_voltage_mv (float): Bus voltage in millivolts (default is 5000).
+            current_ma (float): Current through the shunt in milliamps (default is 0).
+            r_shunt (float): Shunt resistor in milliohm (default is 20).
+        """
+        super().__init__()
+        self.bus_voltage_mv = bus_voltage_mv
+        self.current_ma = current_ma
+        self.r_shunt = r_shunt
+        self.pointer = 0
+        self.reset()
+
+    def reset(self):
+        self.registers = {
+            self.CONFIG_REG: 0x4127,
+            self.CALIBRATION_REG: 0,
+            self.MASK_ENABLE_REG: 0,
+            self.ALERT_LIMIT_REG: 0,
+            self.MANUFACTURER_ID_REG: 0x5449,
+            self.DIE_ID_REG: 0x2260,
+        }
+
+    def conversion(self):
+        """
+        Finish a conversion: set CVRF and assert ALERT if CNVR is enabled.
+        """
+        self.registers[self.MASK_ENABLE_REG] |= self.CVRF
+        if self.registers[self.MASK_ENABLE_REG] & self.CNVR:
+            self.interrupt(True)
+
+    def register(self, register) -> int:
+        shunt = round(self.current_ma * self.r_shunt / 2.5) & 0xFFFF
+        bus = round(self.bus_voltage_mv / 1.25) & 0xFFFF
+        calibration = self.registers[self.CALIBRATION_REG]
+        current = (shunt * calibration // 2048) & 0xFFFF
+        if register == self.SHUNT_VOLTAGE_REG:
+            return shunt
+        if register == self.BUS_VOLTAGE_REG:
+            return bus
+        if register == self.CURRENT_REG:
+            return current
+        if register == self.POWER_REG:
+            return (current * bus // 20000) & 0xFFFF
+        value = self.registers.get(register, 0)
+        if register == self.MASK_ENABLE_REG:
+            # Reading Mask/Enable clears the flags and releases ALERT
+            self.registers[register] = value & ~0x0018
+            self.interrupt(False)
+        return value
+
+    def write(self, data):
+        if data:
+            self.pointer = data[0]
+        if len(data) >= 3:
+            value = data[1] << 8 | data[2]
+            if self.pointer == self.CONFIG_REG and value & 0x8000:
+                self.reset()
+            elif self.pointer in self.registers and self.pointer < 0xFE:
+                self.registers[self.pointer] = value
+
+    def read(self, length) -> bytes:
+        value = self.register(self.pointer)
+        return (bytes([value >> 8, value & 0xFF]) * (length // 2 + 1))[:length]
+
+
+class VirtualMPU6050(I2CDevice):
+    """
+    Virtual MPU-6050 with auto-incrementing 8-bit registers.
+
+    The data registers follow the acceleration (g), rotation (deg/s) and
+    temperature (degrees Celsius) set on the model, scaled by the configured
+    full scale ranges.
+    """
+
+    INT_PIN_CFG = 0x37
+    INT_ENABLE = 0x38
+    INT_STATUS = 0x3A
+    ACCEL_XOUT0 = 0x3B
+    GYRO_ZOUT1 = 0x48
+    ACCEL_CONFIG = 0x1C
+    GYRO_CONFIG = 0x1B
+    PWR_MGMT_1 = 0x6B
+    WHO_AM_I = 0x75
+
+    def __init__(self, accel=(0.0, 0.0, 1.0), gyro=(0.0, 0.0, 0.0), temperature=25.0):
+        """
+        Initialize the model.
+
+        Args:
+            accel (tuple): X, Y, Z acceleration in g (default is 1 g on Z).
+            gyro (tuple): X, Y, Z rotation in deg/s (default is at rest).
+            temperature (float): Die temperature in degrees Celsius (default is 25).
+        """
+        super().__init__()
+        self.accel = accel
+        self.gyro = gyro
+        self.temperature = temperature
+        self.registers = bytearray(128)
+        self.registers[self.PWR_MGMT_1] = 0x40
+        self.registers[self.WHO_AM_I] = 0x68
+        self.pointer = 0
+
+    def data_ready(self):
+        """
+        Finish a sample: set DATA_RDY_INT and assert INT if enabled.
+        """
+        self.registers[self.INT_STATUS] |= 0x01
+        if self.registers[self.INT_ENABLE] & 0x01:
+            self.interrupt(True)
+
+    def _update(self):
+        accel_scale = 16384 >> ((self.registers[self.ACCEL_CONFIG] >> 3) & 3)
+        gyro_scale = 131 / (1 << ((self.registers[self.GYRO_CONFIG] >> 3) & 3))
+        raw = [round(value * accel_scale) for value in self.accel]
+        raw.append(round((self.temperature - 36.53) * 340))
+        raw += [round(value * gyro_scale) for value in self.gyro]
+        if self.registers[self.PWR_MGMT_1] & 0x40:
+            # Sleeping, no conversions
+            raw = [0] * 7
+        for index, value in enumerate(raw):
+            value = max(-0x8000, min(0x7FFF, value)) & 0xFFFF
+            self.registers[self.ACCEL_XOUT0 + 2 * index] = value >> 8
+            self.registers[self.ACCEL_XOUT0 + 2 * index + 1] = value & 0xFF
+
+    def write(self, data):
+        if data:
+            self.pointer = data[0]
+        for value in data[1:]:
+            self.registers[self.pointer & 0x7F] = value
+            self.pointer += 1
+
+    def read(self, length) -> bytes:
+        self._update()
+        start = self.pointer & 0x7F
+        data = bytes(self.registers[(start + i) & 0x7F] for i in range(length))
+        if start <= self.INT_STATUS < start + length:
+            self.registers[self.INT_STATUS] = 0
+            if self.registers[self.INT_PIN_CFG] & 0x20:
+                self.interrupt(False)
+        self.pointer = start + length
+        return data
+
+
+class VirtualEEPROM(I2CDevice):
+    """
+    Virtual 24Cxx EEPROM.
+
+    Parts up to 24C16 take one address byte and use the low bits of the bus
+    address as the high address bits, larger parts take two address bytes.
+    """
+
+    def __init__(self, size=256, page_size=None):
+        """
+        Initialize the model.
+
+        Args:
+            size (int): Capacity in bytes, 128 (24C01) up to 524288 (24C4096) (default is 256).
+            page_size (int, optional): Page write size, chosen from the size by default.
+        """
+        super().__init__()
+        self.size = size
+        self.memory = bytearray([0xFF] * size)
+        self.address_bytes = 1 if size <= 2048 else 2
+        self.address_span = max(1, size // 256) if self.address_bytes == 1 else 1
+        if page_size is None:
+            page_size = (
+                8 if size <= 256 else 16 if size <= 2048 else 32 if size <= 8192 else 64
+            )
+        self.page_size = page_size
+        self.pointer = 0
+
+    def write(self, data):
+        count = self.address_bytes
+        if len(data) < count:
+            return
+        if count == 1:
+            self.pointer = (self.block << 8 | data[0]) % self.size
+        else:
+            self.pointer = (data[0] << 8 | data[1]) % self.size
+        page = self.pointer & ~(self.page_size - 1)
+        for value in data[count:]:
+            self.memory[self.pointer] = value
+            # Page writes wrap around within the page
+            self.pointer = page | ((self.pointer + 1) & (self.page_size - 1))
+
+    def read(self, length) -> bytes:
+        data = bytes(self.memory[(self.pointer + i) % self.size] for i in range(length))
+        self.pointer = (self.pointer + length) % self.size
+        return data
+
+
+class _AddressBlock:
+    # One of the bus addresses of a device that answers to several
+    def __init__(self, device, block):
+        self.device = device
+        self.block = block
+
+    def write(self, data):
+        self.device.block = self.block
+        self.device.write(data)
+
+    def read(self, length):
+        return self.device.read(length)
+
+    def __getattr__(self, name):
+        return getattr(self.device, name)
+
+
+class SPIDevice:
+    """
+    Base class of virtual SPI devices.
+
+    Every transaction is `select()`, one or more `exchange(data)` calls that
+    return the bytes clocked out on MISO, and `deselect()`.
+    """
+
+    def select(self):
+        pass
+
+    def exchange(self, data) -> bytes:
+        return bytes([0xFF] * len(data))
+
+    def deselect(self):
+        pass
+
+
+class SPILoopback(SPIDevice):
+    """
+    MOSI wired to MISO: every byte sent is received back.
+    """
+
+    def exchange(self, data) -> bytes:
+        return bytes(data)
+
+
+class VirtualSPIFlash(SPIDevice):
+    """
+    Virtual SPI NOR flash.
+
+    Supports RDID (9Fh), READ (03h), FAST_READ (0Bh), RDSR (05h), WREN (06h),
+    WRDI (04h), PP (02h), SE (20h), BE (D8h) and CE (C7h/60h) with 3-byte
+    addresses. Program only clears bits and erase sets them, like the real
+    part. Erases take effect when chip select is released.
+    """
+
+    # Opcode: number of bytes before the data phase
+    HEADERS = {
+        0x9F: 1,
+        0x03: 4,
+        0x0B: 5,
+        0x05: 1,
+        0x06: 1,
+        0x04: 1,
+        0x02: 4,
+        0x20: 4,
+        0xD8: 4,
+        0xC7: 1,
+        0x60: 1,
+    }
+
+    PAGE_SIZE = 256
+
+    def __init__(self, size=1 << 21, jedec_id=b"\xef\x40\x15"):
+        """
+        Initialize the model.
+
+        Args:
+            size (int): Capacity in bytes (default is 2 MiB).
+            jedec_id (bytes): Manufacturer and device ID returned by RDID (default is a W25Q16).
+        """
+        self.size = size
+        self.jedec_id = bytes(jedec_id)
+        self.memory = bytearray([0xFF] * size)
+        self.write_enabled = False
+        self.header = bytearray()
+        self.address = 0
+
+    def select(self):
+        self.header = bytearray()
+
+    def exchange(self, data) -> bytes:
+        data = bytes(data)
+        out = bytearray()
+        if not self.header and data:
+            self.header.append(data[0])
+            out.append(0xFF)
+            data = data[1:]
+        needed = self.HEADERS.get(self.header[0], 1) if self.header else 1
+        if len(self.header) < needed:
+            take = needed - len(self.header)
+            self.header += data[:take]
+            out += bytes([0xFF] * len(data[:take]))
+            data = data[take:]
+            if len(self.header) == needed and needed >= 4:
+                self.address = int.from_bytes(self.header[1:4], "big") % self.size
+        if data:
+            out += self._data_phase(data)
+        return bytes(out)
+
+    def _data_phase(self, data) -> bytes:
+        opcode = self.header[0]
+        length = len(data)
+        if opcode in (0x03, 0x0B):
+            start = self.address
+            end = start + length
+            if end <= self.size:
+                out = bytes(self.memory[start:end])
+            else:
+                out = bytes(self.memory[start:]) + bytes(self.memory) * (
+                    (end - self.size) // self.size + 1
+                )
+                out = out[:length]
+            self.address = end % self.size
+            return out
+        if opcode == 0x9F:
+            return (self.jedec_id + bytes([0xFF] * length))[:length]
+        if opcode == 0x05:
+            return bytes([0x02 if self.write_enabled else 0x00]) * length
+        if opcode == 0x02 and self.write_enabled:
+            page = self.address & ~(self.PAGE_SIZE - 1)
+            for value in data:
+                self.memory[self.address] &= value
+                self.address = page | ((self.address + 1) & (self.PAGE_SIZE - 1))
+        return bytes([0xFF] * length)
+
+    def deselect(self):
+        if not self.header:
+            return
+        opcode = self.header[0]
+        complete = len(self.header) >= self.HEADERS.get(opcode, 1)
+        if opcode == 0x06:
+            self.write_enabled = True
+        elif opcode == 0x04:
+            self.write_enabled = False
+        elif (
+            opcode in (0x20, 0xD8, 0xC7, 0x60, 0x02) and complete and self.write_enabled
+        ):
+            block = {0x20: 4096, 0xD8: 65536}.get(opcode)
+            if block is not None:
+                start = self.address & ~(block - 1)
+                self.memory[start : start + block] = bytes([0xFF] * block)
+            elif opcode != 0x02:
+                self.memory[:] = bytes([0xFF] * self.size)
+            self.write_enabled = False
+        self.header = bytearray()
+
+
+class _TransferTimeout(Exception):
+    # A stalled transfer ran into the USB timeout
+    pass
+
+
+class SimulatedFunction:
+    """
+    Callable DLL entry point that accepts argtypes/restype like a ctypes function.
+    """
+
+    # Unset until a binding declares them, as on a ctypes function
+    argtypes = None
+    restype = None
+
+    def __init__(self, function):
+        self.function = function
+        self.__name__ = function.__name__
+
+    def __call__(self, *args):
+        try:
+            return self.function(*args)
+        except _TransferTimeout:
+            return False
+
+
+class SimulatedCH347:
+    """
+    Pure-Python replacement of the CH347 DLL.
+
+    Pass an instance as `dll_path` to `CH347` to use it.
+
+    Attributes:
+        elapsed (float): Simulated seconds spent in calls, per the latency model.
+        calls (int): Number of DLL calls.
+        timeouts (tuple): USB write and read timeouts in ms set with CH347SetTimeout.
+        stalls (int): Number of bus transfers still to stall, -1 until the device is reopened.
+        spi_max_hz (int): Fastest SPI clock that transfers intact, None for no limit.
+        spi_data_bits (int): SPI frame size set with CH347SPI_SetDataBits, 8 or 16.
+        i2c_rise_limit (int): Fastest SCL the pull-ups carry in open-drain mode, None for no limit.
+        i2c_stretch (bool): Clock stretching set with CH347I2C_SetStretch.
+        i2c_drive_mode (int): Pin drive mode set with CH347I2C_SetDriverMode.
+        usb_speed (int): UsbSpeedType reported, 0=full speed, 1=high speed.
+    """
+
+    NO_TIMEOUT = 0xFFFFFFFF
+
+    I2C_SPEEDS = (20000, 100000, 400000, 750000)
+
+    INVALID_HANDLE_VALUE = ctypes.c_void_p(-1).value
+
+    def __init__(
+        self,
+        latency=None,
+        device_count=1,
+        serial_number="SIM00001",
+        chip_type=1,
+        usb_speed=1,
+    ):
+        """
+        Initialize the simulator.
+
+        Args:
+            latency (LatencyModel, optional): Cost model of the calls (default has no sleep).
+            device_count (int): Number of devices CH347OpenDevice finds (default is 1).
+            serial_number (str): Serial number reported for every device (default is "SIM00001").
+            chip_type (int): Chip type reported, 1=CH347T, 2=CH347F (default is 1).
+            usb_speed (int): USB speed reported, 0=full speed, 1=high speed (default is 1).
+        """
+        self.latency = latency if latency is not None else LatencyModel()
+        self.device_count = device_count
+        self.serial_number = serial_number
+        self.chip_type = chip_type
+        self.usb_speed = usb_speed
+        self.elapsed = 0.0
+        self.calls = 0
+        self.timeouts = (self.NO_TIMEOUT, self.NO_TIMEOUT)
+        self.stalls = 0
+
+        self.i2c = {}
+        self.i2c_speed = self.I2C_SPEEDS[1]
+        self.i2c_rise_limit = None
+        self.i2c_stretch = False
+        self.i2c_drive_mode = 0
+        self.spi = {}
+        self.spi_config = SPIConfig()
+        self.spi_hz = 60000000 >> 2
+        self.spi_max_hz = None
+        self.spi_data_bits = 8
+        self.noise = random.Random(0x347)
+        self.spi_selected = None
+
+        self.gpio_direction = 0
+        self.gpio_output = 0
+        self.gpio_input = 0xFF
+        self.int_pins = ()
+        self.int_routine = None
+
+        self.uart_rx = bytearray()
+        self.uart_tx = bytearray()
+        self.uart_loopback = False
+        self.uart_read_timeout = None
+        self.uart_config = None
+        self.uart_cond = threading.Condition()
+
+        # Wrap the entry points so bindings can set argtypes and restype
+        for name in dir(type(self)):
+            if name.startswith("CH347"):
+                setattr(self, name, SimulatedFunction(getattr(self, name)))
+
+    # Virtual hardware
+
+    def attach_i2c(self, address, device):
+        """
+        Connect a virtual I2C device.
+
+        Args:
+            address (int): 7-bit bus address; devices spanning several addresses start here.
+            device (I2CDevice): The device.
+        """
+        if device.address_span == 1:
+            self.i2c[address] = device
+            return
+        for block in range(device.address_span):
+            self.i2c[address + block] = _AddressBlock(device, block)
+
+    def attach_spi(self, chip_select, device):
+        """
+        Connect a virtual SPI device.
+
+        Args:
+            chip_select (int): 0 for CS1, 1 for CS2.
+            device (SPIDevice): The device.
+        """
+        self.spi[chip_select] = device
+
+    def wire_interrupt(self, device, pin, active_low=True):
+        """
+        Connect a device's interrupt output to a GPIO input.
+
+        Args:
+            device (I2CDevice): Device whose interrupt() drives the pin.
+            pin (int): GPIO number, 0-7.
+            active_low (bool): Whether the output pulls the line low when active (default is True).
+        """
+        device.irq = lambda active: self.set_input(pin, int(active != active_low))
+
+    def set_input(self, pin, level):
+        """
+        Drive an external level onto a GPIO pin and raise its interrupt on an edge.
+
+        Args:
+            pin (int): GPIO number, 0-7.
+            level (int): 0 for low, 1 for high.
+        """
+        bit = 1 << pin
+        old = (self.gpio_input >> pin) & 1
+        self.gpio_input = self.gpio_input | bit if level else self.gpio_input & ~bit
+        if old == level or self.int_routine is None:
+            return
+        for armed, mode in self.int_pins:
+            if armed == pin and (mode == 2 or mode == level):
+                status = (ctypes.c_ubyte * 8)(*self._gpio_status())
+                self.int_routine(status)
+                return
+
+    def uart_feed(self, data):
+        """
+        Make data arrive on the UART receive line.
+        """
+        with self.uart_cond:
+            self.uart_rx += data
+            self.uart_cond.notify_all()
+
+    def stall(self, calls=1, until_reopen=False):
+        """
+        Make bus transfers hang until the USB timeout and fail.
+
+        Args:
+            calls (int): Number of transfers to stall (default is 1).
+            until_reopen (bool): Stall every transfer until the device is closed (default is False).
+        """
+        self.stalls = -1 if until_reopen else calls
+
+    def _charge(self, wire_bits=0, bit_rate=None):
+        if wire_bits and self.stalls:
+            if self.stalls > 0:
+                self.stalls -= 1
+            timeout = min(self.timeouts)
+            if timeout == self.NO_TIMEOUT:
+                raise RuntimeError(
+                    "Stalled transfer without a USB timeout never returns"
+                )
+            seconds = self.latency.call_overhead + timeout / 1000
+            self.calls += 1
+            self.elapsed += seconds
+            self.latency.wait(seconds)
+            raise _TransferTimeout()
+        seconds = self.latency.cost(wire_bits, bit_rate)
+        self.calls += 1
+        self.elapsed += seconds
+        self.latency.wait(seconds)
+
+    def _gpio_levels(self) -> int:
+        return (self.gpio_output & self.gpio_direction) | (
+            self.gpio_input & ~self.gpio_direction & 0xFF
+        )
+
+    def _gpio_status(self) -> list:
+        levels = self._gpio_levels()
+        status = []
+        for pin in range(8):
+            value = ((self.gpio_direction >> pin) & 1) << 7 | ((levels >> pin) & 1) << 6
+            for armed, mode in self.int_pins:
+                if armed == pin:
+                    value |= 0x20 | (mode & 3) << 3
+            status.append(value)
+        return status
+
+    def _i2c_transfer(self, write, read_length):
+        # Returns (acknowledged, data); a missing device reads as 0xFF
+        self._charge(
+            9 * (len(write) + read_length + (1 if read_length else 0)), self.i2c_speed
+        )
+        if not write:
+            return True, b""
+        device = self.i2c.get(write[0] >> 1)
+        if device is None or not self._i2c_acknowledged(device):
+            return False, bytes([0xFF] * read_length)
+        if len(write) > 1 or not read_length:
+            device.write(write[1:])
+        if not read_length:
+            return True, b""
+        data = device.read(read_length)
+        stretch_above = device.stretch_above
+        if (
+            stretch_above is not None
+            and self.i2c_speed > stretch_above
+            and not self.i2c_stretch
+        ):
+            # The host samples SDA while the device still holds SCL low
+            data = bytearray(data)
+            data[self.noise.randrange(len(data))] ^= 1 << self.noise.randrange(8)
+            data = bytes(data)
+        return True, data
+
+    def _i2c_acknowledged(self, device) -> bool:
+        if (
+            self.i2c_rise_limit
+            and self.i2c_drive_mode == 0
+            and self.i2c_speed > self.i2c_rise_limit
+        ):
+            return False
+        return device.max_speed is None or self.i2c_speed <= device.max_speed
+
+    def _spi_device(self, chip_select):
+        if chip_select & 0x80:
+            return self.spi.get(chip_select & 0x03)
+        return (
+            self.spi.get(self.spi_selected) if self.spi_selected is not None else None
+        )
+
+    def _spi_transfer(self, chip_select, data) -> bytes:
+        self._charge(8 * len(data), self.spi_hz)
+        device = self._spi_device(chip_select)
+        if device is None:
+            return bytes([0xFF] * len(data))
+        if chip_select & 0x80:
+            device.select()
+        out = device.exchange(data)
+        if chip_select & 0x80:
+            device.deselect()
+        if self.spi_max_hz and self.spi_hz > self.spi_max_hz and out:
+            out = bytearray(out)
+            out[self.noise.randrange(len(out))] ^= 1 << self.noise.randrange(8)
+            out = bytes(out)
+        return out
+
+    # Device
+
+    def CH347OpenDevice(self, index):
+        self._charge()
+        if _int(index) >= self.device_count:
+            return self.INVALID_HANDLE_VALUE
+        return _int(index) + 1
+
+    def CH347CloseDevice(self, index):
+        self._charge()
+        if self.stalls < 0:
+            self.stalls = 0
+        return True
+
+    def CH347GetDeviceInfor(self, index, info):
+        self._charge()
+        info = getattr(info, "_obj", info)
+        info.DeviceIndex = _int(index)
+        info.DevicePath = b"\\\\?\\sim#ch347#%d" % _int(index)
+        info.UsbClass = 1
+        info.FuncType = 1
+        info.DeviceID = b"USB\\VID_1A86&PID_55DB"
+        info.ChipMode = 1
+        packet_size = 64 if self.usb_speed == 0 else 512
+        info.BulkOutEndpMaxSize = packet_size
+        info.BulkInEndpMaxSize = packet_size
+        info.UsbSpeedType = self.usb_speed
+        info.ProductString = b"CH347 Simulator"
+        info.ManufacturerString = b"ch347-py"
+        info.FuncDescStr = b"SPI+I2C"
+        info.FirmwareVer = 0x41
+        return True
+
+    def CH347GetVersion(self, index, driver_ver, dll_ver, device_ver, chip_type):
+        self._charge()
+        for reference, value in (
+            (driver_ver, 0x30),
+            (dll_ver, 0x30),
+            (device_ver, 0x41),
+            (chip_type, self.chip_type),
+        ):
+            _set(reference, value)
+        return True
+
+    def CH347GetSerialNumber(self, index, buffer):
+        self._charge()
+        _store(buffer, self.serial_number.encode() + b"\x00")
+        return True
+
+    def CH347GetChipType(self, index):
+        return self.chip_type
+
+    def CH347SetTimeout(self, index, write_timeout, read_timeout):
+        self.timeouts = (_int(write_timeout), _int(read_timeout))
+        return True
+
+    def CH347SetDeviceNotify(self, index, device_id, routine):
+        return True
+
+    def CH347ReadData(self, index, buffer, length):
+        # Raw USB blocks carry the vendor protocol, which is not simulated
+        _set(length, 0)
+        return False
+
+    def CH347WriteData(self, index, buffer, length):
+        _set(length, 0)
+        return False
+
+    # SPI
+
+    def CH347SPI_Init(self, index, config):
+        self._charge()
+        self.spi_config = SPIConfig.from_buffer_copy(getattr(config, "_obj", config))
+        self.spi_hz = 60000000 >> self.spi_config.Clock
+        return True
+
+    def CH347SPI_GetCfg(self, index, config):
+        self._charge()
+        ctypes.memmove(
+            _address(config),
+            ctypes.addressof(self.spi_config),
+            ctypes.sizeof(SPIConfig),
+        )
+        return True
+
+    def CH347SPI_SetFrequency(self, index, frequency):
+        self.spi_hz = _int(frequency)
+        return True
+
+    def CH347SPI_SetDataBits(self, index, data_bits):
+        self.spi_data_bits = 16 if _int(data_bits) else 8
+        return True
+
+    def CH347SPI_ChangeCS(self, index, status):
+        self._charge()
+        chip_select = self.spi_config.ChipSelect & 0x03
+        device = self.spi.get(chip_select)
+        if _int(status):
+            self.spi_selected = chip_select
+            if device is not None:
+                device.select()
+        else:
+            if device is not None and self.spi_selected is not None:
+                device.deselect()
+            self.spi_selected = None
+        return True
+
+    def CH347SPI_SetChipSelect(self, index, enable, select, auto, active, deactive):
+        return True
+
+    def CH347SPI_Write(self, index, chip_select, length, step, buffer):
+        self._spi_transfer(_int(chip_select), _load(buffer, _int(length)))
+        return True
+
+    def CH347SPI_Read(self, index, chip_select, write_length, read_length, buffer):
+        write_length = _int(write_length)
+        count = _int(read_length)
+        data = _load(buffer, write_length) + bytes([0xFF] * count)
+        out = self._spi_transfer(_int(chip_select), data)
+        _store(buffer, out[write_length:])
+        return True
+
+    def CH347SPI_WriteRead(self, index, chip_select, length, buffer):
+        _store(
+            buffer, self._spi_transfer(_int(chip_select), _load(buffer, _int(length)))
+        )
+        return True
+
+    def CH347StreamSPI4(self, index, chip_select, length, buffer):
+        return self.CH347SPI_WriteRead(index, chip_select, length, buffer)
+
+    # I2C
+
+    def CH347I2C_Set(self, index, mode):
+        self.i2c_speed = self.I2C_SPEEDS[_int(mode) & 0x03]
+        return True
+
+    def CH347I2C_SetDelaymS(self, index, delay):
+        self._charge()
+        self.elapsed += _int(delay) / 1000
+        self.latency.wait(_int(delay) / 1000)
+        return True
+
+    def CH347I2C_SetStretch(self, index, enable):
+        self.i2c_stretch = bool(_int(enable))
+        return True
+
+    def CH347I2C_SetDriverMode(self, index, mode):
+        self.i2c_drive_mode = _int(mode)
+        return True
+
+    def CH347StreamI2C(
+        self, index, write_length, write_buffer, read_length, read_buffer
+    ):
+        count = _int(read_length)
+        acknowledged, data = self._i2c_transfer(
+            _load(write_buffer, _int(write_length)), count
+        )
+        if not acknowledged:
+            return False
+        _store(read_buffer, data)
+        return True
+
+    def CH347StreamI2C_RetACK(
+        self, index, write_length, write_buffer, read_length, read_buffer, ack_count
+    ):
+        write = _load(write_buffer, _int(write_length))
+        count = _int(read_length)
+        acknowledged, data = self._i2c_transfer(write, count)
+        _store(read_buffer, data)
+        _set(ack_count, (len(write) + (1 if count else 0)) if acknowledged else 0)
+        return True
+
+    def _eeprom_target(self, eeprom_id, address):
+        # Bus address and address bytes of a 24Cxx access
+        if eeprom_id <= 4:
+            return 0x50 | ((address >> 8) & 0x07), bytes([address & 0xFF])
+        return 0x50, address.to_bytes(2, "big")
+
+    def CH347ReadEEPROM(self, index, eeprom_id, address, length, buffer):
+        bus_address, offset = self._eeprom_target(_int(eeprom_id), _int(address))
+        acknowledged, data = self._i2c_transfer(
+            bytes([bus_address << 1]) + offset, _int(length)
+        )
+        if not acknowledged:
+            return False
+        _store(buffer, data)
+        return True
+
+    def CH347WriteEEPROM(self, index, eeprom_id, address, length, buffer):
+        eeprom_id = _int(eeprom_id)
+        address = _int(address)
+        data = _load(buffer, _int(length))
+        page = (
+            8
+            if eeprom_id <= 1
+            else 16 if eeprom_id <= 4 else 32 if eeprom_id <= 6 else 64
+        )
+        position = 0
+        while position < len(data):
+            count = min(page - (address + position) % page, len(data) - position)
+            bus_address, offset = self._eeprom_target(eeprom_id, address + position)
+            acknowledged, _ = self._i2c_transfer(
+                bytes([bus_address << 1]) + offset + data[position : position + count],
+                0,
+            )
+            if not acknowledged:
+                return False
+            position += count
+        return True
+
+    # GPIO
+
+    def CH347GPIO_Get(self, index, direction, level):
+        self._charge()
+        _set(direction, self.gpio_direction)
+        _set(level, self._gpio_levels())
+        return True
+
+    def CH347GPIO_Set(self, index, enable, set_dir_out, set_data_out):
+        self._charge()
+        enable = _int(enable)
+        self.gpio_direction = (self.gpio_direction & ~enable) | (
+            _int(set_dir_out) & enable
+        )
+        self.gpio_output = (self.gpio_output & ~enable) | (_int(set_data_out) & enable)
+        return True
+
+    def CH347SetIntRoutine(
+        self, index, int0_pin, int0_mode, int1_pin, int1_mode, routine
+    ):
+        self._charge()
+        pins = [(_int(int0_pin), _int(int0_mode)), (_int(int1_pin), _int(int1_mode))]
+        self.int_pins = tuple((pin, mode) for pin, mode in pins if pin < 8)
+        self.int_routine = routine
+        return True
+
+    def CH347ReadInter(self, index, status):
+        self._charge()
+        _store(status, bytes(self._gpio_status()))
+        return True
+
+    def CH347AbortInter(self, index):
+        return True
+
+    # UART
+
+    def CH347Uart_Open(self, index):
+        return self.CH347OpenDevice(index)
+
+    def CH347Uart_Close(self, index):
+        return True
+
+    def CH347Uart_Init(
+        self, index, baud_rate, byte_size, parity, stop_bits, byte_timeout
+    ):
+        self.uart_config = tuple(
+            _int(value)
+            for value in (baud_rate, byte_size, parity, stop_bits, byte_timeout)
+        )
+        return True
+
+    def CH347Uart_SetTimeout(self, index, write_timeout, read_timeout):
+        read_timeout = _int(read_timeout)
+        self.uart_read_timeout = (
+            None if read_timeout == 0xFFFFFFFF else read_timeout / 1000
+        )
+        return True
+
+    def CH347Uart_QueryBufUpload(self, index, remain_bytes):
+        _set(remain_bytes, len(self.uart_rx))
+        return True
+
+    def CH347Uart_Read(self, index, buffer, length):
+        with self.uart_cond:
+            if not self.uart_rx:
+                self.uart_cond.wait(
+                    0.1 if self.uart_read_timeout is None else self.uart_read_timeout
+                )
+            count = min(_int(length), len(self.uart_rx))
+            _store(buffer, self.uart_rx[:count])
+            del self.uart_rx[:count]
+        _set(length, count)
+        return True
+
+    def CH347Uart_Write(self, index, buffer, length):
+        data = _load(buffer, _int(length))
+        self.uart_tx += data
+        if self.uart_loopback:
+            self.uart_feed(data)
+        return True
@@ -0,0 +1,253 @@
+"""
+Streaming Module
+----------------
+
+The `ch347.streaming` module keeps the SPI bus busy during long continuous
+output such as LED strips, DAC waveforms or display refreshes.
+
+A `SPIStreamer` owns a few buffers allocated once for its whole life and
+runs two threads: a producer that fills free buffers through a user
+function, and a consumer that sends filled buffers with `stream_spi4`. The
+next chunk is prepared while the current one is on the wire, so the bus only
+waits for the host when the producer is slower than the bus. The time the
+consumer spends waiting for a filled buffer is reported as bus idle time.
+
+Usage Example:
+--------------
+
+from ch347 import CH347
+from ch347.streaming import SPIStreamer
+
+streamer = SPIStreamer(CH347(), chip_select=0x80)
+streamer.write(frame_bytes)
+print(streamer.stats())
+
+def fill(buffer):
+    return dac.next_block(buffer)  # bytes written into the memoryview, 0 to end
+
+streamer.start(fill)
+streamer.wait()
+"""
+
+import ctypes
+import queue
+import threading
+import time
+
+
+class SPIStreamer:
+    """
+    Double-buffered SPI output with a producer and a consumer thread.
+
+    Attributes:
+        BASE_CLOCK (int): SPI clock in Hz of the SPIConfig Clock setting 0.
+        CHUNK_SIZE (int): Default chunk size, the payload of one 4096 byte
+                          CH347 command buffer after its 3 byte header.
+        chunk_size (int): Size of every buffer in bytes.
+        chunks (int): Number of chunks sent.
+        bytes (int): Number of bytes sent.
+        busy_ns (int): Time spent in stream_spi4 in nanoseconds.
+        idle_ns (int): Time the consumer waited for a filled buffer in nanoseconds.
+    """
+
+    BASE_CLOCK = 60000000
+    CHUNK_SIZE = 4093
+
+    def __init__(self, driver, chip_select=0x80, chunk_size=None, buffers=2):
+        """
+        Initialize the streamer.
+
+        Args:
+            driver (CH347): The driver, with SPI already initialized.
+            chip_select (int): Chip select of every chunk (default is 0x80, CS0 asserted).
+            chunk_size (int, optional): Bytes per chunk (default is CHUNK_SIZE).
+            buffers (int): Number of buffers, at least 2 (default is 2).
+        """
+        if buffers < 2:
+            raise ValueError("SPIStreamer needs at least 2 buffers")
+        self.driver = driver
+        self.chip_select = chip_select
+        self.chunk_size = chunk_size or self.CHUNK_SIZE
+        # Allocated once, so the library always gets the same memory
+        self._buffers = [
+            ctypes.create_string_buffer(self.chunk_size) for _ in range(buffers)
+        ]
+        self._views = [memoryview(buffer).cast("B") for buffer in self._buffers]
+        self._free = queue.Queue()
+        self._filled = queue.Queue()
+        self._threads = ()
+        self._running = False
+        self._error = None
+        self.reset()
+
+    def reset(self):
+        """
+        Clear the statistics.
+        """
+        self.chunks = 0
+        self.bytes = 0
+        self.busy_ns = 0
+        self.idle_ns = 0
+        self._started_ns = None
+        self._finished_ns = None
+
+    def _produce(self, fill):
+        try:
+            while self._running:
+                index = self._free.get()
+                if index is None:
+                    break
+                length = fill(self._views[index])
+                if not length:
+                    break
+                self._filled.put((index, length))
+        except BaseException as error:
+            self._error = error
+        self._filled.put(None)
+
+    def _consume(self):
+        stream_spi4 = self.driver.stream_spi4
+        chip_select = self.chip_select
+        waited = time.perf_counter_ns()
+        while True:
+            item = self._filled.get()
+            if item is None:
+                break
+            index, length = item
+            start = time.perf_counter_ns()
+            if self._started_ns is None:
+                self._started_ns = start
+            else:
+                self.idle_ns += start - waited
+            ok = stream_spi4(chip_select, length, self._buffers[index])
+            waited = time.perf_counter_ns()
+            self.busy_ns += waited - start
+            if not ok:
+                self._error = RuntimeError("CH347StreamSPI4 failed")
+                self._running = False
+                self._free.put(None)
+                break
+            self.chunks += 1
+            self.bytes += length
+            self._free.put(index)
+        self._finished_ns = time.perf_counter_ns()
+
+    def start(self, fill):
+        """
+        Start streaming in the background.
+
+        Args:
+            fill (callable): Called on the producer thread with a writable memoryview
+                             of chunk_size bytes; returns the number of bytes it
+                             wrote, 0 or None to end the stream.
+        """
+        if self._threads:
+            raise RuntimeError("streamer already running")
+        self._free = queue.Queue()
+        self._filled = queue.Queue()
+        for index in range(len(self._buffers)):
+            self._free.put(index)
+        self._error = None
+        self._running = True
+        self._threads = (
+            threading.Thread(target=self._produce, args=(fill,), daemon=True),
+            threading.Thread(target=self._consume, daemon=True),
+        )
+        for thread in self._threads:
+            thread.start()
+
+    def wait(self, timeout=None) -> bool:
+        """
+        Wait for the stream to end.
+
+        Args:
+            timeout (float, optional): Maximum time to wait in seconds.
+
+        Returns:
+            bool: True if the stream ended, False on timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(
+                None if deadline is None else max(0, deadline - time.monotonic())
+            )
+            if thread.is_alive():
+                return False
+        self._threads = ()
+        self._running = False
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+        return True
+
+    def stop(self):
+        """
+        End the stream after the chunks already filled are sent.
+        """
+        self._running = False
+        self._free.put(None)
+        self.wait()
+
+    def run(self, fill):
+        """
+        Stream until fill ends the stream.
+
+        Args:
+            fill (callable): See start().
+        """
+        self.start(fill)
+        self.wait()
+
+    def write(self, data):
+        """
+        Stream a bytes-like object in chunks.
+
+        Args:
+            data (bytes): Data to send.
+        """
+        source = memoryview(data).cast("B")
+        offset = 0
+
+        def fill(buffer):
+            nonlocal offset
+            length = min(len(buffer), len(source) - offset)
+            buffer[:length] = source[offset : offset + length]
+            offset += length
+            return length
+
+        self.run(fill)
+
+    def stats(self, clock_hz=None) -> dict:
+        """
+        Summarize the stream.
+
+        Args:
+            clock_hz (int, optional): SPI clock in Hz, by default read from the
+                                      driver's SPI configuration.
+
+        Returns:
+            dict: chunks, bytes, seconds, throughput_bps, bus_idle_percent and,
+                  when the clock is known, clock_hz and bus_efficiency, the
+                  share of the clock rate the stream sustained.
+        """
+        if self._started_ns is None:
+            seconds = 0.0
+        else:
+            finished = self._finished_ns or time.perf_counter_ns()
+            seconds = (finished - self._started_ns) / 1e9
+        active = self.busy_ns + self.idle_ns
+        result = {
+            "chunks": self.chunks,
+            "bytes": self.bytes,
+            "seconds": seconds,
+            "throughput_bps": self.bytes * 8 / seconds if seconds else 0.0,
+            "bus_idle_percent": 100.0 * self.idle_ns / active if active else 0.0,
+        }
+        if clock_hz is None:
+            config = self.driver.spi_get_config()
+            if config is not None:
+                clock_hz = self.BASE_CLOCK >> config.Clock
+        if clock_hz:
+            result["clock_hz"] = clock_hz
+            result["bus_efficiency"] = result["throughput_bps"] / clock_hz
+        return result
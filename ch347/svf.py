@@ -0,0 +1,630 @@
+"""
+SVF Module
+----------
+
+The `ch347.svf` module plays Serial Vector Format (SVF) and Xilinx XSVF files
+through a `ch347.jtag.JTAG` instance, e.g. to program CPLDs and FPGAs.
+
+Files are parsed as a stream, one statement at a time, so multi-MB files are
+never expanded in memory. Header and trailer patterns (HIR/TIR/HDR/TDR) are
+turned into bit images once and reused for every scan that follows them, and
+each scan is sent as a single `CH347Jtag_WriteRead_Fast` call when it starts
+and ends in Run-Test/Idle.
+
+TDO comparisons are deferred: captured TDO, expected TDO and mask bytes of
+consecutive scans are appended to batch buffers and checked with one big
+integer XOR/AND over the whole batch. The batch is checked when it grows past
+CHECK_BATCH_SIZE bytes and at the end of the file.
+
+Usage Example:
+--------------
+
+from ch347 import CH347
+from ch347.jtag import JTAG
+from ch347.svf import SVFPlayer
+
+jtag = JTAG(CH347())
+stats = SVFPlayer(jtag).play("design.svf")
+print(f"{stats['bits_per_second'] / 1e6:.2f} Mbit/s")
+"""
+
+import re
+import struct
+import time
+from bisect import bisect_right
+
+from .jtag import TapState
+
+
+class SVFError(RuntimeError):
+    """
+    Raised on malformed input or when a TDO comparison fails.
+
+    Attributes:
+        line (int): Line number (SVF) or byte offset (XSVF) of the offending statement.
+    """
+
+    def __init__(self, message, line=None):
+        if line is not None:
+            message = f"{message} (at {line})"
+        super().__init__(message)
+        self.line = line
+
+
+# SVF state names
+SVF_STATES = {
+    "RESET": TapState.TEST_LOGIC_RESET,
+    "IDLE": TapState.RUN_TEST_IDLE,
+    "DRSELECT": TapState.SELECT_DR_SCAN,
+    "DRCAPTURE": TapState.CAPTURE_DR,
+    "DRSHIFT": TapState.SHIFT_DR,
+    "DREXIT1": TapState.EXIT1_DR,
+    "DRPAUSE": TapState.PAUSE_DR,
+    "DREXIT2": TapState.EXIT2_DR,
+    "DRUPDATE": TapState.UPDATE_DR,
+    "IRSELECT": TapState.SELECT_IR_SCAN,
+    "IRCAPTURE": TapState.CAPTURE_IR,
+    "IRSHIFT": TapState.SHIFT_IR,
+    "IREXIT1": TapState.EXIT1_IR,
+    "IRPAUSE": TapState.PAUSE_IR,
+    "IREXIT2": TapState.EXIT2_IR,
+    "IRUPDATE": TapState.UPDATE_IR,
+}
+
+
+class _Pattern:
+    # One of the SIR/SDR/HIR/TIR/HDR/TDR registers of an SVF file. TDI and
+    # MASK are sticky between statements, TDO only applies to one statement.
+
+    __slots__ = ("length", "tdi", "tdo", "mask")
+
+    def __init__(self):
+        self.length = 0
+        self.tdi = 0
+        self.tdo = None
+        self.mask = 0
+
+    def update(self, length, fields, line):
+        if length != self.length:
+            # A new length invalidates the sticky values
+            if length and "TDI" not in fields:
+                raise SVFError("TDI required after length change", line)
+            self.length = length
+            self.tdi = 0
+            self.mask = (1 << length) - 1
+        all_ones = (1 << length) - 1
+        if "TDI" in fields:
+            self.tdi = fields["TDI"] & all_ones
+        if "MASK" in fields:
+            self.mask = fields["MASK"] & all_ones
+        tdo = fields.get("TDO")
+        self.tdo = tdo & all_ones if tdo is not None else None
+
+
+class _Player:
+    # Scan execution, deferred TDO checking and statistics shared by the SVF
+    # and XSVF players.
+
+    # Bytes of captured TDO held back before they are compared
+    CHECK_BATCH_SIZE = 1 << 16
+
+    def __init__(self, jtag):
+        self.jtag = jtag
+        self.driver = jtag.driver
+        self.end_ir = TapState.RUN_TEST_IDLE
+        self.end_dr = TapState.RUN_TEST_IDLE
+        self._reset_stats()
+        self._reset_batch()
+
+    def _reset_stats(self):
+        self.scans = 0
+        self.scan_bits = 0
+        self.tck_cycles = 0
+
+    def _reset_batch(self):
+        self._batch_tdo = bytearray()
+        self._batch_expected = bytearray()
+        self._batch_mask = bytearray()
+        # End offset of each scan in the batch buffers and its location
+        self._batch_ends = []
+        self._batch_lines = []
+
+    def _scan(self, is_dr, tdi, bit_length, expected, mask, end_state, line):
+        self.scans += 1
+        self.scan_bits += bit_length
+        self.tck_cycles += bit_length
+        byte_length = (bit_length + 7) // 8
+        data = tdi.to_bytes(byte_length, "little")
+        if is_dr:
+            tdo = self.jtag.shift_dr(data, bit_length, expected is not None, end_state)
+        else:
+            tdo = self.jtag.shift_ir(data, bit_length, expected is not None, end_state)
+        if expected is not None:
+            self._defer_check(tdo, expected, mask, byte_length, line)
+
+    def _defer_check(self, tdo, expected, mask, byte_length, line):
+        self._batch_tdo += tdo
+        self._batch_expected += expected.to_bytes(byte_length, "little")
+        self._batch_mask += mask.to_bytes(byte_length, "little")
+        self._batch_ends.append(len(self._batch_tdo))
+        self._batch_lines.append(line)
+        if len(self._batch_tdo) >= self.CHECK_BATCH_SIZE:
+            self._check()
+
+    def _check(self):
+        """
+        Compare all deferred TDO captures of the current batch at once.
+        """
+        if not self._batch_ends:
+            return
+        errors = (
+            int.from_bytes(self._batch_tdo, "little")
+            ^ int.from_bytes(self._batch_expected, "little")
+        ) & int.from_bytes(self._batch_mask, "little")
+        if errors:
+            # The lowest set bit belongs to the first failing scan
+            first_byte = ((errors & -errors).bit_length() - 1) // 8
+            index = bisect_right(self._batch_ends, first_byte)
+            line = self._batch_lines[index]
+            start = self._batch_ends[index - 1] if index else 0
+            end = self._batch_ends[index]
+            got = bytes(self._batch_tdo[start:end])[::-1].hex()
+            want = bytes(self._batch_expected[start:end])[::-1].hex()
+            self._reset_batch()
+            raise SVFError(f"TDO mismatch: got {got}, expected {want}", line)
+        self._reset_batch()
+
+    def _run_test(self, state, cycles, seconds):
+        if cycles:
+            self.jtag.run_test(cycles, state)
+            self.tck_cycles += cycles
+        else:
+            self.jtag.goto_state(state)
+        if seconds:
+            # The clocks have to happen before the wait starts
+            self.jtag.flush()
+            time.sleep(seconds)
+
+    def _play(self, run):
+        self._reset_stats()
+        self._reset_batch()
+        start = time.perf_counter()
+        run()
+        self.jtag.flush()
+        self._check()
+        seconds = time.perf_counter() - start
+        return {
+            "scans": self.scans,
+            "scan_bits": self.scan_bits,
+            "tck_cycles": self.tck_cycles,
+            "seconds": seconds,
+            "bits_per_second": self.scan_bits / seconds if seconds else 0.0,
+        }
+
+
+class SVFPlayer(_Player):
+    """
+    Serial Vector Format player.
+
+    Supported statements: SIR, SDR, HIR, TIR, HDR, TDR, ENDIR, ENDDR, STATE,
+    RUNTEST, TRST and FREQUENCY (accepted, the clock rate is the one JTAG was
+    initialised with). PIO and PIOMAP are rejected.
+    """
+
+    _TOKEN = re.compile(r"\(|\)|[^\s()]+")
+
+    def __init__(self, jtag):
+        """
+        Initialize the player.
+
+        Args:
+            jtag (JTAG): The JTAG interface to play the file through.
+        """
+        super().__init__(jtag)
+        self.run_state = TapState.RUN_TEST_IDLE
+        self.run_end_state = TapState.RUN_TEST_IDLE
+        self._patterns = {
+            name: _Pattern() for name in ("SIR", "SDR", "HIR", "TIR", "HDR", "TDR")
+        }
+
+    def play(self, source) -> dict:
+        """
+        Play an SVF file.
+
+        Args:
+            source (str or file): Path of the file, or a text stream.
+
+        Returns:
+            dict: Statistics of the run with the keys "scans", "scan_bits",
+            "tck_cycles", "seconds" and "bits_per_second".
+        """
+        if isinstance(source, str):
+            with open(source, "r") as stream:
+                return self._play(lambda: self._run(stream))
+        return self._play(lambda: self._run(source))
+
+    @staticmethod
+    def statements(stream):
+        """
+        Split an SVF stream into statements without reading it all in.
+
+        Args:
+            stream: An iterable of text lines.
+
+        Yields:
+            tuple: (line, text) with the line number the statement starts on and
+            its text without the terminating semicolon.
+        """
+        parts = []
+        start = None
+        for number, text in enumerate(stream, 1):
+            for marker in ("!", "//"):
+                index = text.find(marker)
+                if index >= 0:
+                    text = text[:index]
+            while text:
+                index = text.find(";")
+                if index < 0:
+                    if text.strip():
+                        if start is None:
+                            start = number
+                        parts.append(text)
+                    break
+                parts.append(text[:index])
+                statement = " ".join(parts).strip()
+                if statement:
+                    yield (start if start is not None else number), statement
+                parts = []
+                start = None
+                text = text[index + 1 :]
+        if " ".join(parts).strip():
+            raise SVFError("Missing ';' at end of file", start)
+
+    def _run(self, stream):
+        for line, statement in self.statements(stream):
+            tokens = self._TOKEN.findall(statement.upper())
+            command = tokens[0]
+            handler = getattr(self, "_cmd_" + command.lower(), None)
+            if handler is None:
+                raise SVFError(f"Unsupported statement {command}", line)
+            handler(tokens[1:], line)
+
+    def _parse_fields(self, tokens, line):
+        try:
+            length = int(tokens[0])
+        except (IndexError, ValueError):
+            raise SVFError("Missing scan length", line)
+        fields = {}
+        index = 1
+        while index < len(tokens):
+            name = tokens[index]
+            if tokens[index + 1 : index + 2] != ["("] or ")" not in tokens[index:]:
+                raise SVFError(f"Expected '(...)' after {name}", line)
+            end = tokens.index(")", index + 2)
+            try:
+                fields[name] = int("".join(tokens[index + 2 : end]) or "0", 16)
+            except ValueError:
+                raise SVFError(f"Invalid hex value for {name}", line)
+            index = end + 1
+        return length, fields
+
+    def _set_pattern(self, name, tokens, line):
+        length, fields = self._parse_fields(tokens, line)
+        self._patterns[name].update(length, fields, line)
+
+    def _cmd_hir(self, tokens, line):
+        self._set_pattern("HIR", tokens, line)
+
+    def _cmd_tir(self, tokens, line):
+        self._set_pattern("TIR", tokens, line)
+
+    def _cmd_hdr(self, tokens, line):
+        self._set_pattern("HDR", tokens, line)
+
+    def _cmd_tdr(self, tokens, line):
+        self._set_pattern("TDR", tokens, line)
+
+    def _cmd_sir(self, tokens, line):
+        self._set_pattern("SIR", tokens, line)
+        self._shift(False, "HIR", "SIR", "TIR", self.end_ir, line)
+
+    def _cmd_sdr(self, tokens, line):
+        self._set_pattern("SDR", tokens, line)
+        self._shift(True, "HDR", "SDR", "TDR", self.end_dr, line)
+
+    def _shift(self, is_dr, header, body, trailer, end_state, line):
+        # The header is shifted first and ends up nearest to TDO
+        tdi = 0
+        expected = 0
+        mask = 0
+        compare = False
+        offset = 0
+        for pattern in (
+            self._patterns[header],
+            self._patterns[body],
+            self._patterns[trailer],
+        ):
+            if pattern.length:
+                tdi |= pattern.tdi << offset
+                if pattern.tdo is not None:
+                    compare = True
+                    expected |= pattern.tdo << offset
+                    mask |= pattern.mask << offset
+                offset += pattern.length
+
+        if self.jtag.state in (TapState.PAUSE_DR, TapState.PAUSE_IR):
+            # SVF scans always capture, leave the pause state through Update
+            self.jtag.goto_state(TapState.RUN_TEST_IDLE)
+        self._scan(
+            is_dr, tdi, offset, expected if compare else None, mask, end_state, line
+        )
+
+    def _end_state(self, tokens, line):
+        if len(tokens) != 1 or tokens[0] not in ("IDLE", "DRPAUSE", "IRPAUSE", "RESET"):
+            raise SVFError("Invalid end state", line)
+        return SVF_STATES[tokens[0]]
+
+    def _cmd_endir(self, tokens, line):
+        self.end_ir = self._end_state(tokens, line)
+
+    def _cmd_enddr(self, tokens, line):
+        self.end_dr = self._end_state(tokens, line)
+
+    def _cmd_state(self, tokens, line):
+        for name in tokens:
+            if name not in SVF_STATES:
+                raise SVFError(f"Unknown state {name}", line)
+            self.jtag.goto_state(SVF_STATES[name])
+
+    def _cmd_runtest(self, tokens, line):
+        if tokens and tokens[0] in SVF_STATES:
+            self.run_state = SVF_STATES[tokens.pop(0)]
+            # The end state defaults to the run state when one is given
+            self.run_end_state = self.run_state
+        cycles = 0
+        seconds = 0.0
+        index = 0
+        while index < len(tokens):
+            token = tokens[index]
+            if token == "ENDSTATE":
+                self.run_end_state = SVF_STATES[tokens[index + 1]]
+                index += 2
+            elif token == "MAXIMUM":
+                index += 3
+            elif index + 1 < len(tokens) and tokens[index + 1] in ("TCK", "SCK", "SEC"):
+                value = float(token)
+                if tokens[index + 1] == "SEC":
+                    seconds = max(seconds, value)
+                else:
+                    cycles = int(value)
+                index += 2
+            else:
+                raise SVFError(f"Unexpected {token} in RUNTEST", line)
+        self._run_test(self.run_state, cycles, seconds)
+        self.jtag.goto_state(self.run_end_state)
+
+    def _cmd_trst(self, tokens, line):
+        mode = tokens[0] if tokens else ""
+        if mode == "ON":
+            self.jtag.flush()
+            self.driver.jtag_reset_trst(False)
+        elif mode == "OFF":
+            self.jtag.flush()
+            self.driver.jtag_reset_trst(True)
+        elif mode not in ("Z", "ABSENT"):
+            raise SVFError(f"Invalid TRST mode {mode}", line)
+
+    def _cmd_frequency(self, tokens, line):
+        pass
+
+
+class XSVFPlayer(_Player):
+    """
+    Xilinx XSVF player (XAPP503).
+
+    All instructions except XSDRINC and XSETSDRMASKS are supported. Scans that
+    may be repeated (XREPEAT > 0) are checked immediately so they can be retried,
+    all other comparisons are deferred.
+    """
+
+    XCOMPLETE = 0x00
+    XTDOMASK = 0x01
+    XSIR = 0x02
+    XSDR = 0x03
+    XRUNTEST = 0x04
+    XREPEAT = 0x07
+    XSDRSIZE = 0x08
+    XSDRTDO = 0x09
+    XSETSDRMASKS = 0x0A
+    XSDRINC = 0x0B
+    XSDRB = 0x0C
+    XSDRC = 0x0D
+    XSDRE = 0x0E
+    XSDRTDOB = 0x0F
+    XSDRTDOC = 0x10
+    XSDRTDOE = 0x11
+    XSTATE = 0x12
+    XENDIR = 0x13
+    XENDDR = 0x14
+    XSIR2 = 0x15
+    XCOMMENT = 0x16
+    XWAIT = 0x17
+
+    def __init__(self, jtag):
+        """
+        Initialize the player.
+
+        Args:
+            jtag (JTAG): The JTAG interface to play the file through.
+        """
+        super().__init__(jtag)
+        self.sdr_size = 0
+        self.tdo_mask = 0
+        self.tdo_expected = 0
+        self.repeat = 32
+        self.run_test_us = 0
+        self._offset = 0
+        # Pieces of the XSDRB/C/E scan in progress: (bit offset, length, expected, position)
+        self._pieces = []
+
+    def play(self, source) -> dict:
+        """
+        Play an XSVF file.
+
+        Args:
+            source (str or file): Path of the file, or a binary stream.
+
+        Returns:
+            dict: Statistics of the run with the keys "scans", "scan_bits",
+            "tck_cycles", "seconds" and "bits_per_second".
+        """
+        if isinstance(source, str):
+            with open(source, "rb") as stream:
+                return self._play(lambda: self._run(stream))
+        return self._play(lambda: self._run(source))
+
+    def _read(self, stream, length):
+        data = stream.read(length)
+        if len(data) != length:
+            raise SVFError("Unexpected end of XSVF data", self._offset)
+        self._offset += length
+        return data
+
+    def _read_value(self, stream, bit_length):
+        # XSVF values are stored MSB first
+        return int.from_bytes(self._read(stream, (bit_length + 7) // 8), "big")
+
+    def _run(self, stream):
+        self._offset = 0
+        self._pieces = []
+        while True:
+            position = self._offset
+            opcode = self._read(stream, 1)[0]
+            if opcode == self.XCOMPLETE:
+                break
+            elif opcode == self.XTDOMASK:
+                self.tdo_mask = self._read_value(stream, self.sdr_size)
+            elif opcode in (self.XSIR, self.XSIR2):
+                if opcode == self.XSIR:
+                    length = self._read(stream, 1)[0]
+                else:
+                    length = struct.unpack(">H", self._read(stream, 2))[0]
+                tdi = self._read_value(stream, length)
+                self._xsir(tdi, length, position)
+            elif opcode == self.XSDR:
+                tdi = self._read_value(stream, self.sdr_size)
+                self._xsdr(tdi, self.tdo_expected, position)
+            elif opcode == self.XRUNTEST:
+                self.run_test_us = struct.unpack(">I", self._read(stream, 4))[0]
+            elif opcode == self.XREPEAT:
+                self.repeat = self._read(stream, 1)[0]
+            elif opcode == self.XSDRSIZE:
+                self.sdr_size = struct.unpack(">I", self._read(stream, 4))[0]
+            elif opcode == self.XSDRTDO:
+                tdi = self._read_value(stream, self.sdr_size)
+                self.tdo_expected = self._read_value(stream, self.sdr_size)
+                self._xsdr(tdi, self.tdo_expected, position)
+            elif opcode in (self.XSDRB, self.XSDRC, self.XSDRE):
+                tdi = self._read_value(stream, self.sdr_size)
+                self._xsdr_piece(opcode - self.XSDRB, tdi, None, position)
+            elif opcode in (self.XSDRTDOB, self.XSDRTDOC, self.XSDRTDOE):
+                tdi = self._read_value(stream, self.sdr_size)
+                expected = self._read_value(stream, self.sdr_size)
+                self._xsdr_piece(opcode - self.XSDRTDOB, tdi, expected, position)
+            elif opcode == self.XSTATE:
+                state = self._read(stream, 1)[0]
+                if state == TapState.TEST_LOGIC_RESET:
+                    self.jtag.reset()
+                else:
+                    self.jtag.goto_state(state)
+            elif opcode == self.XENDIR:
+                pause = self._read(stream, 1)[0]
+                self.end_ir = TapState.PAUSE_IR if pause else TapState.RUN_TEST_IDLE
+            elif opcode == self.XENDDR:
+                pause = self._read(stream, 1)[0]
+                self.end_dr = TapState.PAUSE_DR if pause else TapState.RUN_TEST_IDLE
+            elif opcode == self.XCOMMENT:
+                while self._read(stream, 1) != b"\x00":
+                    pass
+            elif opcode == self.XWAIT:
+                wait_state, end_state = self._read(stream, 2)
+                wait_us = struct.unpack(">I", self._read(stream, 4))[0]
+                self._run_test(wait_state, 0, wait_us / 1e6)
+                self.jtag.goto_state(end_state)
+            else:
+                raise SVFError(f"Unsupported XSVF instruction 0x{opcode:02x}", position)
+
+    def _after_scan(self, end_state):
+        # With XRUNTEST set the scan ends in Run-Test/Idle and waits there
+        if self.run_test_us:
+            self._run_test(TapState.RUN_TEST_IDLE, 0, self.run_test_us / 1e6)
+        else:
+            self.jtag.goto_state(end_state)
+
+    def _xsir(self, tdi, length, position):
+        end_state = TapState.RUN_TEST_IDLE if self.run_test_us else self.end_ir
+        self._scan(False, tdi, length, None, 0, end_state, position)
+        self._after_scan(self.end_ir)
+
+    def _xsdr(self, tdi, expected, position):
+        length = self.sdr_size
+        mask = self.tdo_mask
+        if self.repeat == 0 or not mask:
+            end_state = TapState.RUN_TEST_IDLE if self.run_test_us else self.end_dr
+            self._scan(
+                True, tdi, length, expected if mask else None, mask, end_state, position
+            )
+            self._after_scan(self.end_dr)
+            return
+
+        # Checked immediately: on a mismatch go Exit1-DR -> Pause-DR and shift again
+        data = tdi.to_bytes((length + 7) // 8, "little")
+        for attempt in range(self.repeat + 1):
+            self.scans += 1
+            self.scan_bits += length
+            self.tck_cycles += length
+            tdo = self.jtag.shift_dr(data, length, True, TapState.EXIT1_DR)
+            if not (int.from_bytes(tdo, "little") ^ expected) & mask:
+                break
+            self.jtag.goto_state(TapState.PAUSE_DR)
+        else:
+            raise SVFError(
+                f"TDO mismatch after {self.repeat} retries: got "
+                f"{tdo[::-1].hex()}, expected {expected:x}",
+                position,
+            )
+        self._after_scan(self.end_dr)
+
+    def _xsdr_piece(self, kind, tdi, expected, position):
+        # kind 0/1/2 = begin/continue/end of a scan spread over several instructions
+        length = self.sdr_size
+        if kind == 0:
+            self.scans += 1
+            self._pieces = []
+        offset = sum(piece[1] for piece in self._pieces)
+        self._pieces.append((offset, length, expected, position))
+        self.scan_bits += length
+        self.tck_cycles += length
+        tdo = self.jtag.shift_dr(
+            tdi.to_bytes((length + 7) // 8, "little"),
+            length,
+            expected is not None,
+            TapState.SHIFT_DR if kind < 2 else self.end_dr,
+        )
+        if kind < 2:
+            return
+
+        # The completed scan reads back all its pieces, compare each of them
+        value = int.from_bytes(tdo, "little") if tdo else 0
+        for offset, length, expected, position in self._pieces:
+            if expected is not None:
+                byte_length = (length + 7) // 8
+                piece = (value >> offset) & ((1 << length) - 1)
+                self._defer_check(
+                    piece.to_bytes(byte_length, "little"),
+                    expected,
+                    self.tdo_mask,
+                    byte_length,
+                    position,
+                )
+        self._pieces = []
@@ -0,0 +1,359 @@
+"""
+Timeouts Module
+---------------
+
+The `ch347.timeouts` module gives every CH347 bus transfer its own USB
+timeout instead of the single global `set_timeout` value.
+
+`AdaptiveTimeouts.attach(driver)` puts a proxy in front of the driver's DLL
+object. Before each I2C, SPI, EEPROM, JTAG or raw USB transfer it computes a
+deadline from
+
+- the wire time of the payload at the clock configured through
+  `CH347SPI_Init`/`CH347SPI_SetFrequency`, `CH347I2C_Set` or
+  `CH347Jtag_INIT`, times a safety margin, plus the EEPROM write cycles,
+- the USB latency observed for the same operation, estimated like the TCP
+  retransmission timeout: smoothed latency plus four times its mean
+  deviation,
+
+and applies it with `CH347SetTimeout` when it differs from the timeout in
+force. Deadlines are rounded up to a power of two milliseconds, so
+transfers of similar size share a timeout and do not cost an extra call.
+
+A transfer that fails after running into its deadline is treated as a
+timeout: the device is closed and reopened, the driver applies its SPI/I2C/
+JTAG configuration again with `CH347.restore_configuration` and the transfer
+is retried with a doubled deadline. When the retries are used up
+`TimeoutError` is raised, so a wedged device surfaces after milliseconds
+instead of hanging the process.
+Failures that return before their deadline, such as an I2C NACK, are
+returned to the caller unchanged.
+
+Usage Example:
+--------------
+
+from ch347 import CH347
+from ch347.timeouts import AdaptiveTimeouts
+
+driver = CH347()
+timeouts = AdaptiveTimeouts(retries=2)
+timeouts.attach(driver)
+driver.open_device()
+data = driver.spi_read(0x80, [0x03, 0x00, 0x00, 0x00], 1 << 20)
+"""
+
+import ctypes
+import math
+import threading
+import time
+
+from .dll_proxy import DLLProxy, ProxyFunction, argument_value
+from .instrument import Instrumentation
+from .jtag import JTAG
+
+
+class LatencyEstimator:
+    """
+    Smoothed USB latency and mean deviation of one operation (RFC 6298).
+
+    Attributes:
+        smoothed (float): Smoothed latency in seconds, None before the first sample.
+        deviation (float): Mean deviation of the latency in seconds.
+        samples (int): Number of samples.
+    """
+
+    ALPHA = 1 / 8
+    BETA = 1 / 4
+
+    def __init__(self):
+        self.smoothed = None
+        self.deviation = 0.0
+        self.samples = 0
+
+    def add(self, seconds):
+        if self.smoothed is None:
+            self.smoothed = seconds
+            self.deviation = seconds / 2
+        else:
+            self.deviation += self.BETA * (
+                abs(self.smoothed - seconds) - self.deviation
+            )
+            self.smoothed += self.ALPHA * (seconds - self.smoothed)
+        self.samples += 1
+
+    def bound(self, default) -> float:
+        """
+        Latency that a call exceeds only when something is wrong.
+
+        Args:
+            default (float): Seconds to assume before the first sample.
+        """
+        if self.smoothed is None:
+            return default
+        return self.smoothed + 4 * self.deviation
+
+
+class AdaptiveTimeouts:
+    """
+    Per-transfer USB timeouts with retry and device reopen.
+
+    Attributes:
+        I2C_SPEEDS (tuple): SCL frequency in Hz of the CH347I2C_Set modes.
+        SPI_BASE_CLOCK (int): SPI clock in Hz of SPIConfig.Clock 0.
+        EEPROM_WRITE_CYCLE (float): Seconds an EEPROM page write may take.
+        OPERATIONS (dict): DLL function name to the bus it runs on.
+        CONFIGURATION (tuple): DLL functions that set a bus clock.
+        timeouts (int): Number of transfers that ran into their deadline.
+        reopens (int): Number of times the device was reopened.
+    """
+
+    I2C_SPEEDS = (20000, 100000, 400000, 750000)
+    SPI_BASE_CLOCK = 60000000
+    EEPROM_WRITE_CYCLE = 0.005
+
+    OPERATIONS = {
+        "CH347StreamI2C": "i2c",
+        "CH347StreamI2C_RetACK": "i2c",
+        "CH347ReadEEPROM": "i2c",
+        "CH347WriteEEPROM": "i2c",
+        "CH347SPI_Write": "spi",
+        "CH347SPI_Read": "spi",
+        "CH347SPI_WriteRead": "spi",
+        "CH347StreamSPI4": "spi",
+        "CH347Jtag_WriteRead": "jtag",
+        "CH347Jtag_WriteRead_Fast": "jtag",
+        "CH347Jtag_IoScan": "jtag",
+        "CH347Jtag_IoScanT": "jtag",
+        "CH347ReadData": "usb",
+        "CH347WriteData": "usb",
+    }
+
+    CONFIGURATION = (
+        "CH347SPI_SetFrequency",
+        "CH347SPI_Init",
+        "CH347I2C_Set",
+        "CH347Jtag_INIT",
+    )
+
+    def __init__(
+        self,
+        margin=2.0,
+        minimum_ms=8,
+        maximum_ms=60000,
+        initial_latency=0.002,
+        retries=2,
+    ):
+        """
+        Initialize the timeout policy.
+
+        Args:
+            margin (float): Factor applied to the wire time of a transfer (default is 2.0).
+            minimum_ms (int): Shortest timeout applied in milliseconds (default is 8).
+            maximum_ms (int): Longest timeout applied in milliseconds (default is 60000).
+            initial_latency (float): USB latency in seconds assumed before an operation
+                                     has been observed (default is 2 ms).
+            retries (int): Attempts after the first one that times out (default is 2).
+        """
+        self.margin = margin
+        self.minimum_ms = minimum_ms
+        self.maximum_ms = maximum_ms
+        self.initial_latency = initial_latency
+        self.retries = retries
+        self.latency = {}
+        self.lock = threading.Lock()
+        self.timeouts = 0
+        self.reopens = 0
+
+    def attach(self, driver):
+        """
+        Start managing the USB timeouts of a CH347 driver.
+
+        Args:
+            driver (CH347): The driver.
+        """
+        if not isinstance(driver.ch347dll, TimeoutDLL):
+            driver.ch347dll = TimeoutDLL(driver.ch347dll, self, driver)
+        # Timeouts now change behind the driver's configuration shadow
+        driver.shadowed.discard("set_timeout")
+        driver.config_shadow.pop("set_timeout", None)
+
+    @staticmethod
+    def detach(driver):
+        """
+        Stop managing the USB timeouts of a CH347 driver.
+
+        The timeout last applied stays in force.
+
+        Args:
+            driver (CH347): The managed driver.
+        """
+        if isinstance(driver.ch347dll, TimeoutDLL):
+            driver.ch347dll = driver.ch347dll.dll
+        driver.shadowed.add("set_timeout")
+
+    def wire_time(self, operation, args, clocks) -> float:
+        """
+        Seconds a transfer needs on the bus.
+
+        Args:
+            operation (str): DLL function name.
+            args (tuple): Call arguments.
+            clocks (dict): Bus name to clock frequency in Hz.
+
+        Returns:
+            float: The wire time, including EEPROM write cycles.
+        """
+        bus = self.OPERATIONS[operation]
+        payload = Instrumentation.PAYLOAD[operation](args)
+        if bus == "usb":
+            return 0.0
+        if bus == "i2c":
+            # Eight data bits and an acknowledge per byte
+            seconds = payload * 9 / clocks["i2c"]
+            if operation == "CH347WriteEEPROM":
+                eeprom_id = argument_value(args[1])
+                page = (
+                    8
+                    if eeprom_id <= 1
+                    else 16 if eeprom_id <= 4 else 32 if eeprom_id <= 6 else 64
+                )
+                pages = math.ceil(payload / page) + 1
+                seconds += pages * self.EEPROM_WRITE_CYCLE
+            return seconds
+        return payload * 8 / clocks[bus]
+
+    def deadline(self, operation, wire_seconds) -> int:
+        """
+        Timeout of a transfer in milliseconds, a power of two within the limits.
+
+        Args:
+            operation (str): DLL function name.
+            wire_seconds (float): Wire time of the transfer.
+        """
+        with self.lock:
+            estimator = self.latency.get(operation)
+            latency = (
+                estimator.bound(self.initial_latency)
+                if estimator is not None
+                else self.initial_latency
+            )
+        milliseconds = math.ceil((self.margin * wire_seconds + latency) * 1000)
+        milliseconds = max(self.minimum_ms, milliseconds)
+        return min(self.maximum_ms, 1 << (milliseconds - 1).bit_length())
+
+    def observe(self, operation, latency_seconds):
+        """
+        Add the USB latency of a successful transfer, its wire time excluded.
+        """
+        with self.lock:
+            estimator = self.latency.get(operation)
+            if estimator is None:
+                estimator = self.latency[operation] = LatencyEstimator()
+            estimator.add(max(0.0, latency_seconds))
+
+
+class TimeoutDLL(DLLProxy):
+    """
+    Stand-in for the CH347 DLL object that applies AdaptiveTimeouts.
+
+    Attributes:
+        clocks (dict): Bus clocks in Hz as configured through this object,
+                       the slowest setting until configured.
+        applied (dict): Device index to the timeout in ms last applied.
+    """
+
+    def __init__(self, dll, policy, driver):
+        super().__init__(dll)
+        self.policy = policy
+        self.driver = driver
+        self.clocks = {
+            "i2c": policy.I2C_SPEEDS[1],
+            "spi": policy.SPI_BASE_CLOCK >> 7,
+            "jtag": JTAG.CLOCK_RATES[0],
+        }
+        self.applied = {}
+
+    def wrap(self, name, function):
+        if (
+            name in AdaptiveTimeouts.OPERATIONS
+            or name in AdaptiveTimeouts.CONFIGURATION
+            or name in ("CH347SetTimeout", "CH347CloseDevice")
+        ):
+            return TimeoutFunction(name, function, self)
+        return function
+
+    def configure(self, name, args):
+        # Track the bus clocks the transfers run at
+        if name == "CH347I2C_Set":
+            self.clocks["i2c"] = self.policy.I2C_SPEEDS[argument_value(args[1]) & 0x03]
+        elif name == "CH347SPI_Init":
+            config = getattr(args[1], "_obj", args[1])
+            self.clocks["spi"] = self.policy.SPI_BASE_CLOCK >> config.Clock
+        elif name == "CH347SPI_SetFrequency":
+            self.clocks["spi"] = argument_value(args[1]) or self.clocks["spi"]
+        elif name == "CH347Jtag_INIT":
+            rate = min(argument_value(args[1]), len(JTAG.CLOCK_RATES) - 1)
+            self.clocks["jtag"] = JTAG.CLOCK_RATES[rate]
+
+    def apply(self, device, milliseconds):
+        if self.applied.get(device) != milliseconds:
+            if self.dll.CH347SetTimeout(device, milliseconds, milliseconds):
+                self.applied[device] = milliseconds
+                # Other drivers of the device share the configuration shadow
+                self.driver.config_shadow.pop("set_timeout", None)
+
+    def reopen(self, device):
+        self.dll.CH347CloseDevice(device)
+        self.applied.pop(device, None)
+        if self.dll.CH347OpenDevice(device) == ctypes.c_void_p(-1).value:
+            return False
+        self.driver.restore_configuration()
+        self.policy.reopens += 1
+        return True
+
+    def transfer(self, name, function, args):
+        device = argument_value(args[0])
+        wire = self.policy.wire_time(name, args, self.clocks)
+        milliseconds = self.policy.deadline(name, wire)
+        attempts = 0
+        while True:
+            attempts += 1
+            self.apply(device, milliseconds)
+            start = time.perf_counter()
+            result = function(*args)
+            elapsed = time.perf_counter() - start
+            if result:
+                self.policy.observe(name, elapsed - wire)
+                return result
+            if elapsed * 1000 < 0.9 * milliseconds:
+                # Failed before the deadline, e.g. a NACK, not a timeout
+                return result
+            self.policy.timeouts += 1
+            if attempts > self.policy.retries or not self.reopen(device):
+                raise TimeoutError(
+                    f"{name} timed out after {milliseconds} ms ({attempts} attempts)"
+                )
+            milliseconds = min(self.policy.maximum_ms, milliseconds * 2)
+
+
+class TimeoutFunction(ProxyFunction):
+    """
+    Wrapper of a single DLL function managed by TimeoutDLL.
+    """
+
+    def __call__(self, *args):
+        owner = self.owner
+        name = self.name
+        if name in AdaptiveTimeouts.OPERATIONS:
+            return owner.transfer(name, self.function, args)
+        result = self.function(*args)
+        if not result:
+            return result
+        if name == "CH347SetTimeout":
+            # An explicit timeout stays in force until the next transfer
+            owner.applied.pop(argument_value(args[0]), None)
+        elif name == "CH347CloseDevice":
+            owner.applied.pop(argument_value(args[0]), None)
+        else:
+            owner.configure(name, args)
+        return result
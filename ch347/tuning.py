@@ -0,0 +1,410 @@
+"""
+Tuning Module
+-------------
+
+The `ch347.tuning` module finds the fastest bus settings a board carries
+reliably, so each fixture runs at its own safe maximum instead of a
+conservative default.
+
+`SPIClockTuner` steps the `SPIConfig.Clock` divider from 468.75 kHz up to
+60 MHz. At every setting it reads a known pattern several times: the JEDEC
+ID and a CRC-32 over a large read of a SPI flash, or a pseudo-random
+pattern sent through a MOSI-MISO loopback. The reference is taken at the
+slowest clock. Stepping stops at the first clock that fails, and the
+result is the fastest passing clock slowed down by a safety margin.
+
+`I2CSpeedTuner` tries every `i2c_set` speed (20/100/400/750 kHz) with clock
+stretching off and on and open-drain and push-pull pins. For each
+combination it reads the ID register of every probed device repeatedly
+through `stream_i2c_ret_ack`, checking the acknowledge count and the ID.
+The fastest combination every device passes is applied; at equal speed
+open-drain is preferred over push-pull and stretching off over on.
+
+Results are cached in a JSON file per device serial number, so later runs
+apply the tuned setting without probing.
+
+Usage Example:
+--------------
+
+from ch347 import CH347, SPIConfig
+from ch347.tuning import I2CSpeedTuner, SPIClockTuner
+
+driver = CH347()
+driver.open_device()
+config = SPIConfig(Mode=0, Clock=7, ByteOrder=1, ChipSelect=0x80)
+result = SPIClockTuner(driver, config).tune()
+print(result["hz"])
+
+probes = [I2CSpeedTuner.ina226(0x40), I2CSpeedTuner.mpu6050(0x68)]
+print(I2CSpeedTuner(driver, probes).tune())
+"""
+
+import ctypes
+import json
+import os
+import random
+import threading
+import time
+import zlib
+
+from .ch347 import SPIConfig
+
+
+class TuningCache:
+    """
+    Tuning results per device serial number, kept in a JSON file.
+
+    Attributes:
+        DEFAULT_PATH (str): Cache file used when none is given.
+    """
+
+    DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".ch347", "tuning.json")
+
+    def __init__(self, path=None):
+        """
+        Load the cache.
+
+        Args:
+            path (str, optional): Cache file (default is DEFAULT_PATH).
+        """
+        self.path = path if path is not None else self.DEFAULT_PATH
+        self.lock = threading.Lock()
+        try:
+            with open(self.path) as file:
+                self.entries = json.load(file)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def get(self, serial_number, key):
+        """
+        Look up a result.
+
+        Args:
+            serial_number (str): Device serial number.
+            key (str): What was tuned, e.g. "spi:0x80:flash".
+
+        Returns:
+            dict: The stored result, None when missing.
+        """
+        with self.lock:
+            return self.entries.get(serial_number, {}).get(key)
+
+    def put(self, serial_number, key, result):
+        """
+        Store a result and write the file, replacing it atomically.
+        """
+        with self.lock:
+            self.entries.setdefault(serial_number, {})[key] = result
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temporary = f"{self.path}.{os.getpid()}.tmp"
+            with open(temporary, "w") as file:
+                json.dump(self.entries, file, indent=2, sort_keys=True)
+            os.replace(temporary, self.path)
+
+
+class SPIClockTuner:
+    """
+    Finds the fastest reliable SPIConfig.Clock setting of a board.
+
+    Attributes:
+        BASE_CLOCK (int): SPI clock in Hz of Clock 0.
+        SLOWEST (int): Largest Clock divider setting.
+        JEDEC_ID (int): Read JEDEC ID command.
+        READ (int): Read data command.
+    """
+
+    BASE_CLOCK = 60000000
+    SLOWEST = 7
+
+    JEDEC_ID = 0x9F
+    READ = 0x03
+
+    def __init__(
+        self,
+        driver,
+        config=None,
+        pattern="flash",
+        read_length=64 * 1024,
+        passes=3,
+        margin=1,
+        cache=None,
+    ):
+        """
+        Initialize the tuner.
+
+        Args:
+            driver: An instance of the CH347 driver, with the device open.
+            config (SPIConfig, optional): SPI settings to tune the clock of; chip
+                select 0x80 (CS1) in mode 0, MSB first, by default.
+            pattern (str): "flash" to read a SPI flash, "loopback" for MOSI wired
+                           to MISO (default is "flash").
+            read_length (int): Bytes read per pass (default is 64 KiB).
+            passes (int): Reads that must all match at a clock (default is 3).
+            margin (int): Divider steps below the fastest passing clock (default is 1).
+            cache (TuningCache, optional): Result cache (default is TuningCache()).
+        """
+        if pattern not in ("flash", "loopback"):
+            raise ValueError(f"Unsupported pattern: {pattern}")
+        self.driver = driver
+        self.config = SPIConfig.from_buffer_copy(
+            config
+            if config is not None
+            else SPIConfig(Mode=0, Clock=self.SLOWEST, ByteOrder=1, ChipSelect=0x80)
+        )
+        self.chip_select = self.config.ChipSelect & 0xFF
+        self.pattern = pattern
+        self.read_length = read_length
+        self.passes = passes
+        self.margin = margin
+        self.cache = cache if cache is not None else TuningCache()
+        self.reference = None
+
+    @property
+    def key(self) -> str:
+        return f"spi:{self.chip_select:#04x}:{self.pattern}"
+
+    @classmethod
+    def clock_hz(cls, clock) -> int:
+        return cls.BASE_CLOCK >> clock
+
+    def apply(self, clock) -> bool:
+        """
+        Initialize the SPI controller with a Clock setting.
+        """
+        self.config.Clock = clock
+        return self.driver.spi_init(self.config)
+
+    def _read(self):
+        if self.pattern == "loopback":
+            pattern = self.reference
+            buffer = ctypes.create_string_buffer(pattern, len(pattern))
+            if not self.driver.spi_write_read(self.chip_select, len(pattern), buffer):
+                return None
+            return buffer.raw
+        jedec = self.driver.spi_read(self.chip_select, [self.JEDEC_ID], 3)
+        data = self.driver.spi_read(
+            self.chip_select, [self.READ, 0, 0, 0], self.read_length
+        )
+        if jedec is None or data is None:
+            return None
+        return bytes(jedec) + zlib.crc32(bytes(data)).to_bytes(4, "little")
+
+    def verify(self, clock) -> bool:
+        """
+        Check that every pass at a Clock setting reads the reference.
+        """
+        if not self.apply(clock):
+            return False
+        for _ in range(self.passes):
+            if self._read() != self.reference:
+                return False
+        return True
+
+    def tune(self, force=False) -> dict:
+        """
+        Find and apply the fastest reliable clock.
+
+        Args:
+            force (bool): Probe even when the cache has a result (default is False).
+
+        Returns:
+            dict: "clock" (the SPIConfig.Clock setting applied), "hz", "fastest"
+                  (the fastest passing setting), "serial_number", "tuned" (epoch
+                  seconds) and "cached".
+        """
+        serial_number = self.driver.get_serial_number() or ""
+        if not force:
+            result = self.cache.get(serial_number, self.key)
+            if result is not None:
+                self.apply(result["clock"])
+                return dict(result, cached=True)
+
+        if self.pattern == "loopback":
+            generator = random.Random(0x347)
+            self.reference = bytes(
+                generator.getrandbits(8) for _ in range(self.read_length)
+            )
+        else:
+            self.apply(self.SLOWEST)
+            self.reference = self._read()
+            if self.reference is None or self.reference[:3] in (
+                b"\x00\x00\x00",
+                b"\xff\xff\xff",
+            ):
+                raise RuntimeError("No SPI flash answers the JEDEC ID command")
+
+        fastest = None
+        for clock in range(self.SLOWEST, -1, -1):
+            if not self.verify(clock):
+                break
+            fastest = clock
+        if fastest is None:
+            raise RuntimeError("SPI transfers fail even at the slowest clock")
+
+        clock = min(self.SLOWEST, fastest + self.margin)
+        self.apply(clock)
+        result = {
+            "clock": clock,
+            "hz": self.clock_hz(clock),
+            "fastest": fastest,
+            "serial_number": serial_number,
+            "tuned": time.time(),
+        }
+        self.cache.put(serial_number, self.key, result)
+        return dict(result, cached=False)
+
+
+class I2CProbe:
+    """
+    A device ID register read used to check an I2C setting.
+
+    Attributes:
+        address (int): 7-bit device address.
+        register (int): ID register address.
+        expected (bytes): ID register contents.
+    """
+
+    def __init__(self, address, register, expected):
+        self.address = address
+        self.register = register
+        self.expected = bytes(expected)
+
+    def check(self, driver) -> bool:
+        """
+        Read the ID register once and compare the acknowledges and the data.
+        """
+        result, data, acks = driver.stream_i2c_ret_ack(
+            [self.address << 1, self.register], len(self.expected)
+        )
+        # Address, register and the repeated start address are acknowledged
+        return bool(result) and acks == 3 and bytes(data or b"") == self.expected
+
+
+class I2CSpeedTuner:
+    """
+    Finds the fastest reliable speed, stretch and drive mode of an I2C bus.
+
+    Attributes:
+        SPEEDS (tuple): SCL frequency in Hz of the i2c_set modes.
+        VARIANTS (tuple): (stretch, drive mode) combinations in order of preference.
+    """
+
+    SPEEDS = (20000, 100000, 400000, 750000)
+    VARIANTS = ((False, 0), (True, 0), (False, 1), (True, 1))
+
+    def __init__(self, driver, probes, passes=20, cache=None):
+        """
+        Initialize the tuner.
+
+        Args:
+            driver: An instance of the CH347 driver, with the device open.
+            probes (list): I2CProbe of every device on the bus to keep working.
+            passes (int): ID reads per device that must all pass (default is 20).
+            cache (TuningCache, optional): Result cache (default is TuningCache()).
+        """
+        if not probes:
+            raise ValueError("At least one I2C probe is required")
+        self.driver = driver
+        self.probes = list(probes)
+        self.passes = passes
+        self.cache = cache if cache is not None else TuningCache()
+
+    @staticmethod
+    def ina226(address=0x40) -> I2CProbe:
+        # MANUFACTURER_ID_REG reads "TI"
+        return I2CProbe(address, 0xFE, b"\x54\x49")
+
+    @staticmethod
+    def mpu6050(address=0x68) -> I2CProbe:
+        # WHO_AM_I holds the upper six bits of the default address
+        return I2CProbe(address, 0x75, b"\x68")
+
+    @property
+    def key(self) -> str:
+        addresses = ",".join(f"{probe.address:#04x}" for probe in self.probes)
+        return f"i2c:{addresses}"
+
+    def apply(self, mode, stretch, drive_mode) -> bool:
+        """
+        Configure the bus.
+
+        Args:
+            mode (int): i2c_set speed mode, 0-3.
+            stretch (bool): Clock stretching enable.
+            drive_mode (int): 0=open-drain, 1=push-pull.
+        """
+        return bool(
+            self.driver.i2c_set(mode)
+            and self.driver.i2c_set_stretch(stretch)
+            and self.driver.i2c_set_driver_mode(drive_mode)
+        )
+
+    def verify(self, probe, mode, stretch, drive_mode) -> bool:
+        """
+        Check that every ID read of a device passes with a bus setting.
+        """
+        if not self.apply(mode, stretch, drive_mode):
+            return False
+        return all(probe.check(self.driver) for _ in range(self.passes))
+
+    def tune(self, force=False) -> dict:
+        """
+        Find and apply the fastest setting every probed device passes.
+
+        Args:
+            force (bool): Probe even when the cache has a result (default is False).
+
+        Returns:
+            dict: "mode", "hz", "stretch", "drive_mode", "devices" (address to the
+                  fastest mode the device passes alone, None if it fails at all),
+                  "serial_number", "tuned" (epoch seconds) and "cached".
+        """
+        serial_number = self.driver.get_serial_number() or ""
+        if not force:
+            result = self.cache.get(serial_number, self.key)
+            if result is not None:
+                self.apply(result["mode"], result["stretch"], result["drive_mode"])
+                return dict(result, cached=True)
+
+        passing = {}
+        for mode in range(len(self.SPEEDS)):
+            for variant in self.VARIANTS:
+                passing[mode, variant] = [
+                    self.verify(probe, mode, *variant) for probe in self.probes
+                ]
+
+        chosen = None
+        for mode in range(len(self.SPEEDS) - 1, -1, -1):
+            for variant in self.VARIANTS:
+                if all(passing[mode, variant]):
+                    chosen = mode, variant
+                    break
+            if chosen is not None:
+                break
+        if chosen is None:
+            raise RuntimeError("No I2C setting reads every probed device reliably")
+
+        devices = {}
+        for index, probe in enumerate(self.probes):
+            modes = [
+                mode
+                for mode in range(len(self.SPEEDS))
+                if any(passing[mode, variant][index] for variant in self.VARIANTS)
+            ]
+            devices[f"{probe.address:#04x}"] = max(modes) if modes else None
+
+        mode, (stretch, drive_mode) = chosen
+        self.apply(mode, stretch, drive_mode)
+        result = {
+            "mode": mode,
+            "hz": self.SPEEDS[mode],
+            "stretch": stretch,
+            "drive_mode": drive_mode,
+            "devices": devices,
+            "serial_number": serial_number,
+            "tuned": time.time(),
+        }
+        self.cache.put(serial_number, self.key, result)
+        return dict(result, cached=False)
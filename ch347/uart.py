@@ -0,0 +1,443 @@
+"""
+UART Module
+-----------
+
+The `ch347.uart` module provides `UARTPort`, a buffered, pyserial-like port on
+the CH347 UART.
+
+A background reader thread asks `CH347Uart_QueryBufUpload` how much data the
+device holds and reads it with `CH347Uart_Read` straight into a preallocated
+ring buffer, so received data is moved in blocks and never handled byte by
+byte in Python. Consumers take data out with `read`, `readinto` or
+`read_until`, which scans the ring with `bytearray.find`. Optionally every
+received byte is also appended to an mmap-ed capture file.
+
+Usage Example:
+--------------
+
+from ch347 import CH347
+from ch347.uart import UARTPort
+
+with UARTPort(CH347(), baudrate=3000000, timeout=1.0, capture="log.bin") as port:
+    port.write(b"AT\\r\\n")
+    print(port.read_until(b"\\r\\n"))
+"""
+
+import mmap
+import threading
+import time
+
+
+class ByteRing:
+    """
+    Preallocated ring buffer of bytes for one producer and one consumer.
+
+    The producer fills the ring in place through `writable()` and `commit()`,
+    the consumer takes data out through `peek()` and `consume()`. Positions
+    only grow; the index into the buffer is the position modulo the capacity.
+
+    Attributes:
+        capacity (int): Size of the ring in bytes.
+    """
+
+    def __init__(self, capacity=1 << 20):
+        self.capacity = capacity
+        self.buffer = bytearray(capacity)
+        self.view = memoryview(self.buffer)
+        self.head = 0
+        self.tail = 0
+
+    def __len__(self):
+        return self.head - self.tail
+
+    def free(self) -> int:
+        return self.capacity - (self.head - self.tail)
+
+    def writable(self) -> memoryview:
+        """
+        Contiguous free space after the head, to be filled by the producer.
+        """
+        start = self.head % self.capacity
+        return self.view[start : start + min(self.free(), self.capacity - start)]
+
+    def commit(self, count):
+        self.head += count
+
+    def segments(self, start=0, count=None):
+        """
+        The buffered data from offset start on, as at most two memoryviews.
+        """
+        available = len(self) - start
+        if count is not None:
+            available = min(available, count)
+        if available <= 0:
+            return ()
+        first = (self.tail + start) % self.capacity
+        end = first + available
+        if end <= self.capacity:
+            return (self.view[first:end],)
+        return (self.view[first:], self.view[: end - self.capacity])
+
+    def consume(self, count):
+        self.tail += count
+
+    def find(self, separator, start=0) -> int:
+        """
+        Offset of separator in the buffered data, searching from offset start.
+
+        Returns:
+            int: Offset relative to the tail, or -1 if not found.
+        """
+        available = len(self)
+        if start >= available:
+            return -1
+        first = (self.tail + start) % self.capacity
+        end = min(first + available - start, self.capacity)
+        index = self.buffer.find(separator, first, end)
+        if index >= 0:
+            return start + index - first
+        wrapped = available - start - (end - first)
+        if wrapped <= 0:
+            return -1
+        # A separator may straddle the end of the buffer
+        overlap = len(separator) - 1
+        if overlap:
+            edge = max(first, end - overlap)
+            joint = self.buffer[edge:end] + self.buffer[: min(overlap, wrapped)]
+            index = joint.find(separator)
+            if index >= 0:
+                return start + edge - first + index
+        index = self.buffer.find(separator, 0, wrapped)
+        if index >= 0:
+            return start + end - first + index
+        return -1
+
+
+class CaptureFile:
+    """
+    Append-only capture file written through a memory map.
+
+    The file grows by doubling its mapping and is truncated to the data
+    length on close.
+
+    Attributes:
+        length (int): Number of bytes captured.
+    """
+
+    def __init__(self, path, initial_size=1 << 24):
+        self.file = open(path, "w+b")
+        self.size = initial_size
+        self.file.truncate(self.size)
+        self.map = mmap.mmap(self.file.fileno(), self.size)
+        self.length = 0
+
+    def write(self, data):
+        end = self.length + len(data)
+        if end > self.size:
+            self.map.close()
+            while self.size < end:
+                self.size *= 2
+            self.file.truncate(self.size)
+            self.map = mmap.mmap(self.file.fileno(), self.size)
+        self.map[self.length : end] = data
+        self.length = end
+
+    def close(self):
+        self.map.close()
+        self.file.truncate(self.length)
+        self.file.close()
+
+
+class UARTPort:
+    """
+    Buffered CH347 UART port with a background reader thread.
+
+    Attributes:
+        bytes_received (int): Number of bytes read from the device.
+        reads (int): Number of CH347Uart_Read calls that returned data.
+        overflows (int): Number of times the reader had to wait for the ring to drain.
+        error (Exception): The failure that stopped the reader thread, raised by
+                           the reads once the buffered data is used up.
+    """
+
+    # Upper bound of a single CH347Uart_Read when the device reports no data
+    READ_CHUNK = 4096
+
+    # USB read timeout in milliseconds, bounds how long the reader blocks
+    USB_READ_TIMEOUT = 10
+
+    PARITY_NONE = 0
+    PARITY_ODD = 1
+    PARITY_EVEN = 2
+    PARITY_MARK = 3
+    PARITY_SPACE = 4
+
+    STOPBITS_ONE = 0
+    STOPBITS_ONE_POINT_FIVE = 1
+    STOPBITS_TWO = 2
+
+    def __init__(
+        self,
+        driver,
+        baudrate=115200,
+        bytesize=8,
+        parity=PARITY_NONE,
+        stopbits=STOPBITS_ONE,
+        timeout=None,
+        buffer_size=1 << 20,
+        capture=None,
+    ):
+        """
+        Open and configure the UART and start the reader thread.
+
+        Args:
+            driver: An instance of the CH347 driver.
+            baudrate (int): Baud rate (default is 115200).
+            bytesize (int): Data bits, 5, 6, 7, 8 or 16 (default is 8).
+            parity (int): One of the PARITY_* constants (default is PARITY_NONE).
+            stopbits (int): One of the STOPBITS_* constants (default is STOPBITS_ONE).
+            timeout (float, optional): Read timeout in seconds, None blocks until enough data arrives.
+            buffer_size (int): Size of the receive ring buffer in bytes (default is 1 MiB).
+            capture (str, optional): Path of a file that receives a copy of all data read.
+        """
+        self.driver = driver
+        self.timeout = timeout
+        self.bytesize = bytesize
+        self.parity = parity
+        self.stopbits = stopbits
+        self._baudrate = baudrate
+        self.ring = ByteRing(buffer_size)
+        self.capture = CaptureFile(capture) if capture is not None else None
+        self.bytes_received = 0
+        self.reads = 0
+        self.overflows = 0
+        self.error = None
+        self._cond = threading.Condition()
+
+        if self.driver.uart_open() is None:
+            raise RuntimeError("CH347Uart_Open failed")
+        self._configure()
+        if not self.driver.uart_set_timeout(0xFFFFFFFF, self.USB_READ_TIMEOUT):
+            raise RuntimeError("CH347Uart_SetTimeout failed")
+
+        self.is_open = True
+        self._thread = threading.Thread(target=self._reader, daemon=True)
+        self._thread.start()
+
+    def _configure(self):
+        if not self.driver.uart_init(
+            self._baudrate, self.bytesize, self.parity, self.stopbits
+        ):
+            raise RuntimeError("CH347Uart_Init failed")
+
+    @property
+    def baudrate(self) -> int:
+        return self._baudrate
+
+    @baudrate.setter
+    def baudrate(self, value):
+        self._baudrate = value
+        self._configure()
+
+    @property
+    def in_waiting(self) -> int:
+        """
+        Number of bytes in the receive buffer.
+        """
+        return len(self.ring)
+
+    def _reader(self):
+        ring = self.ring
+        driver = self.driver
+        while self.is_open:
+            with self._cond:
+                if not ring.free():
+                    self.overflows += 1
+                while not ring.free() and self.is_open:
+                    self._cond.wait(0.1)
+            if not self.is_open:
+                break
+            pending = driver.uart_query_buf_upload()
+            if pending is None:
+                self.error = RuntimeError("CH347Uart_QueryBufUpload failed")
+                break
+            target = ring.writable()
+            length = min(len(target), pending or self.READ_CHUNK)
+            count = driver.uart_read_into(target[:length], length)
+            if count is None:
+                self.error = RuntimeError("CH347Uart_Read failed")
+                break
+            if not count:
+                continue
+            if self.capture is not None:
+                self.capture.write(target[:count])
+            with self._cond:
+                ring.commit(count)
+                self.bytes_received += count
+                self.reads += 1
+                self._cond.notify_all()
+        with self._cond:
+            self._cond.notify_all()
+
+    def _wait(self, predicate) -> bool:
+        # Wait until predicate() holds, the timeout expires or the reader stops
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        with self._cond:
+            while not predicate():
+                if self.error is not None:
+                    raise self.error
+                if not self.is_open:
+                    return False
+                if deadline is None:
+                    self._cond.wait()
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def _take(self, out, count) -> int:
+        offset = 0
+        for segment in self.ring.segments(0, count):
+            out[offset : offset + len(segment)] = segment
+            offset += len(segment)
+        with self._cond:
+            self.ring.consume(offset)
+            self._cond.notify_all()
+        return offset
+
+    def readinto(self, buffer) -> int:
+        """
+        Read into a writable buffer, waiting for it to fill up to the timeout.
+
+        Args:
+            buffer: Writable object supporting the buffer protocol.
+
+        Returns:
+            int: Number of bytes read, less than len(buffer) on timeout.
+
+        Raises:
+            RuntimeError: If the reader thread failed before enough data arrived.
+        """
+        view = memoryview(buffer).cast("B")
+        size = len(view)
+        self._wait(lambda: len(self.ring) >= size)
+        return self._take(view, size)
+
+    def read(self, size=1) -> bytes:
+        """
+        Read size bytes, waiting for them up to the timeout.
+
+        Args:
+            size (int): Number of bytes to read (default is 1).
+
+        Returns:
+            bytes: The data read, shorter than size on timeout.
+        """
+        out = bytearray(size)
+        count = self.readinto(out)
+        del out[count:]
+        return bytes(out)
+
+    def read_all(self) -> bytes:
+        """
+        Read everything in the receive buffer without waiting.
+
+        Returns:
+            bytes: The buffered data.
+        """
+        out = bytearray(len(self.ring))
+        self._take(out, len(out))
+        return bytes(out)
+
+    def read_until(self, expected=b"\n", size=None) -> bytes:
+        """
+        Read until expected is found, size bytes are read or the timeout expires.
+
+        Args:
+            expected (bytes): Terminator to look for (default is b"\\n").
+            size (int, optional): Maximum number of bytes to read.
+
+        Returns:
+            bytes: The data read, including the terminator if it was found.
+
+        Raises:
+            RuntimeError: If the reader thread failed before the terminator arrived.
+        """
+        state = {"searched": 0, "end": -1}
+
+        def found():
+            available = len(self.ring)
+            if size is not None and available >= size:
+                state["end"] = size
+            index = self.ring.find(expected, state["searched"])
+            if index >= 0:
+                end = index + len(expected)
+                if size is None or end <= size:
+                    state["end"] = end
+            else:
+                # Do not scan the same bytes again on the next wakeup
+                state["searched"] = max(0, available - len(expected) + 1)
+            return state["end"] >= 0
+
+        self._wait(found)
+        count = state["end"] if state["end"] >= 0 else len(self.ring)
+        if size is not None:
+            count = min(count, size)
+        out = bytearray(count)
+        self._take(out, count)
+        return bytes(out)
+
+    def readline(self, size=None) -> bytes:
+        return self.read_until(b"\n", size)
+
+    def write(self, data) -> int:
+        """
+        Write data to the UART.
+
+        Args:
+            data (bytes): Data to write.
+
+        Returns:
+            int: Number of bytes written, fewer than given when the device
+                 stops accepting data.
+        """
+        view = memoryview(data).cast("B")
+        written = 0
+        while written < len(view):
+            count = self.driver.uart_write(view[written:])
+            if count is None:
+                raise RuntimeError("CH347Uart_Write failed")
+            if not count:
+                break
+            written += count
+        return written
+
+    def reset_input_buffer(self):
+        """
+        Discard all data in the receive buffer.
+        """
+        with self._cond:
+            self.ring.consume(len(self.ring))
+            self._cond.notify_all()
+
+    def close(self):
+        """
+        Stop the reader thread, close the UART and the capture file.
+        """
+        if not self.is_open:
+            return
+        self.is_open = False
+        with self._cond:
+            self._cond.notify_all()
+        self._thread.join()
+        self.driver.uart_close()
+        if self.capture is not None:
+            self.capture.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
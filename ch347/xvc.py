@@ -0,0 +1,395 @@
+"""
+XVC Module
+----------
+
+The `ch347.xvc` module serves the CH347 JTAG interface over Xilinx Virtual Cable
+(XVC 1.0), so Vivado or openFPGALoader can use it through a TCP connection.
+
+The TMS/TDI vectors of `shift:` requests are split on the host: bits clocked
+while the TAP sits in Shift-DR/IR go out through `CH347Jtag_IoScanT` in packets
+of up to 4096 bytes, all other bits are TMS moves sent through
+`CH347Jtag_TmsChange`. Every request already waiting in the socket buffer is
+handled together, so TMS moves and shifts that run across request boundaries
+are merged into the same USB transfers.
+
+Usage Example:
+--------------
+
+from ch347 import CH347
+from ch347.xvc import XVCServer
+
+server = XVCServer(CH347(), ("127.0.0.1", 2542))
+server.serve_forever()
+"""
+
+import select
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+from .jtag import JTAG, TapState
+
+
+class XVCBackend:
+    """
+    Executes XVC shift vectors on the CH347 JTAG bindings.
+
+    Attributes:
+        BUFFER_SIZE (int): Size of the CH347 JTAG hardware buffer in bytes.
+        CLOCK_RATES (tuple): TCK frequency in Hz of each CH347Jtag_INIT clock rate.
+        state (int): The TAP state tracked from the TMS bits clocked so far.
+    """
+
+    BUFFER_SIZE = 4096
+
+    CLOCK_RATES = JTAG.CLOCK_RATES
+
+    def __init__(self, driver, clock_rate=4):
+        """
+        Initialize the JTAG interface and reset the TAP.
+
+        Args:
+            driver: An instance of the CH347 driver.
+            clock_rate (int): Initial CH347Jtag_INIT clock rate, 0-5 (default is 4).
+        """
+        self.driver = driver
+        self.driver.open_device()
+        self.clock_rate = None
+        self.set_clock_rate(clock_rate)
+        self.state = TapState.TEST_LOGIC_RESET
+        self._tms_change(0x1F, 5)
+
+    def set_clock_rate(self, clock_rate):
+        if not self.driver.jtag_init(clock_rate):
+            raise RuntimeError("CH347Jtag_INIT failed")
+        self.clock_rate = clock_rate
+
+    def set_tck_period(self, period_ns: int) -> int:
+        """
+        Select the fastest clock rate not faster than the requested TCK period.
+
+        Args:
+            period_ns (int): Requested TCK period in nanoseconds.
+
+        Returns:
+            int: The TCK period actually set, in nanoseconds.
+        """
+        clock_rate = 0
+        for rate, frequency in enumerate(self.CLOCK_RATES):
+            if frequency * period_ns <= 1000000000:
+                clock_rate = rate
+        if clock_rate != self.clock_rate:
+            self.set_clock_rate(clock_rate)
+        return 1000000000 // self.CLOCK_RATES[clock_rate]
+
+    def shift(self, vectors):
+        """
+        Clock a sequence of XVC shift vectors.
+
+        Args:
+            vectors (list): (bit_count, tms_bytes, tdi_bytes) tuples in request order.
+
+        Returns:
+            list: The TDO bytes of each vector. Bits clocked outside Shift-DR/IR read as 0.
+        """
+        # Concatenate all vectors into single bit streams
+        tms = 0
+        tdi = 0
+        total = 0
+        for bit_count, tms_bytes, tdi_bytes in vectors:
+            mask = (1 << bit_count) - 1
+            tms |= (int.from_bytes(tms_bytes, "little") & mask) << total
+            tdi |= (int.from_bytes(tdi_bytes, "little") & mask) << total
+            total += bit_count
+
+        tdo = 0
+        position = 0
+        tms_start = 0
+        while position < total:
+            if self.state in (TapState.SHIFT_DR, TapState.SHIFT_IR):
+                # Shift until the first TMS high bit, which also shifts and exits
+                rest = tms >> position
+                if rest:
+                    length = (rest & -rest).bit_length()
+                    last = True
+                else:
+                    length = total - position
+                    last = False
+                self._tms_change(tms >> tms_start, position - tms_start)
+                tdo |= self._scan(tdi >> position, length, last) << position
+                position += length
+                tms_start = position
+                if last:
+                    self.state = TapState.TRANSITIONS[self.state][1]
+            elif not (tms >> position) & 1:
+                # TMS low keeps Run-Test/Idle and the pause states where they
+                # are, every other state moves on by one
+                next_state = TapState.TRANSITIONS[self.state][0]
+                if next_state == self.state:
+                    rest = tms >> position
+                    length = (
+                        (rest & -rest).bit_length() - 1 if rest else total - position
+                    )
+                    position += min(length, total - position)
+                else:
+                    self.state = next_state
+                    position += 1
+            else:
+                self.state = TapState.TRANSITIONS[self.state][(tms >> position) & 1]
+                position += 1
+        self._tms_change(tms >> tms_start, position - tms_start)
+
+        results = []
+        offset = 0
+        for bit_count, _, _ in vectors:
+            value = (tdo >> offset) & ((1 << bit_count) - 1)
+            results.append(value.to_bytes((bit_count + 7) // 8, "little"))
+            offset += bit_count
+        return results
+
+    def _tms_change(self, bits, count):
+        max_bits = self.BUFFER_SIZE * 8
+        while count > 0:
+            step = min(count, max_bits)
+            chunk = bits & ((1 << step) - 1)
+            if not self.driver.jtag_tms_change(
+                chunk.to_bytes((step + 7) // 8, "little"), step, 0
+            ):
+                raise RuntimeError("CH347Jtag_TmsChange failed")
+            bits >>= step
+            count -= step
+
+    def _scan(self, bits, length, last):
+        max_bits = self.BUFFER_SIZE * 8
+        tdo = 0
+        offset = 0
+        while offset < length:
+            step = min(length - offset, max_bits)
+            chunk = (bits >> offset) & ((1 << step) - 1)
+            result = self.driver.jtag_io_scan_t(
+                chunk.to_bytes((step + 7) // 8, "little"),
+                step,
+                True,
+                last and offset + step == length,
+            )
+            if result is None:
+                raise RuntimeError("CH347Jtag_IoScanT failed")
+            tdo |= (int.from_bytes(result, "little") & ((1 << step) - 1)) << offset
+            offset += step
+        return tdo
+
+
+class _XVCHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        sock = self.request
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        buffer = bytearray()
+        while True:
+            # Block for more data, then take whatever else is already queued
+            data = sock.recv(self.server.RECEIVE_SIZE)
+            if not data:
+                return
+            buffer += data
+            while select.select([sock], [], [], 0)[0]:
+                data = sock.recv(self.server.RECEIVE_SIZE)
+                if not data:
+                    break
+                buffer += data
+            try:
+                consumed, response = self.server.process(buffer)
+            except ValueError:
+                return
+            del buffer[:consumed]
+            if response:
+                sock.sendall(response)
+
+
+class XVCServer(socketserver.TCPServer):
+    """
+    XVC 1.0 TCP server backed by the CH347 JTAG interface.
+
+    Only one client is served at a time, as the JTAG chain cannot be shared.
+
+    Attributes:
+        MAX_VECTOR_BYTES (int): Largest TMS/TDI vector accepted, reported by getinfo.
+    """
+
+    allow_reuse_address = True
+
+    MAX_VECTOR_BYTES = 32768
+    COMMANDS = (b"getinfo:", b"settck:", b"shift:")
+    RECEIVE_SIZE = 2 * MAX_VECTOR_BYTES + 10
+
+    def __init__(self, driver, server_address=("127.0.0.1", 2542), clock_rate=4):
+        """
+        Initialize the server.
+
+        Args:
+            driver: An instance of the CH347 driver.
+            server_address (tuple): (host, port) to listen on (default is 127.0.0.1:2542).
+            clock_rate (int): Initial CH347Jtag_INIT clock rate, 0-5 (default is 4).
+        """
+        self.backend = XVCBackend(driver, clock_rate)
+        self.requests = 0
+        self.transfers = 0
+        super().__init__(server_address, _XVCHandler)
+
+    def process(self, buffer):
+        """
+        Handle all complete commands at the start of the buffer.
+
+        Consecutive shift commands are executed as one batch.
+
+        Args:
+            buffer (bytes): Data received from the client.
+
+        Returns:
+            tuple: (consumed, response) - the number of bytes used and the bytes to send back.
+
+        Raises:
+            ValueError: If the buffer does not start with a valid command.
+        """
+        response = bytearray()
+        vectors = []
+        position = 0
+        while position < len(buffer):
+            head = bytes(buffer[position : position + 8])
+            if head.startswith(b"shift:"):
+                if len(buffer) < position + 10:
+                    break
+                bit_count = struct.unpack_from("<I", buffer, position + 6)[0]
+                byte_count = (bit_count + 7) // 8
+                if byte_count > self.MAX_VECTOR_BYTES:
+                    raise ValueError("XVC vector too long")
+                end = position + 10 + 2 * byte_count
+                if len(buffer) < end:
+                    break
+                tms = buffer[position + 10 : position + 10 + byte_count]
+                tdi = buffer[position + 10 + byte_count : end]
+                vectors.append((bit_count, tms, tdi))
+                position = end
+                continue
+
+            # Any other command ends the current batch of shifts
+            if vectors:
+                response += self._shift(vectors)
+                vectors = []
+            if head.startswith(b"getinfo:"):
+                response += b"xvcServer_v1.0:%d\n" % self.MAX_VECTOR_BYTES
+                position += 8
+            elif head.startswith(b"settck:"):
+                if len(buffer) < position + 11:
+                    break
+                period = struct.unpack_from("<I", buffer, position + 7)[0]
+                response += struct.pack("<I", self.backend.set_tck_period(period))
+                position += 11
+            elif any(name.startswith(head) for name in self.COMMANDS):
+                # Only part of the command name has arrived so far
+                break
+            else:
+                raise ValueError("Unknown XVC command")
+        if vectors:
+            response += self._shift(vectors)
+        return position, bytes(response)
+
+    def _shift(self, vectors):
+        self.requests += len(vectors)
+        self.transfers += 1
+        return b"".join(self.backend.shift(vectors))
+
+
+class XVCClient:
+    """
+    Minimal XVC 1.0 client, for tests and benchmarks.
+    """
+
+    def __init__(self, host="127.0.0.1", port=2542):
+        self.sock = socket.create_connection((host, port))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def _receive(self, length):
+        data = bytearray()
+        while len(data) < length:
+            chunk = self.sock.recv(length - len(data))
+            if not chunk:
+                raise ConnectionError("XVC server closed the connection")
+            data += chunk
+        return bytes(data)
+
+    def getinfo(self) -> str:
+        self.sock.sendall(b"getinfo:")
+        data = bytearray()
+        while not data.endswith(b"\n"):
+            data += self._receive(1)
+        return data.decode().strip()
+
+    def settck(self, period_ns: int) -> int:
+        self.sock.sendall(b"settck:" + struct.pack("<I", period_ns))
+        return struct.unpack("<I", self._receive(4))[0]
+
+    def send_shift(self, bit_count: int, tms: bytes, tdi: bytes):
+        self.sock.sendall(b"shift:" + struct.pack("<I", bit_count) + tms + tdi)
+
+    def receive_shift(self, bit_count: int) -> bytes:
+        return self._receive((bit_count + 7) // 8)
+
+    def shift(self, bit_count: int, tms: bytes, tdi: bytes) -> bytes:
+        self.send_shift(bit_count, tms, tdi)
+        return self.receive_shift(bit_count)
+
+    def close(self):
+        self.sock.close()
+
+
+def benchmark(driver, vector_bytes=4096, count=256, pipeline=4) -> dict:
+    """
+    Measure XVC shift throughput through a local server.
+
+    The vectors stay in Shift-DR, so all bits go through CH347Jtag_IoScanT.
+
+    Args:
+        driver: An instance of the CH347 driver, or a simulated backend.
+        vector_bytes (int): Size of each TMS/TDI vector in bytes (default is 4096).
+        count (int): Number of shift requests to send (default is 256).
+        pipeline (int): Number of requests kept in flight (default is 4).
+
+    Returns:
+        dict: "bits", "seconds", "mbit_per_second", "requests" and "transfers".
+    """
+    server = XVCServer(driver, ("127.0.0.1", 0))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    client = XVCClient(*server.server_address)
+    try:
+        bit_count = vector_bytes * 8
+        # Test-Logic-Reset -> Run-Test/Idle -> Select-DR -> Capture-DR -> Shift-DR
+        client.shift(4, bytes([0b0010]), bytes(1))
+        tms = bytes(vector_bytes)
+        tdi = bytes(range(256)) * (vector_bytes // 256) + bytes(vector_bytes % 256)
+
+        start = time.perf_counter()
+        in_flight = 0
+        for _ in range(count):
+            client.send_shift(bit_count, tms, tdi)
+            in_flight += 1
+            if in_flight == pipeline:
+                client.receive_shift(bit_count)
+                in_flight -= 1
+        for _ in range(in_flight):
+            client.receive_shift(bit_count)
+        seconds = time.perf_counter() - start
+    finally:
+        client.close()
+        server.shutdown()
+        server.server_close()
+
+    bits = bit_count * count
+    return {
+        "bits": bits,
+        "seconds": seconds,
+        "mbit_per_second": bits / seconds / 1e6,
+        "requests": server.requests,
+        "transfers": server.transfers,
+    }
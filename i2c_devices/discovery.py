@@ -0,0 +1,182 @@
+"""
+Discovery Module
+----------------
+
+The `i2c_devices.discovery` module finds out what is on an I2C bus.
+
+Discovery runs in two passes. The scan pass sends one zero-length
+transaction, the address byte alone, to every 7-bit address with
+`stream_i2c_ret_ack` and keeps the addresses that acknowledge. The
+identification pass reads the ID registers of the known parts only at the
+addresses that answered and whose address range fits the part, so a bus
+with a few devices costs about one round trip per address plus a handful
+of register reads. Matching parts get an instance of their `i2c_devices`
+driver.
+
+The CH347 library has no call that carries several I2C transactions, so
+every probe is a USB round trip of its own: a scan of the whole address
+range takes about 25 ms at 100 kHz on a high speed device.
+
+Usage Example:
+--------------
+
+from ch347 import CH347
+from i2c_devices.discovery import discover
+
+for device in discover(CH347()):
+    print(hex(device.address), device.name, device.driver)
+"""
+
+import sys
+import os
+from collections import namedtuple
+
+# Get the parent directory's path
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Add the parent directory to the system path if not already present
+if parent_directory not in sys.path:
+    sys.path.insert(0, parent_directory)
+
+from i2c_devices.ina226 import INA226
+from i2c_devices.mpu6050 import MPU6050
+
+DiscoveredDevice = namedtuple(
+    "DiscoveredDevice", ["address", "name", "identity", "driver"]
+)
+
+# Addresses 0x00-0x07 and 0x78-0x7F are reserved by the I2C specification
+SCAN_ADDRESSES = range(0x08, 0x78)
+
+
+class Identifier:
+    """
+    ID register read that recognizes a part.
+
+    Attributes:
+        name (str): Part name.
+        addresses (range): 7-bit addresses the part can have.
+        reads (tuple): (register, expected bytes) pairs, register None for a
+                       current address read that only has to succeed.
+        factory (callable): Creates the driver, given the 7-bit address and the
+                            CH347 driver, None if there is no driver class.
+    """
+
+    def __init__(self, name, addresses, reads, factory=None):
+        self.name = name
+        self.addresses = addresses
+        self.reads = tuple(reads)
+        self.factory = factory
+
+    def identify(self, driver, address):
+        """
+        Read the ID registers of the part at an address.
+
+        Returns:
+            bytes: The ID register contents if they match, otherwise None.
+        """
+        identity = b""
+        for register, expected in self.reads:
+            if register is None:
+                result, data, acks = driver.stream_i2c_ret_ack([address << 1], 1)
+                # Address and the read are acknowledged
+                if not result or acks != 2:
+                    return None
+                continue
+            result, data, acks = driver.stream_i2c_ret_ack(
+                [address << 1, register], len(expected)
+            )
+            # Address, register and the repeated start address are acknowledged
+            if not result or acks != 3 or bytes(data) != expected:
+                return None
+            identity += data
+        return identity
+
+
+IDENTIFIERS = (
+    Identifier(
+        "INA226",
+        range(0x40, 0x50),
+        ((INA226.MANUFACTURER_ID_REG, b"TI"), (INA226.DIE_ID_REG, b"\x22\x60")),
+        lambda address, driver: INA226(address=address, driver=driver),
+    ),
+    Identifier(
+        "MPU6050",
+        range(0x68, 0x6A),
+        ((MPU6050.WHO_AM_I, b"\x68"),),
+        lambda address, driver: MPU6050(address=address, driver=driver),
+    ),
+    Identifier("EEPROM", range(0x50, 0x58), ((None, b""),)),
+)
+
+
+def scan(driver, addresses=SCAN_ADDRESSES) -> list:
+    """
+    Find the addresses that acknowledge.
+
+    Args:
+        driver (CH347): The opened CH347 driver.
+        addresses (iterable): 7-bit addresses to probe (default is 0x08-0x77).
+
+    Returns:
+        list: 7-bit addresses that acknowledged, in probe order.
+    """
+    probe = driver.stream_i2c_ret_ack
+    found = []
+    for address in addresses:
+        result, _, acks = probe([address << 1], 0)
+        if result and acks:
+            found.append(address)
+    return found
+
+
+def identify(driver, addresses, identifiers=IDENTIFIERS, instantiate=True) -> list:
+    """
+    Recognize the parts at the addresses that acknowledged.
+
+    Args:
+        driver (CH347): The opened CH347 driver.
+        addresses (list): 7-bit addresses found by scan().
+        identifiers (tuple): Parts to look for, in order of preference (default is IDENTIFIERS).
+        instantiate (bool): Create the drivers of recognized parts (default is True).
+                            Driver constructors configure their device.
+
+    Returns:
+        list: DiscoveredDevice for every address; name, identity and driver
+              are None for unknown parts.
+    """
+    devices = []
+    for address in addresses:
+        device = DiscoveredDevice(address, None, None, None)
+        for identifier in identifiers:
+            if address not in identifier.addresses:
+                continue
+            identity = identifier.identify(driver, address)
+            if identity is None:
+                continue
+            instance = None
+            if instantiate and identifier.factory is not None:
+                instance = identifier.factory(address, driver)
+            device = DiscoveredDevice(address, identifier.name, identity, instance)
+            break
+        devices.append(device)
+    return devices
+
+
+def discover(
+    driver, addresses=SCAN_ADDRESSES, identifiers=IDENTIFIERS, instantiate=True
+) -> list:
+    """
+    Scan the bus and recognize the parts on it.
+
+    Args:
+        driver (CH347): The CH347 driver.
+        addresses (iterable): 7-bit addresses to probe (default is 0x08-0x77).
+        identifiers (tuple): Parts to look for (default is IDENTIFIERS).
+        instantiate (bool): Create the drivers of recognized parts (default is True).
+
+    Returns:
+        list: DiscoveredDevice for every address that acknowledged.
+    """
+    driver.open_device()
+    return identify(driver, scan(driver, addresses), identifiers, instantiate)
@@ -9,13 +9,16 @@ if parent_directory not in sys.path:
     sys.path.insert(0, parent_directory)
 
 import ch347
+from i2c_devices.register_map import Register, RegisterMap
 
-class INA226:
+class INA226(RegisterMap):
     """
     INA226 Sensor Driver.
 
     This class provides methods for interacting with the INA226 sensor
-    using the CH347 I2C driver.
+    using the CH347 I2C driver. The registers and their bitfields are
+    declared in REGISTERS; the register pointer of the INA226 does not
+    auto-increment, so every register is a transfer of its own.
 
     Attributes:
         CONFIG_REG (int): Address of the configuration register.
@@ -28,6 +31,7 @@ class INA226:
         ALERT_LIMIT_REG (int): Address of the alert limit register.
         MANUFACTURER_ID_REG (int): Address of the manufacturer ID register.
         DIE_ID_REG (int): Address of the die ID register.
+        REGISTERS (dict): Register map of the INA226.
     """
     CONFIG_REG = 0x00
     SHUNT_VOLTAGE_REG = 0x01
@@ -40,7 +44,40 @@ class INA226:
     MANUFACTURER_ID_REG = 0xfe
     DIE_ID_REG = 0xff
 
-    def __init__(self, address=0x40, r_shunt=20, driver=ch347.CH347()):
+    AUTO_INCREMENT = False
+
+    REGISTERS = {
+        "CONFIG": Register(CONFIG_REG, 2, fields={
+            "reset": (15, 1),
+            "avg": (9, 3),
+            "vbus_ct": (6, 3),
+            "vsh_ct": (3, 3),
+            "mode": (0, 3),
+        }),
+        "SHUNT_VOLTAGE": Register(SHUNT_VOLTAGE_REG, 2),
+        "BUS_VOLTAGE": Register(BUS_VOLTAGE_REG, 2),
+        "POWER": Register(POWER_REG, 2),
+        "CURRENT": Register(CURRENT_REG, 2),
+        "CALIBRATION": Register(CALIBRATION_REG, 2),
+        "MASK_ENABLE": Register(MASK_ENABLE_REG, 2, fields={
+            "SOL": (15, 1),  # Shunt Voltage Over-Voltage
+            "SUL": (14, 1),  # Shunt Voltage Under-Voltage
+            "BOL": (13, 1),  # Bus Voltage Over-Voltage
+            "BUL": (12, 1),  # Bus Voltage Under-Voltage
+            "POL": (11, 1),  # Power Over-Limit
+            "CNVR": (10, 1),  # Conversion Ready
+            "AFF": (4, 1),  # Alert Function Flag
+            "CVRF": (3, 1),  # CVRF (Conversion Ready Flag)
+            "OVF": (2, 1),  # Math Overflow Flag
+            "APOL": (1, 1),  # Alert Polarity
+            "LEN": (0, 1),  # Alert Latch Enable
+        }),
+        "ALERT_LIMIT": Register(ALERT_LIMIT_REG, 2),
+        "MANUFACTURER_ID": Register(MANUFACTURER_ID_REG, 2),
+        "DIE_ID": Register(DIE_ID_REG, 2),
+    }
+
+    def __init__(self, address=0x40, r_shunt=20, driver=None):
         """
         Initialize the INA226 driver.
 
@@ -51,7 +88,8 @@ class INA226:
         """
         self.address = address << 1
         self.r_shunt = r_shunt
-        self.driver = driver
+        # Create the default driver on use, not when this module is imported
+        self.driver = driver if driver is not None else ch347.CH347()
         self.driver.open_device()
         self.set_calibration(2048)
 
@@ -65,7 +103,7 @@ class INA226:
         Returns:
             int: The read 16-bit word value.
         """
-        raw_data = self.driver.stream_i2c([self.address, register], 2)
+        raw_data = self._read(register, 2)
         value = (raw_data[0] << 8) | raw_data[1]
         return value
 
@@ -88,7 +126,7 @@ class INA226:
         return self.driver.stream_i2c([self.address, register, byte1, byte2], 0)
     
     def reset(self):
-        return self.i2c_write_word(self.CONFIG_REG, 0x8000)
+        return self.write_register("CONFIG", self.pack_fields(reset=1))
 
     
     def get_config(self):
@@ -155,19 +193,7 @@ class INA226:
                 6: Bus Voltage, Continuous
                 7: Shunt and Bus, Continuous    (default)
         """
-        # Read the current value of CONFIG_REG
-        config_value = self.i2c_read_word(self.CONFIG_REG)
-
-        # Parse the configuration settings
-        config = {
-            "reset": bool(config_value & 0x8000),
-            "avg": (config_value >> 9) & 0x07,
-            "vbus_ct": (config_value >> 6) & 0x07,
-            "vsh_ct": (config_value >> 3) & 0x07,
-            "mode": config_value & 0x07
-        }
-
-        return config
+        return self.read_fields("CONFIG")
     
     def set_config(self, avg=0, vbus_ct=4, vsh_ct=4, mode=7):
         """
@@ -222,15 +248,8 @@ class INA226:
         Returns:
             int: Result code (0 for success, -1 for failure).
         """
-        # Calculate the value to write to the CONFIG_REG
-        config_value = 0
-        config_value |= (avg & 0x07) << 9
-        config_value |= (vbus_ct & 0x07) << 6
-        config_value |= (vsh_ct & 0x07) << 3
-        config_value |= mode & 0x07
-
-        # Write the value to the CONFIG_REG
-        return self.i2c_write_word(self.CONFIG_REG, config_value)
+        config_value = self.pack_fields(avg=avg, vbus_ct=vbus_ct, vsh_ct=vsh_ct, mode=mode)
+        return self.write_register("CONFIG", config_value)
 
     def get_shunt_voltage(self):
         """
@@ -239,7 +258,7 @@ class INA226:
         Returns:
             float: Shunt voltage in microvolts(uV).
         """
-        raw_data = self.i2c_read_word(self.SHUNT_VOLTAGE_REG)
+        raw_data = self.read_register("SHUNT_VOLTAGE")
 
         if raw_data > 0x7fff:
             raw_data = 0x7fff - raw_data
@@ -254,7 +273,7 @@ class INA226:
         Returns:
             float: Bus voltage in millivolts(mV).
         """
-        raw_data = self.i2c_read_word(self.BUS_VOLTAGE_REG)
+        raw_data = self.read_register("BUS_VOLTAGE")
         voltage = raw_data * 1.25  # Convert raw data to voltage (mV)
         return voltage
     
@@ -265,7 +284,7 @@ class INA226:
         Returns:
             float: Power consumption in milliwatts.
         """
-        raw_data = self.i2c_read_word(self.POWER_REG)
+        raw_data = self.read_register("POWER")
         power = raw_data * 62.5 / self.r_shunt  # Convert raw data to power (mA)
         return power
 
@@ -276,7 +295,7 @@ class INA226:
         Returns:
             float: Current draw in microamps(uA).
         """
-        raw_data = self.i2c_read_word(self.CURRENT_REG)
+        raw_data = self.read_register("CURRENT")
         current = raw_data * 2500 / self.r_shunt  # Convert raw data to current (uA)
         return current
     
@@ -287,7 +306,7 @@ class INA226:
         Returns:
             int: The calibration value as a 16-bit integer (hexadecimal).
         """
-        return self.i2c_read_word(self.CALIBRATION_REG)
+        return self.read_register("CALIBRATION")
 
     def set_calibration(self, calibration):
         """
@@ -298,7 +317,7 @@ class INA226:
         Returns:
             int: Result code (0 for success, -1 for failure).
         """
-        return self.i2c_write_word(self.CALIBRATION_REG, calibration)
+        return self.write_register("CALIBRATION", calibration)
     
     def get_mask_enable(self):
         """
@@ -318,23 +337,7 @@ class INA226:
             - "APOL" (bool): Alert Polarity (inverted or normal).
             - "LEN" (bool): Alert Latch Enable (Latch or Transparent).
         """
-        mask_enable = self.i2c_read_word(self.MASK_ENABLE_REG)
-        
-        settings = {
-            "SOL": bool(mask_enable & 0x8000),
-            "SUL": bool(mask_enable & 0x4000),
-            "BOL": bool(mask_enable & 0x2000),
-            "BUL": bool(mask_enable & 0x1000),
-            "POL": bool(mask_enable & 0x0800),
-            "CNVR": bool(mask_enable & 0x0400),
-            "AFF": bool(mask_enable & 0x0010),
-            "CVRF": bool(mask_enable & 0x0008),
-            "OVF": bool(mask_enable & 0x0004),
-            "APOL": bool(mask_enable & 0x0002),
-            "LEN": bool(mask_enable & 0x0001)
-        }
-        
-        return settings
+        return self.read_fields("MASK_ENABLE")
 
     def set_mask_enable(self, bit_name):
         """
@@ -357,27 +360,10 @@ class INA226:
         Returns:
             int: Result code (0 for success, -1 for failure).
         """
-        # 定义每个位的名称和对应的位值
-        bit_values = {
-            "SOL": 0x8000,  # Shunt Voltage Over-Voltage
-            "SUL": 0x4000,  # Shunt Voltage Under-Voltage
-            "BOL": 0x2000,  # Bus Voltage Over-Voltage
-            "BUL": 0x1000,  # Bus Voltage Under-Voltage
-            "POL": 0x0800,  # Power Over-Limit
-            "CNVR": 0x0400,  # Conversion Ready
-            "AFF": 0x0010,  # Alert Function Flag
-            "CVRF": 0x0008,  # CVRF (Conversion Ready Flag)
-            "OVF": 0x0004,  # Math Overflow Flag
-            "APOL": 0x0002,  # Alert Polarity
-            "LEN": 0x0001  # Alert Latch Enable
-        }
-
         # 检查输入的位名是否有效
-        if bit_name in bit_values:
-            # 获取位值
-            bit_value = bit_values[bit_name]
+        if bit_name in self.REGISTERS["MASK_ENABLE"].fields:
             # 写入 Mask/Enable 寄存器
-            return self.i2c_write_word(self.MASK_ENABLE_REG, bit_value)
+            return self.write_register("MASK_ENABLE", self.pack_fields(**{bit_name: 1}))
         else:
             print(f"Invalid bit name: {bit_name}")
             return -1
@@ -389,7 +375,7 @@ class INA226:
         Returns:
             int: The value from the Alert Limit Register.
         """
-        return self.i2c_read_word(self.ALERT_LIMIT_REG)
+        return self.read_register("ALERT_LIMIT")
 
     def set_alert_limit(self, value):
         """
@@ -401,7 +387,7 @@ class INA226:
         Returns:
             int: Result code (0 for success, -1 for failure).
         """
-        return self.i2c_write_word(self.ALERT_LIMIT_REG, value)
+        return self.write_register("ALERT_LIMIT", value)
 
     def get_manufacturer_id(self):
         """
@@ -410,7 +396,7 @@ class INA226:
         Returns:
             int: Manufacturer ID value.
         """
-        return self.i2c_read_word(self.MANUFACTURER_ID_REG)
+        return self.read_register("MANUFACTURER_ID")
 
     def get_die_id(self):
         """
@@ -419,7 +405,7 @@ class INA226:
         Returns:
             int: Die ID value.
         """
-        return self.i2c_read_word(self.DIE_ID_REG)
+        return self.read_register("DIE_ID")
 
     def close(self):
         """
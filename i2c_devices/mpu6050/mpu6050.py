@@ -20,8 +20,9 @@ if parent_directory not in sys.path:
     sys.path.insert(0, parent_directory)
 
 import ch347
+from i2c_devices.register_map import Register, RegisterMap
 
-class MPU6050:
+class MPU6050(RegisterMap):
 
     # Global Variables
     GRAVITIY_MS2 = 9.80665
@@ -76,13 +77,51 @@ class MPU6050:
     GYRO_CONFIG = 0x1B
     MPU_CONFIG = 0x1A
 
-    def __init__(self, address=0x68, driver=ch347.CH347()):
+    WHO_AM_I = 0x75
+
+    REGISTERS = {
+        "CONFIG": Register(MPU_CONFIG, fields={"EXT_SYNC_SET": (3, 3), "DLPF_CFG": (0, 3)}),
+        "GYRO_CONFIG": Register(GYRO_CONFIG, fields={"FS_SEL": (3, 2)}),
+        "ACCEL_CONFIG": Register(ACCEL_CONFIG, fields={"AFS_SEL": (3, 2)}),
+        "ACCEL_XOUT": Register(ACCEL_XOUT0, 2, signed=True),
+        "ACCEL_YOUT": Register(ACCEL_YOUT0, 2, signed=True),
+        "ACCEL_ZOUT": Register(ACCEL_ZOUT0, 2, signed=True),
+        "TEMP_OUT": Register(TEMP_OUT0, 2, signed=True),
+        "GYRO_XOUT": Register(GYRO_XOUT0, 2, signed=True),
+        "GYRO_YOUT": Register(GYRO_YOUT0, 2, signed=True),
+        "GYRO_ZOUT": Register(GYRO_ZOUT0, 2, signed=True),
+        "PWR_MGMT_1": Register(PWR_MGMT_1, fields={
+            "DEVICE_RESET": (7, 1),
+            "SLEEP": (6, 1),
+            "CYCLE": (5, 1),
+            "TEMP_DIS": (3, 1),
+            "CLKSEL": (0, 3),
+        }),
+        "PWR_MGMT_2": Register(PWR_MGMT_2),
+        "WHO_AM_I": Register(WHO_AM_I),
+    }
+
+    # Full scale settings, indexed by AFS_SEL and FS_SEL
+    ACCEL_RANGES = (2, 4, 8, 16)
+    ACCEL_SCALE_MODIFIERS = (ACCEL_SCALE_MODIFIER_2G, ACCEL_SCALE_MODIFIER_4G,
+                             ACCEL_SCALE_MODIFIER_8G, ACCEL_SCALE_MODIFIER_16G)
+    GYRO_RANGES = (250, 500, 1000, 2000)
+    GYRO_SCALE_MODIFIERS = (GYRO_SCALE_MODIFIER_250DEG, GYRO_SCALE_MODIFIER_500DEG,
+                            GYRO_SCALE_MODIFIER_1000DEG, GYRO_SCALE_MODIFIER_2000DEG)
+
+    # Everything get_all_data needs, in two burst reads
+    ALL_DATA = ("GYRO_CONFIG", "ACCEL_CONFIG",
+                "ACCEL_XOUT", "ACCEL_YOUT", "ACCEL_ZOUT", "TEMP_OUT",
+                "GYRO_XOUT", "GYRO_YOUT", "GYRO_ZOUT")
+
+    def __init__(self, address=0x68, driver=None):
         self.address = address << 1
-        self.driver = driver
+        # Create the default driver on use, not when this module is imported
+        self.driver = driver if driver is not None else ch347.CH347()
 
         self.driver.open_device()
         # Wake up the MPU-6050 since it starts in sleep mode
-        self.driver.stream_i2c([self.address, self.PWR_MGMT_1, 0x00], 0)
+        self.write_register("PWR_MGMT_1", 0x00)
 
     # I2C communication methods
 
@@ -123,15 +162,13 @@ class MPU6050:
         Returns the temperature in degrees Celcius.
         """
         
-        raw_temp = self.read_i2c_word(self.TEMP_OUT0)
-        # raw_temp = self.driver.stream_i2c([self.address, self.TEMP_OUT0], 2)
-        # temp = raw_temp[0] << 8 | raw_temp[1]
+        return self._temperature(self.read_register("TEMP_OUT"))
 
+    @staticmethod
+    def _temperature(raw_temp):
         # Get the actual temperature using the formule given in the
         # MPU-6050 Register Map and Descriptions revision 4.2, page 30
-        actual_temp = (raw_temp / 340.0) + 36.53
-
-        return actual_temp
+        return (raw_temp / 340.0) + 36.53
 
     def set_accel_range(self, accel_range):
         """
@@ -140,12 +177,7 @@ class MPU6050:
         accel_range -- the range to set the accelerometer to. Using a
         pre-defined range is advised.
         """
-        
-        # First change it to 0x00 to make sure we write the correct value later
-        self.write_byte_data(self.ACCEL_CONFIG, 0x00)
-
-        # Write the new range to the ACCEL_CONFIG register
-        self.write_byte_data(self.ACCEL_CONFIG, accel_range)
+        self.write_register("ACCEL_CONFIG", accel_range)
 
     def read_accel_range(self, raw = False):
         """
@@ -153,25 +185,11 @@ class MPU6050:
 
         If raw is True, it will return the raw value from the ACCEL_CONFIG
         register
-        If raw is False, it will return an integer: -1, 2, 4, 8 or 16. When it
-        returns -1 something went wrong.
+        If raw is False, it will return the full scale range in g: 2, 4, 8 or 16.
         """
-        
-        raw_data = self.read_byte_data(self.ACCEL_CONFIG)
-
         if raw is True:
-            return raw_data
-        elif raw is False:
-            if raw_data == self.ACCEL_RANGE_2G:
-                return 2
-            elif raw_data == self.ACCEL_RANGE_4G:
-                return 4
-            elif raw_data == self.ACCEL_RANGE_8G:
-                return 8
-            elif raw_data == self.ACCEL_RANGE_16G:
-                return 16
-            else:
-                return -1
+            return self.read_register("ACCEL_CONFIG")
+        return self.ACCEL_RANGES[self.read_field("AFS_SEL")]
 
     def get_accel_data(self, g = False):
         """
@@ -181,37 +199,14 @@ class MPU6050:
         If g is False, it will return the data in m/s^2
         Returns a dictionary with the measurement results.
         """
-        
-        x = self.read_i2c_word(self.ACCEL_XOUT0)
-        y = self.read_i2c_word(self.ACCEL_YOUT0)
-        z = self.read_i2c_word(self.ACCEL_ZOUT0)
-
-        accel_scale_modifier = None
-        accel_range = self.read_accel_range(True)
-
-        if accel_range == self.ACCEL_RANGE_2G:
-            accel_scale_modifier = self.ACCEL_SCALE_MODIFIER_2G
-        elif accel_range == self.ACCEL_RANGE_4G:
-            accel_scale_modifier = self.ACCEL_SCALE_MODIFIER_4G
-        elif accel_range == self.ACCEL_RANGE_8G:
-            accel_scale_modifier = self.ACCEL_SCALE_MODIFIER_8G
-        elif accel_range == self.ACCEL_RANGE_16G:
-            accel_scale_modifier = self.ACCEL_SCALE_MODIFIER_16G
-        else:
-            print("Unkown range - accel_scale_modifier set to self.ACCEL_SCALE_MODIFIER_2G")
-            accel_scale_modifier = self.ACCEL_SCALE_MODIFIER_2G
-
-        x = x / accel_scale_modifier
-        y = y / accel_scale_modifier
-        z = z / accel_scale_modifier
+        config, x, y, z = self.read_registers("ACCEL_CONFIG", "ACCEL_XOUT", "ACCEL_YOUT", "ACCEL_ZOUT")
+        return self._accel(config, x, y, z, g)
 
-        if g is True:
-            return {'x': x, 'y': y, 'z': z}
-        elif g is False:
-            x = x * self.GRAVITIY_MS2
-            y = y * self.GRAVITIY_MS2
-            z = z * self.GRAVITIY_MS2
-            return {'x': x, 'y': y, 'z': z}
+    def _accel(self, config, x, y, z, g):
+        scale = self.ACCEL_SCALE_MODIFIERS[(config >> 3) & 0x03]
+        if g is False:
+            scale = scale / self.GRAVITIY_MS2
+        return {'x': x / scale, 'y': y / scale, 'z': z / scale}
 
     def set_gyro_range(self, gyro_range):
         """
@@ -220,20 +215,13 @@ class MPU6050:
         gyro_range -- the range to set the gyroscope to. Using a pre-defined
         range is advised.
         """
-        
-        # First change it to 0x00 to make sure we write the correct value later
-        self.write_byte_data(self.GYRO_CONFIG, 0x00)
-
-        # Write the new range to the ACCEL_CONFIG register
-        self.write_byte_data(self.GYRO_CONFIG, gyro_range)
+        self.write_register("GYRO_CONFIG", gyro_range)
 
     def set_filter_range(self, filter_range=FILTER_BW_256):
         """
         Sets the low-pass bandpass filter frequency"""
-        
-        # Keep the current EXT_SYNC_SET configuration in bits 3, 4, 5 in the MPU_CONFIG register
-        EXT_SYNC_SET = self.read_byte_data(self.MPU_CONFIG) & 0b00111000
-        return self.write_byte_data(self.MPU_CONFIG,  EXT_SYNC_SET | filter_range)
+        # Keep the current EXT_SYNC_SET configuration in the MPU_CONFIG register
+        return self.update_fields(DLPF_CFG=filter_range)
 
 
     def read_gyro_range(self, raw = False):
@@ -242,25 +230,12 @@ class MPU6050:
 
         If raw is True, it will return the raw value from the GYRO_CONFIG
         register.
-        If raw is False, it will return 250, 500, 1000, 2000 or -1. If the
-        returned value is equal to -1 something went wrong.
+        If raw is False, it will return the full scale range in deg/s: 250,
+        500, 1000 or 2000.
         """
-        
-        raw_data = self.read_byte_data(self.GYRO_CONFIG)
-
         if raw is True:
-            return raw_data
-        elif raw is False:
-            if raw_data == self.GYRO_RANGE_250DEG:
-                return 250
-            elif raw_data == self.GYRO_RANGE_500DEG:
-                return 500
-            elif raw_data == self.GYRO_RANGE_1000DEG:
-                return 1000
-            elif raw_data == self.GYRO_RANGE_2000DEG:
-                return 2000
-            else:
-                return -1
+            return self.read_register("GYRO_CONFIG")
+        return self.GYRO_RANGES[self.read_field("FS_SEL")]
 
     def get_gyro_data(self):
         """
@@ -268,42 +243,24 @@ class MPU6050:
 
         Returns the read values in a dictionary.
         """
-        
-        x = self.read_i2c_word(self.GYRO_XOUT0)
-        y = self.read_i2c_word(self.GYRO_YOUT0)
-        z = self.read_i2c_word(self.GYRO_ZOUT0)
-
-        gyro_scale_modifier = None
-        gyro_range = self.read_gyro_range(True)
-
-        if gyro_range == self.GYRO_RANGE_250DEG:
-            gyro_scale_modifier = self.GYRO_SCALE_MODIFIER_250DEG
-        elif gyro_range == self.GYRO_RANGE_500DEG:
-            gyro_scale_modifier = self.GYRO_SCALE_MODIFIER_500DEG
-        elif gyro_range == self.GYRO_RANGE_1000DEG:
-            gyro_scale_modifier = self.GYRO_SCALE_MODIFIER_1000DEG
-        elif gyro_range == self.GYRO_RANGE_2000DEG:
-            gyro_scale_modifier = self.GYRO_SCALE_MODIFIER_2000DEG
-        else:
-            print("Unkown range - gyro_scale_modifier set to self.GYRO_SCALE_MODIFIER_250DEG")
-            gyro_scale_modifier = self.GYRO_SCALE_MODIFIER_250DEG
+        config, x, y, z = self.read_registers("GYRO_CONFIG", "GYRO_XOUT", "GYRO_YOUT", "GYRO_ZOUT")
+        return self._gyro(config, x, y, z)
 
-        x = x / gyro_scale_modifier
-        y = y / gyro_scale_modifier
-        z = z / gyro_scale_modifier
-
-        return {'x': x, 'y': y, 'z': z}
+    def _gyro(self, config, x, y, z):
+        scale = self.GYRO_SCALE_MODIFIERS[(config >> 3) & 0x03]
+        return {'x': x / scale, 'y': y / scale, 'z': z / scale}
 
     def get_all_data(self):
         """
         Reads and returns all the available data.
-        """
-        
-        temp = self.get_temp()
-        accel = self.get_accel_data()
-        gyro = self.get_gyro_data()
 
-        return [accel, gyro, temp]
+        The configuration and the sensor registers are read in two burst reads.
+        """
+        (gyro_config, accel_config, ax, ay, az, temp,
+         gx, gy, gz) = self.read_registers(*self.ALL_DATA)
+        accel = self._accel(accel_config, ax, ay, az, False)
+        gyro = self._gyro(gyro_config, gx, gy, gz)
+        return [accel, gyro, self._temperature(temp)]
     
     def close(self):
         self.driver.close_device()
@@ -0,0 +1,273 @@
+"""
+Register Map Module
+-------------------
+
+The `i2c_devices.register_map` module is the shared base of register based
+I2C sensor drivers.
+
+A driver declares its registers and their bitfields once, as class data.
+When the class is created they are compiled to lookup tables of address,
+size, shift and mask, so accessing a register or a field never parses a
+description or builds a mask at run time. Reads of several registers are
+planned once per set of registers: contiguous registers of a device with
+an auto-incrementing register pointer become a single burst read decoded
+with a precompiled `struct`. Field updates read and write only the
+registers that hold the fields, and skip the write when nothing changes.
+
+Usage Example:
+--------------
+
+class Sensor(RegisterMap):
+    REGISTERS = {
+        "CONFIG": Register(0x1A, fields={"EXT_SYNC_SET": (3, 3), "DLPF_CFG": (0, 3)}),
+        "ACCEL_XOUT": Register(0x3B, 2, signed=True),
+        "ACCEL_YOUT": Register(0x3D, 2, signed=True),
+    }
+
+sensor.update_fields(DLPF_CFG=3)
+x, y = sensor.read_registers("ACCEL_XOUT", "ACCEL_YOUT")
+"""
+
+import struct
+
+
+class Register:
+    """
+    Declaration of a device register.
+
+    Attributes:
+        address (int): Register address.
+        size (int): Size in bytes, 1, 2 or 4.
+        signed (bool): Whether the value is two's complement.
+        fields (dict): Field name to (lowest bit, width in bits).
+    """
+
+    FORMATS = {1: "B", 2: "H", 4: "I"}
+
+    def __init__(self, address, size=1, signed=False, fields=None):
+        """
+        Declare a register.
+
+        Args:
+            address (int): Register address.
+            size (int): Size in bytes, 1, 2 or 4 (default is 1).
+            signed (bool): Whether the value is two's complement (default is False).
+            fields (dict, optional): Field name to (lowest bit, width in bits).
+        """
+        if size not in self.FORMATS:
+            raise ValueError(f"Unsupported register size {size}")
+        self.address = address
+        self.size = size
+        self.signed = signed
+        self.fields = dict(fields or {})
+
+    @property
+    def format(self) -> str:
+        code = self.FORMATS[self.size]
+        return code.lower() if self.signed else code
+
+
+class RegisterMap:
+    """
+    Base class of drivers for I2C devices with addressable registers.
+
+    Subclasses set REGISTERS and provide `driver` (a CH347) and `address`
+    (the 8-bit write address) on their instances.
+
+    Attributes:
+        REGISTERS (dict): Register name to Register.
+        BYTE_ORDER (str): ">" for big-endian or "<" for little-endian registers.
+        AUTO_INCREMENT (bool): Whether the device advances its register pointer
+                               on reads, which allows burst reads.
+    """
+
+    REGISTERS = {}
+    BYTE_ORDER = ">"
+    AUTO_INCREMENT = True
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._compile()
+
+    @classmethod
+    def _compile(cls):
+        cls._registers = {}
+        cls._fields = {}
+        cls._register_fields = {}
+        cls._plans = {}
+        for name, register in cls.REGISTERS.items():
+            cls._registers[name] = (
+                register.address,
+                register.size,
+                struct.Struct(cls.BYTE_ORDER + register.format),
+            )
+            fields = []
+            for field, (shift, width) in register.fields.items():
+                if field in cls._fields:
+                    raise ValueError(f"Field {field} declared twice")
+                mask = ((1 << width) - 1) << shift
+                # Single bit fields read as bool
+                entry = (name, shift, mask, width == 1)
+                cls._fields[field] = entry
+                fields.append((field,) + entry[1:])
+            cls._register_fields[name] = tuple(fields)
+
+    def _read(self, address, length) -> bytes:
+        data = self.driver.stream_i2c([self.address, address], length)
+        if data is None:
+            raise RuntimeError(f"I2C read of register 0x{address:02X} failed")
+        return data
+
+    def read_register(self, name) -> int:
+        """
+        Read a register.
+
+        Args:
+            name (str): Register name.
+
+        Returns:
+            int: Register value.
+        """
+        address, size, codec = self._registers[name]
+        return codec.unpack(self._read(address, size))[0]
+
+    def write_register(self, name, value):
+        """
+        Write a register.
+
+        Args:
+            name (str): Register name.
+            value (int): Register value.
+
+        Returns:
+            The result of stream_i2c.
+        """
+        address, _, codec = self._registers[name]
+        return self.driver.stream_i2c(
+            [self.address, address] + list(codec.pack(value)), 0
+        )
+
+    @classmethod
+    def _plan(cls, names):
+        # Group the registers into burst reads: (address, length, codec, positions)
+        order = sorted(set(names), key=lambda name: cls._registers[name][0])
+        runs = []
+        for name in order:
+            address, size, _ = cls._registers[name]
+            run = runs[-1] if runs else None
+            if cls.AUTO_INCREMENT and run is not None and run[0] + run[1] == address:
+                run[1] += size
+                run[2].append(name)
+            else:
+                runs.append([address, size, [name]])
+        plan = []
+        for address, length, members in runs:
+            codec = struct.Struct(
+                cls.BYTE_ORDER + "".join(cls.REGISTERS[name].format for name in members)
+            )
+            positions = tuple(
+                tuple(index for index, wanted in enumerate(names) if wanted == name)
+                for name in members
+            )
+            plan.append((address, length, codec, positions))
+        return tuple(plan)
+
+    def read_registers(self, *names) -> tuple:
+        """
+        Read several registers with as few transfers as possible.
+
+        Args:
+            *names (str): Register names.
+
+        Returns:
+            tuple: Register values in the order of names.
+        """
+        plan = self._plans.get(names)
+        if plan is None:
+            plan = self._plans[names] = self._plan(names)
+        values = [0] * len(names)
+        for address, length, codec, positions in plan:
+            for value, indexes in zip(
+                codec.unpack(self._read(address, length)), positions
+            ):
+                for index in indexes:
+                    values[index] = value
+        return tuple(values)
+
+    def read_field(self, field) -> int:
+        """
+        Read a field.
+
+        Args:
+            field (str): Field name.
+
+        Returns:
+            int: Field value, or bool for single bit fields.
+        """
+        name, shift, mask, flag = self._fields[field]
+        value = (self.read_register(name) & mask) >> shift
+        return bool(value) if flag else value
+
+    def read_fields(self, name) -> dict:
+        """
+        Read a register and split it into its fields.
+
+        Args:
+            name (str): Register name.
+
+        Returns:
+            dict: Field name to value, bool for single bit fields.
+        """
+        value = self.read_register(name)
+        return {
+            field: bool(value & mask) if flag else (value & mask) >> shift
+            for field, shift, mask, flag in self._register_fields[name]
+        }
+
+    @classmethod
+    def pack_fields(cls, **fields) -> int:
+        """
+        Combine field values into register bits, without touching the device.
+
+        Returns:
+            int: The fields shifted and masked into place, OR-ed together.
+        """
+        value = 0
+        for field, field_value in fields.items():
+            _, shift, mask, _ = cls._fields[field]
+            value |= (int(field_value) << shift) & mask
+        return value
+
+    def update_fields(self, **fields) -> bool:
+        """
+        Change fields, keeping the other bits of their registers.
+
+        Registers whose fields are all given are written without reading
+        them first, and registers that already hold the values are not written.
+
+        Args:
+            **fields: Field name to new value.
+
+        Returns:
+            bool: True if successful, False otherwise.
+        """
+        changes = {}
+        for field, field_value in fields.items():
+            name, shift, mask, _ = self._fields[field]
+            bits, covered = changes.get(name, (0, 0))
+            changes[name] = (
+                (bits & ~mask) | ((int(field_value) << shift) & mask),
+                covered | mask,
+            )
+        for name, (bits, covered) in changes.items():
+            size = self._registers[name][1]
+            if covered == (1 << (8 * size)) - 1:
+                value = bits
+            else:
+                current = self.read_register(name)
+                value = (current & ~covered) | bits
+                if value == current:
+                    continue
+            if self.write_register(name, value) is None:
+                return False
+        return True
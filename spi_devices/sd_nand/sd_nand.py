@@ -53,7 +53,7 @@ class R7Response(Response):
 
 
 class SD_NAND:
-    def __init__(self, cs=0, driver=ch347.CH347()):
+    def __init__(self, cs=0, driver=None):
         spi_config = ch347.SPIConfig(
             Mode=0,
             Clock=2,
@@ -67,7 +67,8 @@ class SD_NAND:
             ActiveDelay=0,
             DelayDeactive=0,
         )
-        self.driver = driver
+        # Create the default driver on use, not when this module is imported
+        self.driver = driver if driver is not None else ch347.CH347()
         self.driver.open_device()
         self.driver.spi_init(spi_config)
 
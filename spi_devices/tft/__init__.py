@@ -0,0 +1 @@
+from .tft import *
@@ -0,0 +1,364 @@
+import sys
+import os
+import ctypes
+import time
+
+import numpy as np
+
+# Get the parent directory's path
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+
+# Add the parent directory to the system path if not already present
+if parent_directory not in sys.path:
+    sys.path.insert(0, parent_directory)
+
+import ch347
+
+
+def rgb888_to_rgb565(image):
+    """
+    Convert RGB888 pixels to RGB565.
+
+    Args:
+        image (numpy.ndarray): uint8 array whose last axis is (R, G, B).
+
+    Returns:
+        numpy.ndarray: uint16 array of the same shape without the last axis.
+    """
+    image = np.asarray(image, dtype=np.uint8)
+    r = image[..., 0].astype(np.uint16)
+    g = image[..., 1].astype(np.uint16)
+    b = image[..., 2].astype(np.uint16)
+    return ((r & 0xF8) << 8) | ((g & 0xFC) << 3) | (b >> 3)
+
+
+class TFT:
+    """
+    SPI TFT Display Driver.
+
+    Drawing goes to a RGB565 framebuffer in memory. Every change marks a dirty
+    rectangle, covering only the pixels whose value actually changed. `show`
+    merges the dirty rectangles and sends each merged region as one
+    CASET/RASET window followed by a single pixel burst through
+    `stream_spi4`, so an update costs bytes in proportion to what changed.
+
+    The D/C line is driven by a CH347 GPIO pin, command bytes are sent with
+    it low and parameters and pixels with it high.
+
+    Attributes:
+        WIDTH (int): Panel width in pixels.
+        HEIGHT (int): Panel height in pixels.
+        CASET (int): Column address set command.
+        RASET (int): Row address set command.
+        RAMWR (int): Memory write command.
+        WINDOW_COST (int): Bytes a window is worth in USB round trips, used
+                           to decide when two regions are sent as one.
+        INIT_SEQUENCE (tuple): (command, parameters, delay in seconds) sent by init().
+        framebuffer (numpy.ndarray): height x width big-endian RGB565 pixels.
+        bytes_sent (int): Number of bytes sent to the panel.
+        windows_sent (int): Number of windows sent to the panel.
+    """
+
+    WIDTH = 240
+    HEIGHT = 240
+
+    SWRESET = 0x01
+    SLPOUT = 0x11
+    NORON = 0x13
+    INVON = 0x21
+    DISPON = 0x29
+    CASET = 0x2A
+    RASET = 0x2B
+    RAMWR = 0x2C
+    MADCTL = 0x36
+    COLMOD = 0x3A
+
+    WINDOW_COST = 512
+
+    INIT_SEQUENCE = (
+        (SWRESET, b"", 0.15),
+        (SLPOUT, b"", 0.12),
+        (COLMOD, b"\x55", 0),
+        (MADCTL, b"\x00", 0),
+        (DISPON, b"", 0.02),
+    )
+
+    def __init__(
+        self,
+        dc_pin,
+        cs=0,
+        width=None,
+        height=None,
+        x_offset=0,
+        y_offset=0,
+        clock=1,
+        driver=None,
+    ):
+        """
+        Initialize the display driver.
+
+        Args:
+            dc_pin (int): CH347 GPIO number wired to D/C.
+            cs (int): Chip select, 0 or 1 (default is 0).
+            width (int, optional): Panel width, by default WIDTH.
+            height (int, optional): Panel height, by default HEIGHT.
+            x_offset (int): First controller column of the panel (default is 0).
+            y_offset (int): First controller row of the panel (default is 0).
+            clock (int): SPIConfig Clock setting, 60MHz >> clock (default is 1, 30MHz).
+            driver: An instance of the CH347 driver (default is a new instance).
+        """
+        self.width = width or self.WIDTH
+        self.height = height or self.HEIGHT
+        self.x_offset = x_offset
+        self.y_offset = y_offset
+        self.dc_mask = 1 << dc_pin
+        self.chip_select = 0x80 if cs == 0 else 0x81
+        spi_config = ch347.SPIConfig(
+            Mode=0,
+            Clock=clock,
+            ByteOrder=1,
+            SPIOutDefaultData=0xFF,
+            ChipSelect=self.chip_select,
+            IsAutoDeactiveCS=1,
+        )
+        # Create the default driver on use, not when this module is imported
+        self.driver = driver if driver is not None else ch347.CH347()
+        self.driver.open_device()
+        self.driver.spi_init(spi_config)
+
+        self.framebuffer = np.zeros((self.height, self.width), dtype=">u2")
+        self.dirty = []
+        self.bytes_sent = 0
+        self.windows_sent = 0
+        self._dc = None
+        # One buffer for the largest burst, reused by every window
+        self._burst = bytearray(self.width * self.height * 2)
+
+    def _set_dc(self, level):
+        if self._dc != level:
+            self.driver.gpio_set(
+                self.dc_mask, self.dc_mask, self.dc_mask if level else 0
+            )
+            self._dc = level
+
+    def _send(self, data, length=None):
+        if length is None:
+            length = len(data)
+        if not length:
+            return
+        if isinstance(data, bytearray):
+            buffer = (ctypes.c_char * length).from_buffer(data)
+        else:
+            buffer = ctypes.create_string_buffer(bytes(data), length)
+        if not self.driver.stream_spi4(self.chip_select, length, buffer):
+            raise RuntimeError("CH347StreamSPI4 failed")
+        self.bytes_sent += length
+
+    def command(self, command, parameters=b""):
+        """
+        Send a command and its parameters.
+
+        Args:
+            command (int): Command byte.
+            parameters (bytes): Parameter bytes (default is none).
+        """
+        self._set_dc(False)
+        self._send(bytes([command]))
+        if parameters:
+            self._set_dc(True)
+            self._send(bytes(parameters))
+
+    def init(self):
+        """
+        Reset the controller and turn the display on, then send the whole framebuffer.
+        """
+        for command, parameters, delay in self.INIT_SEQUENCE:
+            self.command(command, parameters)
+            if delay:
+                time.sleep(delay)
+        self.invalidate()
+        self.show()
+
+    def set_window(self, x0, y0, x1, y1):
+        """
+        Select the region pixel data is written to, end coordinates inclusive.
+        """
+        x0 += self.x_offset
+        x1 += self.x_offset
+        y0 += self.y_offset
+        y1 += self.y_offset
+        self.command(self.CASET, bytes([x0 >> 8, x0 & 0xFF, x1 >> 8, x1 & 0xFF]))
+        self.command(self.RASET, bytes([y0 >> 8, y0 & 0xFF, y1 >> 8, y1 & 0xFF]))
+        self.windows_sent += 1
+
+    def _mark(self, x0, y0, x1, y1):
+        # Rectangles are [x0, x1) x [y0, y1)
+        if x0 < x1 and y0 < y1:
+            self.dirty.append((x0, y0, x1, y1))
+
+    def _clip(self, x, y, width, height):
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + width, self.width), min(y + height, self.height)
+        return x0, y0, max(x0, x1), max(y0, y1)
+
+    def _update(self, x0, y0, pixels):
+        # Store pixels and mark the bounding box of the pixels that changed
+        height, width = pixels.shape
+        region = self.framebuffer[y0 : y0 + height, x0 : x0 + width]
+        changed = region != pixels
+        rows = np.flatnonzero(changed.any(axis=1))
+        if not len(rows):
+            return
+        columns = np.flatnonzero(changed.any(axis=0))
+        region[...] = pixels
+        self._mark(
+            x0 + int(columns[0]),
+            y0 + int(rows[0]),
+            x0 + int(columns[-1]) + 1,
+            y0 + int(rows[-1]) + 1,
+        )
+
+    def fill_rect(self, x, y, width, height, color):
+        """
+        Fill a rectangle with one color.
+
+        Args:
+            x (int): Left column.
+            y (int): Top row.
+            width (int): Width in pixels.
+            height (int): Height in pixels.
+            color (tuple): (R, G, B) color.
+        """
+        x0, y0, x1, y1 = self._clip(x, y, width, height)
+        pixels = np.full((y1 - y0, x1 - x0), rgb888_to_rgb565(color), dtype=">u2")
+        self._update(x0, y0, pixels)
+
+    def fill(self, color):
+        """
+        Fill the whole screen with one color.
+        """
+        self.fill_rect(0, 0, self.width, self.height, color)
+
+    def draw_image(self, x, y, image):
+        """
+        Draw an image.
+
+        Args:
+            x (int): Left column.
+            y (int): Top row.
+            image (numpy.ndarray): height x width x 3 RGB888 array, or
+                                   height x width RGB565 array.
+        """
+        image = np.asarray(image)
+        if image.ndim == 3:
+            image = rgb888_to_rgb565(image)
+        height, width = image.shape
+        x0, y0, x1, y1 = self._clip(x, y, width, height)
+        self._update(x0, y0, image[y0 - y : y1 - y, x0 - x : x1 - x])
+
+    def invalidate(self):
+        """
+        Mark the whole screen for sending.
+        """
+        self.dirty = [(0, 0, self.width, self.height)]
+
+    @classmethod
+    def merge(cls, rectangles) -> list:
+        """
+        Merge rectangles whose bounding box costs less to send than sending them apart.
+
+        Args:
+            rectangles (list): (x0, y0, x1, y1) rectangles, end coordinates exclusive.
+
+        Returns:
+            list: Merged rectangles.
+        """
+
+        def area(rectangle):
+            x0, y0, x1, y1 = rectangle
+            return (x1 - x0) * (y1 - y0)
+
+        merged = list(rectangles)
+        changed = True
+        while changed:
+            changed = False
+            for i in range(len(merged)):
+                for j in range(i + 1, len(merged)):
+                    a, b = merged[i], merged[j]
+                    union = (
+                        min(a[0], b[0]),
+                        min(a[1], b[1]),
+                        max(a[2], b[2]),
+                        max(a[3], b[3]),
+                    )
+                    # Two bytes per pixel against the cost of one more window
+                    if 2 * area(union) <= 2 * (area(a) + area(b)) + cls.WINDOW_COST:
+                        merged[i] = union
+                        del merged[j]
+                        changed = True
+                        break
+                if changed:
+                    break
+        return merged
+
+    def show(self) -> int:
+        """
+        Send the changed regions to the display.
+
+        Returns:
+            int: Number of pixel bytes sent.
+        """
+        sent = 0
+        for x0, y0, x1, y1 in self.merge(self.dirty):
+            length = (x1 - x0) * (y1 - y0) * 2
+            burst = np.frombuffer(self._burst, dtype=">u2", count=length // 2)
+            burst.shape = (y1 - y0, x1 - x0)
+            burst[...] = self.framebuffer[y0:y1, x0:x1]
+            self.set_window(x0, y0, x1 - 1, y1 - 1)
+            self.command(self.RAMWR)
+            self._set_dc(True)
+            self._send(self._burst, length)
+            sent += length
+        self.dirty = []
+        return sent
+
+
+class ST7789(TFT):
+    """
+    ST7789 240x240 or 240x320 TFT controller.
+
+    Most ST7789 panels need inverted colors, and 240x240 panels mounted at the
+    bottom of the 240x320 memory need a y_offset of 80 when rotated.
+    """
+
+    WIDTH = 240
+    HEIGHT = 240
+
+    INIT_SEQUENCE = (
+        (TFT.SWRESET, b"", 0.15),
+        (TFT.SLPOUT, b"", 0.12),
+        (TFT.COLMOD, b"\x55", 0),
+        (TFT.MADCTL, b"\x00", 0),
+        (TFT.INVON, b"", 0),
+        (TFT.NORON, b"", 0.01),
+        (TFT.DISPON, b"", 0.02),
+    )
+
+
+class ILI9341(TFT):
+    """
+    ILI9341 240x320 TFT controller.
+    """
+
+    WIDTH = 240
+    HEIGHT = 320
+
+    INIT_SEQUENCE = (
+        (TFT.SWRESET, b"", 0.15),
+        (TFT.SLPOUT, b"", 0.12),
+        (TFT.COLMOD, b"\x55", 0),
+        # BGR panel order
+        (TFT.MADCTL, b"\x48", 0),
+        (TFT.NORON, b"", 0.01),
+        (TFT.DISPON, b"", 0.02),
+    )
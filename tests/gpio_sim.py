@@ -0,0 +1,40 @@
+"""
+Fake CH347 driver standing in for the GPIO methods of `CH347`.
+
+Pin levels are kept as a bit mask and `edge()` calls the installed interrupt
+routine with the 8 status bytes the DLL would pass, so tests can raise
+interrupts from any thread without a device.
+"""
+
+
+class FakeGPIODriver:
+    def __init__(self):
+        self.direction = 0
+        self.level = 0xFF
+        self.routine = None
+        self.int_routine_calls = 0
+
+    def open_device(self):
+        return 1
+
+    def close_device(self):
+        return True
+
+    def gpio_get(self):
+        return self.direction, self.level
+
+    def gpio_set(self, enable, set_dir_out, set_data_out):
+        self.direction = (self.direction & ~enable) | (set_dir_out & enable)
+        self.level = (self.level & ~enable) | (set_data_out & enable)
+        return True
+
+    def set_int_routine(self, int0_pin, int0_mode, int1_pin, int1_mode, routine):
+        self.routine = routine
+        self.int_routine_calls += 1
+        return True
+
+    def edge(self, pin, level):
+        # Deliver the 8 status bytes the DLL passes to the interrupt routine
+        self.level = (self.level & ~(1 << pin)) | (level << pin)
+        status = bytes(((self.level >> p) & 1) << 6 for p in range(8))
+        self.routine(status)
@@ -0,0 +1,132 @@
+"""
+Simulated JTAG scan chain standing in for the `jtag_*` methods of `CH347`.
+
+Every TCK is clocked through a bit-level model of the TAP controller of each
+device on the chain, and every DR/IR update is recorded so tests can check
+what a scan actually shifted into the targets.
+"""
+
+from ch347.jtag import TapState
+
+
+class SimulatedDevice:
+    def __init__(self, idcode=None, ir_length=4, idcode_opcode=0x1):
+        self.idcode = idcode
+        self.ir_length = ir_length
+        self.idcode_opcode = idcode_opcode
+        self.bypass_opcode = (1 << ir_length) - 1
+        self.ir = idcode_opcode if idcode is not None else self.bypass_opcode
+        self.ir_shift = 0
+        self.dr_shift = 0
+        self.dr_length = 1
+        self.updates = []
+
+    def reset(self):
+        self.ir = self.idcode_opcode if self.idcode is not None else self.bypass_opcode
+
+    def capture_ir(self):
+        self.ir_shift = 0b01
+
+    def capture_dr(self):
+        if self.ir == self.idcode_opcode and self.idcode is not None:
+            self.dr_shift, self.dr_length = self.idcode, 32
+        elif self.ir == self.bypass_opcode:
+            self.dr_shift, self.dr_length = 0, 1
+        else:
+            # Any other instruction selects a 64-bit user register
+            self.dr_shift, self.dr_length = 0, 64
+
+    def shift(self, is_dr, tdi):
+        if is_dr:
+            tdo = self.dr_shift & 1
+            self.dr_shift = (self.dr_shift >> 1) | (tdi << (self.dr_length - 1))
+        else:
+            tdo = self.ir_shift & 1
+            self.ir_shift = (self.ir_shift >> 1) | (tdi << (self.ir_length - 1))
+        return tdo
+
+    def update_ir(self):
+        self.ir = self.ir_shift
+        self.updates.append(("IR", self.ir))
+
+    def update_dr(self):
+        self.updates.append(("DR", self.ir, self.dr_shift))
+
+
+class SimulatedTAP:
+    """
+    A fake CH347 driver exposing the JTAG bindings over a simulated chain.
+
+    Args:
+        devices (list): SimulatedDevice instances, closest to TDO first.
+    """
+
+    def __init__(self, devices):
+        self.devices = devices
+        self.state = TapState.TEST_LOGIC_RESET
+        self.calls = []
+        self.clock_rate = None
+
+    def open_device(self):
+        return 1
+
+    def jtag_init(self, clock_rate):
+        self.clock_rate = clock_rate
+        return True
+
+    def clock(self, tms, tdi=1):
+        tdo = 1
+        if self.state in (TapState.SHIFT_DR, TapState.SHIFT_IR):
+            is_dr = self.state == TapState.SHIFT_DR
+            carry = tdi
+            for device in reversed(self.devices):
+                carry = device.shift(is_dr, carry)
+            tdo = carry
+        self.state = TapState.TRANSITIONS[self.state][tms]
+        for device in self.devices:
+            if self.state == TapState.TEST_LOGIC_RESET:
+                device.reset()
+            elif self.state == TapState.CAPTURE_IR:
+                device.capture_ir()
+            elif self.state == TapState.CAPTURE_DR:
+                device.capture_dr()
+            elif self.state == TapState.UPDATE_IR:
+                device.update_ir()
+            elif self.state == TapState.UPDATE_DR:
+                device.update_dr()
+        return tdo
+
+    def jtag_tms_change(self, tms_value, step, skip=0):
+        self.calls.append(("tms", step))
+        bits = int.from_bytes(bytes(tms_value), "little")
+        for i in range(skip, skip + step):
+            self.clock((bits >> i) & 1)
+        return True
+
+    def _scan(self, data, bit_length, last):
+        bits = int.from_bytes(bytes(data), "little")
+        tdo = 0
+        for i in range(bit_length):
+            tms = 1 if last and i == bit_length - 1 else 0
+            tdo |= self.clock(tms, (bits >> i) & 1) << i
+        return tdo.to_bytes((bit_length + 7) // 8, "little")
+
+    def jtag_io_scan_t(self, data_bits, bit_length, is_read, is_last_packet):
+        self.calls.append(("scan", bit_length))
+        assert self.state in (TapState.SHIFT_DR, TapState.SHIFT_IR)
+        assert bit_length <= 4096 * 8
+        tdo = self._scan(data_bits, bit_length, is_last_packet)
+        return tdo if is_read else b""
+
+    def jtag_write_read_fast(self, is_dr, write_data, write_bit_length):
+        self.calls.append(("fast", write_bit_length))
+        assert self.state == TapState.RUN_TEST_IDLE
+        assert write_bit_length <= 4096 * 8
+        # Run-Test -> Select-DR [-> Select-IR] -> Capture -> Shift
+        for tms in (1, 0, 0) if is_dr else (1, 1, 0, 0):
+            self.clock(tms)
+        tdo = self._scan(write_data, write_bit_length, True)
+        # Exit1 -> Update -> Run-Test
+        self.clock(1)
+        self.clock(0)
+        return tdo
@@ -0,0 +1,58 @@
+import json
+import os
+import sys
+
+# Get the parent directory's path
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Add the parent directory to the system path if not already present
+if parent_directory not in sys.path:
+    sys.path.insert(0, parent_directory)
+
+from ch347.bench import compare, main, run_benchmarks
+
+
+def test_quick_run_reports_every_metric():
+    results = run_benchmarks(quick=True)["results"]
+    for operation in ("stream_i2c", "spi_read", "spi_write", "stream_spi4"):
+        assert results[f"bindings.{operation}.ns_per_call"]["value"] > 0
+        assert f"bindings.{operation}.alloc_bytes_per_call" in results
+    # The caller owns the stream_spi4 buffer, so the binding allocates nothing
+    assert results["bindings.stream_spi4.alloc_bytes_per_call"]["value"] == 0
+    assert results["drivers.mpu6050.get_all_data.modeled_hz"]["value"] > 0
+    assert results["drivers.ina226.reading.host_hz"]["value"] > 0
+    for name in ("eeprom.read", "eeprom.write", "flash.read", "flash.program"):
+        assert results[f"{name}.modeled_mb_per_s"]["higher_is_better"]
+
+
+def test_compare_respects_direction_and_tolerance():
+    baseline = {
+        "results": {
+            "rate": {"value": 100.0, "unit": "hz", "higher_is_better": True},
+            "cost": {"value": 100.0, "unit": "ns", "higher_is_better": False},
+            "gone": {"value": 1.0, "unit": "ns", "higher_is_better": False},
+        }
+    }
+    current = {
+        "results": {
+            "rate": {"value": 85.0, "unit": "hz", "higher_is_better": True},
+            "cost": {"value": 105.0, "unit": "ns", "higher_is_better": False},
+            "new": {"value": 1.0, "unit": "ns", "higher_is_better": False},
+        }
+    }
+    regressions = compare(current, baseline, tolerance=0.1)
+    assert [r["name"] for r in regressions] == ["rate"]
+    assert regressions[0]["change"] == 0.15
+    assert compare(current, baseline, tolerance=0.2) == []
+
+
+def test_cli_writes_json_and_fails_on_regression(tmp_path, capsys):
+    output = tmp_path / "bench.json"
+    assert main(["--quick", "--output", str(output)]) == 0
+    results = json.loads(output.read_text())
+    assert results["meta"]["quick"]
+    for metric in results["results"].values():
+        metric["value"] *= 100 if metric["higher_is_better"] else 0.01
+    output.write_text(json.dumps(results))
+    assert main(["--quick", "--baseline", str(output)]) == 1
+    assert "REGRESSION" in capsys.readouterr().err
@@ -0,0 +1,96 @@
+import os
+import queue
+import sys
+
+# Get the parent directory's path
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Add the parent directory to the system path if not already present
+if parent_directory not in sys.path:
+    sys.path.insert(0, parent_directory)
+
+from ch347.capture import TriggeredCapture
+from ch347.gpio import GPIO
+from tests.gpio_sim import FakeGPIODriver
+
+
+class FakeSensorDriver(FakeGPIODriver):
+    def __init__(self, int_pin):
+        super().__init__()
+        self.int_pin = int_pin
+        self.transfers = []
+        self.conversion = 0
+
+    def stream_i2c(self, write_data, read_length):
+        self.transfers.append((bytes(write_data), read_length))
+        if read_length and write_data[1] == TriggeredCapture.MPU6050_INT_STATUS:
+            # Reading INT_STATUS releases the latched INT line, a rising
+            # edge does not interrupt in falling edge mode
+            self.level |= 1 << self.int_pin
+        return bytes([self.conversion] * read_length)
+
+    def data_ready(self):
+        self.conversion += 1
+        self.edge(self.int_pin, 0)
+
+
+def test_each_edge_triggers_planned_burst():
+    driver = FakeSensorDriver(int_pin=4)
+    capture = TriggeredCapture.mpu6050(GPIO(driver), pin=4)
+    assert driver.transfers == [(b"\xd0\x37\xa0", 0), (b"\xd0\x38\x01", 0)]
+    driver.transfers.clear()
+
+    samples = queue.Queue()
+    # Short edge waits make the worker time out between the edges
+    capture.start(samples.put, timeout=0.01)
+    received = []
+    for _ in range(3):
+        driver.data_ready()
+        received.append(samples.get(timeout=5))
+    capture.stop()
+    # Armed once by start() and disarmed once by stop()
+    assert driver.int_routine_calls == 2
+
+    assert [s.data for s in received] == [bytes([n] * 15) for n in (1, 2, 3)]
+    assert driver.transfers == [(b"\xd0\x3a", 15)] * 3
+    assert all(s.latency_ns >= 0 for s in received)
+    stats = capture.stats()
+    assert stats["samples"] == 3 and stats["dropped"] == 0
+    assert stats["latency_max_us"] >= stats["latency_p50_us"] >= 0
+
+    # run() ends when the edges stop
+    capture.arm()
+    driver.data_ready()
+    assert [s.data for s in capture.run(count=2, timeout=0)] == [bytes([4] * 15)]
+
+
+def test_edges_during_read_are_dropped():
+    driver = FakeSensorDriver(int_pin=2)
+    capture = TriggeredCapture.ina226(GPIO(driver), pin=2)
+    capture.arm()
+    for _ in range(3):
+        # Transparent ALERT: the line goes back high on its own
+        driver.data_ready()
+        driver.level |= 1 << 2
+
+    sample = capture.read_sample(timeout=0)
+    assert sample.data == bytes([3] * 8)
+    assert [t[0][1] for t in driver.transfers[-4:]] == [0x02, 0x03, 0x04, 0x06]
+    assert capture.read_sample(timeout=0) is None
+    assert capture.stats()["dropped"] == 2
+
+
+def test_edges_of_other_pins_stay_buffered():
+    driver = FakeSensorDriver(int_pin=2)
+    gpio = GPIO(driver)
+    capture = TriggeredCapture.ina226(gpio, pin=2)
+    gpio.arm(2, GPIO.FALLING, 5, GPIO.FALLING)
+    driver.edge(5, 0)
+    driver.data_ready()
+    driver.level |= 1 << 2
+    driver.edge(5, 1)
+    driver.edge(5, 0)
+
+    assert capture.read_sample(timeout=0).data == bytes([1] * 8)
+    assert capture.stats()["dropped"] == 0
+    assert [(e.pin, e.level) for e in gpio.events(timeout=0)] == [(5, 0), (5, 0)]
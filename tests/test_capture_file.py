@@ -0,0 +1,83 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Get the parent directory's path
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Add the parent directory to the system path if not already present
+if parent_directory not in sys.path:
+    sys.path.insert(0, parent_directory)
+
+from ch347.capture_file import CaptureReader, CaptureWriter
+
+
+def _samples(count, start_ns=10**18):
+    # A 1 kHz capture of slowly changing readings
+    timestamps = start_ns + np.arange(count, dtype=np.int64) * 1000000
+    bus_mv = (5000 + 10 * np.sin(np.arange(count) / 500)).astype(np.float32)
+    current = (1000 + np.arange(count) // 100).astype(np.int32)
+    accel = (np.arange(count) % 7 - 3).astype(np.int16)
+    return timestamps, bus_mv, current, accel
+
+
+def test_round_trip_and_time_range(tmp_path):
+    path = str(tmp_path / "capture.ch347col")
+    timestamps, bus_mv, current, accel = _samples(10000)
+    columns = {"bus_mv": "f4", "current_ua": "i4", "accel_x": ">i2"}
+    with CaptureWriter(path, columns, chunk_rows=1024) as writer:
+        for i in range(100):
+            writer.append(timestamps[i], bus_mv[i], current[i], accel[i])
+        writer.write_block(
+            timestamps[100:],
+            bus_mv=bus_mv[100:],
+            current_ua=current[100:],
+            accel_x=accel[100:],
+        )
+    # Evenly spaced timestamps and slow integer readings shrink a lot
+    assert os.path.getsize(path) < timestamps.nbytes / 10 + bus_mv.nbytes
+
+    with CaptureReader(path) as reader:
+        assert reader.rows == 10000
+        assert len(reader.index) == 10
+        assert reader.time_range == (int(timestamps[0]), int(timestamps[-1]))
+        data = reader.read()
+        assert (data["timestamp_ns"] == timestamps).all()
+        assert (data["bus_mv"] == bus_mv).all()
+        assert (data["current_ua"] == current).all()
+        assert (data["accel_x"] == accel).all()
+
+        part = reader.read(timestamps[1500], timestamps[3000], columns=["accel_x"])
+        assert list(part) == ["timestamp_ns", "accel_x"]
+        assert (part["timestamp_ns"] == timestamps[1500:3000]).all()
+        assert (part["accel_x"] == accel[1500:3000]).all()
+        assert len(reader.read(0, timestamps[0])["current_ua"]) == 0
+
+
+def test_unclosed_file(tmp_path):
+    path = str(tmp_path / "capture.ch347col")
+    writer = CaptureWriter(path, {"value": "u2"}, chunk_rows=4)
+    for i in range(10):
+        writer.append(i, i)
+    writer.file.flush()
+    with pytest.raises(ValueError):
+        CaptureReader(path)
+    writer.close()
+    with CaptureReader(path) as reader:
+        assert reader.read(3, 7)["value"].tolist() == [3, 4, 5, 6]
+
+
+def test_mismatched_samples_are_rejected(tmp_path):
+    path = str(tmp_path / "capture.ch347col")
+    with CaptureWriter(path, {"a": "u2", "b": "u2"}, chunk_rows=4) as writer:
+        with pytest.raises(ValueError):
+            writer.append(0, 1)
+        with pytest.raises(ValueError):
+            writer.write_block([0, 1, 2], a=[1, 2, 3], b=[1, 2])
+        with pytest.raises(ValueError):
+            writer.write_block([0], a=[1], b=[1], c=[1])
+        writer.write_block([5, 6], a=[1, 2], b=[3, 4])
+    with CaptureReader(path) as reader:
+        assert reader.read()["timestamp_ns"].tolist() == [5, 6]
@@ -0,0 +1,152 @@
+import json
+import os
+import subprocess
+import sys
+
+# Get the parent directory's path
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Add the parent directory to the system path if not already present
+if parent_directory not in sys.path:
+    sys.path.insert(0, parent_directory)
+
+from ch347 import CH347
+from ch347.__main__ import main
+from ch347.simulator import (
+    SimulatedCH347,
+    VirtualEEPROM,
+    VirtualINA226,
+    VirtualMPU6050,
+    VirtualSPIFlash,
+)
+
+
+def _run(capsys, argv, sim):
+    status = main(["--json"] + argv, driver=CH347(dll_path=sim))
+    return status, json.loads(capsys.readouterr().out)
+
+
+def test_list_and_info(capsys):
+    sim = SimulatedCH347(device_count=2)
+    status, result = _run(capsys, ["list"], sim)
+    assert status == 0
+    assert [device["index"] for device in result["devices"]] == [0, 1]
+    assert result["devices"][0]["serial_number"] == "SIM00001"
+
+    status, result = _run(capsys, ["info"], sim)
+    assert status == 0
+    assert result["transfer_plan"]["i2c_read_chunk"] == 508
+    assert result["info"]["UsbSpeedType"] == 1
+
+
+def test_i2c(capsys):
+    sim = SimulatedCH347()
+    sim.attach_i2c(0x40, VirtualINA226())
+    sim.attach_i2c(0x68, VirtualMPU6050())
+    status, result = _run(capsys, ["i2c", "scan", "--speed", "400"], sim)
+    assert status == 0
+    assert [(d["address"], d["name"]) for d in result["devices"]] == [
+        (0x40, "INA226"),
+        (0x68, "MPU6050"),
+    ]
+    assert sim.i2c_speed == 400000
+
+    status, result = _run(
+        capsys, ["i2c", "dump", "0x68", "--start", "0x75", "--length", "1"], sim
+    )
+    assert bytes.fromhex(result["data"]) == b"\x68"
+
+    assert (
+        main(["i2c", "dump", "0x68", "--length", "32"], driver=CH347(dll_path=sim)) == 0
+    )
+    assert capsys.readouterr().out.startswith("0000: ")
+
+
+def test_eeprom_round_trip(capsys, tmp_path):
+    sim = SimulatedCH347()
+    sim.attach_i2c(0x50, VirtualEEPROM(size=4096))
+    source = tmp_path / "source.bin"
+    source.write_bytes(os.urandom(3000))
+    status, result = _run(
+        capsys,
+        ["eeprom", "write", "24c32", str(source), "--address", "0x100", "--verify"],
+        sim,
+    )
+    assert status == 0 and result["verified"] and result["bytes"] == 3000
+
+    copy = tmp_path / "copy.bin"
+    status, result = _run(
+        capsys,
+        ["eeprom", "read", "24C32", str(copy), "--address", "0x100", "--chunk", "512"],
+        sim,
+    )
+    assert status == 0 and result["bytes"] == 4096 - 0x100
+    assert copy.read_bytes()[:3000] == source.read_bytes()
+
+
+def test_flash_write_skips_unchanged_sectors(capsys, tmp_path):
+    sim = SimulatedCH347()
+    flash = VirtualSPIFlash(size=1 << 16, jedec_id=b"\xef\x40\x10")
+    sim.attach_spi(0, flash)
+    image = bytearray(os.urandom(5 * 4096 + 100))
+    image[4096 : 2 * 4096] = b"\xff" * 4096
+    image[100] = 0x00
+    source = tmp_path / "image.bin"
+    source.write_bytes(image)
+
+    status, result = _run(
+        capsys, ["spi", "flash", "write", str(source), "--verify"], sim
+    )
+    assert status == 0 and result["verified"]
+    # The blank sector already matches, the others only clear bits
+    assert result["sectors_skipped"] == 1 and result["sectors_erased"] == 0
+    assert bytes(flash.memory[: len(image)]) == bytes(image)
+
+    # A set bit needs an erase, a cleared one only a program
+    image[100] = 0xFF
+    image[5000] = 0x00
+    source.write_bytes(image)
+    status, result = _run(capsys, ["spi", "flash", "write", str(source)], sim)
+    assert result["sectors_erased"] == 1 and result["sectors_skipped"] == 4
+    assert result["pages_programmed"] == 16 + 1
+
+    copy = tmp_path / "copy.bin"
+    status, result = _run(capsys, ["spi", "flash", "read", str(copy)], sim)
+    assert result["bytes"] == 1 << 16 and result["jedec_id"] == "ef4010"
+    assert copy.read_bytes()[: len(image)] == bytes(image)
+
+    flash.memory[100] ^= 0x01
+    status, result = _run(capsys, ["spi", "flash", "verify", str(source)], sim)
+    assert status == 1 and result["mismatch"] == 100
+    assert sim.spi_config.SPIOutDefaultData == 0xFF
+    assert sim.spi_config.IsAutoDeactiveCS == 1
+
+
+def test_flash_beyond_3_byte_addresses(capsys, tmp_path):
+    sim = SimulatedCH347()
+    # A 32 MiB part, of which the model keeps 64 KiB
+    sim.attach_spi(0, VirtualSPIFlash(size=1 << 16, jedec_id=b"\xef\x40\x19"))
+    copy = tmp_path / "copy.bin"
+    status, result = _run(capsys, ["spi", "flash", "read", str(copy)], sim)
+    assert status == 1 and "16 MiB" in result["error"]
+    status, result = _run(
+        capsys, ["spi", "flash", "read", str(copy), "--length", "4096"], sim
+    )
+    assert status == 0 and result["bytes"] == 4096
+
+
+def test_errors_and_startup(capsys):
+    sim = SimulatedCH347(device_count=0)
+    status, result = _run(capsys, ["info"], sim)
+    assert status == 1 and "Cannot open" in result["error"]
+
+    # Only what parsing needs is imported before a subcommand runs
+    code = "import sys, ch347.__main__; print('numpy' in sys.modules)"
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=parent_directory,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    assert output.strip() == "False"
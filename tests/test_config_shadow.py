@@ -0,0 +1,138 @@
+import os
+import sys
+
+# Get the parent directory's path
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Add the parent directory to the system path if not already present
+if parent_directory not in sys.path:
+    sys.path.insert(0, parent_directory)
+
+from ch347 import CH347, SPIConfig
+from ch347.instrument import Instrumentation
+from ch347.simulator import SimulatedCH347
+from ch347.timeouts import AdaptiveTimeouts
+from spi_devices.sd_nand.sd_nand import SD_NAND
+
+
+def _driver(sim=None):
+    driver = CH347(dll_path=sim or SimulatedCH347())
+    instrumentation = Instrumentation()
+    instrumentation.attach(driver)
+    driver.open_device()
+    return driver, instrumentation
+
+
+def _calls(instrumentation, name) -> int:
+    operation = instrumentation.operations.get((name, 0))
+    return operation.calls if operation is not None else 0
+
+
+def test_redundant_configuration_is_skipped():
+    driver, instrumentation = _driver()
+    SD_NAND(driver=driver)
+    SD_NAND(driver=driver)
+    assert _calls(instrumentation, "CH347SPI_GetCfg") == 1
+    assert _calls(instrumentation, "CH347SPI_Init") == 1
+
+    # Switching between two devices costs one init per switch, none when staying
+    flash = SPIConfig(Mode=0, Clock=1, ByteOrder=1, ChipSelect=0x80)
+    sensor = SPIConfig(Mode=3, Clock=4, ByteOrder=1, ChipSelect=0x81)
+    for config in (flash, flash, sensor, sensor, flash):
+        assert driver.spi_init(config)
+    assert _calls(instrumentation, "CH347SPI_Init") == 4
+
+    for _ in range(3):
+        assert driver.i2c_set(2)
+        assert driver.i2c_set_stretch(True)
+        assert driver.set_timeout(500, 500)
+    assert _calls(instrumentation, "CH347I2C_Set") == 1
+    assert _calls(instrumentation, "CH347I2C_SetStretch") == 1
+    assert _calls(instrumentation, "CH347SetTimeout") == 1
+
+    # A new frequency initializes the controller again with the same settings
+    assert driver.spi_set_frequency(10000000)
+    assert driver.spi_set_frequency(10000000)
+    assert driver.spi_init(flash)
+    assert _calls(instrumentation, "CH347SPI_SetFrequency") == 1
+    assert _calls(instrumentation, "CH347SPI_Init") == 5
+
+
+def test_configuration_in_force_is_not_applied_again():
+    sim = SimulatedCH347()
+    config = SPIConfig(Mode=1, Clock=3, ByteOrder=1, ChipSelect=0x80)
+    CH347(dll_path=sim).spi_init(config)
+
+    # Another driver finds the configuration on the device
+    driver, instrumentation = _driver(sim)
+    assert driver.spi_init(config)
+    assert _calls(instrumentation, "CH347SPI_Init") == 0
+    assert driver.spi_word_order == ">"
+
+
+def test_drivers_of_one_device_share_the_shadow():
+    sim = SimulatedCH347()
+    first, _ = _driver(sim)
+    second, _ = _driver(sim)
+    flash = SPIConfig(Mode=0, Clock=1, ByteOrder=1, ChipSelect=0x80)
+    sensor = SPIConfig(Mode=3, Clock=4, ByteOrder=1, ChipSelect=0x80)
+    assert first.spi_init(flash)
+    assert second.spi_init(sensor)
+    assert first.spi_init(flash)
+    assert sim.spi_config.Mode == 0 and sim.spi_config.Clock == 1
+
+    # Another device, or another library, has a shadow of its own
+    other = CH347(device_index=1, dll_path=sim)
+    assert other.config_shadow is not first.config_shadow
+    assert CH347(dll_path=SimulatedCH347()).config_shadow == {}
+
+
+def test_reopen_restores_configuration():
+    sim = SimulatedCH347()
+    driver, instrumentation = _driver(sim)
+    config = SPIConfig(Mode=2, Clock=2, ByteOrder=0, ChipSelect=0x80)
+    driver.spi_init(config)
+    driver.i2c_set(3)
+    driver.set_timeout(100, 200)
+    driver.close_device()
+
+    # Reset by the reopen
+    sim.spi_config = SPIConfig()
+    sim.i2c_speed = sim.I2C_SPEEDS[1]
+    sim.timeouts = (sim.NO_TIMEOUT, sim.NO_TIMEOUT)
+    assert driver.open_device()
+    assert sim.spi_config.Mode == 2 and sim.spi_config.Clock == 2
+    assert sim.i2c_speed == 750000
+    assert sim.timeouts == (100, 200)
+
+    # The SPI configuration survives a frequency change
+    driver.spi_set_frequency(15000000)
+    driver.close_device()
+    sim.spi_config = SPIConfig()
+    sim.spi_hz = 0
+    assert driver.open_device()
+    assert sim.spi_hz == 15000000
+    assert sim.spi_config.Mode == 2 and sim.spi_config.ChipSelect == 0x80
+    assert sim.spi_config.ByteOrder == 0
+
+    # Opening an open device does not apply anything
+    calls = sim.calls
+    driver.open_device()
+    assert sim.calls - calls == 1
+    assert driver.spi_init(config)
+    assert sim.calls - calls == 1
+
+
+def test_adaptive_timeouts_bypass_the_shadow():
+    sim = SimulatedCH347()
+    driver = CH347(dll_path=sim)
+    driver.set_timeout(100, 100)
+    timeouts = AdaptiveTimeouts()
+    timeouts.attach(driver)
+    driver.open_device()
+    driver.stream_i2c([0xA0, 0x00], 1)
+    # The adaptive timeout replaced 100 ms, so setting it again is not redundant
+    assert driver.set_timeout(100, 100)
+    assert sim.timeouts == (100, 100)
+    AdaptiveTimeouts.detach(driver)
+    assert "set_timeout" in driver.shadowed
@@ -0,0 +1,57 @@
+import os
+import sys
+
+# Get the parent directory's path
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Add the parent directory to the system path if not already present
+if parent_directory not in sys.path:
+    sys.path.insert(0, parent_directory)
+
+from ch347 import CH347
+from ch347.simulator import (
+    SimulatedCH347,
+    VirtualEEPROM,
+    VirtualINA226,
+    VirtualMPU6050,
+)
+from i2c_devices.discovery import discover, scan
+from i2c_devices.ina226 import INA226
+from i2c_devices.mpu6050 import MPU6050
+
+
+def _bus():
+    sim = SimulatedCH347()
+    sim.attach_i2c(0x41, VirtualINA226())
+    sim.attach_i2c(0x68, VirtualMPU6050())
+    sim.attach_i2c(0x50, VirtualEEPROM())
+    # Something without an identifier
+    sim.attach_i2c(0x20, VirtualEEPROM())
+    return sim
+
+
+def test_scan():
+    sim = _bus()
+    driver = CH347(dll_path=sim)
+    driver.open_device()
+    calls = sim.calls
+    assert scan(driver) == [0x20, 0x41, 0x50, 0x68]
+    assert sim.calls - calls == 0x78 - 0x08
+
+
+def test_discover():
+    sim = _bus()
+    devices = discover(CH347(dll_path=sim), instantiate=True)
+    assert [(device.address, device.name) for device in devices] == [
+        (0x20, None),
+        (0x41, "INA226"),
+        (0x50, "EEPROM"),
+        (0x68, "MPU6050"),
+    ]
+    assert isinstance(devices[1].driver, INA226)
+    assert devices[1].driver.address == 0x41 << 1
+    assert devices[1].identity == b"TI\x22\x60"
+    assert devices[2].driver is None
+    assert isinstance(devices[3].driver, MPU6050)
+    # One round trip per address, a few ID reads and the driver setup
+    assert sim.elapsed < 0.05
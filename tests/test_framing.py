@@ -0,0 +1,108 @@
+import os
+import struct
+import sys
+import zlib
+
+import pytest
+
+# Get the parent directory's path
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Add the parent directory to the system path if not already present
+if parent_directory not in sys.path:
+    sys.path.insert(0, parent_directory)
+
+from ch347.framing import (
+    COBSDecoder,
+    DelimitedDecoder,
+    LengthPrefixedDecoder,
+    SLIPDecoder,
+    cobs_encode,
+    slip_encode,
+)
+
+PAYLOADS = [
+    b"",
+    b"\x00",
+    b"hello\x00world\x00",
+    bytes(range(256)) * 3,
+    b"\xc0\xdb\xdc\xdd" * 10,
+    bytes(254),
+    b"\x01" * 254 + b"\x00",
+]
+
+
+def sum8(data):
+    return bytes([sum(data) & 0xFF])
+
+
+def test_cobs_round_trip_in_chunks():
+    stream = b"".join(cobs_encode(p) + b"\x00" for p in PAYLOADS)
+    decoder = COBSDecoder(capacity=4096)
+    frames = []
+    for i in range(0, len(stream), 100):
+        # Views are only valid until the next feed
+        frames += [bytes(f) for f in decoder.feed(stream[i : i + 100])]
+    assert frames == PAYLOADS
+    assert decoder.errors == 0
+
+
+def test_frames_are_views_into_the_buffer():
+    decoder = SLIPDecoder()
+    frames = decoder.feed(b"\xc0abc\xc0" + slip_encode(b"x\xc0y") + b"\xc0")
+    assert [bytes(f) for f in frames] == [b"abc", b"x\xc0y"]
+    assert all(f.obj is decoder.buffer for f in frames)
+
+
+def test_slip_checksums_drop_bad_frames():
+    good = [p + sum8(p) for p in PAYLOADS[1:]]
+    bad = b"corrupt" + b"\x00"
+    stream = b"\xc0".join(slip_encode(f) for f in good[:2] + [bad] + good[2:])
+    decoder = SLIPDecoder(checksum="sum8")
+    frames = [bytes(f) for f in decoder.feed(stream + b"\xc0")]
+    assert frames == PAYLOADS[1:]
+    assert decoder.errors == 1
+    # An escape that is not followed by ESC_END or ESC_ESC is an error too
+    assert decoder.feed(b"a\xdbb\xc0") == [] and decoder.errors == 2
+
+
+def test_length_prefixed_crc32_and_partial_frames():
+    def frame(payload):
+        body = payload + zlib.crc32(payload).to_bytes(4, "little")
+        return struct.pack("<H", len(body)) + body
+
+    # The third frame is one byte of payload with a wrong CRC
+    frames = [frame(p) for p in PAYLOADS]
+    stream = b"".join(frames[:2]) + b"\x05\x00hello" + b"".join(frames[2:])
+    decoder = LengthPrefixedDecoder(checksum="crc32", capacity=2048)
+    received = []
+    for i in range(0, len(stream), 7):
+        received += [bytes(f) for f in decoder.feed(stream[i : i + 7])]
+    assert received == PAYLOADS
+    assert decoder.errors == 1
+
+
+def test_xor8_batch():
+    payloads = [bytes([i, i * 3 % 256, 7]) for i in range(200)]
+    stream = b"".join(
+        cobs_encode(p + bytes([p[0] ^ p[1] ^ p[2]])) + b"\x00" for p in payloads
+    )
+    decoder = COBSDecoder(checksum="xor8")
+    assert [bytes(f) for f in decoder.feed(stream)] == payloads
+
+
+def test_decoders_need_split_and_decode():
+    with pytest.raises(TypeError):
+        DelimitedDecoder()
+
+
+def test_feed_larger_than_the_buffer():
+    payloads = [bytes([i]) * 3 for i in range(1, 6)]
+    stream = b"".join(cobs_encode(p) + b"\x00" for p in payloads)
+    decoder = COBSDecoder(capacity=16)
+    assert [bytes(f) for f in decoder.feed(stream)] == payloads
+
+    # A frame too short to hold its checksum is an error
+    decoder = COBSDecoder(checksum="crc32")
+    assert decoder.feed(cobs_encode(b"ab") + b"\x00") == []
+    assert decoder.errors == 1
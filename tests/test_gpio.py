@@ -0,0 +1,97 @@
+import asyncio
+import os
+import sys
+import threading
+
+# Get the parent directory's path
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Add the parent directory to the system path if not already present
+if parent_directory not in sys.path:
+    sys.path.insert(0, parent_directory)
+
+from ch347.gpio import GPIO, EventRing
+from tests.gpio_sim import FakeGPIODriver
+
+
+def test_read_write_keep_other_pins():
+    driver = FakeGPIODriver()
+    gpio = GPIO(driver)
+    assert gpio.write(2, 0)
+    assert gpio.write(5, 1)
+    assert driver.direction == 0b00100100
+    assert gpio.read(2) == 0 and gpio.read(5) == 1
+    assert gpio.set_direction(5, False)
+    assert driver.direction == 0b00000100
+
+
+def test_edges_are_queued_in_order():
+    driver = FakeGPIODriver()
+    gpio = GPIO(driver)
+    assert gpio.arm(4, GPIO.BOTH, 6, GPIO.FALLING)
+    driver.edge(4, 0)
+    driver.edge(6, 0)
+    driver.edge(4, 1)
+
+    events = list(gpio.events(timeout=0))
+    assert [(e.pin, e.level) for e in events] == [(4, 0), (6, 0), (4, 1)]
+    assert events[0].timestamp_ns <= events[1].timestamp_ns <= events[2].timestamp_ns
+    assert gpio.interrupts == 3
+
+    # A pulse already over when the status is sampled shows no edge, and a
+    # rising level on a falling edge pin is not one
+    driver.level |= 1 << 6
+    driver.routine(bytes(((driver.level >> p) & 1) << 6 for p in range(8)))
+    assert gpio.get_event(timeout=0) is None
+    assert gpio.interrupts == 4 and gpio.unattributed == 1
+
+    # Back low again: the rising edge in between raised no interrupt
+    driver.edge(6, 0)
+    driver.level |= 1 << 6
+    driver.edge(6, 0)
+    assert [(e.pin, e.level) for e in gpio.events(timeout=0)] == [(6, 0), (6, 0)]
+    assert gpio.unattributed == 1
+
+    gpio.close()
+    assert driver.routine is None
+
+
+def test_wait_for_edge_wakes_from_other_thread():
+    driver = FakeGPIODriver()
+    gpio = GPIO(driver)
+    gpio.arm(3)
+    timer = threading.Timer(0.05, driver.edge, (3, 0))
+    timer.start()
+    event = gpio.wait_for_edge(3, timeout=5)
+    timer.join()
+    assert event is not None and event.pin == 3 and event.level == 0
+    assert gpio.wait_for_edge(3, timeout=0.01) is None
+
+
+def test_stream_yields_events():
+    driver = FakeGPIODriver()
+    gpio = GPIO(driver)
+    gpio.arm(1, GPIO.BOTH)
+
+    async def collect():
+        stream = gpio.stream()
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.01, threading.Thread(target=driver.edge, args=(1, 0)).start)
+        first = await stream.__anext__()
+        driver.edge(1, 1)
+        second = await stream.__anext__()
+        await stream.aclose()
+        return first, second
+
+    first, second = asyncio.run(collect())
+    assert (first.pin, first.level) == (1, 0)
+    assert (second.pin, second.level) == (1, 1)
+
+
+def test_full_ring_counts_drops():
+    ring = EventRing(4)
+    for i in range(6):
+        ring.push(0, 1, i)
+    assert len(ring) == 4 and ring.dropped == 2
+    assert [ring.pop().timestamp_ns for _ in range(4)] == [0, 1, 2, 3]
+    assert ring.pop() is None
@@ -2,8 +2,6 @@ import os
 import sys
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
-import numpy as np
-from time import sleep
 
 # Get the parent directory's path
 parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
@@ -12,22 +10,14 @@ parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 if parent_directory not in sys.path:
     sys.path.insert(0, parent_directory)
 
+from ch347.live import Acquisition
 from i2c_devices.ina226 import INA226
 
 # Initialize the INA226 sensor
 sensor = INA226()
 
-def read_sensor_data():
-    return [sensor.get_bus_voltage(), sensor.get_current(), sensor.get_power()]
-
-# Generator function to produce data from the sensor sensor
-def generate_sensor_data():
-    data_buffer = []
-    while True:
-        data = read_sensor_data()
-        data_buffer.append(data)
-        yield data_buffer
-        sleep(0.1)
+# Sample in the background into a fixed-size ring, independent of the frame rate
+acquisition = Acquisition.ina226(sensor, capacity=1000, rate_hz=100)
 
 # Create a figure with 6 subplots for accelerometer and gyroscope data
 fig, axs = plt.subplots(3, 1, figsize=(8, 12))
@@ -36,7 +26,7 @@ fig, axs = plt.subplots(3, 1, figsize=(8, 12))
 lines = [axs[i].plot([], [], lw=2)[0] for i in range(3)]
 
 # Set the number of data points to be displayed on the plot
-num_display_points = 50
+num_display_points = 500
 
 def init():
     for line in lines:
@@ -44,18 +34,18 @@ def init():
     return lines
 
 def update(frame):
-    data_buffer = next(data_generator)
-
-    # Generate the x-axis values (time steps) based on the number of data points
-    time_steps = np.arange(len(data_buffer))
+    # Views of the latest samples, nothing is copied
+    timestamps, values = acquisition.window(num_display_points)
+    if not len(timestamps):
+        return lines
 
-    # Get the starting index to display a specific number of data points
-    start_index = max(0, len(data_buffer) - num_display_points)
+    # Seconds since the first sample shown
+    time_steps = (timestamps - timestamps[0]) / 1e9
 
-    # Update the plot data for accelerometer and gyroscope
+    # Update the plot data for voltage, current and power
     for i in range(3):
-        lines[i].set_data(time_steps[start_index:], [data[i] for data in data_buffer[start_index:]])
-        axs[i].set_xlim(start_index, start_index + num_display_points - 1)
+        lines[i].set_data(time_steps, values[:, i])
+        axs[i].set_xlim(0, max(time_steps[-1], 1e-3))
 
     # Update the x-axis limits for scrolling effect
     axs[0].set_ylim(0, 10000)
@@ -64,19 +54,19 @@ def update(frame):
 
     return lines
 
-# Create the generator for sensor sensor data
-data_generator = generate_sensor_data()
+acquisition.start()
 
 # Create an animation for real-time plotting, update every 100 milliseconds (0.1 seconds)
-ani = animation.FuncAnimation(fig, update, frames=range(100), init_func=init, blit=True, interval=100)
+ani = animation.FuncAnimation(fig, update, init_func=init, blit=True, interval=100, cache_frame_data=False)
 
 # Add labels and title to each subplot
 axis_labels = ['Voltage in mV', 'Current in uA', 'Power in mW']
 for i in range(3):
     axs[i].set_title(f'{axis_labels[i]}')
-    axs[i].set_xlabel('Time Steps')
+    axs[i].set_xlabel('Time in s')
     axs[i].set_ylabel('INA226 Data Value')
 
 plt.tight_layout()
 plt.show()
+acquisition.stop()
 sensor.close()
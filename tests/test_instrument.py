@@ -0,0 +1,91 @@
+import ctypes
+import json
+import os
+import sys
+
+# Get the parent directory's path
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Add the parent directory to the system path if not already present
+if parent_directory not in sys.path:
+    sys.path.insert(0, parent_directory)
+
+from ch347.instrument import Histogram, Instrumentation
+
+
+class FakeFunction:
+    def __init__(self, result):
+        self.result = result
+
+    def __call__(self, *args):
+        return self.result
+
+
+class FakeDLL:
+    def __init__(self):
+        self.CH347StreamI2C = FakeFunction(True)
+        self.CH347SPI_Read = FakeFunction(True)
+        self.CH347OpenDevice = FakeFunction(None)
+        self.CH347Uart_Open = FakeFunction(1)
+        self.CH347GetChipType = FakeFunction(0)
+        self.CH347SetTimeout = FakeFunction(False)
+
+
+class FakeDriver:
+    def __init__(self):
+        self.ch347dll = FakeDLL()
+
+
+def test_histogram_percentiles_have_bounded_error():
+    histogram = Histogram()
+    for value in range(1, 100001):
+        histogram.record(value)
+    assert histogram.count == 100000 and histogram.min == 1
+    for percent in (50, 90, 99, 99.9):
+        exact = percent * 1000
+        assert abs(histogram.percentile(percent) - exact) <= exact / 32
+    assert histogram.percentile(100) == 100000
+    for index in (0, 63, 64, 100, 500):
+        low, high = Histogram.bucket_range(index)
+        assert Histogram.bucket(low) == Histogram.bucket(high) == index
+
+
+def test_attach_records_per_operation_and_device(tmp_path):
+    driver = FakeDriver()
+    stats = Instrumentation()
+    stats.attach(driver)
+    dll = driver.ch347dll
+
+    dll.CH347StreamI2C.argtypes = [ctypes.c_ulong]
+    assert driver.ch347dll.dll.CH347StreamI2C.argtypes == [ctypes.c_ulong]
+
+    dll.CH347StreamI2C(0, 2, None, 6, None)
+    dll.CH347StreamI2C(1, 3, None, 0, None)
+    read_length = ctypes.c_ulong(16)
+    dll.CH347SPI_Read(0, 0x80, 1, ctypes.byref(read_length), None)
+    dll.CH347OpenDevice(0)
+    dll.CH347Uart_Open(0)
+    dll.CH347GetChipType(0)
+    dll.CH347SetTimeout(0, 100, 100)
+
+    snapshot = {
+        (op["operation"], op["device"]): op for op in stats.snapshot()["operations"]
+    }
+    assert snapshot[("CH347StreamI2C", 0)]["bytes"] == 8
+    assert snapshot[("CH347StreamI2C", 1)]["bytes"] == 3
+    assert snapshot[("CH347SPI_Read", 0)]["bytes"] == 17
+    assert snapshot[("CH347OpenDevice", 0)]["failures"] == 1
+    # Failure depends on the result type: a handle, a value or a BOOL
+    assert snapshot[("CH347Uart_Open", 0)]["failures"] == 0
+    assert snapshot[("CH347GetChipType", 0)]["failures"] == 0
+    assert snapshot[("CH347SetTimeout", 0)]["failures"] == 1
+    assert json.loads(stats.to_json())["operations"][0]["calls"] == 1
+
+    path = tmp_path / "ch347.prom"
+    stats.write_prometheus(str(path))
+    text = path.read_text()
+    assert 'ch347_bytes_total{op="CH347StreamI2C",device="0"} 8' in text
+    assert 'ch347_call_duration_seconds_count{op="CH347SPI_Read",device="0"} 1' in text
+
+    Instrumentation.detach(driver)
+    assert isinstance(driver.ch347dll, FakeDLL)
@@ -0,0 +1,112 @@
+import os
+import sys
+
+# Get the parent directory's path
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Add the parent directory to the system path if not already present
+if parent_directory not in sys.path:
+    sys.path.insert(0, parent_directory)
+
+from ch347.jtag import JTAG, TapState, TMS_PATHS
+from tests.jtag_sim import SimulatedDevice, SimulatedTAP
+
+
+def make_jtag(*devices):
+    tap = SimulatedTAP(list(devices))
+    return JTAG(tap), tap
+
+
+def test_tms_paths_reach_target():
+    for start in range(16):
+        for end in range(16):
+            bits, count = TMS_PATHS[start][end]
+            state = start
+            for i in range(count):
+                state = TapState.TRANSITIONS[state][(bits >> i) & 1]
+            assert state == end
+
+
+def test_scan_chain_reports_idcodes_and_bypass():
+    jtag, _ = make_jtag(
+        SimulatedDevice(idcode=0x0362D093, ir_length=6),
+        SimulatedDevice(idcode=None, ir_length=4),
+        SimulatedDevice(idcode=0x4BA00477, ir_length=4),
+    )
+    assert jtag.scan_chain(max_devices=8) == [0x0362D093, 0, 0x4BA00477]
+    assert jtag.chain_ir_length() == 14
+
+
+def test_dead_chain_has_no_devices():
+    class StuckLowDevice(SimulatedDevice):
+        def shift(self, is_dr, tdi):
+            return 0
+
+    jtag, _ = make_jtag(StuckLowDevice())
+    assert jtag.scan_chain() == []
+
+
+def test_redundant_tms_is_skipped_and_coalesced():
+    jtag, tap = make_jtag(SimulatedDevice(idcode=0x12345679))
+    jtag.goto_state(TapState.RUN_TEST_IDLE)
+    jtag.goto_state(TapState.RUN_TEST_IDLE)
+    jtag.run_test(10)
+    assert tap.calls == []
+    jtag.flush()
+    # Reset, move to idle and idle clocks go out in one TmsChange call
+    assert tap.calls == [("tms", 5 + 1 + 10)]
+    assert tap.state == jtag.state == TapState.RUN_TEST_IDLE
+
+
+def test_short_scan_uses_write_read_fast():
+    device = SimulatedDevice(idcode=0x12345679, ir_length=4)
+    jtag, tap = make_jtag(device)
+    jtag.shift_ir(bytes([0x2]), 4)
+    tdo = jtag.shift_dr(bytes(range(8)), 64, read=True)
+    assert [call[0] for call in tap.calls] == ["tms", "fast", "fast"]
+    assert tdo == bytes(8)
+    assert device.updates[-1] == ("DR", 0x2, int.from_bytes(bytes(range(8)), "little"))
+
+
+def test_continued_scan_is_split_into_buffer_sized_packets():
+    device = SimulatedDevice(idcode=0x12345679, ir_length=4)
+    jtag, tap = make_jtag(device)
+    jtag.shift_ir(bytes([0x2]), 4)
+    payload = os.urandom(JTAG.BUFFER_SIZE * 2 + 100)
+    for offset in range(0, len(payload), 1000):
+        jtag.shift_dr(
+            payload[offset : offset + 1000], read=True, end_state=TapState.SHIFT_DR
+        )
+    tdo = jtag.shift_dr(b"", 0, read=True)
+    jtag.flush()
+
+    scans = [call for call in tap.calls if call[0] == "scan"]
+    assert scans == [
+        ("scan", JTAG.BUFFER_SIZE * 8),
+        ("scan", JTAG.BUFFER_SIZE * 8),
+        ("scan", 100 * 8),
+    ]
+    # The 64-bit user register holds the last 64 bits shifted in
+    assert device.updates[-1] == ("DR", 0x2, int.from_bytes(payload[-8:], "little"))
+    assert len(tdo) == len(payload)
+    assert tdo[8:] == payload[:-8]
+    assert jtag.state == tap.state == TapState.RUN_TEST_IDLE
+
+
+def test_long_scan_is_split_into_buffer_sized_packets():
+    device = SimulatedDevice(idcode=0x12345679, ir_length=4)
+    jtag, tap = make_jtag(device)
+    jtag.shift_ir(bytes([0x2]), 4)
+    payload = os.urandom(JTAG.BUFFER_SIZE * 2 + 100)
+    tdo = jtag.shift_dr(payload, read=True)
+    jtag.flush()
+
+    scans = [call for call in tap.calls if call[0] == "scan"]
+    assert scans == [
+        ("scan", JTAG.BUFFER_SIZE * 8),
+        ("scan", JTAG.BUFFER_SIZE * 8),
+        ("scan", 100 * 8),
+    ]
+    assert device.updates[-1] == ("DR", 0x2, int.from_bytes(payload[-8:], "little"))
+    assert tdo[8:] == payload[:-8]
+    assert jtag.state == tap.state == TapState.RUN_TEST_IDLE
@@ -0,0 +1,85 @@
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+
+# Get the parent directory's path
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Add the parent directory to the system path if not already present
+if parent_directory not in sys.path:
+    sys.path.insert(0, parent_directory)
+
+from ch347 import CH347
+from ch347.live import Acquisition, SampleRing
+from ch347.simulator import SimulatedCH347, VirtualINA226, VirtualMPU6050
+from i2c_devices.ina226 import INA226
+from i2c_devices.mpu6050 import MPU6050
+
+
+def test_ring_windows_are_contiguous_views():
+    ring = SampleRing(8, 2)
+    times, values = ring.window(4)
+    assert len(times) == 0 and values.shape == (0, 2)
+
+    storage = ring._values.nbytes
+    for i in range(21):
+        ring.append(i, (i, -i))
+    assert ring._values.nbytes == storage
+
+    times, values = ring.window(5)
+    assert list(times) == [16, 17, 18, 19, 20]
+    assert list(values[:, 1]) == [-16, -17, -18, -19, -20]
+    assert np.shares_memory(values, ring._values)
+    assert values.flags["C_CONTIGUOUS"]
+
+    # Never more than the ring holds
+    times, _ = ring.window(100)
+    assert list(times) == list(range(13, 21))
+
+    times, values = ring.snapshot(2)
+    ring.append(21, (21, -21))
+    assert list(times) == [19, 20]
+
+
+def test_mpu6050_acquisition():
+    sim = SimulatedCH347()
+    sim.attach_i2c(0x68, VirtualMPU6050(accel=(0.5, -0.25, 1.0), gyro=(10, 0, -90)))
+    mpu = MPU6050(driver=CH347(dll_path=sim))
+
+    with Acquisition.mpu6050(mpu, capacity=64) as acquisition:
+        deadline = time.perf_counter() + 5
+        while acquisition.ring.count < 100 and time.perf_counter() < deadline:
+            time.sleep(0.01)
+    count = acquisition.ring.count
+    assert count >= 100
+    assert acquisition.failures == 0
+
+    times, values = acquisition.window(32)
+    assert values.shape == (32, 6)
+    assert np.all(np.diff(times) >= 0)
+    assert values[-1] == pytest.approx([0.5, -0.25, 1.0, 10, 0, -90], abs=0.01)
+
+    # Stopped: nothing is added any more
+    time.sleep(0.02)
+    assert acquisition.ring.count == count
+
+
+def test_ina226_acquisition_rate():
+    sim = SimulatedCH347()
+    sim.attach_i2c(0x40, VirtualINA226(bus_voltage_mv=3300, current_ma=250))
+    sensor = INA226(driver=CH347(dll_path=sim))
+
+    acquisition = Acquisition.ina226(sensor, capacity=256, rate_hz=200)
+    acquisition.start()
+    with pytest.raises(RuntimeError):
+        acquisition.start()
+    time.sleep(0.3)
+    acquisition.stop()
+
+    assert 20 <= acquisition.ring.count <= 80
+    assert acquisition.rate() == pytest.approx(200, rel=0.25)
+    _, values = acquisition.window(1)
+    assert values[0, 0] == pytest.approx(3300, rel=0.01)
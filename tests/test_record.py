@@ -0,0 +1,123 @@
+import os
+import sys
+import time
+
+import pytest
+
+# Get the parent directory's path
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Add the parent directory to the system path if not already present
+if parent_directory not in sys.path:
+    sys.path.insert(0, parent_directory)
+
+from ch347 import CH347, SPIConfig
+from ch347.record import (
+    OutputBuffer,
+    Recorder,
+    ReplayCH347,
+    ReplayError,
+    TransactionLog,
+)
+from ch347.simulator import (
+    SimulatedCH347,
+    VirtualEEPROM,
+    VirtualMPU6050,
+    VirtualSPIFlash,
+)
+from i2c_devices.mpu6050 import MPU6050
+
+
+def session(driver):
+    mpu = MPU6050(driver=driver)
+    driver.spi_init(SPIConfig(Mode=0, Clock=1, ByteOrder=1, ChipSelect=0x80))
+    return (
+        mpu.get_all_data(),
+        driver.spi_read(0x80, [0x9F], 3),
+        driver.read_eeprom(0, 0x10, 4),
+        driver.gpio_get(),
+        driver.get_serial_number(),
+    )
+
+
+def recorded_log(path):
+    sim = SimulatedCH347(serial_number="FIELD01")
+    sim.attach_i2c(0x68, VirtualMPU6050(accel=(0.1, 0.2, 0.9), gyro=(5, 6, 7)))
+    sim.attach_i2c(0x50, VirtualEEPROM())
+    sim.attach_spi(0, VirtualSPIFlash())
+    sim.i2c[0x50].memory[0x10:0x14] = b"\xde\xad\xbe\xef"
+    driver = CH347(dll_path=sim)
+    with Recorder(str(path)) as recorder:
+        recorder.attach(driver)
+        expected = session(driver)
+        Recorder.detach(driver)
+    assert driver.ch347dll is sim
+    return expected
+
+
+def test_replay_reproduces_driver_results(tmp_path):
+    path = tmp_path / "bus.ch347log"
+    expected = recorded_log(path)
+
+    replay = ReplayCH347(str(path))
+    assert session(CH347(dll_path=replay)) == expected
+    assert replay.remaining == 0
+
+    with TransactionLog(str(path)) as log:
+        calls = list(log)
+    assert calls[0].operation == "CH347OpenDevice" and calls[0].device == 0
+    read = next(c for c in calls if c.operation == "CH347SPI_Read")
+    assert read.target == 0x80 and read.outputs[4] == b"\xef\x40\x15"
+    info = next(c for c in calls if c.operation == "CH347GPIO_Get")
+    assert isinstance(info.arguments[0], OutputBuffer)
+    i2c = next(c for c in calls if c.operation == "CH347StreamI2C")
+    assert i2c.target == 0x68
+    assert all(c.timestamp_ns >= calls[0].timestamp_ns for c in calls)
+
+
+def test_strict_replay_detects_divergence(tmp_path):
+    path = tmp_path / "bus.ch347log"
+    recorded_log(path)
+    driver = CH347(dll_path=ReplayCH347(str(path)))
+    driver.open_device()
+    with pytest.raises(ReplayError, match="argument 2"):
+        # The recording woke the MPU6050 with 0x6B <- 0x00
+        driver.stream_i2c([0x68 << 1, 0x6B, 0x01], 0)
+    with pytest.raises(ReplayError, match="log has CH347OpenDevice"):
+        CH347(dll_path=ReplayCH347(str(path))).close_device()
+
+
+def test_sessions_append_and_truncated_tail_is_ignored(tmp_path):
+    path = tmp_path / "bus.ch347log"
+    recorded_log(path)
+    recorded_log(path)
+    with TransactionLog(str(path)) as log:
+        calls = list(log)
+    assert {c.session for c in calls} == {0, 1}
+    # Cut the last record short, as a crash during a write would
+    with open(path, "r+b") as file:
+        file.truncate(os.path.getsize(path) - 3)
+    with TransactionLog(str(path)) as log:
+        assert len(log) == len(calls) - 1
+
+
+def test_replay_at_recorded_speed(tmp_path):
+    path = tmp_path / "slow.ch347log"
+    driver = CH347(dll_path=SimulatedCH347())
+    with Recorder(str(path)) as recorder:
+        recorder.attach(driver)
+        driver.open_device()
+        time.sleep(0.05)
+        driver.close_device()
+
+    fast = CH347(dll_path=ReplayCH347(str(path)))
+    start = time.perf_counter()
+    fast.open_device()
+    fast.close_device()
+    assert time.perf_counter() - start < 0.04
+
+    paced = CH347(dll_path=ReplayCH347(str(path), speed=1.0))
+    start = time.perf_counter()
+    paced.open_device()
+    paced.close_device()
+    assert time.perf_counter() - start >= 0.045
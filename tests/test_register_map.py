@@ -0,0 +1,97 @@
+import os
+import sys
+
+import pytest
+
+# Get the parent directory's path
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Add the parent directory to the system path if not already present
+if parent_directory not in sys.path:
+    sys.path.insert(0, parent_directory)
+
+from ch347 import CH347
+from ch347.instrument import Instrumentation
+from ch347.simulator import SimulatedCH347, VirtualINA226, VirtualMPU6050
+from i2c_devices.ina226 import INA226
+from i2c_devices.mpu6050 import MPU6050
+from i2c_devices.register_map import Register, RegisterMap
+
+
+def _instrumented(address, device):
+    sim = SimulatedCH347()
+    sim.attach_i2c(address, device)
+    driver = CH347(dll_path=sim)
+    instrumentation = Instrumentation()
+    instrumentation.attach(driver)
+    return driver, instrumentation
+
+
+def _transfers(instrumentation):
+    stats = instrumentation.operations.get(("CH347StreamI2C", 0))
+    return stats.calls if stats else 0
+
+
+def test_compiled_tables():
+    class Sensor(RegisterMap):
+        REGISTERS = {
+            "STATUS": Register(0x10, fields={"READY": (7, 1), "COUNT": (0, 4)}),
+            "VALUE": Register(0x11, 2, signed=True),
+        }
+
+    assert Sensor._fields["COUNT"] == ("STATUS", 0, 0x0F, False)
+    assert Sensor.pack_fields(READY=1, COUNT=0x1F) == 0x8F
+    with pytest.raises(ValueError):
+
+        class Broken(RegisterMap):
+            REGISTERS = {
+                "A": Register(0, fields={"X": (0, 1)}),
+                "B": Register(1, fields={"X": (0, 1)}),
+            }
+
+
+def test_mpu6050_batched_reads():
+    device = VirtualMPU6050(accel=(0.5, -0.25, 1.0), gyro=(10, 0, -90))
+    driver, instrumentation = _instrumented(0x68, device)
+    mpu = MPU6050(driver=driver)
+    mpu.set_accel_range(MPU6050.ACCEL_RANGE_4G)
+    assert mpu.read_accel_range() == 4
+    assert mpu.read_gyro_range() == 250
+
+    before = _transfers(instrumentation)
+    accel, gyro, temp = mpu.get_all_data()
+    assert _transfers(instrumentation) - before == 2
+    assert accel["x"] == pytest.approx(0.5 * MPU6050.GRAVITIY_MS2)
+    assert gyro["z"] == pytest.approx(-90, abs=0.01)
+    assert temp == pytest.approx(25, abs=0.01)
+
+    # Only the register holding the field is touched, and only when it changes
+    device.registers[MPU6050.MPU_CONFIG] = 0x28
+    assert mpu.set_filter_range(MPU6050.FILTER_BW_42)
+    assert device.registers[MPU6050.MPU_CONFIG] == 0x2B
+    before = _transfers(instrumentation)
+    assert mpu.set_filter_range(MPU6050.FILTER_BW_42)
+    assert _transfers(instrumentation) - before == 1
+
+
+def test_ina226_fields():
+    device = VirtualINA226(bus_voltage_mv=3300, current_ma=250)
+    driver, instrumentation = _instrumented(0x40, device)
+    sensor = INA226(driver=driver)
+    assert sensor.get_config() == {
+        "reset": False,
+        "avg": 0,
+        "vbus_ct": 4,
+        "vsh_ct": 4,
+        "mode": 7,
+    }
+    sensor.set_config(avg=2, mode=5)
+    assert device.registers[INA226.CONFIG_REG] == 0x0525
+    assert sensor.set_mask_enable("CNVR") is not None
+    assert sensor.get_mask_enable()["CNVR"] is True
+    assert sensor.set_mask_enable("XYZ") == -1
+
+    # No auto-increment: one transfer per register
+    before = _transfers(instrumentation)
+    assert sensor.read_registers("BUS_VOLTAGE", "POWER") == (2640, 264)
+    assert _transfers(instrumentation) - before == 2
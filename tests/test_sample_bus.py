@@ -0,0 +1,116 @@
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+
+# Get the parent directory's path
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Add the parent directory to the system path if not already present
+if parent_directory not in sys.path:
+    sys.path.insert(0, parent_directory)
+
+from ch347 import CH347
+from ch347.live import Acquisition
+from ch347.sample_bus import SamplePublisher, SampleSubscriber
+from ch347.simulator import SimulatedCH347, VirtualINA226
+from i2c_devices.ina226 import INA226
+
+
+def test_read_and_overrun():
+    with SamplePublisher(2, capacity=8) as publisher:
+        with SampleSubscriber(publisher.name) as subscriber:
+            assert subscriber.capacity == 8 and subscriber.channels == 2
+            times, values = subscriber.read()
+            assert len(times) == 0 and values.shape == (0, 2)
+
+            for i in range(5):
+                publisher.append(i, (i, 2 * i))
+            times, values = subscriber.read()
+            assert list(times) == [0, 1, 2, 3, 4]
+            assert list(values[:, 1]) == [0, 2, 4, 6, 8]
+            assert np.shares_memory(values, subscriber._values)
+            assert subscriber.intact()
+
+            # Crossing the end of the ring still gives one contiguous view
+            publisher.append_block(np.arange(5, 12), np.arange(14).reshape(7, 2))
+            times, values = subscriber.read()
+            assert list(times) == list(range(5, 12))
+            assert values.flags["C_CONTIGUOUS"]
+            assert subscriber.lost == 0
+
+            publisher.append_block(np.arange(12, 32), np.zeros((20, 2)))
+            assert not subscriber.intact()
+            times, _ = subscriber.read()
+            assert list(times) == list(range(24, 32))
+            assert subscriber.lost == 12 and subscriber.overruns == 1
+
+            times, _ = subscriber.window(3)
+            assert list(times) == [29, 30, 31]
+            assert subscriber.available() == 0
+
+
+def test_late_subscriber():
+    with SamplePublisher(1, capacity=4, dtype=np.int32) as publisher:
+        for i in range(10):
+            publisher.append(i, (i,))
+        with SampleSubscriber(publisher.name, from_start=True) as subscriber:
+            assert subscriber.dtype == np.int32
+            times, values = subscriber.read(max_samples=3)
+            assert list(times) == [6, 7, 8]
+            assert list(values[:, 0]) == [6, 7, 8]
+            times, _ = subscriber.read()
+            assert list(times) == [9]
+        with SampleSubscriber(publisher.name) as subscriber:
+            assert len(subscriber.read()[0]) == 0
+
+
+def _consume(name, samples, results):
+    with SampleSubscriber(name, from_start=True) as subscriber:
+        received = 0
+        total = 0.0
+        deadline = time.perf_counter() + 10
+        while received < samples and time.perf_counter() < deadline:
+            times, values = subscriber.read()
+            total += float(values[:, 0].sum())
+            received += len(times)
+        results.put((received, total, subscriber.lost))
+
+
+def test_consumer_processes():
+    context = multiprocessing.get_context()
+    results = context.Queue()
+    samples = 20000
+    with SamplePublisher(1, capacity=samples) as publisher:
+        consumers = [
+            context.Process(target=_consume, args=(publisher.name, samples, results))
+            for _ in range(2)
+        ]
+        for consumer in consumers:
+            consumer.start()
+        for start in range(0, samples, 1000):
+            block = np.arange(start, start + 1000)
+            publisher.append_block(block, block.reshape(-1, 1))
+        outcome = [results.get(timeout=30) for _ in consumers]
+        for consumer in consumers:
+            consumer.join()
+    expected = float(np.arange(samples).sum())
+    assert outcome == [(samples, expected, 0)] * 2
+
+
+def test_acquisition_publishes():
+    sim = SimulatedCH347()
+    sim.attach_i2c(0x40, VirtualINA226(bus_voltage_mv=3300, current_ma=250))
+    sensor = INA226(driver=CH347(dll_path=sim))
+
+    with SamplePublisher(3, capacity=256) as publisher:
+        with SampleSubscriber(publisher.name) as subscriber:
+            with Acquisition.ina226(sensor, ring=publisher):
+                time.sleep(0.05)
+            times, values = subscriber.read()
+            assert publisher.count > 0
+            assert len(times) + subscriber.lost == publisher.count
+            assert values[-1, 0] == pytest.approx(3300, rel=0.01)
@@ -0,0 +1,135 @@
+import ctypes
+import os
+import sys
+
+import pytest
+
+# Get the parent directory's path
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Add the parent directory to the system path if not already present
+if parent_directory not in sys.path:
+    sys.path.insert(0, parent_directory)
+
+from ch347 import CH347, SPIConfig
+from ch347.capture import TriggeredCapture
+from ch347.gpio import GPIO
+from ch347.simulator import (
+    LatencyModel,
+    SimulatedCH347,
+    VirtualEEPROM,
+    VirtualINA226,
+    VirtualMPU6050,
+    VirtualSPIFlash,
+)
+from ch347.uart import UARTPort
+from i2c_devices.ina226 import INA226
+from i2c_devices.mpu6050 import MPU6050
+
+
+def test_device_queries():
+    driver = CH347(dll_path=SimulatedCH347(serial_number="ABC123", chip_type=2))
+    assert driver.open_device() is not None
+    assert driver.get_version()[3] == 2
+    assert driver.get_serial_number() == "ABC123"
+    assert driver.get_device_info().BulkOutEndpMaxSize == 512
+    assert CH347(device_index=1, dll_path=SimulatedCH347()).open_device() is None
+
+    # The bindings declare their argument and result types on first use
+    assert driver.ch347dll.CH347GetSerialNumber.argtypes[1] is ctypes.c_char_p
+    assert driver.get_chip_type() == 2
+    assert driver.ch347dll.CH347GetChipType.restype is ctypes.c_ubyte
+
+
+def test_ina226_driver():
+    sim = SimulatedCH347()
+    sim.attach_i2c(0x40, VirtualINA226(bus_voltage_mv=3300, current_ma=250))
+    sensor = INA226(driver=CH347(dll_path=sim))
+    assert sensor.get_manufacturer_id() == 0x5449
+    assert sensor.get_bus_voltage() == pytest.approx(3300, abs=1.25)
+    assert sensor.get_shunt_voltage() == pytest.approx(250 * 20, abs=2.5)
+    assert sensor.get_calibration() == 2048
+    assert sensor.get_current() == pytest.approx(250 * 20 / 2.5 * 2500 / 20)
+
+
+def test_mpu6050_driver():
+    sim = SimulatedCH347()
+    sim.attach_i2c(0x68, VirtualMPU6050(accel=(0.5, -0.25, 1.0), gyro=(10, 0, -90)))
+    mpu = MPU6050(driver=CH347(dll_path=sim))
+    mpu.set_accel_range(MPU6050.ACCEL_RANGE_4G)
+    accel = mpu.get_accel_data(g=True)
+    assert (accel["x"], accel["y"], accel["z"]) == pytest.approx((0.5, -0.25, 1.0))
+    gyro = mpu.get_gyro_data()
+    assert gyro["x"] == pytest.approx(10, abs=0.01)
+    assert gyro["z"] == pytest.approx(-90, abs=0.01)
+    assert mpu.get_temp() == pytest.approx(25, abs=0.01)
+
+
+def test_eeprom_paths():
+    sim = SimulatedCH347()
+    eeprom = VirtualEEPROM(size=2048)
+    sim.attach_i2c(0x50, eeprom)
+    driver = CH347(dll_path=sim)
+    data = bytes(range(200))
+    # ID_24C16 spans eight bus addresses
+    assert driver.write_eeprom(4, 0x1F0, data)
+    assert driver.read_eeprom(4, 0x1F0, len(data)) == data
+    assert eeprom.memory[0x1F0 : 0x1F0 + 200] == data
+    # A raw I2C page write wraps within its page
+    driver.stream_i2c([0x51 << 1, 0x0E, 1, 2, 3], 0)
+    assert eeprom.memory[0x10E:0x110] == b"\x01\x02" and eeprom.memory[0x100] == 3
+
+
+def test_spi_flash():
+    sim = SimulatedCH347()
+    flash = VirtualSPIFlash(size=1 << 16)
+    sim.attach_spi(0, flash)
+    driver = CH347(dll_path=sim)
+    driver.spi_init(SPIConfig(Mode=0, Clock=1, ByteOrder=1, ChipSelect=0x80))
+    assert bytes(driver.spi_read(0x80, [0x9F], 3)) == b"\xef\x40\x15"
+    driver.spi_write(0x80, [0x06])
+    driver.spi_write(0x80, [0x02, 0x00, 0x01, 0x00] + list(b"hello"))
+    assert bytes(driver.spi_read(0x80, [0x03, 0x00, 0x01, 0x00], 5)) == b"hello"
+    # Without WREN the erase is ignored
+    driver.spi_write(0x80, [0x20, 0x00, 0x00, 0x00])
+    assert flash.memory[0x100:0x105] == b"hello"
+    driver.spi_write(0x80, [0x06])
+    driver.spi_write(0x80, [0x20, 0x00, 0x00, 0x00])
+    assert flash.memory[0x100:0x105] == b"\xff" * 5
+
+
+def test_latency_model_and_interrupt_capture():
+    sim = SimulatedCH347(latency=LatencyModel(call_overhead=100e-6))
+    mpu = VirtualMPU6050()
+    sim.attach_i2c(0x68, mpu)
+    sim.wire_interrupt(mpu, 5)
+    driver = CH347(dll_path=sim)
+
+    elapsed = sim.elapsed
+    driver.stream_i2c([0x68 << 1, 0x3B], 14)
+    # One call, 17 bytes of 9 bits at 100 kHz
+    assert sim.elapsed - elapsed == pytest.approx(100e-6 + 17 * 9 / 100000)
+
+    driver.stream_i2c([0x68 << 1, 0x6B, 0x00], 0)
+    capture = TriggeredCapture.mpu6050(GPIO(driver), pin=5)
+    capture.arm()
+    mpu.data_ready()
+    sample = capture.read_sample(timeout=1)
+    assert sample is not None and sample.data[0] == 0x01
+    # Reading INT_STATUS released the latched line
+    assert driver.gpio_get()[1] >> 5 & 1 == 1
+
+
+def test_uart_loopback():
+    sim = SimulatedCH347()
+    sim.uart_loopback = True
+    with UARTPort(CH347(dll_path=sim), baudrate=921600, timeout=1) as port:
+        port.write(b"ping\n")
+        assert port.readline() == b"ping\n"
+    assert sim.uart_config[0] == 921600
+
+    # The DLL reports a failed open with INVALID_HANDLE_VALUE
+    driver = CH347(device_index=1, dll_path=sim)
+    assert driver.uart_open() is None
+    with pytest.raises(RuntimeError):
+        UARTPort(driver)
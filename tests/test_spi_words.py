@@ -0,0 +1,87 @@
+import os
+import sys
+from array import array
+
+import numpy as np
+import pytest
+
+# Get the parent directory's path
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Add the parent directory to the system path if not already present
+if parent_directory not in sys.path:
+    sys.path.insert(0, parent_directory)
+
+from ch347 import CH347, SPIConfig
+from ch347.simulator import SimulatedCH347, SPIDevice, SPILoopback
+
+
+class Sink(SPIDevice):
+    def __init__(self):
+        self.received = bytearray()
+
+    def exchange(self, data) -> bytes:
+        self.received += data
+        return bytes([0x12, 0x34] * (len(data) // 2))
+
+
+def _driver(device, byte_order):
+    sim = SimulatedCH347(chip_type=2)
+    sim.attach_spi(0, device)
+    driver = CH347(dll_path=sim)
+    driver.open_device()
+    driver.spi_init(SPIConfig(Mode=0, Clock=1, ByteOrder=byte_order, ChipSelect=0x80))
+    assert driver.spi_set_data_bits(1)
+    assert sim.spi_data_bits == 16
+    return driver
+
+
+def test_write_byte_order():
+    words = np.array([0x0102, 0xA0B0, 0xFFFE], dtype=np.uint16)
+    sink = Sink()
+    driver = _driver(sink, byte_order=1)
+    assert driver.spi_write_words(0x80, words)
+    assert bytes(sink.received) == b"\x01\x02\xa0\xb0\xff\xfe"
+    # The caller's array is left alone
+    assert words.tolist() == [0x0102, 0xA0B0, 0xFFFE]
+
+    sink = Sink()
+    driver = _driver(sink, byte_order=0)
+    assert driver.spi_write_words(0x80, array("H", [0x0102, 0xA0B0]))
+    assert bytes(sink.received) == b"\x02\x01\xb0\xa0"
+
+
+def test_wire_order_is_not_copied():
+    driver = _driver(Sink(), byte_order=1)
+    words = np.arange(4, dtype=">u2")
+    converted, buffer = driver._spi_word_buffer(words, copy=False)
+    assert converted is words
+    converted, _ = driver._spi_word_buffer(np.arange(4, dtype="<u2"), copy=False)
+    assert converted.dtype == np.dtype(">u2")
+
+
+def test_words_must_fit_16_bits():
+    driver = _driver(Sink(), byte_order=1)
+    converted, _ = driver._spi_word_buffer([1, 0xFFFF], copy=False)
+    assert converted.tolist() == [1, 0xFFFF]
+    with pytest.raises(TypeError):
+        driver.spi_write_words(0x80, b"\x01\x02")
+    with pytest.raises(TypeError):
+        driver.spi_write_words(0x80, np.zeros(2, dtype=np.uint8))
+    with pytest.raises(ValueError):
+        driver.spi_write_words(0x80, [0x10000])
+    with pytest.raises(ValueError):
+        driver.spi_write_words(0x80, np.array([-1], dtype=np.int32))
+
+
+def test_read_and_full_duplex():
+    driver = _driver(Sink(), byte_order=1)
+    words = driver.spi_read_words(0x80, [0x03, 0x00], 3)
+    assert words.dtype == np.uint16
+    assert words.tolist() == [0x1234] * 3
+
+    driver = _driver(SPILoopback(), byte_order=1)
+    sent = np.array([1, 0x8000, 0xBEEF], dtype=np.uint16)
+    received = driver.spi_write_read_words(0x80, sent)
+    assert received.tolist() == sent.tolist()
+    assert received is not sent
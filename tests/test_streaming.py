@@ -0,0 +1,77 @@
+import os
+import sys
+
+import pytest
+
+# Get the parent directory's path
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Add the parent directory to the system path if not already present
+if parent_directory not in sys.path:
+    sys.path.insert(0, parent_directory)
+
+from ch347 import CH347, SPIConfig
+from ch347.simulator import LatencyModel, SimulatedCH347, SPIDevice
+from ch347.streaming import SPIStreamer
+
+
+class Sink(SPIDevice):
+    def __init__(self):
+        self.received = bytearray()
+
+    def exchange(self, data) -> bytes:
+        self.received += data
+        return bytes(len(data))
+
+
+def _streamer(latency=None, **kwargs):
+    sim = SimulatedCH347(latency=latency)
+    sink = Sink()
+    sim.attach_spi(0, sink)
+    driver = CH347(dll_path=sim)
+    driver.open_device()
+    driver.spi_init(SPIConfig(Mode=0, Clock=1, ByteOrder=1, ChipSelect=0x80))
+    return SPIStreamer(driver, **kwargs), sink
+
+
+def test_write_sends_everything():
+    streamer, sink = _streamer(chunk_size=1000, buffers=3)
+    data = bytes(range(256)) * 40
+    streamer.write(data)
+    assert bytes(sink.received) == data
+    stats = streamer.stats()
+    assert stats["chunks"] == 11
+    assert stats["bytes"] == len(data)
+    assert stats["clock_hz"] == 30000000
+    assert 0 <= stats["bus_idle_percent"] <= 100
+
+
+def test_pipelined_bus_stays_busy():
+    # Every chunk is on the wire for 2 ms, preparing one takes far less
+    streamer, sink = _streamer(LatencyModel(call_overhead=2e-3, sleep=True))
+    chunks = []
+
+    def fill(buffer):
+        if len(chunks) == 20:
+            return 0
+        chunks.append(bytes([len(chunks)]) * len(buffer))
+        buffer[:] = chunks[-1]
+        return len(buffer)
+
+    streamer.run(fill)
+    assert bytes(sink.received) == b"".join(chunks)
+    assert streamer.stats()["bus_idle_percent"] < 25
+
+
+def test_failures_are_raised():
+    streamer, _ = _streamer(chunk_size=64)
+    streamer.driver.ch347dll.stall(calls=1)
+    streamer.driver.set_timeout(10, 10)
+    with pytest.raises(RuntimeError):
+        streamer.write(bytes(256))
+
+    def broken(buffer):
+        raise ValueError("no data")
+
+    with pytest.raises(ValueError):
+        streamer.run(broken)
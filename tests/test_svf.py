@@ -0,0 +1,114 @@
+import io
+import os
+import struct
+import sys
+
+import pytest
+
+# Get the parent directory's path
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Add the parent directory to the system path if not already present
+if parent_directory not in sys.path:
+    sys.path.insert(0, parent_directory)
+
+from ch347.jtag import JTAG
+from ch347.svf import SVFError, SVFPlayer, XSVFPlayer
+from tests.jtag_sim import SimulatedDevice, SimulatedTAP
+
+SVF_PROGRAM = """
+! Two devices, the target is nearest to TDI
+TRST OFF;
+ENDIR IDLE;
+ENDDR IDLE;
+STATE RESET;
+HIR 4 TDI (f);
+HDR 1 TDI (0);
+// Check the IDCODE of the target
+SIR 6 TDI (01);
+SDR 32 TDI (00000000) TDO (0362d093) MASK (0fffffff);
+SIR 6 TDI (02);
+SDR 64 TDI (0123456789abcdef);
+SDR 64 TDI (fedcba98
+            76543210);
+RUNTEST 100 TCK;
+"""
+
+
+def make_chain():
+    bypassed = SimulatedDevice(idcode=None, ir_length=4)
+    target = SimulatedDevice(idcode=0x0362D093, ir_length=6)
+    tap = SimulatedTAP([bypassed, target])
+    tap.jtag_reset_trst = lambda level: True
+    return JTAG(tap), tap, target
+
+
+def test_svf_player_shifts_and_checks():
+    jtag, tap, target = make_chain()
+    stats = SVFPlayer(jtag).play(io.StringIO(SVF_PROGRAM))
+
+    assert [u for u in target.updates if u[0] == "DR" and u[1] == 0x2] == [
+        ("DR", 0x2, 0x0123456789ABCDEF),
+        ("DR", 0x2, 0xFEDCBA9876543210),
+    ]
+    assert stats["scans"] == 5
+    assert stats["scan_bits"] == 2 * 10 + 33 + 2 * 65
+    assert stats["bits_per_second"] > 0
+    # Every scan starts and ends in Run-Test/Idle and goes out in one call
+    assert sum(1 for call in tap.calls if call[0] == "fast") == 5
+
+
+def test_svf_tdo_mismatch_reports_line():
+    jtag, _, _ = make_chain()
+    program = SVF_PROGRAM.replace("TDO (0362d093)", "TDO (0362d092)")
+    with pytest.raises(SVFError) as error:
+        SVFPlayer(jtag).play(io.StringIO(program))
+    assert error.value.line == 11
+
+
+def test_svf_statements_are_streamed():
+    lines = iter(["SIR 4 TDI (\n", "f);SDR 8 TDI(00)", ";\n"])
+    assert list(SVFPlayer.statements(lines)) == [
+        (1, "SIR 4 TDI (\n f)"),
+        (2, "SDR 8 TDI(00)"),
+    ]
+
+
+def xsvf(*parts):
+    return io.BytesIO(b"".join(parts))
+
+
+def test_xsvf_player_with_retries():
+    device = SimulatedDevice(idcode=0x4BA00477, ir_length=4)
+    tap = SimulatedTAP([device])
+    stream = xsvf(
+        bytes([XSVFPlayer.XREPEAT, 0]),
+        bytes([XSVFPlayer.XSIR, 4, 0x01]),
+        bytes([XSVFPlayer.XSDRSIZE]) + struct.pack(">I", 32),
+        bytes([XSVFPlayer.XTDOMASK]) + bytes.fromhex("ffffffff"),
+        bytes([XSVFPlayer.XSDRTDO]) + bytes(4) + bytes.fromhex("4ba00477"),
+        bytes([XSVFPlayer.XREPEAT, 3]),
+        bytes([XSVFPlayer.XSIR, 4, 0x02]),
+        bytes([XSVFPlayer.XSDRSIZE]) + struct.pack(">I", 64),
+        bytes([XSVFPlayer.XTDOMASK]) + bytes(8),
+        bytes([XSVFPlayer.XSDRB]) + bytes.fromhex("1111111111111111"),
+        bytes([XSVFPlayer.XSDRE]) + bytes.fromhex("2222222222222222"),
+        bytes([XSVFPlayer.XCOMPLETE]),
+    )
+    stats = XSVFPlayer(JTAG(tap)).play(stream)
+    assert stats["scan_bits"] == 4 + 32 + 4 + 128
+    assert device.updates[-1] == ("DR", 0x2, 0x2222222222222222)
+
+
+def test_xsvf_mismatch_is_raised():
+    tap = SimulatedTAP([SimulatedDevice(idcode=0x4BA00477, ir_length=4)])
+    stream = xsvf(
+        bytes([XSVFPlayer.XREPEAT, 2]),
+        bytes([XSVFPlayer.XSIR, 4, 0x01]),
+        bytes([XSVFPlayer.XSDRSIZE]) + struct.pack(">I", 32),
+        bytes([XSVFPlayer.XTDOMASK]) + bytes.fromhex("ffffffff"),
+        bytes([XSVFPlayer.XSDRTDO]) + bytes(4) + bytes.fromhex("12345678"),
+        bytes([XSVFPlayer.XCOMPLETE]),
+    )
+    with pytest.raises(SVFError):
+        XSVFPlayer(JTAG(tap)).play(stream)
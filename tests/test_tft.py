@@ -0,0 +1,120 @@
+import os
+import sys
+
+import numpy as np
+
+# Get the parent directory's path
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Add the parent directory to the system path if not already present
+if parent_directory not in sys.path:
+    sys.path.insert(0, parent_directory)
+
+from ch347 import CH347
+from ch347.simulator import SimulatedCH347, SPIDevice
+from spi_devices.tft import ILI9341, ST7789, TFT, rgb888_to_rgb565
+
+DC_PIN = 2
+
+
+class VirtualPanel(SPIDevice):
+    """
+    Controller memory of a TFT, following the D/C GPIO of the simulator.
+    """
+
+    def __init__(self, sim, width, height):
+        self.sim = sim
+        self.memory = np.zeros((height, width), dtype=np.uint16)
+        self.command = None
+        self.parameters = bytearray()
+        self.columns = (0, width - 1)
+        self.rows = (0, height - 1)
+
+    def exchange(self, data) -> bytes:
+        if not self.sim.gpio_output & (1 << DC_PIN):
+            self.command = data[-1]
+            self.parameters = bytearray()
+        elif self.command == TFT.RAMWR:
+            x0, x1 = self.columns
+            y0, y1 = self.rows
+            pixels = np.frombuffer(bytes(data), dtype=">u2")
+            self.memory[y0 : y1 + 1, x0 : x1 + 1] = pixels.reshape(
+                y1 - y0 + 1, x1 - x0 + 1
+            )
+        else:
+            self.parameters += data
+            if len(self.parameters) == 4:
+                p = self.parameters
+                window = (p[0] << 8 | p[1], p[2] << 8 | p[3])
+                if self.command == TFT.CASET:
+                    self.columns = window
+                elif self.command == TFT.RASET:
+                    self.rows = window
+        return bytes(len(data))
+
+
+def _display(cls):
+    sim = SimulatedCH347()
+    panel = VirtualPanel(sim, cls.WIDTH, cls.HEIGHT)
+    sim.attach_spi(0, panel)
+    return cls(dc_pin=DC_PIN, driver=CH347(dll_path=sim)), panel
+
+
+def test_rgb565_conversion():
+    colors = np.array([[[255, 0, 0], [0, 255, 0], [0, 0, 255], [255, 255, 255]]])
+    assert rgb888_to_rgb565(colors).tolist() == [[0xF800, 0x07E0, 0x001F, 0xFFFF]]
+
+
+def test_spi_configuration():
+    display, _ = _display(ST7789)
+    config = display.driver.ch347dll.spi_config
+    assert (config.Mode, config.Clock, config.ByteOrder) == (0, 1, 1)
+    assert config.SPIOutDefaultData == 0xFF
+    assert config.ChipSelect == 0x80 and config.IsAutoDeactiveCS == 1
+
+
+def test_partial_updates():
+    display, panel = _display(ST7789)
+    display.fill((0, 0, 255))
+    assert display.show() == 240 * 240 * 2
+    assert (panel.memory == 0x001F).all()
+
+    # Only the changed pixels are sent
+    display.fill((0, 0, 255))
+    assert display.show() == 0
+    sent = display.bytes_sent
+    display.fill_rect(10, 20, 8, 4, (255, 0, 0))
+    assert display.show() == 8 * 4 * 2
+    assert display.bytes_sent - sent < 8 * 4 * 2 + 32
+    assert (panel.memory == display.framebuffer).all()
+
+    # Neighbouring regions share a window, distant ones do not
+    windows = display.windows_sent
+    display.fill_rect(0, 0, 4, 4, (0, 255, 0))
+    display.fill_rect(4, 0, 4, 4, (0, 255, 0))
+    display.fill_rect(200, 200, 4, 4, (0, 255, 0))
+    image = np.zeros((2, 3, 3), dtype=np.uint8)
+    image[1, 2] = (255, 255, 255)
+    display.draw_image(238, 238, image)
+    display.show()
+    assert display.windows_sent - windows == 3
+    assert (panel.memory == display.framebuffer).all()
+
+
+def test_merge():
+    assert TFT.merge([(0, 0, 4, 4), (4, 0, 8, 4)]) == [(0, 0, 8, 4)]
+    assert TFT.merge([(0, 0, 4, 4), (100, 100, 140, 140)]) == [
+        (0, 0, 4, 4),
+        (100, 100, 140, 140),
+    ]
+
+
+def test_ili9341_init():
+    display, panel = _display(ILI9341)
+    display.INIT_SEQUENCE = tuple(
+        (command, parameters, 0) for command, parameters, _ in display.INIT_SEQUENCE
+    )
+    display.fill((255, 255, 255))
+    display.init()
+    assert panel.memory.shape == (320, 240)
+    assert (panel.memory == 0xFFFF).all()
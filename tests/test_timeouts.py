@@ -0,0 +1,99 @@
+import os
+import sys
+import time
+
+import pytest
+
+# Get the parent directory's path
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Add the parent directory to the system path if not already present
+if parent_directory not in sys.path:
+    sys.path.insert(0, parent_directory)
+
+from ch347 import CH347, SPIConfig
+from ch347.instrument import Instrumentation
+from ch347.jtag import JTAG
+from ch347.simulator import LatencyModel, SimulatedCH347, VirtualSPIFlash
+from ch347.timeouts import AdaptiveTimeouts
+
+
+def flash_driver(sleep=False):
+    sim = SimulatedCH347(latency=LatencyModel(call_overhead=0, sleep=sleep))
+    flash = VirtualSPIFlash()
+    flash.memory[:4] = b"\x12\x34\x56\x78"
+    sim.attach_spi(0, flash)
+    driver = CH347(dll_path=sim)
+    stats = Instrumentation()
+    stats.attach(driver)
+    policy = AdaptiveTimeouts()
+    policy.attach(driver)
+    driver.open_device()
+    driver.spi_init(SPIConfig(Mode=0, Clock=1, ByteOrder=1, ChipSelect=0x80))
+    return sim, driver, policy, stats
+
+
+def set_timeout_calls(stats):
+    return sum(
+        entry["calls"]
+        for entry in stats.snapshot()["operations"]
+        if entry["operation"] == "CH347SetTimeout"
+    )
+
+
+def test_deadline_follows_payload_and_clock():
+    sim, driver, policy, stats = flash_driver()
+    driver.spi_read(0x80, [0x03, 0, 0, 0], 4)
+    assert sim.timeouts == (8, 8)
+    # 1 MiB at 30 MHz is 280 ms on the wire
+    driver.spi_read(0x80, [0x03, 0, 0, 0], 1 << 20)
+    assert sim.timeouts == (1024, 1024)
+    # Slower clock, longer deadline
+    driver.spi_init(SPIConfig(Mode=0, Clock=4, ByteOrder=1, ChipSelect=0x80))
+    driver.spi_read(0x80, [0x03, 0, 0, 0], 1 << 20)
+    assert sim.timeouts == (8192, 8192)
+
+
+def test_unchanged_deadline_is_not_applied_again():
+    sim, driver, policy, stats = flash_driver()
+    for _ in range(20):
+        driver.spi_read(0x80, [0x03, 0, 0, 0], 16)
+        driver.spi_write(0x80, [0x06])
+    assert set_timeout_calls(stats) == 1
+    assert policy.latency["CH347SPI_Read"].samples == 20
+
+
+def test_timeout_reopens_and_retries():
+    sim, driver, policy, stats = flash_driver(sleep=True)
+    driver.i2c_set(2)
+    sim.stall(until_reopen=True)
+    assert bytes(driver.spi_read(0x80, [0x03, 0, 0, 0], 4)) == b"\x12\x34\x56\x78"
+    assert policy.timeouts == 1 and policy.reopens == 1
+    calls = {e["operation"]: e["calls"] for e in stats.snapshot()["operations"]}
+    # The driver applied its configuration again after the reopen
+    assert calls["CH347SPI_Init"] == 2 and calls["CH347OpenDevice"] == 2
+    assert calls["CH347I2C_Set"] == 2
+    assert driver.ch347dll.clocks["i2c"] == 400000
+
+
+def test_wedged_device_fails_fast():
+    sim, driver, policy, stats = flash_driver(sleep=True)
+    sim.stall(calls=100)
+    start = time.perf_counter()
+    with pytest.raises(TimeoutError, match="CH347SPI_Read timed out"):
+        driver.spi_read(0x80, [0x03, 0, 0, 0], 4)
+    # 8 + 16 + 32 ms, not forever
+    assert time.perf_counter() - start < 0.5
+    assert policy.timeouts == 3 and policy.reopens == 2
+
+
+def test_nack_is_returned_without_retry():
+    sim, driver, policy, stats = flash_driver()
+    assert driver.stream_i2c([0x50 << 1, 0x00], 1) is None
+    assert policy.timeouts == 0 and policy.reopens == 0
+
+
+def test_jtag_clock_follows_the_clock_rate_table():
+    sim, driver, policy, stats = flash_driver()
+    driver.ch347dll.configure("CH347Jtag_INIT", (0, 2))
+    assert driver.ch347dll.clocks["jtag"] == JTAG.CLOCK_RATES[2] == 7500000
@@ -0,0 +1,74 @@
+import os
+import sys
+
+# Get the parent directory's path
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Add the parent directory to the system path if not already present
+if parent_directory not in sys.path:
+    sys.path.insert(0, parent_directory)
+
+from ch347 import CH347, SPIConfig, TransferPlan
+from ch347.instrument import Instrumentation
+from ch347.simulator import SimulatedCH347, VirtualEEPROM, VirtualSPIFlash
+
+
+class StepRecordingCH347(SimulatedCH347):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.steps = []
+
+    def CH347SPI_Write(self, index, chip_select, length, step, buffer):
+        self.steps.append(step)
+        return super().CH347SPI_Write(index, chip_select, length, step, buffer)
+
+
+def test_plan_follows_endpoint():
+    full_speed = CH347(dll_path=SimulatedCH347(usb_speed=0))
+    high_speed = CH347(dll_path=SimulatedCH347(usb_speed=1))
+    full_speed.open_device()
+    high_speed.open_device()
+    assert full_speed.get_transfer_plan().to_dict() == {
+        "usb_speed": 0,
+        "packet_size": 64,
+        "spi_write_step": 4032,
+        "i2c_read_chunk": 60,
+    }
+    assert high_speed.get_transfer_plan().spi_write_step == 3584
+    assert high_speed.get_transfer_plan().i2c_read_chunk == 508
+    assert TransferPlan(2).spi_write_step == 3072
+    assert TransferPlan(2).i2c_read_chunk == 1020
+    assert TransferPlan.split(10, 4) == [(0, 4), (4, 4), (8, 2)]
+
+    # The plan is read once and dropped when the device is closed
+    sim = high_speed.ch347dll
+    calls = sim.calls
+    high_speed.get_transfer_plan()
+    assert sim.calls == calls
+    high_speed.close_device()
+    assert high_speed.transfer_plan is None
+
+
+def test_chunked_transfers():
+    sim = StepRecordingCH347(usb_speed=0)
+    eeprom = VirtualEEPROM(size=32768)
+    eeprom.memory[:] = bytes(range(256)) * 128
+    sim.attach_i2c(0x50, eeprom)
+    sim.attach_spi(0, VirtualSPIFlash())
+    driver = CH347(dll_path=sim)
+    driver.open_device()
+    instrumentation = Instrumentation()
+    instrumentation.attach(driver)
+
+    expected = bytes(eeprom.memory[256:1256])
+    assert driver.stream_i2c_chunked([0xA0, 0x01, 0x00], 1000) == expected
+    assert instrumentation.operations[("CH347StreamI2C", 0)].calls == 17
+
+    # Without opting in a read stays a single command
+    assert driver.stream_i2c([0xA0, 0x01, 0x00], 1000) == expected
+    assert instrumentation.operations[("CH347StreamI2C", 0)].calls == 18
+
+    driver.spi_init(SPIConfig(Mode=0, Clock=1, ByteOrder=1, ChipSelect=0x80))
+    assert driver.spi_write(0x80, [0x9F] * 10000)
+    assert driver.spi_write(0x80, [0x9F] * 600, write_step=64)
+    assert sim.steps == [4032, 64]
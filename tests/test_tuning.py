@@ -0,0 +1,115 @@
+import os
+import sys
+
+import pytest
+
+# Get the parent directory's path
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Add the parent directory to the system path if not already present
+if parent_directory not in sys.path:
+    sys.path.insert(0, parent_directory)
+
+from ch347 import CH347
+from ch347.simulator import (
+    SimulatedCH347,
+    SPILoopback,
+    VirtualINA226,
+    VirtualMPU6050,
+    VirtualSPIFlash,
+)
+from ch347.tuning import I2CSpeedTuner, SPIClockTuner, TuningCache
+
+
+def spi_board(device, max_hz, serial_number="BOARD1"):
+    sim = SimulatedCH347(serial_number=serial_number)
+    sim.attach_spi(0, device)
+    sim.spi_max_hz = max_hz
+    driver = CH347(dll_path=sim)
+    driver.open_device()
+    return sim, driver
+
+
+def test_flash_tuning_picks_fastest_clock_with_margin(tmp_path):
+    flash = VirtualSPIFlash(size=1 << 16)
+    flash.memory[:] = bytes(range(256)) * 256
+    sim, driver = spi_board(flash, 20000000)
+    cache = TuningCache(str(tmp_path / "tuning.json"))
+    result = SPIClockTuner(driver, read_length=4096, cache=cache).tune()
+    # 15 MHz is the fastest clean clock, one step of margin gives 7.5 MHz
+    assert result["fastest"] == 2 and result["clock"] == 3
+    assert result["hz"] == 7500000 and sim.spi_hz == 7500000
+    assert not result["cached"]
+
+    tuner = SPIClockTuner(driver, read_length=4096, passes=1, margin=0, cache=cache)
+    assert tuner.tune(force=True)["clock"] == 2
+
+
+def test_cached_result_is_applied_without_probing(tmp_path):
+    path = str(tmp_path / "tuning.json")
+    sim, driver = spi_board(SPILoopback(), 4000000)
+    result = SPIClockTuner(
+        driver, pattern="loopback", read_length=1024, cache=TuningCache(path)
+    ).tune()
+    assert result["fastest"] == 4 and result["clock"] == 5
+
+    # Another process on the same fixture
+    sim, driver = spi_board(SPILoopback(), 4000000)
+    calls = sim.calls
+    cached = SPIClockTuner(driver, pattern="loopback", cache=TuningCache(path)).tune()
+    assert cached["cached"] and cached["clock"] == 5
+    # Only the serial number query, reading the configuration in force and CH347SPI_Init
+    assert sim.spi_hz == 1875000 and sim.calls - calls == 3
+
+    # A different board is tuned on its own
+    sim, driver = spi_board(SPILoopback(), None, serial_number="BOARD2")
+    tuner = SPIClockTuner(
+        driver, pattern="loopback", read_length=256, cache=TuningCache(path)
+    )
+    assert tuner.tune()["fastest"] == 0
+
+
+def test_missing_flash_is_reported(tmp_path):
+    sim, driver = spi_board(VirtualSPIFlash(jedec_id=b"\xff\xff\xff"), None)
+    tuner = SPIClockTuner(driver, cache=TuningCache(str(tmp_path / "t.json")))
+    with pytest.raises(RuntimeError, match="JEDEC"):
+        tuner.tune()
+
+
+def i2c_board(rise_limit=None, mpu_stretch_above=None):
+    sim = SimulatedCH347()
+    sim.i2c_rise_limit = rise_limit
+    mpu = VirtualMPU6050()
+    mpu.stretch_above = mpu_stretch_above
+    sim.attach_i2c(0x40, VirtualINA226())
+    sim.attach_i2c(0x68, mpu)
+    driver = CH347(dll_path=sim)
+    driver.open_device()
+    probes = [I2CSpeedTuner.ina226(0x40), I2CSpeedTuner.mpu6050(0x68)]
+    return sim, driver, probes
+
+
+def test_i2c_tuning_finds_fastest_stable_setting(tmp_path):
+    cache = TuningCache(str(tmp_path / "tuning.json"))
+    sim, driver, probes = i2c_board()
+    result = I2CSpeedTuner(driver, probes, passes=5, cache=cache).tune()
+    assert (result["mode"], result["stretch"], result["drive_mode"]) == (3, False, 0)
+
+    # Slow edges above 500 kHz and a device stretching SCL above 400 kHz
+    sim, driver, probes = i2c_board(rise_limit=500000, mpu_stretch_above=400000)
+    result = I2CSpeedTuner(driver, probes, passes=5, cache=cache).tune(force=True)
+    assert (result["mode"], result["stretch"], result["drive_mode"]) == (3, True, 1)
+    assert result["hz"] == 750000 and result["devices"] == {"0x40": 3, "0x68": 3}
+    assert (sim.i2c_speed, sim.i2c_stretch, sim.i2c_drive_mode) == (750000, True, 1)
+
+
+def test_i2c_tuning_respects_slowest_device(tmp_path):
+    sim, driver, probes = i2c_board()
+    sim.i2c[0x68].max_speed = 400000
+    path = str(tmp_path / "tuning.json")
+    result = I2CSpeedTuner(driver, probes, passes=3, cache=TuningCache(path)).tune()
+    assert result["mode"] == 2 and result["devices"] == {"0x40": 3, "0x68": 2}
+
+    sim, driver, probes = i2c_board()
+    cached = I2CSpeedTuner(driver, probes, cache=TuningCache(path)).tune()
+    assert cached["cached"] and sim.i2c_speed == 400000
@@ -0,0 +1,145 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# Get the parent directory's path
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Add the parent directory to the system path if not already present
+if parent_directory not in sys.path:
+    sys.path.insert(0, parent_directory)
+
+from ch347.uart import ByteRing, UARTPort
+
+
+class FakeUART:
+    def __init__(self):
+        self.rx = bytearray()
+        self.tx = bytearray()
+        self.lock = threading.Lock()
+        self.config = None
+        self.closed = False
+
+    def feed(self, data):
+        with self.lock:
+            self.rx += data
+
+    def uart_open(self):
+        return 1
+
+    def uart_close(self):
+        self.closed = True
+        return True
+
+    def uart_init(self, baud_rate, byte_size=8, parity=0, stop_bits=0, byte_timeout=0):
+        self.config = (baud_rate, byte_size, parity, stop_bits)
+        return True
+
+    def uart_set_timeout(self, write_timeout, read_timeout):
+        return True
+
+    def uart_query_buf_upload(self):
+        return len(self.rx)
+
+    def uart_read_into(self, buffer, length):
+        with self.lock:
+            count = min(length, len(self.rx))
+            buffer[:count] = self.rx[:count]
+            del self.rx[:count]
+        if not count:
+            # The DLL waits for the USB read timeout
+            time.sleep(0.001)
+        return count
+
+    def uart_write(self, data):
+        # Accept at most 3 bytes per call
+        self.tx += bytes(data[:3])
+        return min(3, len(data))
+
+
+def test_read_until_and_readinto():
+    uart = FakeUART()
+    with UARTPort(uart, baudrate=3000000, timeout=2) as port:
+        assert uart.config == (3000000, 8, 0, 0)
+        assert port.write(b"hello") == 5 and uart.tx == b"hello"
+
+        # A device that stops accepting data ends the write short
+        uart.uart_write = lambda data: 0
+        assert port.write(b"stuck") == 0
+        del uart.uart_write
+
+        uart.feed(b"first line\r")
+        threading.Timer(0.05, uart.feed, (b"\nsecond",)).start()
+        assert port.read_until(b"\r\n") == b"first line\r\n"
+
+        buffer = bytearray(6)
+        assert port.readinto(buffer) == 6 and buffer == b"second"
+
+        port.timeout = 0.05
+        uart.feed(b"partial")
+        assert port.read_until(b"\n") == b"partial"
+        assert port.read(4) == b""
+    assert uart.closed
+
+
+def test_ring_wraps_and_finds_across_boundary():
+    ring = ByteRing(8)
+    ring.writable()[:6] = b"xxxxxx"
+    ring.commit(6)
+    ring.consume(6)
+    target = ring.writable()
+    assert len(target) == 2
+    target[:] = b"ab"
+    ring.commit(2)
+    ring.writable()[:4] = b"\r\ncd"
+    ring.commit(4)
+    assert ring.find(b"b\r") == 1
+    assert ring.find(b"\r\n") == 2
+    assert ring.find(b"d") == 5
+    assert ring.find(b"\r\n", 3) == -1
+    assert b"".join(bytes(s) for s in ring.segments()) == b"ab\r\ncd"
+
+
+def test_sustained_stream_is_not_dropped(tmp_path):
+    uart = FakeUART()
+    payload = bytes(range(256)) * 4096
+    capture = tmp_path / "capture.bin"
+    with UARTPort(uart, timeout=5, buffer_size=1 << 16, capture=str(capture)) as port:
+        feeder = threading.Thread(
+            target=lambda: [
+                uart.feed(payload[i : i + 65536]) for i in range(0, len(payload), 65536)
+            ]
+        )
+        feeder.start()
+        received = bytearray(len(payload))
+        view = memoryview(received)
+        offset = 0
+        while offset < len(payload):
+            offset += port.readinto(view[offset : offset + 50000])
+        feeder.join()
+        assert received == payload
+        assert port.bytes_received == len(payload)
+    assert capture.read_bytes() == payload
+
+
+def test_reader_failure_is_raised():
+    uart = FakeUART()
+    uart.feed(b"ok")
+    uart.uart_query_buf_upload = lambda: None if not uart.rx else len(uart.rx)
+    with UARTPort(uart, timeout=2) as port:
+        assert port.read(2) == b"ok"
+        with pytest.raises(RuntimeError, match="QueryBufUpload"):
+            port.readline()
+
+
+def test_full_ring_counts_one_overflow():
+    uart = FakeUART()
+    with UARTPort(uart, timeout=2, buffer_size=16) as port:
+        uart.feed(b"x" * 16)
+        # The reader waits on the full ring across several wakeups
+        time.sleep(0.3)
+        assert port.overflows == 1
+        assert port.read(16) == b"x" * 16
@@ -0,0 +1,97 @@
+import os
+import struct
+import sys
+import threading
+
+# Get the parent directory's path
+parent_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Add the parent directory to the system path if not already present
+if parent_directory not in sys.path:
+    sys.path.insert(0, parent_directory)
+
+from ch347.xvc import XVCClient, XVCServer, benchmark
+from tests.jtag_sim import SimulatedDevice, SimulatedTAP
+
+IDCODE = 0x4BA00477
+
+
+def start_server(driver):
+    server = XVCServer(driver, ("127.0.0.1", 0))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, XVCClient(*server.server_address)
+
+
+def bits(*values):
+    # Pack a list of 0/1 values LSB first
+    value = sum(bit << i for i, bit in enumerate(values))
+    return value.to_bytes((len(values) + 7) // 8, "little")
+
+
+def test_xvc_reads_idcode_over_tcp():
+    tap = SimulatedTAP([SimulatedDevice(idcode=IDCODE)])
+    server, client = start_server(tap)
+    try:
+        assert client.getinfo() == "xvcServer_v1.0:%d" % XVCServer.MAX_VECTOR_BYTES
+        # 60 MHz is the fastest clock, a shorter period is rounded up to it
+        assert client.settck(10) == 16
+        assert client.settck(1000) == 533
+
+        # Reset, Idle, Select-DR, Capture-DR, then 32 bits of Shift-DR,
+        # split over two requests, and back to Idle
+        tms = [1] * 5 + [0, 1, 0, 0]
+        first = client.shift(len(tms) + 16, bits(*tms, *[0] * 16), bytes(4))
+        second = client.shift(18, bits(*[0] * 15, 1, 1, 0), bytes(3))
+        value = int.from_bytes(first, "little") >> len(tms)
+        value |= (int.from_bytes(second, "little") & 0xFFFF) << 16
+        assert value == IDCODE
+        assert tap.state == 1
+    finally:
+        client.close()
+        server.shutdown()
+        server.server_close()
+
+
+def test_queued_shifts_share_transfers():
+    tap = SimulatedTAP([SimulatedDevice(idcode=IDCODE)])
+    server = XVCServer(tap, ("127.0.0.1", 0))
+    try:
+        tap.calls.clear()
+        tms = [0, 1, 0, 0] + [0] * 12
+        request = b"shift:" + struct.pack("<I", 16) + bits(*tms) + bytes(2)
+        follow = b"shift:" + struct.pack("<I", 16) + bits(*[0] * 16) + bytes(2)
+        buffer = request + follow + b"getin"
+        consumed, response = server.process(buffer)
+
+        assert consumed == len(request) + len(follow)
+        assert len(response) == 4
+        assert server.requests == 2 and server.transfers == 1
+        # One TMS move into Shift-DR, then one scan across both requests
+        assert tap.calls == [("tms", 4), ("scan", 12 + 16)]
+        tdo = int.from_bytes(response, "little") >> 4
+        assert tdo == IDCODE & 0xFFFFFFF
+    finally:
+        server.server_close()
+
+
+class NullJtag:
+    def open_device(self):
+        return 1
+
+    def jtag_init(self, clock_rate):
+        return True
+
+    def jtag_tms_change(self, tms_value, step, skip=0):
+        return True
+
+    def jtag_io_scan_t(self, data_bits, bit_length, is_read, is_last_packet):
+        return bytes(data_bits)
+
+
+def test_benchmark_reports_throughput():
+    result = benchmark(NullJtag(), vector_bytes=1024, count=32)
+    print(f"XVC loopback: {result['mbit_per_second']:.1f} Mbit/s")
+    assert result["bits"] == 1024 * 8 * 32
+    assert result["mbit_per_second"] > 0
+    assert result["requests"] == 33